@@ -17,7 +17,12 @@ CREATE TABLE producao_cana (
     produtividade_toneladas_ha NUMBER(6,2) GENERATED ALWAYS AS (qtd_colhida_toneladas / area_plantada_ha),
     data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+)
+-- Particionamento por intervalo: o Oracle cria automaticamente uma partição
+-- por mês de colheita; relatórios filtrados por data leem só as do período
+PARTITION BY RANGE (data_colheita)
+INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_inicial VALUES LESS THAN (DATE '2024-01-01'));
 
 -- Criar tabela para armazenar cálculos de perdas
 CREATE TABLE perdas_colheita (
@@ -25,13 +30,18 @@ CREATE TABLE perdas_colheita (
     producao_id NUMBER NOT NULL,
     perda_estimada_toneladas NUMBER(10,2) NOT NULL CHECK (perda_estimada_toneladas >= 0),
     percentual_perda NUMBER(5,2) NOT NULL CHECK (percentual_perda BETWEEN 0 AND 100),
-    fatores_perda CLOB, -- JSON com fatores que contribuíram para a perda
+    fatores_perda CLOB CHECK (fatores_perda IS JSON), -- JSON com fatores que contribuíram para a perda
     metodo_calculo VARCHAR2(50) NOT NULL,
     observacoes VARCHAR2(500),
     calculado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (producao_id) REFERENCES producao_cana(id) ON DELETE CASCADE
+    FOREIGN KEY (producao_id) REFERENCES producao_cana(id) ON DELETE CASCADE,
+    CONSTRAINT uk_perdas_producao_metodo UNIQUE (producao_id, metodo_calculo)
 );
 
+-- Destino dos dados arquivados (OracleDatabase.arquivar_particoes)
+CREATE TABLE producao_cana_arquivo AS SELECT * FROM producao_cana WHERE 1 = 0;
+CREATE TABLE perdas_colheita_arquivo AS SELECT * FROM perdas_colheita WHERE 1 = 0;
+
 -- Criar tabela para parâmetros de cálculo de perdas
 CREATE TABLE parametros_perdas (
     id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -43,9 +53,20 @@ CREATE TABLE parametros_perdas (
     descricao VARCHAR2(200),
     ativo CHAR(1) DEFAULT 'S' CHECK (ativo IN ('S', 'N')),
     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    versao NUMBER DEFAULT 1 NOT NULL, -- incrementada a cada UPDATE (gatilho abaixo)
     UNIQUE (tipo_colheita, ativo)
 );
 
+-- Sem LISTEN/NOTIFY no Oracle, os processos detectam alterações consultando
+-- a versão das linhas (OracleDatabase.assinar_alteracoes_parametros)
+CREATE OR REPLACE TRIGGER trg_parametros_versao
+BEFORE UPDATE ON parametros_perdas
+FOR EACH ROW
+BEGIN
+    :NEW.versao := :OLD.versao + 1;
+END;
+/
+
 -- Inserir parâmetros padrão para cálculo de perdas
 INSERT INTO parametros_perdas (tipo_colheita, fator_base_perda, fator_umidade, fator_idade, fator_clima, descricao) VALUES
 ('manual', 0.05, 0.02, 0.01, 0.015, 'Parâmetros para colheita manual - perda base 5%');
@@ -54,12 +75,34 @@ INSERT INTO parametros_perdas (tipo_colheita, fator_base_perda, fator_umidade, f
 ('mecanizada', 0.08, 0.025, 0.015, 0.02, 'Parâmetros para colheita mecanizada - perda base 8%');
 
 -- Criar índices para melhor performance
-CREATE INDEX idx_producao_data ON producao_cana(data_colheita);
-CREATE INDEX idx_producao_tipo ON producao_cana(tipo_colheita);
-CREATE INDEX idx_producao_local ON producao_cana(localizacao);
-CREATE INDEX idx_perdas_producao ON perdas_colheita(producao_id);
+CREATE INDEX idx_producao_tipo ON producao_cana(tipo_colheita) LOCAL;
+CREATE INDEX idx_producao_local ON producao_cana(localizacao) LOCAL;
+
+-- Índices compostos e de cobertura (OracleDatabase.INDICES_COBERTURA):
+-- listagem paginada por (data_colheita, id) e relatório filtrado por data com
+-- junção das perdas por producao_id, respondidos sem acessar as tabelas
+CREATE INDEX idx_producao_data_id ON producao_cana
+    (data_colheita, id, localizacao, tipo_colheita,
+     area_plantada_ha, qtd_colhida_toneladas) LOCAL;
+CREATE INDEX idx_perdas_producao_cobertura ON perdas_colheita
+    (producao_id, id, perda_estimada_toneladas, percentual_perda,
+     metodo_calculo, calculado_em);
+
+-- Fatores de perda (OracleDatabase.INDICES_FATORES): filtros por faixa de cada fator
+CREATE INDEX idx_perdas_fator_umidade ON perdas_colheita
+    (JSON_VALUE(fatores_perda, '$.fator_umidade' RETURNING NUMBER));
+CREATE INDEX idx_perdas_fator_idade ON perdas_colheita
+    (JSON_VALUE(fatores_perda, '$.fator_idade' RETURNING NUMBER));
+CREATE INDEX idx_perdas_fator_clima ON perdas_colheita
+    (JSON_VALUE(fatores_perda, '$.fator_clima' RETURNING NUMBER));
+
+-- Chave natural da produção (usada pelos MERGE de upsert); inclui a coluna de
+-- particionamento, então o índice pode ser LOCAL
+ALTER TABLE producao_cana ADD CONSTRAINT uk_producao_natural
+    UNIQUE (localizacao, data_colheita, tipo_colheita) USING INDEX LOCAL;
 
 -- Criar view para relatórios consolidados
+-- (sem ORDER BY: cada consulta ordena apenas quando precisa)
 CREATE OR REPLACE VIEW vw_relatorio_perdas AS
 SELECT 
     p.id,
@@ -75,8 +118,7 @@ SELECT
     l.calculado_em,
     (p.qtd_colhida_toneladas + l.perda_estimada_toneladas) AS producao_potencial_toneladas
 FROM producao_cana p
-LEFT JOIN perdas_colheita l ON p.id = l.producao_id
-ORDER BY p.data_colheita DESC;
+LEFT JOIN perdas_colheita l ON p.id = l.producao_id;
 
 -- Inserir dados de exemplo para teste
 INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, data_colheita, variedade_cana, idade_cana_meses, umidade_solo, temperatura_media, precipitacao_mm) VALUES
@@ -88,5 +130,149 @@ INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas,
 INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, data_colheita, variedade_cana, idade_cana_meses, umidade_solo, temperatura_media, precipitacao_mm) VALUES
 ('Usina Central - Área 3', 120.0, 10800.0, 'mecanizada', DATE '2024-09-05', 'CTC4', 11, 72.0, 27.5, 1450.2);
 
+
+-- ============================================================================
+-- RELATÓRIO MATERIALIZADO
+-- ============================================================================
+
+-- Versão materializada de vw_relatorio_perdas para consultas repetidas (dashboards).
+-- Refresh sempre completo: o Oracle só faz fast refresh de junção externa
+-- quando a coluna de junção da tabela interna é única, e
+-- perdas_colheita.producao_id não é (a chave é producao_id + metodo_calculo).
+-- Por isso não há MATERIALIZED VIEW LOG nas tabelas: os logs só custariam em
+-- todo INSERT/UPDATE/DELETE sem nunca serem usados pelo refresh.
+CREATE MATERIALIZED VIEW mv_relatorio_perdas
+BUILD IMMEDIATE
+REFRESH COMPLETE ON DEMAND
+AS
+SELECT 
+    p.id,
+    l.id AS perda_id,
+    p.localizacao,
+    p.area_plantada_ha,
+    p.qtd_colhida_toneladas,
+    p.tipo_colheita,
+    p.data_colheita,
+    p.produtividade_toneladas_ha,
+    l.perda_estimada_toneladas,
+    l.percentual_perda,
+    l.metodo_calculo,
+    l.calculado_em,
+    (p.qtd_colhida_toneladas + l.perda_estimada_toneladas) AS producao_potencial_toneladas
+FROM producao_cana p
+LEFT JOIN perdas_colheita l ON p.id = l.producao_id;
+
+CREATE INDEX idx_mv_relatorio_data ON mv_relatorio_perdas(data_colheita);
+
+-- ============================================================================
+-- RECÁLCULO DE PERDAS NO BANCO
+-- ============================================================================
+
+-- Mesma fórmula de CalculadoraPerdas.calcular_perda_avancada (src/functions.py),
+-- aplicada a todas as produções do período num único MERGE com os parâmetros
+-- ativos. Grava as perdas 'avancado' e devolve a quantidade de linhas
+-- inseridas ou alteradas.
+-- Paridade e desempenho: scripts/benchmark_recalculo.py
+CREATE OR REPLACE FUNCTION recalcular_perdas(
+    p_data_inicio IN DATE DEFAULT NULL,
+    p_data_fim IN DATE DEFAULT NULL
+) RETURN NUMBER AS
+BEGIN
+    MERGE INTO perdas_colheita l
+    USING (
+        SELECT t.producao_id,
+               ROUND(t.qtd_colhida_toneladas * t.fator_total, 2) AS perda_estimada_toneladas,
+               ROUND(t.fator_total * 100, 2) AS percentual_perda,
+               JSON_OBJECT(
+                   'fator_base' VALUE t.fator_base,
+                   'fator_umidade' VALUE t.fator_umidade,
+                   'fator_idade' VALUE t.fator_idade,
+                   'fator_clima' VALUE t.fator_clima
+                   ABSENT ON NULL RETURNING CLOB
+               ) AS fatores_perda,
+               'Cálculo avançado para colheita ' || t.tipo_colheita
+               || CASE WHEN t.fator_umidade <> 0 AND t.umidade_solo < 60
+                           THEN '; Solo seco (' || t.umidade_texto || '%) aumentou perdas'
+                       WHEN t.fator_umidade <> 0 AND t.umidade_solo > 70
+                           THEN '; Solo muito úmido (' || t.umidade_texto || '%) aumentou perdas'
+                  END
+               || CASE WHEN t.fator_idade <> 0 AND t.idade_cana_meses < 12
+                           THEN '; Cana jovem (' || t.idade_cana_meses || ' meses) gerou mais perdas'
+                       WHEN t.fator_idade <> 0 AND t.idade_cana_meses > 18
+                           THEN '; Cana madura (' || t.idade_cana_meses || ' meses) gerou mais perdas'
+                  END
+               || CASE WHEN t.fator_clima <> 0
+                           THEN '; Condições climáticas adversas identificadas'
+                  END AS observacoes
+        FROM (
+            SELECT f.*,
+                   LEAST(f.fator_base + NVL(f.fator_umidade, 0) + NVL(f.fator_idade, 0)
+                         + NVL(f.fator_clima, 0), 0.25) AS fator_total,
+                   -- Umidade como o Python a exibe (58.0, 72.5)
+                   CASE WHEN f.umidade_solo = TRUNC(f.umidade_solo)
+                        THEN TO_CHAR(TRUNC(f.umidade_solo)) || '.0'
+                        ELSE RTRIM(TO_CHAR(f.umidade_solo, 'FM990.99',
+                                           'NLS_NUMERIC_CHARACTERS=''.,'''), '0')
+                   END AS umidade_texto
+            FROM (
+                SELECT p.id AS producao_id,
+                       p.tipo_colheita,
+                       p.qtd_colhida_toneladas,
+                       p.umidade_solo,
+                       p.idade_cana_meses,
+                       pp.fator_base_perda AS fator_base,
+                       -- Umidade ideal entre 60 e 70%
+                       CASE WHEN p.umidade_solo IS NULL THEN NULL
+                            WHEN p.umidade_solo BETWEEN 60 AND 70 THEN 0
+                            WHEN p.umidade_solo < 60 THEN pp.fator_umidade * (60 - p.umidade_solo) / 30
+                            ELSE pp.fator_umidade * (p.umidade_solo - 70) / 30
+                       END AS fator_umidade,
+                       -- Idade ideal entre 12 e 18 meses
+                       CASE WHEN p.idade_cana_meses IS NULL THEN NULL
+                            WHEN p.idade_cana_meses BETWEEN 12 AND 18 THEN 0
+                            WHEN p.idade_cana_meses < 12 THEN pp.fator_idade * (12 - p.idade_cana_meses) / 6
+                            ELSE pp.fator_idade * (p.idade_cana_meses - 18) / 12
+                       END AS fator_idade,
+                       -- Temperatura ideal entre 25 e 30°C, chuva entre 80 e 125 mm
+                       CASE WHEN p.temperatura_media IS NULL OR p.precipitacao_mm IS NULL THEN NULL
+                            ELSE (CASE WHEN p.temperatura_media < 25 THEN pp.fator_clima * (25 - p.temperatura_media) / 10
+                                       WHEN p.temperatura_media > 30 THEN pp.fator_clima * (p.temperatura_media - 30) / 10
+                                       ELSE 0
+                                  END
+                                + CASE WHEN p.precipitacao_mm < 80 THEN pp.fator_clima * (80 - p.precipitacao_mm) / 80
+                                       WHEN p.precipitacao_mm > 125 THEN pp.fator_clima * (p.precipitacao_mm - 125) / 125
+                                       ELSE 0
+                                  END) / 2
+                       END AS fator_clima
+                FROM producao_cana p
+                JOIN parametros_perdas pp ON pp.tipo_colheita = p.tipo_colheita AND pp.ativo = 'S'
+                WHERE (p_data_inicio IS NULL OR p.data_colheita >= p_data_inicio)
+                  AND (p_data_fim IS NULL OR p.data_colheita <= p_data_fim)
+            ) f
+        ) t
+    ) d
+    ON (l.producao_id = d.producao_id AND l.metodo_calculo = 'avancado')
+    WHEN MATCHED THEN UPDATE SET
+        l.perda_estimada_toneladas = d.perda_estimada_toneladas,
+        l.percentual_perda = d.percentual_perda,
+        l.fatores_perda = d.fatores_perda,
+        l.observacoes = d.observacoes,
+        l.calculado_em = CURRENT_TIMESTAMP
+        -- Só regrava linhas cujo resultado mudou
+        WHERE DECODE(l.perda_estimada_toneladas, d.perda_estimada_toneladas, 0, 1)
+            + DECODE(l.percentual_perda, d.percentual_perda, 0, 1)
+            + DECODE(l.observacoes, d.observacoes, 0, 1)
+            + DECODE(DBMS_LOB.COMPARE(l.fatores_perda, d.fatores_perda), 0, 0, 1) > 0
+    WHEN NOT MATCHED THEN INSERT
+        (producao_id, perda_estimada_toneladas, percentual_perda,
+         fatores_perda, metodo_calculo, observacoes)
+    VALUES
+        (d.producao_id, d.perda_estimada_toneladas, d.percentual_perda,
+         d.fatores_perda, 'avancado', d.observacoes);
+
+    RETURN SQL%ROWCOUNT;
+END;
+/
+
 -- Commit das alterações
 COMMIT;
\ No newline at end of file
@@ -2,8 +2,10 @@
 -- Sistema de Cálculo de Perdas - Cana-de-Açúcar
 
 -- Criar tabela principal de produção de cana
+-- Particionada por mês de colheita: relatórios filtrados por data leem só as
+-- partições do período. A chave primária inclui a coluna de particionamento.
 CREATE TABLE producao_cana (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     localizacao VARCHAR(100) NOT NULL,
     area_plantada_ha DECIMAL(10,2) NOT NULL CHECK (area_plantada_ha > 0),
     qtd_colhida_toneladas DECIMAL(12,2) NOT NULL CHECK (qtd_colhida_toneladas >= 0),
@@ -16,8 +18,32 @@ CREATE TABLE producao_cana (
     precipitacao_mm DECIMAL(6,2) CHECK (precipitacao_mm >= 0),
     produtividade_toneladas_ha DECIMAL(6,2) GENERATED ALWAYS AS (qtd_colhida_toneladas / area_plantada_ha) STORED,
     data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, data_colheita),
+    -- Chave natural: reprocessar um lote atualiza em vez de duplicar (upsert)
+    CONSTRAINT uk_producao_natural UNIQUE (localizacao, data_colheita, tipo_colheita)
+) PARTITION BY RANGE (data_colheita);
+
+-- Partições mensais (producao_cana_pAAAA_MM) de jan/2024 até 24 meses à frente.
+-- Novas partições: PostgreSQLDatabase.criar_particoes_futuras()
+DO $$
+DECLARE
+    mes DATE := DATE '2024-01-01';
+BEGIN
+    WHILE mes < date_trunc('month', CURRENT_DATE) + INTERVAL '24 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF producao_cana FOR VALUES FROM (%L) TO (%L)',
+            'producao_cana_p' || to_char(mes, 'YYYY_MM'), mes, (mes + INTERVAL '1 month')::date
+        );
+        mes := (mes + INTERVAL '1 month')::date;
+    END LOOP;
+END $$;
+
+-- Datas fora das partições mensais (antes de 2024, além do horizonte criado
+-- ou de meses já arquivados) ficam aqui em vez de o INSERT falhar, como na
+-- partição p_inicial do Oracle. criar_particoes_futuras() move as linhas do
+-- mês para a partição mensal quando ela é criada.
+CREATE TABLE producao_cana_default PARTITION OF producao_cana DEFAULT;
 
 -- Criar tabela para armazenar cálculos de perdas
 CREATE TABLE perdas_colheita (
@@ -29,9 +55,33 @@ CREATE TABLE perdas_colheita (
     metodo_calculo VARCHAR(50) NOT NULL,
     observacoes TEXT,
     calculado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (producao_id) REFERENCES producao_cana(id) ON DELETE CASCADE
+    data_colheita DATE NOT NULL, -- copiada da produção (preenchida por gatilho)
+    FOREIGN KEY (producao_id, data_colheita) REFERENCES producao_cana(id, data_colheita)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT uk_perdas_producao_metodo UNIQUE (producao_id, metodo_calculo)
 );
 
+-- A chave estrangeira para a tabela particionada exige data_colheita;
+-- o gatilho a preenche a partir da produção, sem mudar os INSERTs da aplicação
+CREATE OR REPLACE FUNCTION preencher_data_colheita_perda() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.data_colheita IS NULL THEN
+        SELECT data_colheita INTO NEW.data_colheita
+          FROM producao_cana
+         WHERE id = NEW.producao_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_perdas_data_colheita
+BEFORE INSERT ON perdas_colheita
+FOR EACH ROW EXECUTE FUNCTION preencher_data_colheita_perda();
+
+-- Destino das partições arquivadas (PostgreSQLDatabase.arquivar_particoes)
+CREATE SCHEMA arquivo;
+CREATE TABLE arquivo.perdas_colheita (LIKE perdas_colheita);
+
 -- Criar tabela para parâmetros de cálculo de perdas
 CREATE TABLE parametros_perdas (
     id SERIAL PRIMARY KEY,
@@ -53,13 +103,62 @@ INSERT INTO parametros_perdas (tipo_colheita, fator_base_perda, fator_umidade, f
 INSERT INTO parametros_perdas (tipo_colheita, fator_base_perda, fator_umidade, fator_idade, fator_clima, descricao) VALUES
 ('mecanizada', 0.08, 0.025, 0.015, 0.02, 'Parâmetros para colheita mecanizada - perda base 8%');
 
+-- Avisa os processos em execução (LISTEN parametros_perdas_alterados) sobre
+-- alterações de parâmetros; o payload é o tipo de colheita afetado.
+-- Usado por PostgreSQLDatabase.assinar_alteracoes_parametros()
+CREATE OR REPLACE FUNCTION notificar_parametros_alterados() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('parametros_perdas_alterados', '');
+        RETURN NULL;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('parametros_perdas_alterados', OLD.tipo_colheita);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM pg_notify('parametros_perdas_alterados', NEW.tipo_colheita);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_parametros_notificar
+AFTER INSERT OR UPDATE OR DELETE ON parametros_perdas
+FOR EACH ROW EXECUTE FUNCTION notificar_parametros_alterados();
+
+CREATE TRIGGER trg_parametros_notificar_truncate
+AFTER TRUNCATE ON parametros_perdas
+FOR EACH STATEMENT EXECUTE FUNCTION notificar_parametros_alterados();
+
 -- Criar índices para melhor performance
-CREATE INDEX idx_producao_data ON producao_cana(data_colheita);
 CREATE INDEX idx_producao_tipo ON producao_cana(tipo_colheita);
 CREATE INDEX idx_producao_local ON producao_cana(localizacao);
-CREATE INDEX idx_perdas_producao ON perdas_colheita(producao_id);
+
+-- Índices compostos e de cobertura (PostgreSQLDatabase.INDICES_COBERTURA):
+-- listagem paginada por (data_colheita, id) e relatório filtrado por data com
+-- junção das perdas por producao_id, respondidos só pelo índice (Index Only Scan)
+CREATE INDEX idx_producao_data_id
+    ON producao_cana (data_colheita DESC, id DESC)
+    INCLUDE (localizacao, area_plantada_ha, qtd_colhida_toneladas,
+             tipo_colheita, produtividade_toneladas_ha);
+CREATE INDEX idx_perdas_producao_cobertura
+    ON perdas_colheita (producao_id)
+    INCLUDE (id, perda_estimada_toneladas, percentual_perda,
+             metodo_calculo, calculado_em);
+
+-- Fatores de perda (PostgreSQLDatabase.INDICES_FATORES): GIN para "quais
+-- cálculos aplicaram o fator" e expressões para filtros por faixa
+CREATE INDEX idx_perdas_fatores_gin
+    ON perdas_colheita USING GIN (fatores_perda jsonb_path_ops);
+CREATE INDEX idx_perdas_fator_umidade
+    ON perdas_colheita (((fatores_perda->>'fator_umidade')::numeric));
+CREATE INDEX idx_perdas_fator_idade
+    ON perdas_colheita (((fatores_perda->>'fator_idade')::numeric));
+CREATE INDEX idx_perdas_fator_clima
+    ON perdas_colheita (((fatores_perda->>'fator_clima')::numeric));
 
 -- Criar view para relatórios consolidados
+-- (sem ORDER BY: cada consulta ordena apenas quando precisa)
 CREATE OR REPLACE VIEW vw_relatorio_perdas AS
 SELECT 
     p.id,
@@ -75,8 +174,7 @@ SELECT
     l.calculado_em,
     (p.qtd_colhida_toneladas + l.perda_estimada_toneladas) AS producao_potencial_toneladas
 FROM producao_cana p
-LEFT JOIN perdas_colheita l ON p.id = l.producao_id
-ORDER BY p.data_colheita DESC;
+LEFT JOIN perdas_colheita l ON p.id = l.producao_id;
 
 -- Inserir dados de exemplo para teste
 INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, data_colheita, variedade_cana, idade_cana_meses, umidade_solo, temperatura_media, precipitacao_mm) VALUES
@@ -86,4 +184,173 @@ INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas,
 ('Fazenda Boa Vista - Setor A', 25.0, 1750.0, 'manual', '2024-08-10', 'SP813250', 14, 58.0, 29.0, 980.5);
 
 INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, data_colheita, variedade_cana, idade_cana_meses, umidade_solo, temperatura_media, precipitacao_mm) VALUES
-('Usina Central - Área 3', 120.0, 10800.0, 'mecanizada', '2024-09-05', 'CTC4', 11, 72.0, 27.5, 1450.2);
\ No newline at end of file
+('Usina Central - Área 3', 120.0, 10800.0, 'mecanizada', '2024-09-05', 'CTC4', 11, 72.0, 27.5, 1450.2);
+
+-- ============================================================================
+-- RELATÓRIO MATERIALIZADO
+-- ============================================================================
+
+-- Versão materializada de vw_relatorio_perdas para consultas repetidas (dashboards)
+CREATE MATERIALIZED VIEW mv_relatorio_perdas AS
+SELECT 
+    -- Chave não nula para o REFRESH CONCURRENTLY: id da perda, ou o id da
+    -- produção negativo enquanto ela não tem cálculo (ids são positivos)
+    COALESCE(l.id, -p.id) AS chave,
+    p.id,
+    l.id AS perda_id,
+    p.localizacao,
+    p.area_plantada_ha,
+    p.qtd_colhida_toneladas,
+    p.tipo_colheita,
+    p.data_colheita,
+    p.produtividade_toneladas_ha,
+    l.perda_estimada_toneladas,
+    l.percentual_perda,
+    l.metodo_calculo,
+    l.calculado_em,
+    (p.qtd_colhida_toneladas + l.perda_estimada_toneladas) AS producao_potencial_toneladas
+FROM producao_cana p
+LEFT JOIN perdas_colheita l ON p.id = l.producao_id;
+
+-- Índice único exigido por REFRESH MATERIALIZED VIEW CONCURRENTLY. Com
+-- (id, perda_id) as produções sem cálculo tinham perda_id NULL, que nunca
+-- casa na comparação, e eram apagadas e reinseridas em todo refresh.
+CREATE UNIQUE INDEX idx_mv_relatorio_chave ON mv_relatorio_perdas(chave);
+CREATE INDEX idx_mv_relatorio_data ON mv_relatorio_perdas(data_colheita);
+
+-- Controle de desatualização: alterado_em > atualizado_em indica dados novos
+CREATE TABLE controle_relatorio_materializado (
+    nome VARCHAR(60) PRIMARY KEY,
+    alterado_em TIMESTAMP NOT NULL DEFAULT clock_timestamp(),
+    atualizado_em TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+);
+
+INSERT INTO controle_relatorio_materializado (nome) VALUES ('mv_relatorio_perdas');
+
+CREATE OR REPLACE FUNCTION marcar_relatorio_desatualizado() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE controle_relatorio_materializado
+       SET alterado_em = clock_timestamp()
+     WHERE nome = 'mv_relatorio_perdas';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Gatilhos por comando (não por linha): cargas em lote marcam uma única vez
+CREATE TRIGGER trg_producao_relatorio_desatualizado
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON producao_cana
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_relatorio_desatualizado();
+
+CREATE TRIGGER trg_perdas_relatorio_desatualizado
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON perdas_colheita
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_relatorio_desatualizado();
+
+
+-- ============================================================================
+-- RECÁLCULO DE PERDAS NO BANCO
+-- ============================================================================
+
+-- Mesma fórmula de CalculadoraPerdas.calcular_perda_avancada (src/functions.py),
+-- aplicada a todas as produções do período num único INSERT ... SELECT com os
+-- parâmetros ativos. Grava as perdas 'avancado' por upsert e devolve a
+-- quantidade de linhas inseridas ou alteradas.
+-- Paridade e desempenho: scripts/benchmark_recalculo.py
+CREATE OR REPLACE FUNCTION recalcular_perdas(
+    p_data_inicio DATE DEFAULT NULL,
+    p_data_fim DATE DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    v_linhas INTEGER;
+BEGIN
+    WITH fatores AS (
+        SELECT p.id AS producao_id,
+               p.data_colheita,
+               p.tipo_colheita,
+               p.qtd_colhida_toneladas,
+               p.umidade_solo,
+               p.idade_cana_meses,
+               pp.fator_base_perda AS fator_base,
+               -- Umidade ideal entre 60 e 70%
+               CASE WHEN p.umidade_solo IS NULL THEN NULL
+                    WHEN p.umidade_solo BETWEEN 60 AND 70 THEN 0
+                    WHEN p.umidade_solo < 60 THEN pp.fator_umidade * (60 - p.umidade_solo) / 30
+                    ELSE pp.fator_umidade * (p.umidade_solo - 70) / 30
+               END AS fator_umidade,
+               -- Idade ideal entre 12 e 18 meses
+               CASE WHEN p.idade_cana_meses IS NULL THEN NULL
+                    WHEN p.idade_cana_meses BETWEEN 12 AND 18 THEN 0
+                    WHEN p.idade_cana_meses < 12 THEN pp.fator_idade * (12 - p.idade_cana_meses) / 6.0
+                    ELSE pp.fator_idade * (p.idade_cana_meses - 18) / 12.0
+               END AS fator_idade,
+               -- Temperatura ideal entre 25 e 30°C, chuva entre 80 e 125 mm
+               CASE WHEN p.temperatura_media IS NULL OR p.precipitacao_mm IS NULL THEN NULL
+                    ELSE (CASE WHEN p.temperatura_media < 25 THEN pp.fator_clima * (25 - p.temperatura_media) / 10
+                               WHEN p.temperatura_media > 30 THEN pp.fator_clima * (p.temperatura_media - 30) / 10
+                               ELSE 0
+                          END
+                        + CASE WHEN p.precipitacao_mm < 80 THEN pp.fator_clima * (80 - p.precipitacao_mm) / 80
+                               WHEN p.precipitacao_mm > 125 THEN pp.fator_clima * (p.precipitacao_mm - 125) / 125
+                               ELSE 0
+                          END) / 2
+               END AS fator_clima
+        FROM producao_cana p
+        JOIN parametros_perdas pp ON pp.tipo_colheita = p.tipo_colheita AND pp.ativo
+        WHERE (p_data_inicio IS NULL OR p.data_colheita >= p_data_inicio)
+          AND (p_data_fim IS NULL OR p.data_colheita <= p_data_fim)
+    ),
+    calculadas AS (
+        SELECT f.*,
+               LEAST(f.fator_base + COALESCE(f.fator_umidade, 0) + COALESCE(f.fator_idade, 0)
+                     + COALESCE(f.fator_clima, 0), 0.25) AS fator_total,
+               -- Umidade como o Python a exibe (58.0, 72.5)
+               CASE WHEN f.umidade_solo = trunc(f.umidade_solo)
+                    THEN trunc(f.umidade_solo)::BIGINT || '.0'
+                    ELSE trim_scale(f.umidade_solo)::TEXT
+               END AS umidade_texto
+        FROM fatores f
+    )
+    INSERT INTO perdas_colheita
+    (producao_id, data_colheita, perda_estimada_toneladas, percentual_perda,
+     fatores_perda, metodo_calculo, observacoes)
+    SELECT producao_id,
+           data_colheita,
+           ROUND(qtd_colhida_toneladas * fator_total, 2),
+           ROUND(fator_total * 100, 2),
+           jsonb_strip_nulls(jsonb_build_object(
+               'fator_base', fator_base,
+               'fator_umidade', fator_umidade,
+               'fator_idade', fator_idade,
+               'fator_clima', fator_clima
+           )),
+           'avancado',
+           concat_ws('; ',
+               'Cálculo avançado para colheita ' || tipo_colheita,
+               CASE WHEN fator_umidade <> 0 AND umidade_solo < 60
+                        THEN 'Solo seco (' || umidade_texto || '%) aumentou perdas'
+                    WHEN fator_umidade <> 0 AND umidade_solo > 70
+                        THEN 'Solo muito úmido (' || umidade_texto || '%) aumentou perdas'
+               END,
+               CASE WHEN fator_idade <> 0 AND idade_cana_meses < 12
+                        THEN 'Cana jovem (' || idade_cana_meses || ' meses) gerou mais perdas'
+                    WHEN fator_idade <> 0 AND idade_cana_meses > 18
+                        THEN 'Cana madura (' || idade_cana_meses || ' meses) gerou mais perdas'
+               END,
+               CASE WHEN fator_clima <> 0 THEN 'Condições climáticas adversas identificadas' END
+           )
+    FROM calculadas
+    ON CONFLICT (producao_id, metodo_calculo) DO UPDATE SET
+        perda_estimada_toneladas = EXCLUDED.perda_estimada_toneladas,
+        percentual_perda = EXCLUDED.percentual_perda,
+        fatores_perda = EXCLUDED.fatores_perda,
+        observacoes = EXCLUDED.observacoes,
+        calculado_em = CURRENT_TIMESTAMP
+    WHERE (perdas_colheita.perda_estimada_toneladas, perdas_colheita.percentual_perda,
+           perdas_colheita.fatores_perda, perdas_colheita.observacoes)
+          IS DISTINCT FROM
+          (EXCLUDED.perda_estimada_toneladas, EXCLUDED.percentual_perda,
+           EXCLUDED.fatores_perda, EXCLUDED.observacoes);
+
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+    RETURN v_linhas;
+END;
+$$ LANGUAGE plpgsql;
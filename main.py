@@ -6,56 +6,133 @@ Este script fornece uma interface de linha de comando para:
 - Cadastrar dados de produção de cana
 - Calcular perdas na colheita
 - Gerar relatórios
-- Gerenciar dados via banco Oracle (prioridade) ou PostgreSQL
+- Gerenciar dados via banco Oracle (prioridade), PostgreSQL ou SQLite (embutido)
 """
 
 import sys
 import os
+import json
 import logging
 import argparse
+from dataclasses import asdict
 from datetime import datetime, date
-from typing import Dict, List, Optional
-import colorlog
-from tabulate import tabulate
+from functools import cached_property, lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 
 # Adicionar o diretório src ao path para importar módulos
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
 
-# Tentar importar banco Oracle primeiro (prioridade), depois PostgreSQL
-try:
-    from src.database import OracleDatabase as Database
-    DATABASE_TYPE = "Oracle"
-except ImportError:
-    try:
-        from src.database_postgres import PostgreSQLDatabase as Database
-        DATABASE_TYPE = "PostgreSQL"
-    except ImportError:
-        print("❌ Erro: Nenhum driver de banco disponível!")
-        print("Instale cx_Oracle ou psycopg2-binary")
-        sys.exit(1)
-
+# Módulos pesados (drivers de banco, pandas, colorlog, tabulate) são
+# importados no primeiro uso: --help, --version e --calcular-json não os carregam
+from src.repository import RepositorioProducao
+from src.instrumentation import monitor_consultas
+from src.cache import RepositorioComCache
+from src.health import MonitorSaude, erro_de_conexao
+from src.write_behind import FilaEscritaAssincrona
+from src.spool import SpoolOffline
+from src.segmentos import ArquivoRelatorios
 from src.functions import (
     CalculadoraPerdas, ManipuladorJSON, DadosProducao, 
     GerenciadorDados, validar_dados_producao
 )
 
 
+@lru_cache(maxsize=None)
+def detectar_banco() -> Tuple[type, str]:
+    """
+    Classe e nome do banco a usar: Oracle (prioridade), PostgreSQL ou SQLite.
+    
+    O driver é importado aqui, só quando o sistema precisa do banco.
+    
+    Returns:
+        Tupla (classe do repositório, nome do banco)
+    """
+    try:
+        from src.database import OracleDatabase
+        return OracleDatabase, "Oracle"
+    except ImportError:
+        try:
+            from src.database_postgres import PostgreSQLDatabase
+            return PostgreSQLDatabase, "PostgreSQL"
+        except ImportError:
+            # Sem driver de servidor: banco embutido (arquivo local)
+            from src.database_sqlite import SQLiteDatabase
+            return SQLiteDatabase, "SQLite"
+
+
+def tabulate(*args, **kwargs) -> str:
+    """tabulate.tabulate, importado na primeira tabela exibida."""
+    from tabulate import tabulate as _tabulate
+    return _tabulate(*args, **kwargs)
+
+
 class SistemaCanaAcucar:
     """Classe principal do sistema de cálculo de perdas."""
     
-    def __init__(self):
-        """Inicializa o sistema."""
+    def __init__(self, db: Optional[RepositorioProducao] = None, escrita_assincrona: bool = False,
+                 arquivar_relatorios: bool = False):
+        """
+        Inicializa o sistema.
+        
+        Args:
+            db: Repositório a usar; por padrão, o banco detectado por
+                detectar_banco() no primeiro acesso a self.db
+            escrita_assincrona: Se True, os cálculos salvos são gravados no
+                banco em segundo plano, em lote (write-behind)
+            arquivar_relatorios: Se True, os relatórios de perda vão para
+                segmentos rotativos em data/relatorios em vez de um JSON cada
+        """
         self.configurar_logging()
-        self.db = Database()
-        self.calculadora = CalculadoraPerdas()
-        self.manipulador_json = ManipuladorJSON()
         self.logger = logging.getLogger(__name__)
+        self._db_informado = db
+        # Disponibilidade do banco em cache, com disjuntor após falhas seguidas
+        # (o repositório só é criado no primeiro teste)
+        self.saude = MonitorSaude(lambda: self.db.test_connection())
+        # Gravação em segundo plano dos cálculos (opcional, --write-behind);
+        # a fila só é criada no primeiro cálculo salvo
+        self._escrita_assincrona = escrita_assincrona
+        # Cálculos que não chegaram ao banco, reenviados quando ele voltar
+        self.spool = SpoolOffline()
+        self.manipulador_json = ManipuladorJSON(
+            arquivo_relatorios=ArquivoRelatorios(os.path.join("data", "relatorios"))
+            if arquivar_relatorios else None
+        )
+    
+    @cached_property
+    def tipo_banco(self) -> str:
+        """Nome do banco em uso (para mensagens)."""
+        if self._db_informado is not None:
+            return type(self._db_informado).__name__
+        return detectar_banco()[1]
+    
+    @cached_property
+    def db(self) -> RepositorioComCache:
+        """
+        Repositório com cache (TTL + LRU), criado no primeiro acesso.
         
+        Até aqui nenhum driver de banco foi importado nem conectado.
+        """
+        repositorio = self._db_informado if self._db_informado is not None else detectar_banco()[0]()
         # Informar qual banco está sendo usado
-        self.logger.info(f"Usando banco de dados: {DATABASE_TYPE}")
+        self.logger.info(f"Usando banco de dados: {self.tipo_banco}")
+        return RepositorioComCache(repositorio, saude=self.saude)
+    
+    @cached_property
+    def fila_escrita(self) -> Optional[FilaEscritaAssincrona]:
+        """Fila de gravação em segundo plano (None sem --write-behind), criada no primeiro uso."""
+        if not self._escrita_assincrona:
+            return None
+        return FilaEscritaAssincrona(self.db, ao_confirmar=self._confirmar_gravacao)
+    
+    @cached_property
+    def calculadora(self) -> CalculadoraPerdas:
+        """Calculadora com os parâmetros de perdas lidos do banco (criada no primeiro uso)."""
+        return CalculadoraPerdas(self.db)
     
     def configurar_logging(self):
         """Configura sistema de logging com cores."""
+        import colorlog
+        
         # Configurar handler com cores
         handler = colorlog.StreamHandler()
         handler.setFormatter(colorlog.ColoredFormatter(
@@ -78,24 +155,127 @@ class SistemaCanaAcucar:
         logger.setLevel(logging.INFO)
         logger.addHandler(handler)
     
-    def verificar_conexao_banco(self) -> bool:
-        """Verifica se a conexão com o banco está funcionando."""
-        self.logger.info(f"Verificando conexão com banco de dados {DATABASE_TYPE}...")
+    def verificar_conexao_banco(self, forcar: bool = False) -> bool:
+        """
+        Verifica se a conexão com o banco está funcionando.
         
-        try:
-            if self.db.test_connection():
-                self.logger.info(f"✅ Conexão com banco {DATABASE_TYPE} estabelecida com sucesso!")
-                return True
-            else:
-                self.logger.error(f"❌ Falha na conexão com banco {DATABASE_TYPE}")
-                return False
-        except Exception as e:
-            self.logger.error(f"❌ Erro ao conectar com banco: {e}")
-            if DATABASE_TYPE == "Oracle":
+        Usa o estado em cache de MonitorSaude: um sucesso recente dispensa
+        novo teste e, com o disjuntor aberto, a resposta é imediata (o banco
+        é sondado em segundo plano).
+        
+        Args:
+            forcar: Testa a conexão de fato (opção 6 do menu e --test-connection)
+        """
+        if forcar:
+            self.logger.info(f"Verificando conexão com banco de dados {self.tipo_banco}...")
+        
+        if self.saude.disponivel(forcar=forcar):
+            if forcar:
+                self.logger.info(f"✅ Conexão com banco {self.tipo_banco} estabelecida com sucesso!")
+            return True
+        
+        estado = self.saude.estado()
+        if estado['situacao'] == MonitorSaude.FECHADO or forcar:
+            self.logger.error(f"❌ Falha na conexão com banco {self.tipo_banco}: {estado['ultimo_erro']}")
+            if self.tipo_banco.startswith("Oracle"):
                 self.logger.info("💡 Certifique-se de que o Docker está rodando: docker-compose up -d")
             else:
                 self.logger.info("💡 Certifique-se de que o PostgreSQL está rodando: docker-compose -f docker-compose-postgres.yml up -d")
+        else:
+            self.logger.warning(f"Banco {self.tipo_banco} indisponível: {self.saude.descrever()}")
+        return False
+    
+    def _confirmar_gravacao(self, producao_id: Optional[int], perda_id: Optional[int],
+                            erro: Optional[Exception], dados_producao: Optional[Dict] = None,
+                            dados_perda: Optional[Dict] = None):
+        """
+        Confirmação da fila de escrita (chamada na thread de gravação).
+        
+        Com erro e os dados do cálculo em mãos, o cálculo vai para o spool
+        local (falha de conexão) ou para os rejeitados do spool (dados
+        recusados pelo banco, que falhariam de novo no reenvio).
+        """
+        if erro is None:
+            self.logger.info(f"Cálculo gravado no banco (produção {producao_id}, perda {perda_id})")
+        elif dados_producao is not None and dados_perda is not None:
+            if erro_de_conexao(erro):
+                self.saude.registrar_falha(erro)
+                self.spool.gravar(dados_producao, dados_perda)
+                self.logger.error(f"Cálculo não gravado no banco; guardado no spool local: {erro}")
+            else:
+                self.spool.rejeitar(dados_producao, dados_perda, erro)
+                self.logger.error(f"Cálculo recusado pelo banco; guardado nos rejeitados do spool: {erro}")
+        else:
+            self.logger.error(f"Cálculo não gravado no banco (o JSON foi salvo): {erro}")
+    
+    def encerrar(self):
+        """Grava os cálculos pendentes na fila de escrita e sincroniza o spool antes de sair."""
+        # Sem nenhum cálculo salvo a fila não foi criada: nada a gravar
+        if self.__dict__.get('fila_escrita') is not None:
+            pendentes = self.fila_escrita.pendentes()
+            if pendentes:
+                print(f"⏳ Gravando {pendentes} cálculo(s) pendente(s) no banco...")
+            self.fila_escrita.fechar(timeout=30)
+        self.spool.fechar()
+        if self.manipulador_json.arquivo_relatorios is not None:
+            self.manipulador_json.arquivo_relatorios.fechar()
+        if self.spool.registros_pendentes:
+            print(f"📦 {self.spool.registros_pendentes} cálculo(s) no spool local aguardando o banco.")
+    
+    def reenviar_spool(self) -> bool:
+        """
+        Reenvia agora os cálculos do spool local, se o banco estiver disponível.
+        
+        Returns:
+            True se o spool ficou vazio
+        """
+        if not self.spool.registros_pendentes:
+            print("📦 Spool local vazio.")
+            return True
+        if not self.verificar_conexao_banco(forcar=True):
+            print(f"❌ Banco indisponível; {self.spool.registros_pendentes} cálculo(s) continuam no spool.")
+            return False
+        
+        try:
+            resultado = self.spool.reenviar(self.db)
+        except Exception as e:
+            self.logger.error(f"Erro ao reenviar spool: {e}")
+            print(f"⚠️  Reenvio interrompido; {self.spool.registros_pendentes} cálculo(s) continuam no spool.")
             return False
+        
+        taxa = resultado['registros_por_segundo']
+        print(f"✅ {resultado['registros']} cálculo(s) reenviado(s) em {resultado['segundos']:.2f}s"
+              + (f" ({taxa:.0f} registros/s)" if taxa else ""))
+        if resultado['rejeitados']:
+            print(f"⚠️  {resultado['rejeitados']} cálculo(s) recusado(s) pelo banco; "
+                  f"guardados em {self.spool.caminho_rejeitados}")
+        return True
+    
+    def exibir_saude_banco(self):
+        """Testa a conexão e mostra o estado do disjuntor (opção 6 do menu)."""
+        self.verificar_conexao_banco(forcar=True)
+        
+        estado = self.saude.estado()
+        print(f"\n🩺 Estado do banco: {self.saude.descrever()}")
+        print(f"  • Disjuntor: {estado['situacao']}")
+        print(f"  • Falhas seguidas: {estado['falhas_consecutivas']}")
+        if estado['ultimo_erro']:
+            print(f"  • Último erro: {estado['ultimo_erro']}")
+        print(f"  • Testes de conexão realizados: {estado['testes_realizados']}")
+        print(f"  • Verificações atendidas pelo cache: {estado['verificacoes_em_cache']}")
+        print(f"  • Recusas imediatas (disjuntor aberto): {estado['rejeicoes_rapidas']}")
+        
+        spool = self.spool.estatisticas()
+        print(f"\n📦 Spool local: {spool['registros_pendentes']} cálculo(s) em "
+              f"{spool['segmentos']} segmento(s) ({spool['bytes'] / 1024:.1f} KB)")
+        print(f"  • Reenviados nesta sessão: {spool['registros_reenviados']}")
+        if spool['registros_rejeitados']:
+            print(f"  • Recusados pelo banco nesta sessão: {spool['registros_rejeitados']}")
+        if spool['ultimo_reenvio']:
+            ultimo = spool['ultimo_reenvio']
+            taxa = ultimo['registros_por_segundo']
+            print(f"  • Último reenvio: {ultimo['registros']} registro(s) em {ultimo['segundos']:.2f}s"
+                  + (f" ({taxa:.0f} registros/s)" if taxa else ""))
     
     def menu_principal(self):
         """Exibe menu principal e processa escolhas do usuário."""
@@ -103,14 +283,16 @@ class SistemaCanaAcucar:
             print("\n" + "="*60)
             print("🌾 SISTEMA DE CÁLCULO DE PERDAS - CANA-DE-AÇÚCAR 🌾")
             print("="*60)
-            print(f"💾 Banco de dados: {DATABASE_TYPE}")
+            print(f"💾 Banco de dados: {self.tipo_banco} - {self.saude.descrever()}")
+            if self.spool.registros_pendentes:
+                print(f"📦 Spool local: {self.spool.registros_pendentes} cálculo(s) aguardando reenvio")
             print("="*60)
             print("1. 📝 Cadastrar nova produção")
             print("2. 🧮 Calcular perdas")
             print("3. 📊 Gerar relatórios")
             print("4. 💾 Gerenciar arquivos JSON")
             print("5. 🔍 Consultar banco de dados")
-            print("6. ⚙️  Testar conexão banco")
+            print("6. ⚙️  Testar conexão e estado do banco")
             print("7. 🌍 Calcular com coordenadas GPS (TUPLA)")
             print("8. 📈 Analisar múltiplas medições (LISTA)")
             print("9. 🗃️  Relatório tabela de memória (DATAFRAME)")
@@ -133,7 +315,7 @@ class SistemaCanaAcucar:
                 elif opcao == "5":
                     self.consultar_banco()
                 elif opcao == "6":
-                    self.verificar_conexao_banco()
+                    self.exibir_saude_banco()
                 elif opcao == "7":
                     self.calcular_com_gps()
                 elif opcao == "8":
@@ -344,7 +526,8 @@ class SistemaCanaAcucar:
                         'precipitacao_mm': dados.precipitacao_mm
                     }
                     
-                    producao_id = self.db.inserir_producao_cana(dados_producao_dict)
+                    # Upsert pela chave natural: recadastrar a mesma colheita atualiza a linha
+                    producao_id = self.db.upsert_producao_cana(dados_producao_dict)
                     print(f"✅ Produção cadastrada no banco com ID: {producao_id}")
                     
                 except Exception as e:
@@ -525,7 +708,8 @@ class SistemaCanaAcucar:
         
         return dados
     
-    def _tem_dados_para_calculo_avancado(self, dados: DadosProducao) -> bool:
+    @staticmethod
+    def _tem_dados_para_calculo_avancado(dados: DadosProducao) -> bool:
         """Verifica se temos dados suficientes para cálculo avançado."""
         return (dados.umidade_solo is not None and 
                 dados.idade_cana_meses is not None and 
@@ -638,10 +822,11 @@ class SistemaCanaAcucar:
     def _carregar_dados_json(self) -> Optional[DadosProducao]:
         """Carrega dados de produção de arquivo JSON."""
         try:
-            arquivos = self.manipulador_json.listar_arquivos_dados()
+            # Só arquivos de produção (relatórios de perda não são dados de entrada)
+            arquivos = [entrada['nome'] for entrada in self.manipulador_json.filtrar_arquivos(tipo='producao')]
             
             if not arquivos:
-                print("❌ Nenhum arquivo JSON encontrado.")
+                print("❌ Nenhum arquivo JSON de produção encontrado.")
                 return None
             
             print("\n📂 Arquivos disponíveis:")
@@ -702,43 +887,64 @@ class SistemaCanaAcucar:
         try:
             # Salvar em JSON
             arquivo_json = self.manipulador_json.salvar_resultado_perda(resultado, dados)
-            print(f"💾 Relatório salvo em: {arquivo_json}")
+            if self.manipulador_json.arquivo_relatorios is not None:
+                print(f"💾 Relatório arquivado com ID: {arquivo_json}")
+            else:
+                print(f"💾 Relatório salvo em: {arquivo_json}")
             
-            # Salvar no banco se disponível
-            if self.verificar_conexao_banco():
-                try:
-                    # Primeiro, buscar ou criar produção no banco
-                    dados_producao_dict = {
-                        'localizacao': dados.localizacao,
-                        'area_plantada_ha': dados.area_plantada_ha,
-                        'qtd_colhida_toneladas': dados.qtd_colhida_toneladas,
-                        'tipo_colheita': dados.tipo_colheita,
-                        'data_colheita': dados.data_colheita,
-                        'variedade_cana': dados.variedade_cana,
-                        'idade_cana_meses': dados.idade_cana_meses,
-                        'umidade_solo': dados.umidade_solo,
-                        'temperatura_media': dados.temperatura_media,
-                        'precipitacao_mm': dados.precipitacao_mm
-                    }
-                    
-                    producao_id = self.db.inserir_producao_cana(dados_producao_dict)
-                    
-                    # Salvar cálculo de perda
-                    dados_perda = {
-                        'producao_id': producao_id,
-                        'perda_estimada_toneladas': resultado.perda_estimada_toneladas,
-                        'percentual_perda': resultado.percentual_perda,
-                        'fatores_perda': resultado.fatores_aplicados,
-                        'metodo_calculo': resultado.metodo_calculo,
-                        'observacoes': resultado.observacoes
-                    }
-                    
-                    perda_id = self.db.inserir_perda_colheita(dados_perda)
+            dados_producao_dict = {
+                'localizacao': dados.localizacao,
+                'area_plantada_ha': dados.area_plantada_ha,
+                'qtd_colhida_toneladas': dados.qtd_colhida_toneladas,
+                'tipo_colheita': dados.tipo_colheita,
+                'data_colheita': dados.data_colheita,
+                'variedade_cana': dados.variedade_cana,
+                'idade_cana_meses': dados.idade_cana_meses,
+                'umidade_solo': dados.umidade_solo,
+                'temperatura_media': dados.temperatura_media,
+                'precipitacao_mm': dados.precipitacao_mm
+            }
+            dados_perda = {
+                'perda_estimada_toneladas': resultado.perda_estimada_toneladas,
+                'percentual_perda': resultado.percentual_perda,
+                'fatores_perda': resultado.fatores_aplicados,
+                'metodo_calculo': resultado.metodo_calculo,
+                'observacoes': resultado.observacoes
+            }
+            
+            # Salvar no banco se disponível; senão, no spool local para reenvio
+            if not self.verificar_conexao_banco():
+                self.spool.gravar(dados_producao_dict, dados_perda)
+                print("📦 Banco indisponível: cálculo guardado no spool local para reenvio automático.")
+                return
+            
+            try:
+                if self.fila_escrita is not None:
+                    # Write-behind: gravado em lote pela thread da fila; se falhar, vai para o spool
+                    self.fila_escrita.enfileirar(
+                        dados_producao_dict, dados_perda,
+                        ao_confirmar=lambda producao_id, perda_id, erro: self._confirmar_gravacao(
+                            producao_id, perda_id, erro, dados_producao_dict, dados_perda
+                        )
+                    )
+                    print("💾 Cálculo enfileirado para gravação no banco")
+                else:
+                    # Upsert pela chave natural: salvar o mesmo cálculo de novo não duplica linhas
+                    producao_id = self.db.upsert_producao_cana(dados_producao_dict)
+                    perda_id = self.db.upsert_perda_colheita({**dados_perda, 'producao_id': producao_id})
                     print(f"💾 Cálculo também salvo no banco com ID: {perda_id}")
-                    
-                except Exception as e:
-                    self.logger.error(f"Erro ao salvar no banco: {e}")
-                    print("⚠️  Erro ao salvar no banco, mas JSON foi salvo.")
+                
+            except Exception as e:
+                self.logger.error(f"Erro ao salvar no banco: {e}")
+                if erro_de_conexao(e):
+                    self.saude.registrar_falha(e)
+                    self.spool.gravar(dados_producao_dict, dados_perda)
+                    print("⚠️  Erro ao salvar no banco: cálculo guardado no spool local para reenvio automático.")
+                else:
+                    # Dados recusados: reenviar falharia do mesmo jeito
+                    self.spool.rejeitar(dados_producao_dict, dados_perda, e)
+                    print(f"❌ Cálculo recusado pelo banco (o JSON foi salvo); guardado em "
+                          f"{self.spool.caminho_rejeitados} para análise.")
             
         except Exception as e:
             self.logger.error(f"Erro ao salvar resultado: {e}")
@@ -778,35 +984,35 @@ class SistemaCanaAcucar:
                 if data_fim_str:
                     data_fim = datetime.strptime(data_fim_str, "%d/%m/%Y").date()
             
-            # Gerar relatório
-            df_relatorio = self.db.gerar_relatorio_perdas(data_inicio, data_fim)
+            # Resumo agregado no banco: apenas algumas linhas são transferidas
+            resumo = self.db.resumir_perdas(data_inicio, data_fim)
             
-            if df_relatorio.empty:
+            if not resumo['total_registros']:
                 print("❌ Nenhum dado encontrado para o período selecionado.")
                 return
             
             # Exibir relatório
-            print(f"\n📈 RELATÓRIO DE PERDAS ({len(df_relatorio)} registros)")
+            print(f"\n📈 RELATÓRIO DE PERDAS ({resumo['total_registros']} registros)")
             print("="*80)
             
-            # Estatísticas gerais
-            total_colhido = df_relatorio['qtd_colhida_toneladas'].sum()
-            total_perdas = df_relatorio['perda_estimada_toneladas'].sum()
-            perda_media = df_relatorio['percentual_perda'].mean()
-            
-            print(f"📊 Total colhido: {total_colhido:,.2f} toneladas")
-            print(f"💔 Total de perdas: {total_perdas:,.2f} toneladas")
-            print(f"📉 Perda média: {perda_media:.2f}%")
+            perda_media = resumo['perda_media']
+            print(f"📊 Total colhido: {resumo['total_colhido']:,.2f} toneladas")
+            print(f"💔 Total de perdas: {resumo['total_perdas']:,.2f} toneladas")
+            print(f"📉 Perda média: {perda_media:.2f}%" if perda_media is not None else "📉 Perda média: N/A")
             
             # Relatório por tipo de colheita
             print("\n🔧 Por tipo de colheita:")
-            relatorio_tipo = df_relatorio.groupby('tipo_colheita').agg({
-                'qtd_colhida_toneladas': 'sum',
-                'perda_estimada_toneladas': 'sum',
-                'percentual_perda': 'mean'
-            }).round(2)
+            self._exibir_agrupamento(self.db.resumir_perdas_por('tipo_colheita', data_inicio, data_fim))
             
-            print(tabulate(relatorio_tipo, headers=relatorio_tipo.columns, tablefmt="grid"))
+            # Agrupamentos adicionais sob demanda
+            print("\nAgrupar também por:")
+            print("1. Localização")
+            print("2. Mês da colheita")
+            print("0. Nenhum")
+            
+            agrupamento = {"1": "localizacao", "2": "mes"}.get(input("Escolha: ").strip())
+            if agrupamento:
+                self._exibir_agrupamento(self.db.resumir_perdas_por(agrupamento, data_inicio, data_fim))
             
             # Exibir detalhes se solicitado
             ver_detalhes = input("\n🔍 Ver detalhes de cada produção? (s/n): ").strip().lower()
@@ -814,39 +1020,103 @@ class SistemaCanaAcucar:
                 print(f"\n📋 DETALHES DAS PRODUÇÕES")
                 print("-"*80)
                 
-                # Preparar dados para tabela
-                df_display = df_relatorio[[
-                    'localizacao', 'area_plantada_ha', 'qtd_colhida_toneladas',
-                    'tipo_colheita', 'perda_estimada_toneladas', 'percentual_perda'
-                ]].copy()
-                
-                # Truncar localização para caber na tela
-                df_display['localizacao'] = df_display['localizacao'].str[:25]
-                
-                print(tabulate(df_display, headers=df_display.columns, tablefmt="grid", showindex=False))
+                # Detalhes também são lidos em blocos, sem carregar tudo
+                for df_relatorio in self.db.gerar_relatorio_perdas_em_lotes(data_inicio, data_fim):
+                    # Preparar dados para tabela
+                    df_display = df_relatorio[[
+                        'localizacao', 'area_plantada_ha', 'qtd_colhida_toneladas',
+                        'tipo_colheita', 'perda_estimada_toneladas', 'percentual_perda'
+                    ]].copy()
+                    
+                    # Truncar localização para caber na tela
+                    df_display['localizacao'] = df_display['localizacao'].str[:25]
+                    
+                    print(tabulate(df_display, headers=df_display.columns, tablefmt="grid", showindex=False))
+            
+            exportar = input("\n💾 Exportar detalhes em formato colunar (Parquet/Feather/.npz)? (s/n): ").strip().lower()
+            if exportar == 's':
+                self.exportar_relatorio(data_inicio=data_inicio, data_fim=data_fim)
             
         except Exception as e:
             self.logger.error(f"Erro ao gerar relatório: {e}")
             print("❌ Erro ao gerar relatório.")
     
+    def exportar_relatorio(self, arquivo: Optional[str] = None,
+                           data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> bool:
+        """
+        Exporta o relatório de perdas em formato colunar, um grupo de linhas por lote lido do banco.
+        
+        Args:
+            arquivo: Destino (.parquet, .feather ou .npz); por padrão,
+                data/relatorio_perdas_<timestamp> com a extensão disponível
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            True se o arquivo foi gravado
+        """
+        from src.exportacao import exportar_lotes, extensao_padrao
+        
+        if not self.verificar_conexao_banco():
+            print("❌ Exportação do relatório requer conexão com banco de dados.")
+            return False
+        
+        if not arquivo:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            arquivo = os.path.join(self.manipulador_json.diretorio_dados,
+                                   f"relatorio_perdas_{timestamp}{extensao_padrao()}")
+        try:
+            caminho, linhas = exportar_lotes(self.db.gerar_relatorio_perdas_em_lotes(data_inicio, data_fim), arquivo)
+        except Exception as e:
+            self.logger.error(f"Erro ao exportar relatório: {e}")
+            print(f"❌ Erro ao exportar relatório: {e}")
+            return False
+        
+        print(f"💾 Relatório exportado: {linhas} linha(s) em {caminho}")
+        return True
+    
+    def _exibir_agrupamento(self, grupos: List[Dict]):
+        """Exibe em tabela o resultado de uma agregação do relatório de perdas."""
+        if not grupos:
+            print("❌ Nenhum dado para agrupar.")
+            return
+        
+        print(tabulate(grupos, headers="keys", tablefmt="grid", floatfmt=".2f"))
+    
     def gerenciar_json(self):
         """Interface para gerenciar arquivos JSON."""
         print("\n💾 GERENCIAR ARQUIVOS JSON")
         print("-" * 40)
         
-        arquivos = self.manipulador_json.listar_arquivos_dados()
+        # Tipo, localização e data vêm do manifesto, sem abrir os arquivos
+        entradas = self.manipulador_json.filtrar_arquivos()
         
-        if not arquivos:
+        if not entradas:
             print("❌ Nenhum arquivo JSON encontrado.")
             return
         
-        print(f"📂 Arquivos encontrados ({len(arquivos)}):")
-        for i, arquivo in enumerate(arquivos, 1):
-            print(f"{i}. {arquivo}")
+        filtro = input("🔎 Filtrar por localização (ENTER para todos): ").strip()
+        if filtro:
+            entradas = self.manipulador_json.filtrar_arquivos(localizacao=filtro)
+            if not entradas:
+                print(f"❌ Nenhum arquivo de '{filtro}'.")
+                return
+        
+        rotulos = {'producao': 'produção', 'relatorio_perda': 'relatório de perda'}
+        print(f"📂 Arquivos encontrados ({len(entradas)}):")
+        for i, entrada in enumerate(entradas, 1):
+            detalhes = ", ".join(valor for valor in (
+                rotulos.get(entrada['tipo'], entrada['tipo']), entrada['localizacao'], entrada['data_colheita']
+            ) if valor)
+            print(f"{i}. {entrada['nome']} ({detalhes})")
+        
+        arquivos = [entrada['nome'] for entrada in entradas]
         
         print("\nOpções:")
         print("1. Ver conteúdo de um arquivo")
         print("2. Excluir um arquivo")
+        if self.manipulador_json.arquivo_relatorios is not None:
+            print("3. Ver relatório arquivado (por ID)")
         print("0. Voltar")
         
         opcao = input("Escolha: ").strip()
@@ -855,6 +1125,24 @@ class SistemaCanaAcucar:
             self._ver_conteudo_json(arquivos)
         elif opcao == "2":
             self._excluir_arquivo_json(arquivos)
+        elif opcao == "3" and self.manipulador_json.arquivo_relatorios is not None:
+            self._ver_relatorio_arquivado()
+    
+    def _ver_relatorio_arquivado(self):
+        """Exibe um relatório dos segmentos de arquivo, pelo ID."""
+        id_relatorio = input("ID do relatório: ").strip()
+        try:
+            relatorio = self.manipulador_json.ler_relatorio(id_relatorio)
+        except KeyError:
+            print(f"❌ Relatório '{id_relatorio}' não encontrado.")
+            return
+        except Exception as e:
+            print(f"❌ Erro ao ler relatório: {e}")
+            return
+        
+        print(f"\n📄 Relatório {id_relatorio}:")
+        print("-" * 50)
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
     
     def _ver_conteudo_json(self, arquivos):
         """Exibe conteúdo de arquivo JSON."""
@@ -887,8 +1175,7 @@ class SistemaCanaAcucar:
                 confirmar = input(f"⚠️  Confirma exclusão de '{arquivo}'? (s/n): ").strip().lower()
                 
                 if confirmar == 's':
-                    caminho = os.path.join(self.manipulador_json.diretorio_dados, arquivo)
-                    os.remove(caminho)
+                    self.manipulador_json.excluir_arquivo(arquivo)
                     print(f"✅ Arquivo '{arquivo}' excluído.")
                 else:
                     print("❌ Exclusão cancelada.")
@@ -910,6 +1197,7 @@ class SistemaCanaAcucar:
         print("1. Listar produções")
         print("2. Buscar produção por ID")
         print("3. Ver parâmetros de perdas")
+        print("4. Relatório materializado (status/atualizar)")
         print("0. Voltar")
         
         opcao = input("Escolha: ").strip()
@@ -921,37 +1209,55 @@ class SistemaCanaAcucar:
                 self._buscar_producao_id()
             elif opcao == "3":
                 self._ver_parametros_perdas()
+            elif opcao == "4":
+                self._gerenciar_relatorio_materializado()
                 
         except Exception as e:
             self.logger.error(f"Erro na consulta: {e}")
             print("❌ Erro ao consultar banco.")
     
     def _listar_producoes(self):
-        """Lista produções do banco."""
+        """Lista produções do banco, página a página."""
         try:
-            producoes = self.db.listar_producoes(20)
-            
-            if not producoes:
-                print("❌ Nenhuma produção encontrada.")
-                return
-            
-            print(f"\n📋 Produções cadastradas ({len(producoes)}):")
-            headers = ["ID", "Localização", "Área (ha)", "Colhida (t)", "Tipo", "Data", "Produtividade"]
-            table_data = []
-            
-            for p in producoes:
-                table_data.append([
-                    p['id'],
-                    p['localizacao'][:25] + "..." if len(p['localizacao']) > 25 else p['localizacao'],
-                    p['area_plantada_ha'],
-                    p['qtd_colhida_toneladas'],
-                    p['tipo_colheita'],
-                    p['data_colheita'].strftime('%d/%m/%Y') if hasattr(p['data_colheita'], 'strftime') else str(p['data_colheita']),
-                    f"{p['produtividade_toneladas_ha']:.1f} t/ha" if p['produtividade_toneladas_ha'] else "N/A"
-                ])
-            
-            print(tabulate(table_data, headers=headers, tablefmt="grid"))
+            tamanho_pagina = 20
+            cursor_pagina = None
+            pagina = 1
             
+            while True:
+                producoes = self.db.listar_producoes(tamanho_pagina, apos=cursor_pagina)
+                
+                if not producoes:
+                    print("❌ Nenhuma produção encontrada." if pagina == 1 else "📭 Não há mais produções.")
+                    return
+                
+                print(f"\n📋 Produções cadastradas - página {pagina} ({len(producoes)}):")
+                headers = ["ID", "Localização", "Área (ha)", "Colhida (t)", "Tipo", "Data", "Produtividade"]
+                table_data = []
+                
+                for p in producoes:
+                    table_data.append([
+                        p['id'],
+                        p['localizacao'][:25] + "..." if len(p['localizacao']) > 25 else p['localizacao'],
+                        p['area_plantada_ha'],
+                        p['qtd_colhida_toneladas'],
+                        p['tipo_colheita'],
+                        p['data_colheita'].strftime('%d/%m/%Y') if hasattr(p['data_colheita'], 'strftime') else str(p['data_colheita']),
+                        f"{p['produtividade_toneladas_ha']:.1f} t/ha" if p['produtividade_toneladas_ha'] else "N/A"
+                    ])
+                
+                print(tabulate(table_data, headers=headers, tablefmt="grid"))
+                
+                if len(producoes) < tamanho_pagina:
+                    return
+                
+                if input("\n➡️  Ver próxima página? (s/n): ").strip().lower() != 's':
+                    return
+                
+                # Cursor da próxima página: chave do último registro exibido
+                ultima = producoes[-1]
+                cursor_pagina = (ultima['data_colheita'], ultima['id'])
+                pagina += 1
+        
         except Exception as e:
             self.logger.error(f"Erro ao listar produções: {e}")
             print("❌ Erro ao listar produções.")
@@ -1003,6 +1309,32 @@ class SistemaCanaAcucar:
             self.logger.error(f"Erro ao buscar parâmetros: {e}")
             print("❌ Erro ao buscar parâmetros.")
     
+    def _gerenciar_relatorio_materializado(self):
+        """Mostra a situação do relatório materializado e permite atualizá-lo."""
+        try:
+            status = self.db.status_relatorio_materializado()
+            
+            if not status.get('disponivel', True):
+                print(f"\nℹ️  {self.tipo_banco} não tem relatório materializado: "
+                      "os relatórios leem a view diretamente.")
+                return
+            
+            print("\n🗄️  Relatório materializado (mv_relatorio_perdas):")
+            print(f"  • Último refresh: {status['atualizado_em']}")
+            
+            if not status['desatualizado']:
+                print("  • Situação: ✅ atualizado")
+                return
+            
+            print("  • Situação: ⚠️  desatualizado (há alterações desde o último refresh)")
+            if input("🔄 Atualizar agora? (s/n): ").strip().lower() == 's':
+                self.db.atualizar_relatorio_materializado()
+                print("✅ Relatório materializado atualizado.")
+            
+        except Exception as e:
+            self.logger.error(f"Erro no relatório materializado: {e}")
+            print("❌ Erro ao acessar relatório materializado.")
+    
     def calcular_com_gps(self):
         """TUPLA: Demonstra cálculo com coordenadas GPS."""
         print("\n🌍 CÁLCULO COM COORDENADAS GPS (TUPLA)")
@@ -1159,6 +1491,16 @@ class SistemaCanaAcucar:
             print(f"Localizações únicas: {geo['localizacoes_unicas']}")
             print(f"Distribuição por local: {geo['distribuicao_locais']}")
             
+            exportar = input("\n💾 Exportar a tabela de memória em formato colunar? (s/n): ").strip().lower()
+            if exportar == 's':
+                from src.exportacao import exportar_dataframe, extensao_padrao
+                
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                arquivo = os.path.join(self.manipulador_json.diretorio_dados,
+                                       f"historico_{timestamp}{extensao_padrao()}")
+                caminho = exportar_dataframe(self.calculadora.gerenciador.tabela_memoria, arquivo)
+                print(f"💾 Tabela de memória exportada em {caminho}")
+            
         except Exception as e:
             print(f"❌ Erro: {e}")
     
@@ -1206,6 +1548,171 @@ class SistemaCanaAcucar:
             print(f"❌ Erro: {e}")
 
 
+def calcular_json(arquivo: str) -> int:
+    """
+    Calcula a perda dos dados de produção de um arquivo JSON e imprime o
+    resultado em JSON na saída padrão (--calcular-json).
+    
+    Não usa o banco (valem os parâmetros padrão de perdas): nenhum driver
+    de banco nem o pandas são importados.
+    
+    Args:
+        arquivo: Nome (em data/) ou caminho do arquivo de dados de produção
+    
+    Returns:
+        Código de saída: 0 com sucesso, 1 em caso de erro
+    """
+    try:
+        # Caminho existente é usado como está; um nome solto é procurado em data/
+        dados = ManipuladorJSON().carregar_dados_producao(
+            os.path.abspath(arquivo) if os.path.exists(arquivo) else arquivo
+        )
+        calculadora = CalculadoraPerdas()
+        if SistemaCanaAcucar._tem_dados_para_calculo_avancado(dados):
+            resultado = calculadora.calcular_perda_avancada(dados)
+        else:
+            resultado = calculadora.calcular_perda_basica(dados.qtd_colhida_toneladas, dados.tipo_colheita)
+    except Exception as e:
+        print(f"❌ Erro ao calcular {arquivo}: {e}", file=sys.stderr)
+        return 1
+    
+    saida = {
+        'dados_producao': asdict(dados),
+        'resultado': asdict(resultado),
+        'producao_potencial_toneladas': round(dados.qtd_colhida_toneladas + resultado.perda_estimada_toneladas, 2)
+    }
+    print(json.dumps(saida, ensure_ascii=False, indent=2, default=str))
+    return 0
+
+
+def calcular_lote_jsonl(entrada: str, saida: str) -> int:
+    """
+    Calcula as perdas de um arquivo JSON Lines de produções e grava os
+    relatórios em outro arquivo JSON Lines ou, se SAIDA terminar em
+    .parquet, .feather ou .npz, em formato colunar (--lote-jsonl).
+    
+    Leitura, cálculo e gravação são feitos em fluxo (memória constante,
+    sem histórico em memória), com os parâmetros padrão de perdas, sem
+    banco. Arquivos terminados em .gz são lidos/gravados com gzip; linhas
+    inválidas da entrada são ignoradas e contadas.
+    
+    Args:
+        entrada: Arquivo de produções (.jsonl ou .jsonl.gz)
+        saida: Arquivo de relatórios de perda (.jsonl, .jsonl.gz, .parquet,
+            .feather ou .npz)
+    
+    Returns:
+        Código de saída: 0 com sucesso, 1 em caso de erro
+    """
+    manipulador = ManipuladorJSON()
+    # Como em --calcular-json: caminho existente como está, nome solto em data/
+    leitor = manipulador.ler_jsonl(os.path.abspath(entrada) if os.path.exists(entrada) else entrada)
+    inicio = datetime.now()
+    
+    try:
+        escritor = _calcular_e_gravar(leitor.producoes(), saida)
+    except Exception as e:
+        print(f"❌ Erro no cálculo em lote de {entrada}: {e}", file=sys.stderr)
+        return 1
+    
+    segundos = (datetime.now() - inicio).total_seconds()
+    print(f"✅ {escritor.linhas_escritas} cálculo(s) gravado(s) em {escritor.caminho} "
+          f"({leitor.linhas_invalidas} linha(s) inválida(s) ignorada(s)) em {segundos:.1f}s")
+    return 0
+
+
+def _calcular_e_gravar(producoes: Iterable[DadosProducao], saida: str):
+    """
+    Calcula a perda de cada produção e grava os relatórios em SAIDA
+    (JSON Lines se terminar em .jsonl/.jsonl.gz; senão, formato colunar
+    pela extensão). Usado por --lote-jsonl e --ingerir.
+    
+    Returns:
+        O escritor já fechado (linhas_escritas, caminho)
+    """
+    calculadora = CalculadoraPerdas()
+    saida = os.path.abspath(saida)
+    if saida.endswith(('.jsonl', '.jsonl.gz')):
+        escritor = ManipuladorJSON().abrir_jsonl(saida)
+    else:
+        from src.exportacao import EscritorResultadosColunar
+        escritor = EscritorResultadosColunar(saida)
+    
+    with escritor:
+        for dados in producoes:
+            if SistemaCanaAcucar._tem_dados_para_calculo_avancado(dados):
+                resultado = calculadora.calcular_perda_avancada(dados, registrar_historico=False)
+            else:
+                resultado = calculadora.calcular_perda_basica(
+                    dados.qtd_colhida_toneladas, dados.tipo_colheita
+                )
+            escritor.escrever_resultado(resultado, dados)
+    return escritor
+
+
+def ingerir_diretorio(diretorio: str,
+                      saida: Optional[str] = None,
+                      db: Optional[RepositorioProducao] = None,
+                      arquivo_quarentena: Optional[str] = None,
+                      trabalhadores: Optional[int] = None,
+                      usar_processos: bool = False) -> int:
+    """
+    Ingere em paralelo os JSON de produção de um diretório (--ingerir).
+    
+    Mostra arquivos por segundo e a quarentena; as produções válidas vão
+    para o cálculo em lote (saida) e/ou para o banco em uma única
+    transação (db, upsert pela chave natural).
+    
+    Args:
+        diretorio: Diretório com um JSON de produção por arquivo
+        saida: Arquivo de relatórios de perda (como em --lote-jsonl)
+        db: Repositório em que gravar as produções
+        arquivo_quarentena: Grava a quarentena (arquivo e motivo) neste JSON
+        trabalhadores: Tamanho do pool
+        usar_processos: Pool de processos em vez de threads
+    
+    Returns:
+        Código de saída: 0 com sucesso, 1 em caso de erro
+    """
+    from src.ingestao import ingerir_diretorio as ingerir
+    
+    if not os.path.isdir(diretorio):
+        print(f"❌ Diretório não encontrado: {diretorio}", file=sys.stderr)
+        return 1
+    
+    try:
+        resultado = ingerir(diretorio, trabalhadores, usar_processos)
+    except Exception as e:
+        print(f"❌ Erro na ingestão de {diretorio}: {e}", file=sys.stderr)
+        return 1
+    
+    print(f"📥 {resultado.total_arquivos} arquivo(s) lido(s) em {resultado.segundos:.2f}s "
+          f"({resultado.arquivos_por_segundo:.0f} arquivos/s): {resultado.total_validos} válido(s), "
+          f"{len(resultado.quarentena)} em quarentena")
+    for item in resultado.quarentena[:10]:
+        print(f"  ⚠️  {os.path.basename(item['arquivo'])}: {item['motivo']}")
+    if len(resultado.quarentena) > 10:
+        print(f"  ... e mais {len(resultado.quarentena) - 10}")
+    
+    try:
+        if arquivo_quarentena:
+            with open(arquivo_quarentena, 'w', encoding='utf-8') as f:
+                json.dump(resultado.quarentena, f, indent=2, ensure_ascii=False)
+            print(f"🗂️  Quarentena gravada em: {arquivo_quarentena}")
+        
+        if saida:
+            escritor = _calcular_e_gravar(resultado.producoes(), saida)
+            print(f"✅ {escritor.linhas_escritas} cálculo(s) gravado(s) em {escritor.caminho}")
+        
+        if db is not None and resultado.total_validos:
+            ids = db.upsert_producoes_em_lote(resultado.registros())
+            print(f"✅ {len(ids)} produção(ões) gravada(s) no banco")
+    except Exception as e:
+        print(f"❌ Erro ao processar a ingestão de {diretorio}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
 def main():
     """Função principal."""
     parser = argparse.ArgumentParser(
@@ -1216,6 +1723,100 @@ def main():
         action="store_true",
         help="Apenas testa a conexão com o banco"
     )
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const="data/cana.db",
+        metavar="ARQUIVO",
+        help="Usa o banco embutido SQLite (padrão: data/cana.db) em vez de Oracle/PostgreSQL"
+    )
+    parser.add_argument(
+        "--metricas-consultas",
+        metavar="ARQUIVO",
+        help="Ao sair, grava em ARQUIVO (JSON) as métricas das consultas e o log de consultas lentas"
+    )
+    parser.add_argument(
+        "--limite-consulta-lenta",
+        type=float,
+        default=500.0,
+        metavar="MS",
+        help="Duração (ms) a partir da qual a consulta entra no log de lentas (padrão: 500)"
+    )
+    parser.add_argument(
+        "--manter-particoes",
+        type=int,
+        nargs="?",
+        const=3,
+        metavar="MESES",
+        help="Cria as partições mensais de produção dos próximos MESES (padrão: 3) e sai"
+    )
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help="Grava os cálculos no banco em segundo plano, em lote, sem esperar o banco"
+    )
+    parser.add_argument(
+        "--arquivar-relatorios",
+        action="store_true",
+        help="Acrescenta os relatórios de perda a segmentos rotativos (data/relatorios) "
+             "em vez de gravar um JSON por cálculo"
+    )
+    parser.add_argument(
+        "--reenviar-spool",
+        action="store_true",
+        help="Reenvia ao banco os cálculos guardados no spool local (data/spool) e sai"
+    )
+    parser.add_argument(
+        "--calcular-json",
+        metavar="ARQUIVO",
+        help="Calcula a perda dos dados de produção em ARQUIVO (JSON) sem usar o banco, "
+             "imprime o resultado em JSON e sai"
+    )
+    parser.add_argument(
+        "--lote-jsonl",
+        nargs=2,
+        metavar=("ENTRADA", "SAIDA"),
+        help="Calcula as perdas das produções de ENTRADA (JSON Lines, .gz opcional) sem usar o banco, "
+             "grava os relatórios em SAIDA (JSON Lines, ou Parquet/Feather/.npz pela extensão) e sai"
+    )
+    parser.add_argument(
+        "--exportar-relatorio",
+        metavar="ARQUIVO",
+        help="Exporta o relatório de perdas do banco em formato colunar "
+             "(.parquet, .feather ou .npz, pela extensão) e sai"
+    )
+    parser.add_argument(
+        "--ingerir",
+        metavar="DIR",
+        help="Lê e valida em paralelo os JSON de produção de DIR, mostra arquivos/s e a "
+             "quarentena; com --saida-ingestao calcula as perdas, com --gravar-banco grava no banco"
+    )
+    parser.add_argument(
+        "--saida-ingestao",
+        metavar="SAIDA",
+        help="Com --ingerir: grava os relatórios de perda em SAIDA (como em --lote-jsonl)"
+    )
+    parser.add_argument(
+        "--gravar-banco",
+        action="store_true",
+        help="Com --ingerir: grava as produções válidas no banco em lote (upsert)"
+    )
+    parser.add_argument(
+        "--quarentena",
+        metavar="ARQUIVO",
+        help="Com --ingerir: grava em ARQUIVO (JSON) os arquivos rejeitados e os motivos"
+    )
+    parser.add_argument(
+        "--trabalhadores",
+        type=int,
+        metavar="N",
+        help="Com --ingerir: tamanho do pool de leitura"
+    )
+    parser.add_argument(
+        "--processos",
+        action="store_true",
+        help="Com --ingerir: usa um pool de processos em vez de threads"
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -1223,19 +1824,54 @@ def main():
     )
     
     args = parser.parse_args()
+    monitor_consultas.limite_lento_ms = args.limite_consulta_lenta
     
+    if args.calcular_json:
+        # Caminho rápido: sem sistema, banco nem bibliotecas de exibição
+        sys.exit(calcular_json(args.calcular_json))
+    if args.lote_jsonl:
+        sys.exit(calcular_lote_jsonl(*args.lote_jsonl))
+    if args.ingerir and not args.gravar_banco:
+        sys.exit(ingerir_diretorio(args.ingerir, args.saida_ingestao, None, args.quarentena,
+                                   args.trabalhadores, args.processos))
+    
+    sistema = None
     try:
-        sistema = SistemaCanaAcucar()
+        if args.sqlite:
+            from src.database_sqlite import SQLiteDatabase
+            sistema = SistemaCanaAcucar(SQLiteDatabase(args.sqlite), escrita_assincrona=args.write_behind,
+                                        arquivar_relatorios=args.arquivar_relatorios)
+        else:
+            sistema = SistemaCanaAcucar(escrita_assincrona=args.write_behind,
+                                        arquivar_relatorios=args.arquivar_relatorios)
         
         if args.test_connection:
             # Apenas testar conexão
-            if sistema.verificar_conexao_banco():
+            if sistema.verificar_conexao_banco(forcar=True):
                 print("✅ Teste de conexão bem-sucedido!")
                 sys.exit(0)
             else:
                 print("❌ Teste de conexão falhou!")
                 sys.exit(1)
+        elif args.manter_particoes is not None:
+            # Manutenção periódica (cron): garantir partições futuras
+            criadas = sistema.db.criar_particoes_futuras(args.manter_particoes)
+            print(f"✅ Partições criadas: {', '.join(criadas) if criadas else 'nenhuma (já existentes ou banco sem particionamento)'}")
+            sys.exit(0)
+        elif args.reenviar_spool:
+            sys.exit(0 if sistema.reenviar_spool() else 1)
+        elif args.exportar_relatorio:
+            sys.exit(0 if sistema.exportar_relatorio(args.exportar_relatorio) else 1)
+        elif args.ingerir:
+            if not sistema.verificar_conexao_banco(forcar=True):
+                sys.exit(1)
+            sys.exit(ingerir_diretorio(args.ingerir, args.saida_ingestao, sistema.db, args.quarentena,
+                                       args.trabalhadores, args.processos))
         else:
+            # Sessão longa: parâmetros atualizados por aviso do banco, sem TTL
+            sistema.db.acompanhar_alteracoes_parametros()
+            # Cálculos do spool local reenviados quando o banco estiver disponível
+            sistema.spool.iniciar_reenvio(sistema.db, sistema.saude.disponivel)
             # Executar menu principal
             sistema.menu_principal()
             
@@ -1246,6 +1882,12 @@ def main():
         logging.error(f"Erro crítico: {e}")
         print(f"❌ Erro crítico: {e}")
         sys.exit(1)
+    finally:
+        if sistema is not None:
+            sistema.encerrar()
+        if args.metricas_consultas:
+            monitor_consultas.exportar_json(args.metricas_consultas)
+            print(f"📊 Métricas de consultas gravadas em {args.metricas_consultas}")
 
 
 if __name__ == "__main__":
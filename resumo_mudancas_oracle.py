@@ -33,7 +33,8 @@ def resumir_mudancas():
     print("-" * 40)
     
     try:
-        from main import DATABASE_TYPE
+        from main import detectar_banco
+        _, DATABASE_TYPE = detectar_banco()
         print(f"🔧 Banco configurado: {DATABASE_TYPE}")
         
         if DATABASE_TYPE == "Oracle":
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark do modo arquivo de relatórios (src/segmentos.py) contra um JSON por cálculo.
+
+Salva N relatórios de perda com ManipuladorJSON nos dois modos, em
+diretórios temporários, e mede a gravação, o número de arquivos criados
+e a leitura aleatória de relatórios pelo ID (modo arquivo). Confere que
+todo relatório relido por ID é igual ao gravado e que nenhum nome de
+arquivo colidiu; o script sai com código 1 se algo divergir.
+
+Uso:
+    python scripts/benchmark_arquivo_relatorios.py
+    python scripts/benchmark_arquivo_relatorios.py --relatorios 20000 --tamanho-segmento 1048576
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.functions import ManipuladorJSON, DadosProducao, ResultadoPerda
+from src.segmentos import ArquivoRelatorios
+
+
+def gerar_calculos(quantidade):
+    """Pares (resultado, produção) sintéticos."""
+    inicio = date(2024, 1, 1)
+    calculos = []
+    for i in range(quantidade):
+        dados = DadosProducao(
+            localizacao=f"Benchmark - Talhão {i}",
+            area_plantada_ha=round(random.uniform(5, 200), 2),
+            qtd_colhida_toneladas=round(random.uniform(300, 20000), 2),
+            tipo_colheita=random.choice(['manual', 'mecanizada']),
+            data_colheita=inicio + timedelta(days=i % 366)
+        )
+        perda = round(dados.qtd_colhida_toneladas * random.uniform(0.03, 0.25), 2)
+        resultado = ResultadoPerda(
+            perda_estimada_toneladas=perda,
+            percentual_perda=round(perda / dados.qtd_colhida_toneladas * 100, 2),
+            metodo_calculo='basico',
+            fatores_aplicados={'tipo_colheita': 1.0}
+        )
+        calculos.append((resultado, dados))
+    return calculos
+
+
+def contar_arquivos(diretorio):
+    """Arquivos (não diretórios) sob o diretório."""
+    return sum(len(arquivos) for _, _, arquivos in os.walk(diretorio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do modo arquivo de relatórios")
+    parser.add_argument("--relatorios", type=int, default=2000,
+                        help="Relatórios salvos em cada modo (padrão: %(default)s)")
+    parser.add_argument("--tamanho-segmento", type=int, default=4 * 1024 * 1024,
+                        help="Bytes por segmento no modo arquivo (padrão: %(default)s)")
+    parser.add_argument("--leituras", type=int, default=1000,
+                        help="Leituras aleatórias por ID (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    calculos = gerar_calculos(args.relatorios)
+    falhas = []
+    print(f"{'Modo':<22}{'Gravação (ms)':>15}{'Por relatório (µs)':>20}{'Arquivos':>10}")
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-relatorios-") as diretorio:
+        # Um JSON por relatório (modo padrão)
+        manipulador = ManipuladorJSON(os.path.join(diretorio, 'arquivos'))
+        inicio = time.perf_counter()
+        nomes = [manipulador.salvar_resultado_perda(resultado, dados) for resultado, dados in calculos]
+        duracao = (time.perf_counter() - inicio) * 1000
+        arquivos = contar_arquivos(manipulador.diretorio_dados)
+        print(f"{'um JSON por cálculo':<22}{duracao:>15.0f}{duracao * 1000 / len(calculos):>20.1f}{arquivos:>10}")
+        if len(set(nomes)) != len(nomes):
+            falhas.append("nomes de arquivo repetidos")
+
+        # Modo arquivo: segmentos rotativos com índice de offsets
+        arquivo = ArquivoRelatorios(os.path.join(diretorio, 'segmentos'),
+                                    tamanho_max_segmento=args.tamanho_segmento)
+        manipulador = ManipuladorJSON(os.path.join(diretorio, 'arquivo'), arquivo)
+        inicio = time.perf_counter()
+        ids = [manipulador.salvar_resultado_perda(resultado, dados) for resultado, dados in calculos]
+        arquivo.fechar()
+        duracao = (time.perf_counter() - inicio) * 1000
+        arquivos = contar_arquivos(arquivo.diretorio)
+        print(f"{'segmentos':<22}{duracao:>15.0f}{duracao * 1000 / len(calculos):>20.1f}{arquivos:>10}")
+
+        # Leitura aleatória pelo ID, em um arquivo reaberto (índices lidos do disco)
+        arquivo = ArquivoRelatorios(arquivo.diretorio)
+        amostra = random.sample(range(len(ids)), min(args.leituras, len(ids)))
+        inicio = time.perf_counter()
+        relidos = [arquivo.ler(ids[i]) for i in amostra]
+        duracao = (time.perf_counter() - inicio) * 1000
+        print(f"\nLeitura por ID: {len(amostra)} relatórios em {duracao:.0f} ms "
+              f"({duracao * 1000 / len(amostra):.1f} µs cada)")
+        for i, relatorio in zip(amostra, relidos):
+            if relatorio['dados_producao']['localizacao'] != calculos[i][1].localizacao:
+                falhas.append(f"relatório {ids[i]} diferente do gravado")
+                break
+
+    if falhas:
+        print("\n❌ " + "; ".join(falhas))
+        sys.exit(1)
+    print("\n✅ Relatórios relidos por ID iguais aos gravados, sem colisão de nomes")
+
+
+if __name__ == "__main__":
+    main()
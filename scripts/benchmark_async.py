@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark da camada assíncrona (PostgreSQLDatabaseAsync).
+
+Dispara N buscas de produção concorrentes em um único event loop e compara
+com a mesma carga enviada em pipeline por uma única conexão.
+
+Uso:
+    python scripts/benchmark_async.py --consultas 2000 --pool 10 --concorrencia 200
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.database_async import PostgreSQLDatabaseAsync
+
+
+async def executar(args):
+    async with PostgreSQLDatabaseAsync(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=int(os.getenv('POSTGRES_PORT', '5432')),
+        database=os.getenv('POSTGRES_DB', 'cana_db'),
+        username=os.getenv('POSTGRES_USER', 'cana_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'CanaPassword123'),
+        tamanho_pool=args.pool,
+        max_concorrencia=args.concorrencia
+    ) as db:
+        producoes = await db.listar_producoes(limite=100)
+        if not producoes:
+            print("Nenhuma produção cadastrada para consultar.")
+            return
+        ids = [producoes[i % len(producoes)]['id'] for i in range(args.consultas)]
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(db.buscar_producao_por_id(producao_id) for producao_id in ids))
+        decorrido = time.perf_counter() - inicio
+        print(f"Concorrente: {args.consultas} consultas em {decorrido:.3f}s "
+              f"({args.consultas / decorrido:.0f} consultas/s)")
+
+        inicio = time.perf_counter()
+        await db.buscar_producoes_por_id(ids)
+        decorrido = time.perf_counter() - inicio
+        print(f"Pipeline:    {args.consultas} consultas em {decorrido:.3f}s "
+              f"({args.consultas / decorrido:.0f} consultas/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da camada assíncrona")
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--pool", type=int, default=10, help="Conexões no pool")
+    parser.add_argument("--concorrencia", type=int, default=200, help="Operações simultâneas")
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark da exportação colunar (src/exportacao.py) contra JSON Lines.
+
+Gera N resultados sintéticos de cálculo (um ano de colheitas), grava em
+JSON Lines e em cada formato colunar disponível (Parquet e Feather com o
+pyarrow instalado; .npz sempre) e mede a gravação, a releitura completa,
+a releitura só de duas colunas (projeção) e a leitura grupo a grupo.
+Confere também que a releitura devolve os mesmos valores gravados; o
+script sai com código 1 se houver divergência.
+
+Uso:
+    python scripts/benchmark_exportacao.py
+    python scripts/benchmark_exportacao.py --linhas 1000000 --tamanho-grupo 250000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from src.exportacao import exportar_dataframe, iterar_grupos, ler_colunar, pa
+from src.functions import LeitorJSONL, EscritorJSONL
+
+COLUNAS_PROJECAO = ['data_colheita', 'percentual_perda']
+
+
+def gerar_resultados(linhas):
+    """DataFrame no formato dos resultados em lote, com datas ao longo de um ano."""
+    inicio = date(2024, 1, 1)
+    tipos = ['manual', 'mecanizada']
+    return pd.DataFrame({
+        'localizacao': [f"Benchmark - Talhão {i}" for i in range(linhas)],
+        'area_plantada_ha': [round(random.uniform(5, 200), 2) for _ in range(linhas)],
+        'qtd_colhida_toneladas': [round(random.uniform(300, 20000), 2) for _ in range(linhas)],
+        'tipo_colheita': [tipos[i % 2] for i in range(linhas)],
+        'data_colheita': [inicio + timedelta(days=i % 366) for i in range(linhas)],
+        'perda_estimada_toneladas': [round(random.uniform(10, 3000), 2) for _ in range(linhas)],
+        'percentual_perda': [round(random.uniform(3, 25), 2) for _ in range(linhas)],
+        'metodo_calculo': ['avancado'] * linhas
+    })
+
+
+def cronometrar(funcao):
+    """(resultado, milissegundos) de uma chamada."""
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de exportação colunar")
+    parser.add_argument("--linhas", type=int, default=365000,
+                        help="Resultados sintéticos (padrão: %(default)s)")
+    parser.add_argument("--tamanho-grupo", type=int, default=100000,
+                        help="Linhas por grupo no arquivo colunar (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    df = gerar_resultados(args.linhas)
+    extensoes = ['.parquet', '.feather', '.npz'] if pa is not None else ['.npz']
+    if pa is None:
+        print("pyarrow não instalado: medindo apenas o .npz\n")
+
+    print(f"{'Formato':<10}{'Tamanho (MB)':>14}{'Gravação (ms)':>15}{'Leitura (ms)':>14}"
+          f"{'Projeção (ms)':>15}{'Grupos':>8}")
+    divergencias = []
+    with tempfile.TemporaryDirectory(prefix="benchmark-exportacao-") as diretorio:
+        # Referência: JSON Lines, um registro por linha
+        caminho = os.path.join(diretorio, 'resultados.jsonl')
+
+        def gravar_jsonl():
+            with EscritorJSONL(caminho) as escritor:
+                for registro in df.to_dict('records'):
+                    escritor.escrever(registro)
+
+        _, gravacao = cronometrar(gravar_jsonl)
+        _, leitura = cronometrar(lambda: pd.DataFrame(list(LeitorJSONL(caminho))))
+        print(f"{'.jsonl':<10}{os.path.getsize(caminho) / 2**20:>14.1f}{gravacao:>15.0f}{leitura:>14.0f}"
+              f"{'-':>15}{'-':>8}")
+
+        for extensao in extensoes:
+            caminho, gravacao = cronometrar(lambda: exportar_dataframe(
+                df, os.path.join(diretorio, 'resultados' + extensao), args.tamanho_grupo))
+            relido, leitura = cronometrar(lambda: ler_colunar(caminho))
+            _, projecao = cronometrar(lambda: ler_colunar(caminho, COLUNAS_PROJECAO))
+            grupos = sum(1 for _ in iterar_grupos(caminho, COLUNAS_PROJECAO))
+            print(f"{extensao:<10}{os.path.getsize(caminho) / 2**20:>14.1f}{gravacao:>15.0f}{leitura:>14.0f}"
+                  f"{projecao:>15.1f}{grupos:>8}")
+
+            for coluna in df.columns:
+                if relido[coluna].astype(object).tolist() != df[coluna].astype(object).tolist():
+                    divergencias.append(f"{extensao}: coluna {coluna}")
+
+    if divergencias:
+        print("\n❌ Releitura diferente do gravado: " + "; ".join(divergencias))
+        sys.exit(1)
+    print("\n✅ Releitura idêntica ao gravado em todos os formatos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tempo de inicialização da CLI em comandos que não usam o banco.
+
+Executa `main.py --version`, `main.py --help` e `main.py --calcular-json`
+(sobre um arquivo de produção de exemplo) em processos novos, várias vezes,
+e compara a mediana com o alvo (100 ms por padrão). Também roda cada
+comando com `python -X importtime` e confere que nenhum módulo pesado
+(drivers de banco, pandas, numpy, colorlog, tabulate, src.database*) foi
+importado; o script sai com código 1 se o alvo for excedido ou se algum
+deles aparecer.
+
+Uso:
+    python scripts/benchmark_inicializacao.py
+    python scripts/benchmark_inicializacao.py --repeticoes 50 --alvo-ms 80
+
+O tempo do interpretador sozinho (`python -c pass`) é mostrado como
+referência: ele entra na medida de todos os comandos.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAIN = os.path.abspath(os.path.join(RAIZ, 'main.py'))
+
+# Módulos que não devem ser carregados fora dos comandos de banco
+MODULOS_PESADOS = (
+    'cx_Oracle', 'psycopg2', 'psycopg', 'psycopg_pool', 'pandas', 'numpy',
+    'colorlog', 'tabulate', 'src.database', 'src.database_postgres',
+    'src.database_sqlite', 'src.database_async', 'src.colunar'
+)
+
+PRODUCAO_EXEMPLO = {
+    'localizacao': 'Benchmark - Talhão 1',
+    'area_plantada_ha': 12.5,
+    'qtd_colhida_toneladas': 1000.0,
+    'tipo_colheita': 'mecanizada',
+    'data_colheita': '2024-06-15',
+    'idade_cana_meses': 14,
+    'umidade_solo': 28.0,
+    'temperatura_media': 26.0,
+    'precipitacao_mm': 90.0
+}
+
+
+def cronometrar(comando, diretorio, repeticoes):
+    """Duração (ms) de cada execução do comando em um processo novo."""
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run(comando, cwd=diretorio, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+    return duracoes
+
+
+def modulos_importados(argumentos, diretorio):
+    """Nomes dos módulos importados pelo comando (saída de -X importtime)."""
+    processo = subprocess.run([sys.executable, '-X', 'importtime', MAIN, *argumentos],
+                              cwd=diretorio, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True)
+    modulos = set()
+    for linha in processo.stderr.splitlines():
+        if linha.startswith('import time:') and linha.count('|') == 2:
+            modulos.add(linha.rsplit('|', 1)[1].strip())
+    return modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização da CLI")
+    parser.add_argument("--repeticoes", type=int, default=20,
+                        help="Execuções de cada comando (padrão: %(default)s)")
+    parser.add_argument("--alvo-ms", type=float, default=100.0,
+                        help="Mediana máxima aceita por comando, em ms (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-inicializacao-") as diretorio:
+        arquivo = os.path.join(diretorio, 'producao.json')
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            json.dump(PRODUCAO_EXEMPLO, f, ensure_ascii=False)
+
+        comandos = {
+            '--version': ['--version'],
+            '--help': ['--help'],
+            '--calcular-json': ['--calcular-json', arquivo]
+        }
+
+        interpretador = statistics.median(
+            cronometrar([sys.executable, '-c', 'pass'], diretorio, args.repeticoes))
+        print(f"Interpretador sozinho: {interpretador:.1f} ms (mediana)\n")
+        print(f"{'Comando':<18}{'Mediana (ms)':>14}{'Máximo (ms)':>14}  Situação")
+
+        falhas = []
+        for nome, argumentos in comandos.items():
+            duracoes = cronometrar([sys.executable, MAIN, *argumentos], diretorio, args.repeticoes)
+            mediana = statistics.median(duracoes)
+            pesados = sorted(
+                modulo for modulo in modulos_importados(argumentos, diretorio)
+                if modulo.split('.')[0] in MODULOS_PESADOS or modulo in MODULOS_PESADOS
+            )
+
+            situacao = "ok"
+            if mediana > args.alvo_ms:
+                situacao = f"acima do alvo de {args.alvo_ms:.0f} ms"
+                falhas.append(nome)
+            if pesados:
+                situacao = f"importou {', '.join(pesados)}"
+                falhas.append(nome)
+            print(f"{nome:<18}{mediana:>14.1f}{max(duracoes):>14.1f}  {situacao}")
+
+    if falhas:
+        print(f"\n❌ Inicialização fora do esperado: {', '.join(sorted(set(falhas)))}")
+        sys.exit(1)
+    print(f"\n✅ Todos os comandos abaixo de {args.alvo_ms:.0f} ms sem módulos pesados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark de poda de partições (PostgreSQL).
+
+Executa EXPLAIN (ANALYZE, FORMAT JSON) na consulta de relatório filtrada
+por período e informa quantas partições de producao_cana foram lidas em
+relação ao total, além do tempo de execução.
+
+Uso:
+    python scripts/benchmark_particionamento.py --inicio 2024-07-01 --fim 2024-07-31
+    python scripts/benchmark_particionamento.py --gerar 500000 --inicio 2024-07-01 --fim 2024-07-31
+
+Com --gerar N são inseridas N produções sintéticas distribuídas pelos
+meses já particionados (localização 'Benchmark - Talhão N'); --limpar
+remove essas linhas ao final.
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.database_postgres import PostgreSQLDatabase
+
+
+SQL_RELATORIO = """
+SELECT tipo_colheita, COUNT(*), SUM(qtd_colhida_toneladas), SUM(perda_estimada_toneladas)
+FROM vw_relatorio_perdas
+WHERE data_colheita BETWEEN %(inicio)s AND %(fim)s
+GROUP BY tipo_colheita
+"""
+
+SQL_GERAR = """
+INSERT INTO producao_cana (localizacao, area_plantada_ha, qtd_colhida_toneladas,
+                           tipo_colheita, data_colheita)
+SELECT 'Benchmark - Talhão ' || g,
+       10 + (g %% 90),
+       (10 + (g %% 90)) * (60 + (g %% 40)),
+       CASE WHEN g %% 2 = 0 THEN 'manual' ELSE 'mecanizada' END,
+       DATE '2024-01-01' + (g %% %(dias)s)
+FROM generate_series(1, %(quantidade)s) AS g
+"""
+
+
+def relacoes_lidas(plano: dict) -> set:
+    """Percorre o plano JSON coletando as partições de producao_cana lidas."""
+    lidas = set()
+    pendentes = [plano]
+    while pendentes:
+        no = pendentes.pop()
+        relacao = no.get('Relation Name', '')
+        if relacao.startswith(PostgreSQLDatabase.PREFIXO_PARTICAO) and no.get('Actual Loops', 1) > 0:
+            lidas.add(relacao)
+        pendentes.extend(no.get('Plans', []))
+    return lidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de poda de partições")
+    parser.add_argument("--inicio", type=date.fromisoformat, required=True)
+    parser.add_argument("--fim", type=date.fromisoformat, required=True)
+    parser.add_argument("--gerar", type=int, default=0, metavar="N",
+                        help="Inserir N produções sintéticas antes de medir")
+    parser.add_argument("--limpar", action="store_true",
+                        help="Remover as produções sintéticas ao final")
+    args = parser.parse_args()
+
+    db = PostgreSQLDatabase(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=int(os.getenv('POSTGRES_PORT', '5432')),
+        database=os.getenv('POSTGRES_DB', 'cana_db'),
+        username=os.getenv('POSTGRES_USER', 'cana_user'),
+        password=os.getenv('POSTGRES_PASSWORD', 'CanaPassword123')
+    )
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        SELECT COUNT(*) AS total FROM pg_inherits i
+        JOIN pg_class pai ON pai.oid = i.inhparent
+        WHERE pai.relname = 'producao_cana'
+        """)
+        total_particoes = cursor.fetchone()['total']
+        # Só gera dentro de meses já particionados (a partir de jan/2024)
+        dias = (date.today() - date(2024, 1, 1)).days
+
+        if args.gerar:
+            cursor.execute(SQL_GERAR, {'quantidade': args.gerar, 'dias': dias})
+            cursor.execute("ANALYZE producao_cana")
+            print(f"Produções sintéticas inseridas: {args.gerar}")
+
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + SQL_RELATORIO,
+                       {'inicio': args.inicio, 'fim': args.fim})
+        resultado = cursor.fetchone()
+        explain = resultado[next(iter(resultado))]
+        if isinstance(explain, str):
+            explain = json.loads(explain)
+        plano = explain[0]
+
+        lidas = relacoes_lidas(plano['Plan'])
+        print(f"Período: {args.inicio} até {args.fim}")
+        print(f"Partições lidas: {len(lidas)} de {total_particoes}")
+        for nome in sorted(lidas):
+            print(f"  - {nome}")
+        print(f"Planejamento: {plano['Planning Time']:.2f} ms")
+        print(f"Execução:     {plano['Execution Time']:.2f} ms")
+
+        if args.limpar:
+            cursor.execute("DELETE FROM producao_cana WHERE localizacao LIKE 'Benchmark - Talhão %'")
+            print(f"Produções sintéticas removidas: {cursor.rowcount}")
+
+
+if __name__ == "__main__":
+    main()
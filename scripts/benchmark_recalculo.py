@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Paridade e benchmark do recálculo de perdas: Python x banco.
+
+Compara os dois caminhos de recálculo em massa das perdas 'avancado':
+
+- Python: lê as produções, calcula com CalculadoraPerdas.calcular_perdas_em_lote
+  e grava com upsert_perdas_em_lote (ida e volta de todas as linhas);
+- Banco: recalcular_perdas_no_banco(), um único comando set-based
+  (função recalcular_perdas no PostgreSQL/Oracle, SQL equivalente no SQLite).
+
+Antes de cada caminho as perdas 'avancado' das produções sintéticas são
+removidas, para que ambos gravem o mesmo volume. Ao final, cada perda
+gravada pelo banco é comparada com a calculada em Python; o script sai com
+código 1 se houver divergência.
+
+Uso:
+    python scripts/benchmark_recalculo.py --gerar 20000
+    python scripts/benchmark_recalculo.py --banco postgres --gerar 100000 --limpar
+    python scripts/benchmark_recalculo.py --banco oracle --inicio 2024-01-01 --fim 2024-12-31
+
+Com --gerar N são gravadas N produções sintéticas (localização
+'Benchmark - Talhão N'), com parte dos fatores ausente para cobrir todos
+os ramos da fórmula; --limpar remove essas linhas ao final.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.cache import RepositorioComCache
+from src.functions import CalculadoraPerdas
+
+
+SQL_PERDAS_AVANCADAS = """
+SELECT producao_id, perda_estimada_toneladas, percentual_perda, fatores_perda, observacoes
+FROM perdas_colheita
+WHERE metodo_calculo = 'avancado'
+"""
+
+SQL_LIMPAR_PERDAS = """
+DELETE FROM perdas_colheita
+WHERE metodo_calculo = 'avancado'
+  AND producao_id IN (SELECT id FROM producao_cana WHERE localizacao LIKE 'Benchmark - %')
+"""
+
+SQL_LIMPAR_PRODUCOES = "DELETE FROM producao_cana WHERE localizacao LIKE 'Benchmark - %'"
+
+
+def criar_banco(banco: str, caminho_sqlite: str):
+    """Instancia o repositório escolhido com as variáveis de ambiente usuais."""
+    if banco == 'sqlite':
+        from src.database_sqlite import SQLiteDatabase
+        return SQLiteDatabase(caminho_sqlite)
+
+    if banco == 'postgres':
+        from src.database_postgres import PostgreSQLDatabase
+        return PostgreSQLDatabase(
+            host=os.getenv('POSTGRES_HOST', 'localhost'),
+            port=int(os.getenv('POSTGRES_PORT', '5432')),
+            database=os.getenv('POSTGRES_DB', 'cana_db'),
+            username=os.getenv('POSTGRES_USER', 'cana_user'),
+            password=os.getenv('POSTGRES_PASSWORD', 'CanaPassword123')
+        )
+
+    from src.database import OracleDatabase
+    return OracleDatabase()
+
+
+def executar(db, sql: str) -> None:
+    """Executa um comando sem parâmetros (SQL comum aos três bancos)."""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        conn.commit()
+
+
+def gerar_producoes(quantidade: int, semente: int = 42) -> list:
+    """Produções sintéticas com chaves naturais distintas."""
+    aleatorio = random.Random(semente)
+    producoes = []
+    for i in range(quantidade):
+        area = aleatorio.randint(5, 150)
+        producoes.append({
+            'localizacao': f"Benchmark - Talhão {i}",
+            'area_plantada_ha': area,
+            'qtd_colhida_toneladas': area * aleatorio.randint(55, 95),
+            'tipo_colheita': aleatorio.choice(['manual', 'mecanizada']),
+            'data_colheita': date(2024, 1, 1) + timedelta(days=i % 365),
+            'idade_cana_meses': aleatorio.choice([None, 8, 11, 12, 15, 18, 20, 30]),
+            'umidade_solo': aleatorio.choice([None, 35.0, 58.0, 60.0, 65.5, 70.0, 72.5, 90.0]),
+            'temperatura_media': aleatorio.choice([None, 18.0, 25.0, 27.5, 33.0]),
+            'precipitacao_mm': aleatorio.choice([40.0, 80.0, 100.0, 125.0, 210.0])
+        })
+    return producoes
+
+
+def ler_perdas_banco(db) -> dict:
+    """Perdas 'avancado' gravadas, por producao_id."""
+    perdas = {}
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_PERDAS_AVANCADAS)
+        for linha in cursor.fetchall():
+            if isinstance(linha, dict):  # RealDictRow (PostgreSQL)
+                linha = tuple(linha.values())
+            producao_id, perda, percentual, fatores, observacoes = linha
+            if hasattr(fatores, 'read'):  # CLOB (Oracle)
+                fatores = fatores.read()
+            if isinstance(fatores, str):
+                fatores = json.loads(fatores)
+            perdas[int(producao_id)] = (float(perda), float(percentual), fatores or {}, observacoes)
+    return perdas
+
+
+def divergencias(esperadas: list, gravadas: dict, tolerancia: float) -> list:
+    """Compara as perdas calculadas em Python com as gravadas pelo banco."""
+    erros = []
+    for esperada in esperadas:
+        producao_id = esperada['producao_id']
+        if producao_id not in gravadas:
+            erros.append(f"produção {producao_id}: sem perda gravada pelo banco")
+            continue
+
+        perda, percentual, fatores, observacoes = gravadas[producao_id]
+        # Valores gravados com 2 casas; empates de arredondamento diferem em 0,01
+        if abs(perda - esperada['perda_estimada_toneladas']) > 0.01 + tolerancia:
+            erros.append(f"produção {producao_id}: perda {perda} != {esperada['perda_estimada_toneladas']}")
+        if abs(percentual - esperada['percentual_perda']) > 0.01 + tolerancia:
+            erros.append(f"produção {producao_id}: percentual {percentual} != {esperada['percentual_perda']}")
+        if set(fatores) != set(esperada['fatores_perda']) or any(
+                abs(float(fatores[nome]) - valor) > tolerancia
+                for nome, valor in esperada['fatores_perda'].items()):
+            erros.append(f"produção {producao_id}: fatores {fatores} != {esperada['fatores_perda']}")
+        if observacoes != esperada['observacoes']:
+            erros.append(f"produção {producao_id}: observações {observacoes!r} != {esperada['observacoes']!r}")
+    return erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e benchmark do recálculo de perdas")
+    parser.add_argument("--banco", choices=['sqlite', 'postgres', 'oracle'], default='sqlite')
+    parser.add_argument("--sqlite", default="data/benchmark_recalculo.db", metavar="ARQUIVO",
+                        help="Arquivo do banco SQLite (padrão: %(default)s)")
+    parser.add_argument("--inicio", type=date.fromisoformat, default=None)
+    parser.add_argument("--fim", type=date.fromisoformat, default=None)
+    parser.add_argument("--gerar", type=int, default=0, metavar="N",
+                        help="Gravar N produções sintéticas antes de medir")
+    parser.add_argument("--limpar", action="store_true",
+                        help="Remover as produções sintéticas ao final")
+    parser.add_argument("--tolerancia", type=float, default=1e-9,
+                        help="Diferença aceita nos fatores (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    db = criar_banco(args.banco, args.sqlite)
+    # Parâmetros em cache e lidos antes da medição: só os dois caminhos de cálculo são comparados
+    calculadora = CalculadoraPerdas(RepositorioComCache(db))
+    for tipo_colheita in calculadora.parametros_padrao:
+        calculadora.obter_parametros(tipo_colheita)
+
+    if args.gerar:
+        inicio = time.perf_counter()
+        db.upsert_producoes_em_lote(gerar_producoes(args.gerar))
+        print(f"{args.gerar} produções sintéticas gravadas em {time.perf_counter() - inicio:.2f}s")
+
+    # Caminho Python: todas as linhas vão ao cliente e voltam
+    executar(db, SQL_LIMPAR_PERDAS)
+    inicio = time.perf_counter()
+    ids = [producao['id'] for producao in db.iterar_producoes(
+        tamanho_lote=10000, data_inicio=args.inicio, data_fim=args.fim)]
+    esperadas = calculadora.calcular_perdas_em_lote(db.buscar_producoes_por_ids(ids))
+    db.upsert_perdas_em_lote(esperadas)
+    tempo_python = time.perf_counter() - inicio
+
+    # Caminho banco: um comando set-based
+    executar(db, SQL_LIMPAR_PERDAS)
+    inicio = time.perf_counter()
+    linhas = db.recalcular_perdas_no_banco(args.inicio, args.fim)
+    tempo_banco = time.perf_counter() - inicio
+
+    erros = divergencias(esperadas, ler_perdas_banco(db), args.tolerancia)
+
+    print(f"\nProduções recalculadas: {len(esperadas)} (banco gravou {linhas})")
+    print(f"Python (ler + calcular + gravar): {tempo_python:.3f}s")
+    print(f"Banco (recalcular_perdas):        {tempo_banco:.3f}s")
+    if tempo_banco > 0:
+        print(f"Ganho: {tempo_python / tempo_banco:.1f}x")
+
+    if args.limpar:
+        executar(db, SQL_LIMPAR_PRODUCOES)
+
+    if erros:
+        print(f"\n❌ {len(erros)} divergências entre Python e banco:")
+        for erro in erros[:20]:
+            print(f"  • {erro}")
+        sys.exit(1)
+    print("\n✅ Resultados do banco iguais aos de CalculadoraPerdas.calcular_perda_avancada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Regressão de planos de consulta: EXPLAIN e tempos das consultas principais.
+
+Sobre uma massa sintética (1 milhão de produções por padrão, cada uma com
+sua perda), captura o plano de execução e o tempo das consultas com o
+formato das usadas pelo sistema:
+
+- listagem paginada de produções (primeira página e página por chave);
+- relatório de perdas filtrado por período (junção com perdas_colheita);
+- resumo por tipo de colheita no período;
+- perdas por faixa de um fator (fatores_perda);
+- busca pela chave natural (upsert).
+
+Cada plano é conferido contra os índices esperados (INDICES_COBERTURA das
+classes de banco) e contra leituras completas de producao_cana; os tempos
+são comparados com uma base gravada antes (--gravar-base). O script sai
+com código 1 se algum plano mudar ou algum tempo piorar além da tolerância.
+
+Uso:
+    python scripts/verificar_planos.py --gravar-base
+    python scripts/verificar_planos.py
+    python scripts/verificar_planos.py --banco postgres --linhas 1000000 --gravar-base
+    make verificar-planos BANCO=postgres
+
+As produções sintéticas usam a localização 'Plano - Talhão N'; só as que
+faltam para chegar a --linhas são geradas, então execuções seguintes
+reaproveitam a massa. --limpar remove essas linhas ao final.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+PREFIXO_SINTETICO = "Plano - Talhão "
+
+# Consultas verificadas, com binds no estilo :nome ({limite} varia por banco).
+# 'esperado' e 'proibido' são expressões regulares procuradas no plano
+# (uma linha por operação: "operação objeto índice"). No PostgreSQL, o '$'
+# em 'Seq Scan producao_cana$' deixa de fora a partição padrão
+# (producao_cana_default), normalmente vazia, que o planejador pode ler
+# por Seq Scan sem custo.
+CASOS = [
+    {
+        'nome': 'listar_producoes (primeira página)',
+        'sql': """
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, produtividade_toneladas_ha
+        FROM producao_cana
+        ORDER BY data_colheita DESC, id DESC {limite}
+        """,
+        'params': lambda massa: {'limite': 50},
+        'esperado': {
+            'postgres': [r'Index Only Scan'],
+            'oracle': [r'INDEX (FULL|RANGE) SCAN DESCENDING IDX_PRODUCAO_DATA_ID'],
+            # Coluna gerada (produtividade) não é lida do índice no SQLite
+            'sqlite': [r'USING (COVERING )?INDEX idx_producao_data_id'],
+        },
+        'proibido': {
+            'postgres': [r'Seq Scan producao_cana$', r'^Sort'],
+            'oracle': [r'TABLE ACCESS FULL PRODUCAO_CANA', r'SORT ORDER BY'],
+            'sqlite': [r'TEMP B-TREE'],
+        },
+    },
+    {
+        'nome': 'listar_producoes (página por chave)',
+        'sql': {
+            'postgres': """
+            SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+                   tipo_colheita, data_colheita, produtividade_toneladas_ha
+            FROM producao_cana
+            WHERE (data_colheita, id) < (:apos_data, :apos_id)
+            ORDER BY data_colheita DESC, id DESC {limite}
+            """,
+            'sqlite': """
+            SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+                   tipo_colheita, data_colheita, produtividade_toneladas_ha
+            FROM producao_cana
+            WHERE (data_colheita, id) < (:apos_data, :apos_id)
+            ORDER BY data_colheita DESC, id DESC {limite}
+            """,
+            'oracle': """
+            SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+                   tipo_colheita, data_colheita, produtividade_toneladas_ha
+            FROM producao_cana
+            WHERE data_colheita < :apos_data
+               OR (data_colheita = :apos_data AND id < :apos_id)
+            ORDER BY data_colheita DESC, id DESC {limite}
+            """,
+        },
+        'params': lambda massa: {'limite': 50, 'apos_data': massa['meio'], 'apos_id': 1},
+        'esperado': {
+            'postgres': [r'Index Only Scan'],
+            'oracle': [r'INDEX (FULL|RANGE) SCAN DESCENDING IDX_PRODUCAO_DATA_ID'],
+            # Coluna gerada (produtividade) não é lida do índice no SQLite
+            'sqlite': [r'USING (COVERING )?INDEX idx_producao_data_id'],
+        },
+        'proibido': {
+            'postgres': [r'Seq Scan producao_cana$', r'^Sort'],
+            'oracle': [r'TABLE ACCESS FULL PRODUCAO_CANA'],
+            'sqlite': [r'TEMP B-TREE'],
+        },
+    },
+    {
+        'nome': 'relatório de perdas no período',
+        'sql': """
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita,
+               data_colheita, produtividade_toneladas_ha, perda_estimada_toneladas,
+               percentual_perda, metodo_calculo, calculado_em, producao_potencial_toneladas
+        FROM vw_relatorio_perdas
+        WHERE data_colheita >= :data_inicio AND data_colheita <= :data_fim
+        ORDER BY data_colheita DESC
+        """,
+        'params': lambda massa: {'data_inicio': massa['inicio_mes'], 'data_fim': massa['fim_mes']},
+        'esperado': {
+            'postgres': [r'Index Only Scan', r'idx_perdas_producao_cobertura'],
+            'oracle': [r'IDX_PRODUCAO_DATA_ID', r'IDX_PERDAS_PRODUCAO_COBERTURA'],
+            'sqlite': [r'USING (COVERING )?INDEX idx_producao_data_id',
+                       r'COVERING INDEX idx_perdas_producao_cobertura'],
+        },
+        'proibido': {
+            'postgres': [r'Seq Scan producao_cana$'],
+            'oracle': [r'TABLE ACCESS FULL PRODUCAO_CANA'],
+            'sqlite': [r'^SCAN p\b'],
+        },
+    },
+    {
+        'nome': 'resumo por tipo de colheita no período',
+        'sql': """
+        SELECT tipo_colheita, COUNT(*) AS registros,
+               SUM(qtd_colhida_toneladas) AS qtd_colhida_toneladas,
+               SUM(perda_estimada_toneladas) AS perda_estimada_toneladas
+        FROM vw_relatorio_perdas
+        WHERE data_colheita >= :data_inicio AND data_colheita <= :data_fim
+        GROUP BY tipo_colheita
+        ORDER BY tipo_colheita
+        """,
+        'params': lambda massa: {'data_inicio': massa['inicio_mes'], 'data_fim': massa['fim_mes']},
+        'esperado': {
+            'postgres': [r'Index Only Scan'],
+            'oracle': [r'IDX_PRODUCAO_DATA_ID'],
+            'sqlite': [r'COVERING INDEX idx_producao_data_id'],
+        },
+        'proibido': {
+            'postgres': [r'Seq Scan producao_cana$'],
+            'oracle': [r'TABLE ACCESS FULL PRODUCAO_CANA'],
+            'sqlite': [r'^SCAN p\b'],
+        },
+    },
+    {
+        'nome': 'perdas por faixa de fator (buscar_perdas_por_fator)',
+        'sql': {
+            'postgres': """
+            SELECT id, producao_id FROM perdas_colheita
+            WHERE (fatores_perda->>'fator_umidade')::numeric >= :minimo
+            """,
+            'sqlite': """
+            SELECT id, producao_id FROM perdas_colheita
+            WHERE json_extract(fatores_perda, '$.fator_umidade') >= :minimo
+            """,
+            'oracle': """
+            SELECT id, producao_id FROM perdas_colheita
+            WHERE JSON_VALUE(fatores_perda, '$.fator_umidade' RETURNING NUMBER) >= :minimo
+            """,
+        },
+        'params': lambda massa: {'minimo': 0.045},
+        'esperado': {
+            'postgres': [r'idx_perdas_fator_umidade'],
+            'oracle': [r'IDX_PERDAS_FATOR_UMIDADE'],
+            'sqlite': [r'idx_perdas_fator_umidade'],
+        },
+        'proibido': {
+            'postgres': [r'Seq Scan perdas_colheita'],
+            'oracle': [r'TABLE ACCESS FULL PERDAS_COLHEITA'],
+            'sqlite': [r'^SCAN perdas_colheita'],
+        },
+    },
+    {
+        'nome': 'busca pela chave natural',
+        'sql': """
+        SELECT id FROM producao_cana
+        WHERE localizacao = :localizacao AND data_colheita = :data_colheita
+          AND tipo_colheita = :tipo_colheita
+        """,
+        'params': lambda massa: dict(massa['chave']),
+        'esperado': {
+            'postgres': [r'Index'],
+            'oracle': [r'UK_PRODUCAO_NATURAL'],
+            'sqlite': [r'uk_producao_natural'],
+        },
+        'proibido': {
+            'postgres': [r'Seq Scan producao_cana$'],
+            'oracle': [r'TABLE ACCESS FULL PRODUCAO_CANA'],
+            'sqlite': [r'^SCAN producao_cana'],
+        },
+    },
+]
+
+
+def criar_banco(banco: str, caminho_sqlite: str):
+    """Instancia o repositório escolhido com as variáveis de ambiente usuais."""
+    if banco == 'sqlite':
+        from src.database_sqlite import SQLiteDatabase
+        return SQLiteDatabase(caminho_sqlite)
+
+    if banco == 'postgres':
+        from src.database_postgres import PostgreSQLDatabase
+        return PostgreSQLDatabase(
+            host=os.getenv('POSTGRES_HOST', 'localhost'),
+            port=int(os.getenv('POSTGRES_PORT', '5432')),
+            database=os.getenv('POSTGRES_DB', 'cana_db'),
+            username=os.getenv('POSTGRES_USER', 'cana_user'),
+            password=os.getenv('POSTGRES_PASSWORD', 'CanaPassword123')
+        )
+
+    from src.database import OracleDatabase
+    return OracleDatabase()
+
+
+def valor_unico(linha):
+    """Primeiro valor de uma linha (tupla, sqlite3.Row ou RealDictRow)."""
+    if isinstance(linha, dict):
+        return next(iter(linha.values()))
+    return linha[0]
+
+
+def contar_sinteticas(db, banco: str) -> int:
+    """Quantidade de produções sintéticas já gravadas."""
+    sql = "SELECT COUNT(*) FROM producao_cana WHERE localizacao LIKE :prefixo"
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(adaptar_sql(sql, banco), {'prefixo': PREFIXO_SINTETICO + '%'})
+        return int(valor_unico(cursor.fetchone()))
+
+
+def gerar_massa(db, inicio: int, fim: int, lote: int = 50000, semente: int = 42) -> None:
+    """Grava as produções sintéticas [inicio, fim) e uma perda para cada."""
+    aleatorio = random.Random(semente + inicio)
+    for comeco in range(inicio, fim, lote):
+        producoes = []
+        for i in range(comeco, min(comeco + lote, fim)):
+            area = aleatorio.randint(5, 150)
+            producoes.append({
+                'localizacao': f"{PREFIXO_SINTETICO}{i}",
+                'area_plantada_ha': area,
+                'qtd_colhida_toneladas': area * aleatorio.randint(55, 95),
+                'tipo_colheita': aleatorio.choice(['manual', 'mecanizada']),
+                # Três anos de colheitas: cada mês tem ~1/36 da massa
+                'data_colheita': date(2024, 1, 1) + timedelta(days=i % 1095),
+                'umidade_solo': aleatorio.choice([None, 58.0, 65.5, 72.5]),
+                'temperatura_media': aleatorio.choice([None, 25.0, 27.5, 33.0]),
+                'precipitacao_mm': aleatorio.choice([80.0, 125.0, 210.0])
+            })
+        producao_ids = db.upsert_producoes_em_lote(producoes)
+        db.upsert_perdas_em_lote([
+            {
+                'producao_id': producao_id,
+                'perda_estimada_toneladas': round(producao['qtd_colhida_toneladas'] * 0.06, 2),
+                'percentual_perda': 6.0,
+                'fatores_perda': {'fator_base': 0.06,
+                                  'fator_umidade': round(aleatorio.uniform(0, 0.05), 4)},
+                'metodo_calculo': 'avancado',
+                'observacoes': None
+            }
+            for producao, producao_id in zip(producoes, producao_ids)
+        ])
+        print(f"  {min(comeco + lote, fim)}/{fim} produções sintéticas")
+
+
+def adaptar_sql(sql: str, banco: str, limite: bool = True) -> str:
+    """Ajusta paginação e binds (:nome) ao dialeto do banco."""
+    if banco == 'oracle':
+        sql = sql.replace("{limite}", "FETCH FIRST :limite ROWS ONLY")
+    else:
+        sql = sql.replace("{limite}", "LIMIT :limite")
+    if banco == 'postgres':
+        sql = re.sub(r"(?<!:):(\w+)", r"%(\1)s", sql)
+    return sql
+
+
+def explicar(db, banco: str, sql: str, params: dict) -> list:
+    """Plano da consulta, uma linha por operação ("operação objeto índice")."""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+
+        if banco == 'sqlite':
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [linha['detail'] for linha in cursor.fetchall()]
+
+        if banco == 'postgres':
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plano = valor_unico(cursor.fetchone())
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            linhas = []
+
+            def percorrer(no):
+                linhas.append(" ".join(filter(None, [
+                    no.get('Node Type'),
+                    # Partições aparecem como producao_cana_pAAAA_MM
+                    re.sub(r"_p\d{4}_\d{2}$", "", no.get('Relation Name', '')),
+                    no.get('Index Name')
+                ])))
+                for filho in no.get('Plans', []):
+                    percorrer(filho)
+
+            percorrer(plano[0]['Plan'])
+            return linhas
+
+        cursor.execute("DELETE FROM plan_table WHERE statement_id = 'verificar_planos'")
+        # EXPLAIN PLAN não recebe valores de bind: o plano vale para qualquer valor
+        cursor.execute("EXPLAIN PLAN SET STATEMENT_ID = 'verificar_planos' FOR " + sql)
+        cursor.execute("""
+        SELECT operation, options, object_name FROM plan_table
+        WHERE statement_id = 'verificar_planos' ORDER BY id
+        """)
+        return [" ".join(filter(None, linha)) for linha in cursor.fetchall()]
+
+
+def cronometrar(db, sql: str, params: dict, repeticoes: int) -> float:
+    """Mediana (ms) do tempo de execução com leitura de todas as linhas."""
+    tempos = []
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressão de planos de consulta e tempos")
+    parser.add_argument("--banco", choices=['sqlite', 'postgres', 'oracle'], default='sqlite')
+    parser.add_argument("--sqlite", default="data/verificar_planos.db", metavar="ARQUIVO",
+                        help="Arquivo do banco SQLite (padrão: %(default)s)")
+    parser.add_argument("--linhas", type=int, default=1000000, metavar="N",
+                        help="Tamanho da massa sintética (padrão: %(default)s)")
+    parser.add_argument("--repeticoes", type=int, default=5,
+                        help="Execuções por consulta; vale a mediana (padrão: %(default)s)")
+    parser.add_argument("--base", default=None, metavar="ARQUIVO",
+                        help="Tempos de referência (padrão: data/planos_base_<banco>.json)")
+    parser.add_argument("--gravar-base", action="store_true",
+                        help="Grava os tempos desta execução como referência")
+    parser.add_argument("--tolerancia", type=float, default=0.5,
+                        help="Piora relativa aceita sobre a base (padrão: %(default)s = +50%%)")
+    parser.add_argument("--folga-ms", type=float, default=5.0,
+                        help="Piora absoluta ignorada, contra ruído em consultas rápidas (padrão: %(default)s)")
+    parser.add_argument("--limpar", action="store_true",
+                        help="Remover as produções sintéticas ao final")
+    args = parser.parse_args()
+    caminho_base = args.base or f"data/planos_base_{args.banco}.json"
+
+    db = criar_banco(args.banco, args.sqlite)
+
+    existentes = contar_sinteticas(db, args.banco)
+    if existentes < args.linhas:
+        print(f"Gerando {args.linhas - existentes} produções sintéticas...")
+        inicio = time.perf_counter()
+        gerar_massa(db, existentes, args.linhas)
+        print(f"Massa gerada em {time.perf_counter() - inicio:.1f}s")
+
+    criados = db.garantir_indices()
+    print(f"Índices criados: {', '.join(criados) if criados else 'nenhum (já existentes)'}")
+
+    massa = {
+        'meio': date(2025, 7, 1),
+        'inicio_mes': date(2025, 3, 1),
+        'fim_mes': date(2025, 3, 31),
+        'chave': {'localizacao': f"{PREFIXO_SINTETICO}{args.linhas // 2}",
+                  'data_colheita': date(2024, 1, 1) + timedelta(days=(args.linhas // 2) % 1095),
+                  'tipo_colheita': 'manual'}
+    }
+
+    base = {}
+    if os.path.exists(caminho_base) and not args.gravar_base:
+        with open(caminho_base, 'r', encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+
+    falhas = []
+    resultados = {}
+    for caso in CASOS:
+        sql = caso['sql'][args.banco] if isinstance(caso['sql'], dict) else caso['sql']
+        sql = adaptar_sql(sql, args.banco)
+        params = caso['params'](massa)
+
+        plano = explicar(db, args.banco, sql, params)
+        tempo_ms = cronometrar(db, sql, params, args.repeticoes)
+        resultados[caso['nome']] = {'tempo_ms': tempo_ms, 'plano': plano}
+
+        print(f"\n▶ {caso['nome']}: {tempo_ms:.2f} ms")
+        for linha in plano:
+            print(f"    {linha}")
+
+        for padrao in caso['esperado'][args.banco]:
+            if not any(re.search(padrao, linha) for linha in plano):
+                falhas.append(f"{caso['nome']}: plano sem '{padrao}'")
+        for padrao in caso['proibido'][args.banco]:
+            if any(re.search(padrao, linha) for linha in plano):
+                falhas.append(f"{caso['nome']}: plano com '{padrao}'")
+
+        referencia = base.get(caso['nome'], {}).get('tempo_ms')
+        if referencia is not None and tempo_ms > referencia * (1 + args.tolerancia) + args.folga_ms:
+            falhas.append(f"{caso['nome']}: {tempo_ms:.2f} ms (base {referencia:.2f} ms)")
+
+    if args.gravar_base:
+        os.makedirs(os.path.dirname(caminho_base) or '.', exist_ok=True)
+        with open(caminho_base, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nBase gravada em {caminho_base}")
+
+    if args.limpar:
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(adaptar_sql("DELETE FROM producao_cana WHERE localizacao LIKE :prefixo", args.banco),
+                           {'prefixo': PREFIXO_SINTETICO + '%'})
+            conn.commit()
+
+    if falhas:
+        print(f"\n❌ {len(falhas)} regressões:")
+        for falha in falhas:
+            print(f"  • {falha}")
+        sys.exit(1)
+    print("\n✅ Planos e tempos dentro do esperado")
+
+
+if __name__ == "__main__":
+    main()
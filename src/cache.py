@@ -0,0 +1,318 @@
+"""
+Cache de leitura (read-through) sobre os repositórios de dados.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Parâmetros de perdas mudam poucas vezes por ano e produções praticamente
+não são alteradas depois de gravadas; RepositorioComCache guarda essas
+leituras em memória com validade (TTL) e limite de itens (LRU), e as
+invalida nas escritas feitas através dele.
+
+Com o banco fora do ar, os cálculos não esperam por ele: os parâmetros
+vêm dos últimos lidos (ou, sem eles, a calculadora usa os padrão), a
+leitura não é tentada enquanto o monitor de saúde indicar o banco
+indisponível e uma falha de leitura suspende novas tentativas por alguns
+segundos.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from src.repository import RepositorioProducao
+
+
+class CacheLRU:
+    """Dicionário com validade por item e descarte do item menos usado."""
+    
+    def __init__(self, max_itens: int = 1000, ttl_segundos: float = 300.0):
+        """
+        Args:
+            max_itens: Quantidade máxima de itens; ao exceder, o menos
+                recentemente usado é descartado
+            ttl_segundos: Tempo de validade de cada item
+        """
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+    
+    def obter(self, chave: Hashable) -> Tuple[bool, Any]:
+        """
+        Busca um item válido.
+        
+        Returns:
+            Tupla (encontrado, valor)
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return False, None
+            
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                self.falhas += 1
+                return False, None
+            
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return True, valor
+    
+    def definir(self, chave: Hashable, valor: Any) -> None:
+        """Guarda o item, descartando o menos usado se o limite for excedido."""
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + self.ttl_segundos)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+    
+    def invalidar(self, chave: Hashable) -> None:
+        """Remove o item, se existir."""
+        with self._lock:
+            self._itens.pop(chave, None)
+    
+    def limpar(self) -> None:
+        """Remove todos os itens."""
+        with self._lock:
+            self._itens.clear()
+    
+    def obter_ou_carregar(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        """
+        Retorna o item do cache ou o carrega (e guarda, se não for None).
+        
+        Args:
+            chave: Chave do item
+            carregar: Função chamada em caso de falha no cache
+        """
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            return valor
+        
+        valor = carregar()
+        if valor is not None:
+            self.definir(chave, valor)
+        return valor
+    
+    def estatisticas(self) -> Dict[str, Any]:
+        """Itens, acertos, falhas, descartes por LRU e taxa de acerto."""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / consultas if consultas else None
+            }
+
+
+class RepositorioComCache:
+    """
+    Envolve um repositório guardando parâmetros e produções em cache.
+    
+    Os demais métodos são repassados ao repositório original. As escritas
+    de produções feitas através deste objeto invalidam os IDs gravados, e
+    o arquivamento de partições, todas as produções (escritas de perdas
+    não mudam as produções em cache e não invalidam nada); escritas
+    feitas por fora (outro processo, SQL direto) só são vistas após o TTL
+    ou após invalidar_parametros() / invalidar_producao().
+    """
+    
+    # Tipos recarregados quando o banco avisa "todos os parâmetros mudaram"
+    TIPOS_COLHEITA = ('manual', 'mecanizada')
+    
+    def __init__(self,
+                 repositorio: RepositorioProducao,
+                 ttl_parametros: float = 3600.0,
+                 ttl_producoes: float = 86400.0,
+                 max_producoes: int = 10000,
+                 saude: Optional[Any] = None,
+                 espera_apos_falha: float = 30.0):
+        """
+        Args:
+            repositorio: Repositório a envolver (Oracle, PostgreSQL ou SQLite)
+            ttl_parametros: Validade (s) dos parâmetros de perdas em cache
+            ttl_producoes: Validade (s) das produções em cache
+            max_producoes: Quantidade máxima de produções em cache
+            saude: MonitorSaude do banco; com ele indisponível (disjuntor
+                aberto), os parâmetros não são buscados no banco
+            espera_apos_falha: Segundos sem nova tentativa de leitura dos
+                parâmetros depois de uma falha
+        """
+        self.repositorio = repositorio
+        self.cache_parametros = CacheLRU(max_itens=16, ttl_segundos=ttl_parametros)
+        self.cache_producoes = CacheLRU(max_itens=max_producoes, ttl_segundos=ttl_producoes)
+        self.saude = saude
+        self.espera_apos_falha = espera_apos_falha
+        self.logger = logging.getLogger(__name__)
+        
+        # Últimos parâmetros lidos de cada tipo (sem validade): usados quando
+        # o banco não responde, em vez de esperar por ele a cada cálculo
+        self._ultimos_parametros: Dict[str, Dict[str, Any]] = {}
+        # Instante (monotônico) até o qual a leitura de um tipo não é tentada
+        self._falha_parametros_ate: Dict[str, float] = {}
+    
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self.repositorio, nome)
+    
+    def buscar_parametros_perdas(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
+        """
+        Parâmetros de perdas do tipo de colheita, lidos do cache quando válidos.
+        
+        Sem banco (monitor de saúde indisponível, ou falha de leitura há
+        menos de espera_apos_falha segundos) devolve os últimos parâmetros
+        lidos, ou None se nunca foram lidos (a calculadora usa os padrão).
+        """
+        encontrado, parametros = self.cache_parametros.obter(tipo_colheita)
+        if not encontrado:
+            parametros = self._carregar_parametros(tipo_colheita)
+        # Cópia: quem recebe pode alterar o dicionário sem afetar o cache
+        return dict(parametros) if parametros is not None else None
+    
+    def _carregar_parametros(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
+        """Lê os parâmetros do banco, ou devolve os últimos conhecidos se ele não responder."""
+        if time.monotonic() < self._falha_parametros_ate.get(tipo_colheita, 0.0):
+            return self._ultimos_parametros.get(tipo_colheita)
+        if self.saude is not None and not self.saude.disponivel():
+            # O teste de conexão também pode demorar: vale a mesma espera
+            self._falha_parametros_ate[tipo_colheita] = time.monotonic() + self.espera_apos_falha
+            return self._ultimos_parametros.get(tipo_colheita)
+        
+        try:
+            parametros = self.repositorio.buscar_parametros_perdas(tipo_colheita)
+        except Exception as e:
+            self._falha_parametros_ate[tipo_colheita] = time.monotonic() + self.espera_apos_falha
+            if self.saude is not None:
+                self.saude.registrar_falha(e)
+            self.logger.warning(f"Parâmetros '{tipo_colheita}' não lidos do banco "
+                                f"(nova tentativa em {self.espera_apos_falha:.0f}s): {e}")
+            return self._ultimos_parametros.get(tipo_colheita)
+        
+        self._falha_parametros_ate.pop(tipo_colheita, None)
+        if parametros is not None:
+            self.cache_parametros.definir(tipo_colheita, parametros)
+            self._ultimos_parametros[tipo_colheita] = parametros
+        return parametros
+    
+    def buscar_producao_por_id(self, producao_id: int) -> Optional[Dict[str, Any]]:
+        """Produção pelo ID, lida do cache quando válida (ausências não são guardadas)."""
+        producao = self.cache_producoes.obter_ou_carregar(
+            producao_id, lambda: self.repositorio.buscar_producao_por_id(producao_id)
+        )
+        return dict(producao) if producao is not None else None
+    
+    def inserir_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """Insere a produção e invalida o ID gerado."""
+        producao_id = self.repositorio.inserir_producao_cana(dados_producao)
+        self.cache_producoes.invalidar(producao_id)
+        return producao_id
+    
+    def inserir_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]], **kwargs) -> List[int]:
+        """Insere as produções em lote e invalida os IDs gerados."""
+        ids = self.repositorio.inserir_producoes_em_lote(lista_producoes, **kwargs)
+        for producao_id in ids:
+            self.cache_producoes.invalidar(producao_id)
+        return ids
+    
+    def upsert_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """Insere ou atualiza a produção e invalida o ID afetado."""
+        producao_id = self.repositorio.upsert_producao_cana(dados_producao)
+        self.cache_producoes.invalidar(producao_id)
+        return producao_id
+    
+    def upsert_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]], **kwargs) -> List[int]:
+        """Insere ou atualiza as produções em lote e invalida os IDs afetados."""
+        ids = self.repositorio.upsert_producoes_em_lote(lista_producoes, **kwargs)
+        for producao_id in ids:
+            self.cache_producoes.invalidar(producao_id)
+        return ids
+    
+    def arquivar_particoes(self, anteriores_a: date) -> List[str]:
+        """Arquiva as partições antigas e descarta todas as produções em cache."""
+        try:
+            return self.repositorio.arquivar_particoes(anteriores_a)
+        finally:
+            # Produções saem de producao_cana sem que se saiba quais IDs estavam em cache
+            self.invalidar_producao()
+    
+    def acompanhar_alteracoes_parametros(self) -> bool:
+        """
+        Mantém os parâmetros em cache atualizados por avisos do banco.
+        
+        Assina as alterações de parametros_perdas no repositório (NOTIFY no
+        PostgreSQL, consulta de versão no Oracle); a partir daí os parâmetros
+        deixam de expirar por TTL e são recarregados assim que o banco avisa,
+        sem ida ao banco nos cálculos.
+        
+        Returns:
+            True se o repositório oferece os avisos; False mantém o TTL
+        """
+        try:
+            self.repositorio.assinar_alteracoes_parametros(self._parametros_alterados)
+        except NotImplementedError:
+            self.logger.info("Banco sem avisos de alteração de parâmetros; mantido o TTL do cache")
+            return False
+        
+        self.cache_parametros.ttl_segundos = float('inf')
+        return True
+    
+    def _parametros_alterados(self, tipo_colheita: Optional[str]) -> None:
+        """
+        Recarrega os parâmetros avisados pelo banco (None: todos os tipos).
+        
+        Se a leitura falhar, os últimos parâmetros conhecidos continuam em uso.
+        """
+        for tipo in ([tipo_colheita] if tipo_colheita else self.TIPOS_COLHEITA):
+            try:
+                parametros = self.repositorio.buscar_parametros_perdas(tipo)
+            except Exception as e:
+                # Sem banco (ex.: o ouvinte perdeu a conexão): sai do cache, para
+                # nova leitura quando o banco voltar, mas os cálculos seguem com
+                # os últimos parâmetros conhecidos até lá
+                self.logger.warning(f"Parâmetros '{tipo}' não recarregados: {e}")
+                self.cache_parametros.invalidar(tipo)
+                self._falha_parametros_ate[tipo] = time.monotonic() + self.espera_apos_falha
+                if self.saude is not None:
+                    self.saude.registrar_falha(e)
+                continue
+            
+            self._falha_parametros_ate.pop(tipo, None)
+            if parametros is None:
+                self.cache_parametros.invalidar(tipo)
+                self._ultimos_parametros.pop(tipo, None)
+            else:
+                self.cache_parametros.definir(tipo, parametros)
+                self._ultimos_parametros[tipo] = parametros
+    
+    def invalidar_parametros(self, tipo_colheita: Optional[str] = None) -> None:
+        """Descarta os parâmetros em cache (de um tipo ou de todos)."""
+        if tipo_colheita is None:
+            self.cache_parametros.limpar()
+        else:
+            self.cache_parametros.invalidar(tipo_colheita)
+    
+    def invalidar_producao(self, producao_id: Optional[int] = None) -> None:
+        """Descarta produções em cache (uma pelo ID ou todas)."""
+        if producao_id is None:
+            self.cache_producoes.limpar()
+        else:
+            self.cache_producoes.invalidar(producao_id)
+    
+    def estatisticas_cache(self) -> Dict[str, Dict[str, Any]]:
+        """Estatísticas dos caches de parâmetros e de produções."""
+        return {
+            'parametros': self.cache_parametros.estatisticas(),
+            'producoes': self.cache_producoes.estatisticas()
+        }
+
+
+# O wrapper oferece a mesma interface por delegação
+RepositorioProducao.register(RepositorioComCache)
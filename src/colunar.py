@@ -0,0 +1,74 @@
+"""
+Montagem colunar de resultados de consulta.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Leituras em massa chegam como tuplas (sem um dicionário por linha) e os
+números já como float (conversores registrados em cada banco). Aqui as
+tuplas são transpostas uma vez e cada coluna vira um array NumPy com o
+dtype certo, em vez de o pandas inferir e converter valor a valor
+(from_records com coerce_float).
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# dtypes das colunas numéricas; as demais (texto, datas) ficam como objeto.
+# 'Int64' (com maiúscula) é o inteiro do pandas que aceita nulos.
+TIPOS_PRODUCAO: Dict[str, str] = {
+    'id': 'int64',
+    'area_plantada_ha': 'float64',
+    'qtd_colhida_toneladas': 'float64',
+    'idade_cana_meses': 'Int64',
+    'umidade_solo': 'float64',
+    'temperatura_media': 'float64',
+    'precipitacao_mm': 'float64',
+    'produtividade_toneladas_ha': 'float64'
+}
+
+TIPOS_RELATORIO: Dict[str, str] = {
+    'id': 'int64',
+    'area_plantada_ha': 'float64',
+    'qtd_colhida_toneladas': 'float64',
+    'produtividade_toneladas_ha': 'float64',
+    # Nulos quando a produção ainda não tem cálculo (LEFT JOIN)
+    'perda_estimada_toneladas': 'float64',
+    'percentual_perda': 'float64',
+    'producao_potencial_toneladas': 'float64'
+}
+
+
+def montar_dataframe(linhas: Sequence[Sequence], colunas: List[str],
+                     tipos: Dict[str, str]) -> pd.DataFrame:
+    """
+    Monta um DataFrame a partir de tuplas, uma coluna NumPy por vez.
+    
+    Args:
+        linhas: Linhas da consulta (tuplas ou sequências equivalentes)
+        colunas: Nomes das colunas, na ordem das tuplas
+        tipos: dtype de cada coluna numérica ('float64', 'int64' ou 'Int64');
+            None vira NaN nas colunas float64 e <NA> nas Int64
+    
+    Returns:
+        DataFrame com as colunas nos dtypes indicados (as demais como objeto)
+    """
+    valores_por_coluna = list(zip(*linhas)) if linhas else [()] * len(colunas)
+    
+    dados = {}
+    for nome, valores in zip(colunas, valores_por_coluna):
+        tipo = tipos.get(nome)
+        if tipo == 'float64':
+            dados[nome] = np.array(valores, dtype=np.float64)
+        elif tipo == 'int64':
+            dados[nome] = np.array(valores, dtype=np.int64)
+        elif tipo == 'Int64':
+            dados[nome] = pd.array(valores, dtype='Int64')
+        else:
+            # Atribuição elemento a elemento: textos e datas não viram arrays aninhados
+            coluna = np.empty(len(valores), dtype=object)
+            coluna[:] = valores
+            dados[nome] = coluna
+    
+    return pd.DataFrame(dados, columns=colunas)
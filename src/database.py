@@ -7,21 +7,95 @@ import cx_Oracle
 import logging
 import json
 import os
+import re
+import threading
 from datetime import datetime, date
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from contextlib import contextmanager
 import pandas as pd
 
+from src.colunar import TIPOS_PRODUCAO, TIPOS_RELATORIO, montar_dataframe
+from src.instrumentation import ConexaoInstrumentada, MonitorConsultas, monitor_consultas
+from src.repository import RepositorioProducao
 
-class OracleDatabase:
+
+def _numero_como_float(cursor, nome, tipo_padrao, tamanho, precisao, escala):
+    """
+    Handler de saída das conexões: NUMBER com casas decimais chega como
+    float nativo (BINARY_DOUBLE convertido no cliente, sem passar por texto).
+    Inteiros e expressões sem escala seguem a conversão padrão.
+    """
+    if tipo_padrao == cx_Oracle.NUMBER and escala > 0:
+        return cursor.var(cx_Oracle.NATIVE_FLOAT, arraysize=cursor.arraysize)
+
+
+class OracleDatabase(RepositorioProducao):
     """Classe para gerenciar conexões e operações com banco Oracle."""
     
+    # Colunas do relatório de perdas (iguais na view comum e na materializada)
+    COLUNAS_RELATORIO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, produtividade_toneladas_ha, perda_estimada_toneladas, "
+        "percentual_perda, metodo_calculo, calculado_em, producao_potencial_toneladas"
+    )
+    
+    # Colunas de produção usadas nas leituras em lote (buscar_producoes_por_ids)
+    COLUNAS_PRODUCAO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, variedade_cana, idade_cana_meses, umidade_solo, "
+        "temperatura_media, precipitacao_mm, produtividade_toneladas_ha"
+    )
+    
+    # Expressões SQL aceitas em resumir_perdas_por (lista fechada contra injeção)
+    AGRUPAMENTOS_RELATORIO = {
+        'tipo_colheita': "tipo_colheita",
+        'localizacao': "localizacao",
+        'mes': "TRUNC(data_colheita, 'MM')"
+    }
+    
+    # Índices compostos e de cobertura ajustados às consultas (garantir_indices).
+    # Sem INCLUDE no Oracle, as colunas lidas entram na chave; o índice é
+    # percorrido de trás para frente no ORDER BY data_colheita DESC, id DESC.
+    # produtividade_toneladas_ha é virtual e sai de qtd/área, já no índice.
+    INDICES_COBERTURA = {
+        'IDX_PRODUCAO_DATA_ID': """
+        CREATE INDEX idx_producao_data_id ON producao_cana
+            (data_colheita, id, localizacao, tipo_colheita,
+             area_plantada_ha, qtd_colhida_toneladas) LOCAL
+        """,
+        'IDX_PERDAS_PRODUCAO_COBERTURA': """
+        CREATE INDEX idx_perdas_producao_cobertura ON perdas_colheita
+            (producao_id, id, perda_estimada_toneladas, percentual_perda,
+             metodo_calculo, calculado_em)
+        """
+    }
+    
+    # Fatores de fatores_perda (CLOB com IS JSON): índices de função sobre
+    # JSON_VALUE atendem filtros por faixa de cada fator.
+    # fator_base fica sem índice: só há um valor por tipo de colheita.
+    EXPRESSAO_FATOR = "JSON_VALUE(fatores_perda, '$.{fator}' RETURNING NUMBER)"
+    INDICES_FATORES = {
+        f'IDX_PERDAS_{fator.upper()}': f"""
+        CREATE INDEX idx_perdas_{fator} ON perdas_colheita
+            (JSON_VALUE(fatores_perda, '$.{fator}' RETURNING NUMBER))
+        """
+        for fator in ('fator_umidade', 'fator_idade', 'fator_clima')
+    }
+    
+    # Índices de uma coluna que passaram a ser prefixo dos de cobertura
+    INDICES_SUBSTITUIDOS = ('IDX_PRODUCAO_DATA', 'IDX_PERDAS_PRODUCAO')
+    
+    # Segundos entre verificações de versão de parametros_perdas
+    INTERVALO_VERSOES = 5.0
+    
     def __init__(self, 
                  host: str = "localhost",
                  port: int = 1521,
                  service_name: str = "XEPDB1",
                  username: str = "cana_user",
-                 password: str = "CanaPassword123"):
+                 password: str = "CanaPassword123",
+                 usar_relatorio_materializado: bool = False,
+                 monitor: Optional[MonitorConsultas] = None):
         """
         Inicializa a conexão com o banco Oracle.
         
@@ -31,14 +105,29 @@ class OracleDatabase:
             service_name: Nome do serviço Oracle
             username: Nome do usuário
             password: Senha do usuário
+            usar_relatorio_materializado: Se True, relatórios e agregações
+                leem mv_relatorio_perdas em vez de vw_relatorio_perdas
+            monitor: Destino das métricas de consultas (padrão: o
+                monitor compartilhado monitor_consultas)
         """
         self.host = host
         self.port = port
         self.service_name = service_name
         self.username = username
         self.password = password
+        
+        # Fonte dos relatórios: view comum ou materializada
+        self.visao_relatorio = "mv_relatorio_perdas" if usar_relatorio_materializado else "vw_relatorio_perdas"
         self.connection_string = f"{username}/{password}@{host}:{port}/{service_name}"
         
+        # Métricas de consultas (tempo, linhas, binds) e contadores de conexão
+        self.monitor = monitor if monitor is not None else monitor_consultas
+        
+        # Verificação de alterações em parametros_perdas (assinar_alteracoes_parametros)
+        self._assinantes_parametros: List[Callable[[Optional[str]], None]] = []
+        self._escuta_parametros: Optional[threading.Thread] = None
+        self._parar_escuta = threading.Event()
+        
         # Configurar logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
@@ -61,14 +150,18 @@ class OracleDatabase:
         Context manager para conexões com o banco.
         
         Yields:
-            cx_Oracle.Connection: Conexão ativa com o banco
+            ConexaoInstrumentada: Conexão ativa com o banco (cx_Oracle),
+            com os comandos medidos pelo monitor de consultas
         """
         connection = None
         try:
-            connection = cx_Oracle.connect(self.connection_string)
-            self.logger.info("Conexão estabelecida com sucesso")
+            conexao = cx_Oracle.connect(self.connection_string)
+            conexao.outputtypehandler = _numero_como_float
+            connection = ConexaoInstrumentada(conexao, self.monitor)
+            self.monitor.contar('conexoes_abertas')
             yield connection
         except cx_Oracle.DatabaseError as e:
+            self.monitor.contar('erros_banco')
             self.logger.error(f"Erro de banco de dados: {e}")
             raise
         except Exception as e:
@@ -77,7 +170,7 @@ class OracleDatabase:
         finally:
             if connection:
                 connection.close()
-                self.logger.info("Conexão fechada")
+                self.monitor.contar('conexoes_fechadas')
     
     def test_connection(self) -> bool:
         """
@@ -125,20 +218,8 @@ class OracleDatabase:
                 # Variável para capturar o ID gerado
                 new_id = cursor.var(cx_Oracle.NUMBER)
                 
-                # Preparar dados
-                dados_sql = {
-                    'localizacao': dados_producao['localizacao'],
-                    'area_plantada_ha': dados_producao['area_plantada_ha'],
-                    'qtd_colhida_toneladas': dados_producao['qtd_colhida_toneladas'],
-                    'tipo_colheita': dados_producao['tipo_colheita'],
-                    'data_colheita': dados_producao.get('data_colheita', datetime.now().date()),
-                    'variedade_cana': dados_producao.get('variedade_cana'),
-                    'idade_cana_meses': dados_producao.get('idade_cana_meses'),
-                    'umidade_solo': dados_producao.get('umidade_solo'),
-                    'temperatura_media': dados_producao.get('temperatura_media'),
-                    'precipitacao_mm': dados_producao.get('precipitacao_mm'),
-                    'new_id': new_id
-                }
+                dados_sql = self._dados_producao(dados_producao)
+                dados_sql['new_id'] = new_id
                 
                 cursor.execute(sql, dados_sql)
                 conn.commit()
@@ -151,6 +232,52 @@ class OracleDatabase:
             self.logger.error(f"Erro ao inserir produção: {e}")
             raise
     
+    def inserir_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere várias produções em uma única transação.
+        
+        Usa executemany (array DML): todas as linhas seguem em uma ida ao
+        servidor e os IDs voltam pela variável de RETURNING.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+            
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        sql = """
+        INSERT INTO producao_cana 
+        (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, 
+         data_colheita, variedade_cana, idade_cana_meses, umidade_solo, 
+         temperatura_media, precipitacao_mm)
+        VALUES 
+        (:localizacao, :area_plantada_ha, :qtd_colhida_toneladas, :tipo_colheita,
+         :data_colheita, :variedade_cana, :idade_cana_meses, :umidade_solo,
+         :temperatura_media, :precipitacao_mm)
+        RETURNING id INTO :new_id
+        """
+        
+        linhas = [self._dados_producao(dados) for dados in lista_producoes]
+        if not linhas:
+            return []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                new_id = cursor.var(cx_Oracle.NUMBER, arraysize=len(linhas))
+                cursor.setinputsizes(new_id=new_id)
+                cursor.executemany(sql, linhas)
+                conn.commit()
+                
+                ids = [int(new_id.getvalue(i)[0]) for i in range(len(linhas))]
+                self.logger.info(f"{len(ids)} produções inseridas em lote")
+                return ids
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir produções em lote: {e}")
+            raise
+    
     def inserir_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
         """
         Insere cálculo de perda no banco.
@@ -177,18 +304,8 @@ class OracleDatabase:
                 
                 new_id = cursor.var(cx_Oracle.NUMBER)
                 
-                # Converter fatores_perda para JSON se for dict
-                fatores_json = json.dumps(dados_perda.get('fatores_perda', {})) if isinstance(dados_perda.get('fatores_perda'), dict) else dados_perda.get('fatores_perda')
-                
-                dados_sql = {
-                    'producao_id': dados_perda['producao_id'],
-                    'perda_estimada_toneladas': dados_perda['perda_estimada_toneladas'],
-                    'percentual_perda': dados_perda['percentual_perda'],
-                    'fatores_perda': fatores_json,
-                    'metodo_calculo': dados_perda.get('metodo_calculo', 'sistema_automatico'),
-                    'observacoes': dados_perda.get('observacoes'),
-                    'new_id': new_id
-                }
+                dados_sql = self._dados_perda(dados_perda)
+                dados_sql['new_id'] = new_id
                 
                 cursor.execute(sql, dados_sql)
                 conn.commit()
@@ -201,6 +318,268 @@ class OracleDatabase:
             self.logger.error(f"Erro ao inserir perda: {e}")
             raise
     
+    def inserir_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere vários cálculos de perda em uma única transação.
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+            
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        sql = """
+        INSERT INTO perdas_colheita 
+        (producao_id, perda_estimada_toneladas, percentual_perda, 
+         fatores_perda, metodo_calculo, observacoes)
+        VALUES 
+        (:producao_id, :perda_estimada_toneladas, :percentual_perda,
+         :fatores_perda, :metodo_calculo, :observacoes)
+        RETURNING id INTO :new_id
+        """
+        
+        linhas = [self._dados_perda(dados) for dados in lista_perdas]
+        if not linhas:
+            return []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                new_id = cursor.var(cx_Oracle.NUMBER, arraysize=len(linhas))
+                cursor.setinputsizes(new_id=new_id)
+                cursor.executemany(sql, linhas)
+                conn.commit()
+                
+                ids = [int(new_id.getvalue(i)[0]) for i in range(len(linhas))]
+                self.logger.info(f"{len(ids)} perdas inseridas em lote")
+                return ids
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir perdas em lote: {e}")
+            raise
+    
+    def upsert_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """
+        Insere a produção ou atualiza a existente com a mesma chave natural
+        (localizacao, data_colheita, tipo_colheita).
+        
+        Args:
+            dados_producao: Dicionário com dados da produção
+            
+        Returns:
+            int: ID da produção inserida ou atualizada
+        """
+        return self.upsert_producoes_em_lote([dados_producao])[0]
+    
+    def upsert_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere ou atualiza várias produções em uma única transação.
+        
+        Usa MERGE sobre a chave natural, enviado com executemany; linhas que
+        já existem com os mesmos valores não são regravadas, de modo que
+        reprocessar um lote não cresce a tabela nem gera escrita. Como o
+        MERGE não tem RETURNING, os IDs são lidos em seguida numa única
+        consulta restrita ao período do lote.
+        
+        Com 'registrado_em' nos dicionários (reenvio do spool), esse instante
+        é o gravado em data_atualizacao e a linha não é alterada se já foi
+        atualizada depois dele.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+            
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        sql = """
+        MERGE INTO producao_cana p
+        USING (SELECT :localizacao AS localizacao, :area_plantada_ha AS area_plantada_ha,
+                      :qtd_colhida_toneladas AS qtd_colhida_toneladas,
+                      :tipo_colheita AS tipo_colheita, :data_colheita AS data_colheita,
+                      :variedade_cana AS variedade_cana, :idade_cana_meses AS idade_cana_meses,
+                      :umidade_solo AS umidade_solo, :temperatura_media AS temperatura_media,
+                      :precipitacao_mm AS precipitacao_mm,
+                      COALESCE(CAST(:registrado_em AS TIMESTAMP), LOCALTIMESTAMP) AS registrado_em
+               FROM dual) d
+        ON (p.localizacao = d.localizacao
+            AND p.data_colheita = d.data_colheita
+            AND p.tipo_colheita = d.tipo_colheita)
+        WHEN MATCHED THEN UPDATE SET
+            p.area_plantada_ha = d.area_plantada_ha,
+            p.qtd_colhida_toneladas = d.qtd_colhida_toneladas,
+            p.variedade_cana = d.variedade_cana,
+            p.idade_cana_meses = d.idade_cana_meses,
+            p.umidade_solo = d.umidade_solo,
+            p.temperatura_media = d.temperatura_media,
+            p.precipitacao_mm = d.precipitacao_mm,
+            p.data_atualizacao = d.registrado_em
+            -- DECODE compara tratando NULL = NULL; só regrava o que mudou
+            WHERE (DECODE(p.area_plantada_ha, d.area_plantada_ha, 0, 1)
+                + DECODE(p.qtd_colhida_toneladas, d.qtd_colhida_toneladas, 0, 1)
+                + DECODE(p.variedade_cana, d.variedade_cana, 0, 1)
+                + DECODE(p.idade_cana_meses, d.idade_cana_meses, 0, 1)
+                + DECODE(p.umidade_solo, d.umidade_solo, 0, 1)
+                + DECODE(p.temperatura_media, d.temperatura_media, 0, 1)
+                + DECODE(p.precipitacao_mm, d.precipitacao_mm, 0, 1) > 0)
+            {so_mais_recentes}
+        WHEN NOT MATCHED THEN INSERT
+            (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita,
+             data_colheita, variedade_cana, idade_cana_meses, umidade_solo,
+             temperatura_media, precipitacao_mm, data_atualizacao)
+        VALUES
+            (d.localizacao, d.area_plantada_ha, d.qtd_colhida_toneladas, d.tipo_colheita,
+             d.data_colheita, d.variedade_cana, d.idade_cana_meses, d.umidade_solo,
+             d.temperatura_media, d.precipitacao_mm, d.registrado_em)
+        """
+        sql_ids = """
+        SELECT id, localizacao, data_colheita, tipo_colheita
+        FROM producao_cana
+        WHERE data_colheita BETWEEN :inicio AND :fim
+          AND localizacao IN (SELECT column_value FROM TABLE(:localizacoes))
+        """
+        
+        linhas = [{**self._dados_producao(dados), 'registrado_em': _instante_local(dados.get('registrado_em'))}
+                  for dados in lista_producoes]
+        if not linhas:
+            return []
+        # Mesma chave repetida no lote: vale a última ocorrência
+        unicas = {_chave_producao(linha): linha for linha in linhas}
+        # Reenvio: não sobrescreve uma linha atualizada depois do registro
+        sql = sql.format(so_mais_recentes=(
+            "AND p.data_atualizacao <= d.registrado_em"
+            if any(linha['registrado_em'] is not None for linha in linhas) else ""
+        ))
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.setinputsizes(registrado_em=cx_Oracle.TIMESTAMP)
+                cursor.executemany(sql, list(unicas.values()))
+                gravadas = cursor.rowcount
+                
+                datas = [data_colheita for _, data_colheita, _ in unicas]
+                localizacoes = conn.gettype("SYS.ODCIVARCHAR2LIST").newobject()
+                localizacoes.extend(sorted({localizacao for localizacao, _, _ in unicas}))
+                cursor.execute(sql_ids, {
+                    'inicio': min(datas), 'fim': max(datas), 'localizacoes': localizacoes
+                })
+                ids = {}
+                for producao_id, localizacao, data_colheita, tipo_colheita in cursor:
+                    chave = _chave_producao({'localizacao': localizacao,
+                                             'data_colheita': data_colheita,
+                                             'tipo_colheita': tipo_colheita})
+                    if chave in unicas:
+                        ids[chave] = int(producao_id)
+                
+                conn.commit()
+                
+                self.logger.info(f"{gravadas} produções inseridas/atualizadas, "
+                                 f"{len(unicas) - gravadas} sem alteração")
+                return [ids[_chave_producao(linha)] for linha in linhas]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar produções em lote (upsert): {e}")
+            raise
+    
+    def upsert_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """
+        Insere o cálculo de perda ou atualiza o existente da mesma produção
+        e método de cálculo.
+        
+        Args:
+            dados_perda: Dicionário com dados da perda calculada
+            
+        Returns:
+            int: ID do registro de perda inserido ou atualizado
+        """
+        return self.upsert_perdas_em_lote([dados_perda])[0]
+    
+    def upsert_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere ou atualiza vários cálculos de perda em uma única transação,
+        pela chave (producao_id, metodo_calculo), com MERGE.
+        
+        Com 'registrado_em' nos dicionários (reenvio do spool), esse instante
+        é o gravado em calculado_em e o cálculo não é alterado se já foi
+        recalculado depois dele.
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+            
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        sql = """
+        MERGE INTO perdas_colheita p
+        USING (SELECT :producao_id AS producao_id,
+                      :perda_estimada_toneladas AS perda_estimada_toneladas,
+                      :percentual_perda AS percentual_perda,
+                      TO_CLOB(:fatores_perda) AS fatores_perda,
+                      :metodo_calculo AS metodo_calculo, :observacoes AS observacoes,
+                      COALESCE(CAST(:registrado_em AS TIMESTAMP), LOCALTIMESTAMP) AS registrado_em
+               FROM dual) d
+        ON (p.producao_id = d.producao_id AND p.metodo_calculo = d.metodo_calculo)
+        WHEN MATCHED THEN UPDATE SET
+            p.perda_estimada_toneladas = d.perda_estimada_toneladas,
+            p.percentual_perda = d.percentual_perda,
+            p.fatores_perda = d.fatores_perda,
+            p.observacoes = d.observacoes,
+            p.calculado_em = d.registrado_em
+            WHERE (DECODE(p.perda_estimada_toneladas, d.perda_estimada_toneladas, 0, 1)
+                + DECODE(p.percentual_perda, d.percentual_perda, 0, 1)
+                + DECODE(p.observacoes, d.observacoes, 0, 1)
+                + DECODE(DBMS_LOB.COMPARE(p.fatores_perda, d.fatores_perda), 0, 0, 1) > 0)
+            {so_mais_recentes}
+        WHEN NOT MATCHED THEN INSERT
+            (producao_id, perda_estimada_toneladas, percentual_perda,
+             fatores_perda, metodo_calculo, observacoes, calculado_em)
+        VALUES
+            (d.producao_id, d.perda_estimada_toneladas, d.percentual_perda,
+             d.fatores_perda, d.metodo_calculo, d.observacoes, d.registrado_em)
+        """
+        sql_ids = """
+        SELECT id, producao_id, metodo_calculo
+        FROM perdas_colheita
+        WHERE producao_id IN (SELECT column_value FROM TABLE(:producao_ids))
+        """
+        
+        linhas = [{**self._dados_perda(dados), 'registrado_em': _instante_local(dados.get('registrado_em'))}
+                  for dados in lista_perdas]
+        if not linhas:
+            return []
+        unicas = {_chave_perda(linha): linha for linha in linhas}
+        sql = sql.format(so_mais_recentes=(
+            "AND p.calculado_em <= d.registrado_em"
+            if any(linha['registrado_em'] is not None for linha in linhas) else ""
+        ))
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.setinputsizes(registrado_em=cx_Oracle.TIMESTAMP)
+                cursor.executemany(sql, list(unicas.values()))
+                gravadas = cursor.rowcount
+                
+                producao_ids = conn.gettype("SYS.ODCINUMBERLIST").newobject()
+                producao_ids.extend(sorted({producao_id for producao_id, _ in unicas}))
+                cursor.execute(sql_ids, {'producao_ids': producao_ids})
+                ids = {}
+                for perda_id, producao_id, metodo_calculo in cursor:
+                    chave = (int(producao_id), metodo_calculo)
+                    if chave in unicas:
+                        ids[chave] = int(perda_id)
+                
+                conn.commit()
+                
+                self.logger.info(f"{gravadas} perdas inseridas/atualizadas, "
+                                 f"{len(unicas) - gravadas} sem alteração")
+                return [ids[_chave_perda(linha)] for linha in linhas]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar perdas em lote (upsert): {e}")
+            raise
+    
     def buscar_producao_por_id(self, producao_id: int) -> Optional[Dict[str, Any]]:
         """
         Busca dados de produção por ID.
@@ -235,6 +614,52 @@ class OracleDatabase:
             self.logger.error(f"Erro ao buscar produção {producao_id}: {e}")
             raise
     
+    def buscar_producoes_por_ids(self, producao_ids: Iterable[int],
+                                 tamanho_lote: int = 10000) -> pd.DataFrame:
+        """
+        Busca várias produções pelos IDs, em poucas idas ao banco.
+        
+        Os IDs (sem repetição) são enviados em blocos de `tamanho_lote`,
+        cada bloco como um único parâmetro coleção (SYS.ODCINUMBERLIST); o resultado vem em
+        formato colunar, pronto para cálculo em lote.
+        
+        Args:
+            producao_ids: IDs das produções (até dezenas de milhares)
+            tamanho_lote: Quantidade de IDs por consulta
+            
+        Returns:
+            DataFrame com uma linha por produção encontrada (ordenado por
+            id) e as colunas de COLUNAS_PRODUCAO; IDs inexistentes são omitidos
+        """
+        sql = f"""
+        SELECT {self.COLUNAS_PRODUCAO}
+        FROM producao_cana 
+        WHERE id IN (SELECT column_value FROM TABLE(:ids))
+        """
+        
+        ids = sorted({int(producao_id) for producao_id in producao_ids})
+        colunas = [coluna.strip() for coluna in self.COLUNAS_PRODUCAO.split(',')]
+        blocos = []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.arraysize = min(max(len(ids), 1), tamanho_lote)
+                tipo_lista = conn.gettype("SYS.ODCINUMBERLIST")
+                
+                for inicio in range(0, len(ids), tamanho_lote):
+                    lista_ids = tipo_lista.newobject()
+                    lista_ids.extend(ids[inicio:inicio + tamanho_lote])
+                    cursor.execute(sql, {'ids': lista_ids})
+                    blocos.extend(cursor.fetchall())
+                
+            producoes = montar_dataframe(blocos, colunas, TIPOS_PRODUCAO)
+            return producoes.sort_values('id', ignore_index=True)
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar produções por IDs: {e}")
+            raise
+    
     def buscar_parametros_perdas(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
         """
         Busca parâmetros para cálculo de perdas por tipo de colheita.
@@ -267,12 +692,15 @@ class OracleDatabase:
             self.logger.error(f"Erro ao buscar parâmetros para {tipo_colheita}: {e}")
             raise
     
-    def listar_producoes(self, limite: int = 50) -> List[Dict[str, Any]]:
+    def listar_producoes(self, limite: int = 50,
+                         apos: Optional[Tuple[date, int]] = None) -> List[Dict[str, Any]]:
         """
-        Lista produções cadastradas.
+        Lista produções cadastradas usando paginação por chave (keyset).
         
         Args:
             limite: Número máximo de registros a retornar
+            apos: Cursor (data_colheita, id) do último registro da página
+                anterior; None para a primeira página
             
         Returns:
             Lista de dicionários com dados das produções
@@ -281,14 +709,24 @@ class OracleDatabase:
         SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
                tipo_colheita, data_colheita, produtividade_toneladas_ha
         FROM producao_cana 
-        ORDER BY data_colheita DESC
-        FETCH FIRST :limite ROWS ONLY
         """
         
+        params = {'limite': limite}
+        
+        if apos:
+            # Oracle não compara tuplas com "<", então a condição é expandida
+            sql += """
+        WHERE data_colheita < :apos_data
+           OR (data_colheita = :apos_data AND id < :apos_id)
+        """
+            params['apos_data'], params['apos_id'] = apos
+        
+        sql += " ORDER BY data_colheita DESC, id DESC FETCH FIRST :limite ROWS ONLY"
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, {'limite': limite})
+                cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
                 colunas = [desc[0].lower() for desc in cursor.description]
@@ -298,19 +736,87 @@ class OracleDatabase:
             self.logger.error(f"Erro ao listar produções: {e}")
             raise
     
-    def gerar_relatorio_perdas(self, data_inicio: date = None, data_fim: date = None) -> pd.DataFrame:
+    def iterar_producoes(self, 
+                         tamanho_lote: int = 1000,
+                         data_inicio: date = None,
+                         data_fim: date = None) -> Iterator[Dict[str, Any]]:
         """
-        Gera relatório consolidado de perdas.
+        Percorre toda a tabela de produções em lotes.
+        
+        O cursor é configurado com arraysize/prefetchrows iguais ao tamanho
+        do lote e lido com fetchmany, de modo que o uso de memória não
+        depende do tamanho da tabela.
         
         Args:
+            tamanho_lote: Quantidade de linhas trazidas por ida ao servidor
             data_inicio: Data inicial para filtro (opcional)
             data_fim: Data final para filtro (opcional)
             
-        Returns:
-            DataFrame do pandas com dados do relatório
+        Yields:
+            Dicionário com dados completos de cada produção
         """
         sql = """
-        SELECT * FROM vw_relatorio_perdas
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, variedade_cana, idade_cana_meses,
+               umidade_solo, temperatura_media, precipitacao_mm, produtividade_toneladas_ha,
+               data_criacao, data_atualizacao
+        FROM producao_cana 
+        WHERE 1=1
+        """
+        
+        params = {}
+        
+        if data_inicio:
+            sql += " AND data_colheita >= :data_inicio"
+            params['data_inicio'] = data_inicio
+            
+        if data_fim:
+            sql += " AND data_colheita <= :data_fim"
+            params['data_fim'] = data_fim
+            
+        sql += " ORDER BY data_colheita DESC, id DESC"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.arraysize = tamanho_lote
+                cursor.prefetchrows = tamanho_lote + 1
+                cursor.execute(sql, params)
+                
+                colunas = [desc[0].lower() for desc in cursor.description]
+                
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(zip(colunas, row))
+                        
+        except Exception as e:
+            self.logger.error(f"Erro ao percorrer produções: {e}")
+            raise
+    
+    def gerar_relatorio_perdas_em_lotes(self, 
+                                        data_inicio: date = None, 
+                                        data_fim: date = None,
+                                        tamanho_lote: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Gera o relatório consolidado de perdas em blocos de DataFrame.
+        
+        O cursor busca `tamanho_lote` linhas por ida ao servidor, portanto
+        apenas um bloco fica em memória de cada vez. Quando não há dados,
+        é produzido um único DataFrame vazio com as colunas do relatório.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            tamanho_lote: Número de linhas por DataFrame
+            
+        Yields:
+            DataFrame do pandas com até `tamanho_lote` linhas do relatório
+        """
+        sql = f"""
+        SELECT {self.COLUNAS_RELATORIO} FROM {self.visao_relatorio}
         WHERE 1=1
         """
         
@@ -328,12 +834,562 @@ class OracleDatabase:
         
         try:
             with self.get_connection() as conn:
-                return pd.read_sql(sql, conn, params=params)
+                cursor = conn.cursor()
+                cursor.arraysize = tamanho_lote
+                cursor.prefetchrows = tamanho_lote + 1
+                cursor.execute(sql, params)
+                
+                colunas = [desc[0].lower() for desc in cursor.description]
+                
+                algum_lote = False
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    algum_lote = True
+                    yield montar_dataframe(rows, colunas, TIPOS_RELATORIO)
+                
+                if not algum_lote:
+                    yield montar_dataframe([], colunas, TIPOS_RELATORIO)
                 
         except Exception as e:
             self.logger.error(f"Erro ao gerar relatório: {e}")
             raise
     
+    def resumir_perdas(self, data_inicio: date = None, data_fim: date = None) -> Dict[str, Any]:
+        """
+        Calcula os totais do relatório de perdas diretamente no banco.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Dict com total_registros, total_colhido, total_perdas e
+            perda_media (None quando não há cálculos de perda)
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT COUNT(*) AS total_registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0) AS total_colhido,
+               COALESCE(SUM(perda_estimada_toneladas), 0) AS total_perdas,
+               AVG(percentual_perda) AS perda_media
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+                
+                colunas = [desc[0].lower() for desc in cursor.description]
+                return dict(zip(colunas, row))
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao resumir perdas: {e}")
+            raise
+    
+    def resumir_perdas_por(self, 
+                           agrupamento: str,
+                           data_inicio: date = None, 
+                           data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega o relatório de perdas no banco por tipo, localização ou mês.
+        
+        Args:
+            agrupamento: 'tipo_colheita', 'localizacao' ou 'mes'
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Lista de dicionários (um por grupo) com registros,
+            qtd_colhida_toneladas, perda_estimada_toneladas e percentual_perda
+        """
+        if agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self.AGRUPAMENTOS_RELATORIO[agrupamento]
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT {expressao} AS {agrupamento},
+               COUNT(*) AS registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0) AS qtd_colhida_toneladas,
+               COALESCE(SUM(perda_estimada_toneladas), 0) AS perda_estimada_toneladas,
+               ROUND(AVG(percentual_perda), 2) AS percentual_perda
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        GROUP BY {expressao}
+        ORDER BY {expressao}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                
+                colunas = [desc[0].lower() for desc in cursor.description]
+                return [dict(zip(colunas, row)) for row in rows]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao agrupar perdas por {agrupamento}: {e}")
+            raise
+    
+    def buscar_perdas_por_fator(self, fator: str, minimo: float = None, maximo: float = None,
+                                limite: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Busca as perdas que aplicaram um fator, opcionalmente numa faixa de valores.
+        
+        O filtro roda no banco com JSON_VALUE (índices de função), sem
+        trazer o CLOB fatores_perda para o Python.
+        
+        Args:
+            fator: Um de FATORES_PERDA (ex.: 'fator_umidade')
+            minimo: Valor mínimo do fator, inclusive (opcional)
+            maximo: Valor máximo do fator, inclusive (opcional)
+            limite: Número máximo de perdas retornadas
+            
+        Returns:
+            Lista de dicionários com id, producao_id, valor_fator,
+            perda_estimada_toneladas, percentual_perda, metodo_calculo e
+            calculado_em, do maior valor do fator para o menor
+        """
+        expressao = self._expressao_fator(fator)
+        
+        sql = f"""
+        SELECT id, producao_id, {expressao} AS valor_fator,
+               perda_estimada_toneladas, percentual_perda,
+               metodo_calculo, calculado_em
+        FROM perdas_colheita
+        WHERE {expressao} IS NOT NULL
+        """
+        
+        params = {'limite': limite}
+        
+        if minimo is not None:
+            sql += f" AND {expressao} >= :minimo"
+            params['minimo'] = minimo
+            
+        if maximo is not None:
+            sql += f" AND {expressao} <= :maximo"
+            params['maximo'] = maximo
+        
+        sql += f" ORDER BY {expressao} DESC, id FETCH FIRST :limite ROWS ONLY"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                
+                colunas = [desc[0].lower() for desc in cursor.description]
+                return [dict(zip(colunas, row)) for row in rows]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar perdas por {fator}: {e}")
+            raise
+    
+    def agregar_fator(self, fator: str, agrupamento: Optional[str] = None,
+                      data_inicio: date = None, data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega um fator no banco, no total ou por tipo, localização ou mês.
+        
+        Args:
+            fator: Um de FATORES_PERDA (ex.: 'fator_umidade')
+            agrupamento: 'tipo_colheita', 'localizacao', 'mes' ou None (total)
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Lista de dicionários (um por grupo) com registros, minimo, media
+            e maximo do fator e percentual_perda médio
+        """
+        if agrupamento is not None and agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self._expressao_fator(fator)
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        grupo = self.AGRUPAMENTOS_RELATORIO.get(agrupamento)
+        
+        sql = f"""
+        SELECT {f'{grupo} AS {agrupamento},' if grupo else ''}
+               COUNT(*) AS registros,
+               MIN(valor_fator) AS minimo,
+               AVG(valor_fator) AS media,
+               MAX(valor_fator) AS maximo,
+               ROUND(AVG(percentual_perda), 2) AS percentual_perda
+        FROM (
+            SELECT p.tipo_colheita, p.localizacao, p.data_colheita,
+                   l.percentual_perda, {expressao} AS valor_fator
+            FROM perdas_colheita l
+            JOIN producao_cana p ON p.id = l.producao_id
+            WHERE {expressao} IS NOT NULL
+        ) f
+        WHERE 1=1 {filtro}
+        {f'GROUP BY {grupo} ORDER BY {grupo}' if grupo else ''}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                
+                colunas = [desc[0].lower() for desc in cursor.description]
+                return [dict(zip(colunas, row)) for row in rows]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao agregar {fator}: {e}")
+            raise
+    
+    def recalcular_perdas_no_banco(self, data_inicio: date = None, data_fim: date = None) -> int:
+        """
+        Recalcula as perdas 'avancado' das produções do período dentro do banco.
+        
+        Chama a função PL/SQL recalcular_perdas (docker/init-db.sql), que
+        aplica a fórmula de CalculadoraPerdas.calcular_perda_avancada com os
+        parâmetros ativos em um único MERGE, sem trazer as produções para
+        o Python.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Quantidade de perdas inseridas ou alteradas
+        """
+        sql = "BEGIN :linhas := recalcular_perdas(:data_inicio, :data_fim); END;"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                linhas = cursor.var(cx_Oracle.NUMBER)
+                cursor.execute(sql, {'linhas': linhas, 'data_inicio': data_inicio, 'data_fim': data_fim})
+                conn.commit()
+                
+                total = int(linhas.getvalue())
+                self.logger.info(f"{total} perdas recalculadas no banco")
+                return total
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao recalcular perdas no banco: {e}")
+            raise
+    
+    def garantir_indices(self) -> List[str]:
+        """
+        Cria os índices de INDICES_COBERTURA e INDICES_FATORES que faltam e
+        remove os substituídos.
+        
+        Bancos criados por docker/init-db.sql já os têm; aqui eles são
+        levados a bancos existentes.
+        
+        Returns:
+            Lista com os nomes dos índices criados
+        """
+        sql_existentes = """
+        SELECT index_name FROM user_indexes
+        WHERE table_name IN ('PRODUCAO_CANA', 'PERDAS_COLHEITA')
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql_existentes)
+                existentes = {row[0] for row in cursor.fetchall()}
+                
+                indices = {**self.INDICES_COBERTURA, **self.INDICES_FATORES}
+                criados = [nome for nome in indices if nome not in existentes]
+                for nome in criados:
+                    cursor.execute(indices[nome])
+                
+                for nome in self.INDICES_SUBSTITUIDOS:
+                    if nome in existentes:
+                        cursor.execute(f"DROP INDEX {nome}")
+                
+            if criados:
+                self.logger.info(f"Índices criados: {', '.join(criados)}")
+            return criados
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao garantir índices: {e}")
+            raise
+    
+    def atualizar_relatorio_materializado(self, atomico: bool = True) -> None:
+        """
+        Atualiza mv_relatorio_perdas via DBMS_MVIEW.REFRESH (sempre completo).
+        
+        A junção externa com perdas_colheita não admite fast refresh (ver
+        docker/init-db.sql), então o refresh é pedido direto como completo.
+        
+        Args:
+            atomico: Se True, DELETE + INSERT numa transação (leitores veem os
+                dados antigos até o fim); se False, TRUNCATE + INSERT direto,
+                mais rápido, mas a view fica vazia durante o refresh
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.callproc('DBMS_MVIEW.REFRESH', ['MV_RELATORIO_PERDAS'],
+                                {'method': 'C', 'atomic_refresh': atomico})
+                
+                self.logger.info("Relatório materializado atualizado")
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao atualizar relatório materializado: {e}")
+            raise
+    
+    def status_relatorio_materializado(self) -> Dict[str, Any]:
+        """
+        Informa se mv_relatorio_perdas está desatualizada.
+        
+        Returns:
+            Dict com desatualizado (bool), atualizado_em (último refresh)
+            e situacao (coluna STALENESS de USER_MVIEWS)
+        """
+        sql = """
+        SELECT staleness, last_refresh_date
+        FROM user_mviews
+        WHERE mview_name = 'MV_RELATORIO_PERDAS'
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                situacao, atualizado_em = cursor.fetchone()
+                
+                return {
+                    'desatualizado': situacao != 'FRESH',
+                    'atualizado_em': atualizado_em,
+                    'situacao': situacao
+                }
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao consultar status do relatório materializado: {e}")
+            raise
+    
+    def criar_particoes_futuras(self, meses_a_frente: int = 3) -> List[str]:
+        """
+        Garante as partições mensais de producao_cana até meses adiante.
+        
+        O particionamento por intervalo cria partições no primeiro INSERT
+        do mês; aqui elas são criadas antecipadamente (LOCK TABLE ...
+        PARTITION FOR), evitando esse custo na carga.
+        
+        Args:
+            meses_a_frente: Quantidade de meses futuros a garantir
+            
+        Returns:
+            Lista com os nomes das partições criadas
+        """
+        sql_particoes = "SELECT partition_name FROM user_tab_partitions WHERE table_name = 'PRODUCAO_CANA'"
+        mes_atual = date.today().replace(day=1)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql_particoes)
+                existentes = {row[0] for row in cursor.fetchall()}
+                
+                for deslocamento in range(meses_a_frente + 1):
+                    inicio = _somar_meses(mes_atual, deslocamento)
+                    # Literal gerado a partir de date: a cláusula não aceita bind
+                    cursor.execute(
+                        f"LOCK TABLE producao_cana PARTITION FOR (DATE '{inicio.isoformat()}') IN SHARE MODE"
+                    )
+                conn.commit()
+                
+                cursor.execute(sql_particoes)
+                criadas = sorted({row[0] for row in cursor.fetchall()} - existentes)
+                
+            if criadas:
+                self.logger.info(f"Partições criadas: {', '.join(criadas)}")
+            return criadas
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao criar partições: {e}")
+            raise
+    
+    def arquivar_particoes(self, anteriores_a: date) -> List[str]:
+        """
+        Arquiva os dados de meses anteriores ao mês de `anteriores_a`.
+        
+        Produções e perdas do período são copiadas para producao_cana_arquivo
+        e perdas_colheita_arquivo e removidas das tabelas principais; as
+        partições de intervalo esvaziadas são então descartadas.
+        
+        Args:
+            anteriores_a: Data de corte (meses anteriores ao dela são arquivados)
+            
+        Returns:
+            Lista com os nomes das partições descartadas
+        """
+        limite = anteriores_a.replace(day=1)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                INSERT INTO perdas_colheita_arquivo
+                SELECT l.* FROM perdas_colheita l
+                JOIN producao_cana p ON p.id = l.producao_id
+                WHERE p.data_colheita < :limite
+                """, {'limite': limite})
+                cursor.execute("""
+                INSERT INTO producao_cana_arquivo
+                SELECT * FROM producao_cana WHERE data_colheita < :limite
+                """, {'limite': limite})
+                # ON DELETE CASCADE remove as perdas correspondentes
+                cursor.execute("DELETE FROM producao_cana WHERE data_colheita < :limite", {'limite': limite})
+                conn.commit()
+                
+                cursor.execute("""
+                SELECT partition_name, high_value
+                FROM user_tab_partitions
+                WHERE table_name = 'PRODUCAO_CANA' AND interval = 'YES'
+                """)
+                
+                descartadas = []
+                for nome, limite_superior in cursor.fetchall():
+                    # high_value é o texto TO_DATE(' AAAA-MM-DD 00:00:00', ...)
+                    encontrado = re.search(r"(\d{4})-(\d{2})-(\d{2})", limite_superior)
+                    if encontrado and date(*map(int, encontrado.groups())) <= limite:
+                        descartadas.append(nome)
+                
+                for nome in descartadas:
+                    cursor.execute(f'ALTER TABLE producao_cana DROP PARTITION "{nome}" UPDATE GLOBAL INDEXES')
+                
+            if descartadas:
+                self.logger.info(f"Partições arquivadas: {', '.join(descartadas)}")
+            return descartadas
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao arquivar partições: {e}")
+            raise
+    
+    def assinar_alteracoes_parametros(self, callback: Callable[[Optional[str]], None]) -> None:
+        """
+        Chama `callback(tipo_colheita)` a cada alteração em parametros_perdas.
+        
+        O Oracle não tem LISTEN/NOTIFY: uma thread em segundo plano consulta a
+        cada INTERVALO_VERSOES segundos a assinatura (quantidade, soma de
+        versao, maior id) de cada tipo de colheita; a coluna versao é
+        incrementada pelo gatilho trg_parametros_versao
+        (docker/init-db.sql). `callback(None)` significa "recarregue todos":
+        é chamado ao começar e a cada queda ou reconexão.
+        
+        Args:
+            callback: Função chamada na thread de verificação com o tipo de
+                colheita alterado (ou None)
+        """
+        self._assinantes_parametros.append(callback)
+        
+        if self._escuta_parametros is None or not self._escuta_parametros.is_alive():
+            self._parar_escuta.clear()
+            self._escuta_parametros = threading.Thread(
+                target=self._acompanhar_versoes_parametros, name="versoes-parametros", daemon=True
+            )
+            self._escuta_parametros.start()
+    
+    def cancelar_assinaturas_parametros(self) -> None:
+        """Encerra a verificação de alterações de parâmetros e remove os callbacks."""
+        self._parar_escuta.set()
+        if self._escuta_parametros is not None:
+            self._escuta_parametros.join(timeout=self.INTERVALO_VERSOES + 1)
+            self._escuta_parametros = None
+        self._assinantes_parametros.clear()
+    
+    def _acompanhar_versoes_parametros(self) -> None:
+        """Laço da thread de verificação: compara as assinaturas e reconecta com backoff."""
+        sql = """
+        SELECT tipo_colheita, COUNT(*), SUM(versao), MAX(id)
+        FROM parametros_perdas
+        GROUP BY tipo_colheita
+        """
+        
+        espera = 1.0
+        while not self._parar_escuta.is_set():
+            try:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(sql)
+                    versoes = {linha[0]: tuple(linha[1:]) for linha in cursor.fetchall()}
+                    espera = 1.0
+                    self._avisar_assinantes(None)
+                    
+                    while not self._parar_escuta.wait(self.INTERVALO_VERSOES):
+                        cursor.execute(sql)
+                        atuais = {linha[0]: tuple(linha[1:]) for linha in cursor.fetchall()}
+                        for tipo_colheita in sorted(set(versoes) | set(atuais)):
+                            if versoes.get(tipo_colheita) != atuais.get(tipo_colheita):
+                                self._avisar_assinantes(tipo_colheita)
+                        versoes = atuais
+                
+            except Exception as e:
+                # Avisa só a primeira falha de uma sequência; as demais vão para debug
+                registrar = self.logger.warning if espera == 1.0 else self.logger.debug
+                registrar(f"Verificação de parâmetros interrompida, nova tentativa em {espera:.0f}s: {e}")
+                self._avisar_assinantes(None)
+                self._parar_escuta.wait(espera)
+                espera = min(espera * 2, 60.0)
+    
+    def _avisar_assinantes(self, tipo_colheita: Optional[str]) -> None:
+        """Repassa o aviso aos callbacks; erro em um deles não derruba a verificação."""
+        for callback in list(self._assinantes_parametros):
+            try:
+                callback(tipo_colheita)
+            except Exception as e:
+                self.logger.error(f"Erro no callback de alteração de parâmetros: {e}")
+    
+    def _dados_producao(self, dados_producao: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de produção."""
+        return {
+            'localizacao': dados_producao['localizacao'],
+            'area_plantada_ha': dados_producao['area_plantada_ha'],
+            'qtd_colhida_toneladas': dados_producao['qtd_colhida_toneladas'],
+            'tipo_colheita': dados_producao['tipo_colheita'],
+            'data_colheita': dados_producao.get('data_colheita', datetime.now().date()),
+            'variedade_cana': dados_producao.get('variedade_cana'),
+            'idade_cana_meses': dados_producao.get('idade_cana_meses'),
+            'umidade_solo': dados_producao.get('umidade_solo'),
+            'temperatura_media': dados_producao.get('temperatura_media'),
+            'precipitacao_mm': dados_producao.get('precipitacao_mm')
+        }
+    
+    def _dados_perda(self, dados_perda: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de perda (fatores_perda em JSON)."""
+        # Converter fatores_perda para JSON se for dict
+        fatores_json = json.dumps(dados_perda.get('fatores_perda', {})) if isinstance(dados_perda.get('fatores_perda'), dict) else dados_perda.get('fatores_perda')
+        
+        return {
+            'producao_id': dados_perda['producao_id'],
+            'perda_estimada_toneladas': dados_perda['perda_estimada_toneladas'],
+            'percentual_perda': dados_perda['percentual_perda'],
+            'fatores_perda': fatores_json,
+            'metodo_calculo': dados_perda.get('metodo_calculo', 'sistema_automatico'),
+            'observacoes': dados_perda.get('observacoes')
+        }
+    
+    def _filtro_data_colheita(self, data_inicio: date = None, data_fim: date = None) -> Tuple[str, Dict[str, Any]]:
+        """Monta o trecho WHERE e os parâmetros do filtro por período."""
+        filtro = ""
+        params = {}
+        
+        if data_inicio:
+            filtro += " AND data_colheita >= :data_inicio"
+            params['data_inicio'] = data_inicio
+            
+        if data_fim:
+            filtro += " AND data_colheita <= :data_fim"
+            params['data_fim'] = data_fim
+        
+        return filtro, params
+    
     def executar_sql_customizado(self, sql: str, params: Dict = None) -> List[Tuple]:
         """
         Executa SQL customizado (apenas SELECT).
@@ -356,4 +1412,32 @@ class OracleDatabase:
                 
         except Exception as e:
             self.logger.error(f"Erro ao executar SQL customizado: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+def _somar_meses(data: date, meses: int) -> date:
+    """Retorna o primeiro dia do mês `meses` meses após o de `data`."""
+    total = data.year * 12 + data.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _chave_producao(linha: Dict[str, Any]) -> Tuple[str, date, str]:
+    """Chave natural (localizacao, data_colheita, tipo_colheita) de uma produção."""
+    data_colheita = linha['data_colheita']
+    if isinstance(data_colheita, datetime):
+        data_colheita = data_colheita.date()
+    elif isinstance(data_colheita, str):
+        data_colheita = date.fromisoformat(data_colheita)
+    return linha['localizacao'], data_colheita, linha['tipo_colheita']
+
+
+def _chave_perda(linha: Dict[str, Any]) -> Tuple[int, str]:
+    """Chave natural (producao_id, metodo_calculo) de um cálculo de perda."""
+    return int(linha['producao_id']), linha['metodo_calculo']
+
+
+def _instante_local(instante: Optional[datetime]) -> Optional[datetime]:
+    """Instante no fuso local, sem tzinfo (como LOCALTIMESTAMP na sessão)."""
+    if instante is None or instante.tzinfo is None:
+        return instante
+    return instante.astimezone().replace(tzinfo=None)
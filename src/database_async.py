@@ -0,0 +1,860 @@
+"""
+Módulo assíncrono para conexão com PostgreSQL (asyncio).
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Contraparte de PostgreSQLDatabase com a mesma interface de métodos, porém
+em corrotinas: um único event loop mantém muitas consultas em andamento,
+limitadas pelo pool de conexões e por um semáforo de concorrência.
+"""
+
+import asyncio
+import logging
+import json
+from datetime import datetime, date
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Any
+from contextlib import asynccontextmanager
+import pandas as pd
+from psycopg.rows import dict_row, tuple_row
+from psycopg.types.numeric import FloatLoader
+from psycopg_pool import AsyncConnectionPool
+
+from src.colunar import TIPOS_RELATORIO, montar_dataframe
+
+
+async def _configurar_conexao(conn) -> None:
+    """NUMERIC lido como float em cada conexão nova do pool (em vez de Decimal)."""
+    conn.adapters.register_loader("numeric", FloatLoader)
+
+
+class PostgreSQLDatabaseAsync:
+    """Classe para operações assíncronas com banco PostgreSQL."""
+    
+    # Colunas do relatório de perdas (iguais na view comum e na materializada)
+    COLUNAS_RELATORIO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, produtividade_toneladas_ha, perda_estimada_toneladas, "
+        "percentual_perda, metodo_calculo, calculado_em, producao_potencial_toneladas"
+    )
+    
+    # Expressões SQL aceitas em resumir_perdas_por (lista fechada contra injeção)
+    AGRUPAMENTOS_RELATORIO = {
+        'tipo_colheita': "tipo_colheita",
+        'localizacao': "localizacao",
+        'mes': "CAST(date_trunc('month', data_colheita) AS DATE)"
+    }
+    
+    # Comandos reaproveitados pelas versões unitária e em pipeline
+    SQL_INSERIR_PRODUCAO = """
+    INSERT INTO producao_cana
+    (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita,
+     data_colheita, variedade_cana, idade_cana_meses, umidade_solo,
+     temperatura_media, precipitacao_mm)
+    VALUES
+    (%(localizacao)s, %(area_plantada_ha)s, %(qtd_colhida_toneladas)s, %(tipo_colheita)s,
+     %(data_colheita)s, %(variedade_cana)s, %(idade_cana_meses)s, %(umidade_solo)s,
+     %(temperatura_media)s, %(precipitacao_mm)s)
+    RETURNING id
+    """
+    
+    # Upserts pela chave natural; linhas sem alteração não são regravadas
+    # nem voltam no RETURNING (seus IDs são lidos por SQL_IDS_*)
+    SQL_UPSERT_PRODUCAO = """
+    INSERT INTO producao_cana
+    (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita,
+     data_colheita, variedade_cana, idade_cana_meses, umidade_solo,
+     temperatura_media, precipitacao_mm)
+    VALUES
+    (%(localizacao)s, %(area_plantada_ha)s, %(qtd_colhida_toneladas)s, %(tipo_colheita)s,
+     %(data_colheita)s, %(variedade_cana)s, %(idade_cana_meses)s, %(umidade_solo)s,
+     %(temperatura_media)s, %(precipitacao_mm)s)
+    ON CONFLICT (localizacao, data_colheita, tipo_colheita) DO UPDATE SET
+        area_plantada_ha = EXCLUDED.area_plantada_ha,
+        qtd_colhida_toneladas = EXCLUDED.qtd_colhida_toneladas,
+        variedade_cana = EXCLUDED.variedade_cana,
+        idade_cana_meses = EXCLUDED.idade_cana_meses,
+        umidade_solo = EXCLUDED.umidade_solo,
+        temperatura_media = EXCLUDED.temperatura_media,
+        precipitacao_mm = EXCLUDED.precipitacao_mm,
+        data_atualizacao = CURRENT_TIMESTAMP
+    WHERE (producao_cana.area_plantada_ha, producao_cana.qtd_colhida_toneladas,
+           producao_cana.variedade_cana, producao_cana.idade_cana_meses,
+           producao_cana.umidade_solo, producao_cana.temperatura_media,
+           producao_cana.precipitacao_mm)
+          IS DISTINCT FROM
+          (EXCLUDED.area_plantada_ha, EXCLUDED.qtd_colhida_toneladas,
+           EXCLUDED.variedade_cana, EXCLUDED.idade_cana_meses,
+           EXCLUDED.umidade_solo, EXCLUDED.temperatura_media,
+           EXCLUDED.precipitacao_mm)
+    RETURNING id
+    """
+    
+    SQL_IDS_PRODUCOES = """
+    SELECT p.id, p.localizacao, p.data_colheita, p.tipo_colheita
+    FROM producao_cana p
+    JOIN unnest(%(localizacoes)s::varchar[], %(datas)s::date[], %(tipos)s::varchar[])
+         AS c (localizacao, data_colheita, tipo_colheita)
+      ON p.localizacao = c.localizacao
+     AND p.data_colheita = c.data_colheita
+     AND p.tipo_colheita = c.tipo_colheita
+    """
+    
+    SQL_UPSERT_PERDA = """
+    INSERT INTO perdas_colheita
+    (producao_id, perda_estimada_toneladas, percentual_perda,
+     fatores_perda, metodo_calculo, observacoes)
+    VALUES
+    (%(producao_id)s, %(perda_estimada_toneladas)s, %(percentual_perda)s,
+     %(fatores_perda)s, %(metodo_calculo)s, %(observacoes)s)
+    ON CONFLICT (producao_id, metodo_calculo) DO UPDATE SET
+        perda_estimada_toneladas = EXCLUDED.perda_estimada_toneladas,
+        percentual_perda = EXCLUDED.percentual_perda,
+        fatores_perda = EXCLUDED.fatores_perda,
+        observacoes = EXCLUDED.observacoes,
+        calculado_em = CURRENT_TIMESTAMP
+    WHERE (perdas_colheita.perda_estimada_toneladas, perdas_colheita.percentual_perda,
+           perdas_colheita.fatores_perda, perdas_colheita.observacoes)
+          IS DISTINCT FROM
+          (EXCLUDED.perda_estimada_toneladas, EXCLUDED.percentual_perda,
+           EXCLUDED.fatores_perda, EXCLUDED.observacoes)
+    RETURNING id
+    """
+    
+    SQL_IDS_PERDAS = """
+    SELECT id, producao_id, metodo_calculo
+    FROM perdas_colheita
+    WHERE producao_id = ANY(%(producao_ids)s)
+    """
+    
+    SQL_BUSCAR_PRODUCAO = """
+    SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+           tipo_colheita, data_colheita, variedade_cana, idade_cana_meses,
+           umidade_solo, temperatura_media, precipitacao_mm, produtividade_toneladas_ha,
+           data_criacao, data_atualizacao
+    FROM producao_cana
+    WHERE id = %(producao_id)s
+    """
+    
+    def __init__(self,
+                 host: str = "localhost",
+                 port: int = 5432,
+                 database: str = "cana_db",
+                 username: str = "cana_user",
+                 password: str = "CanaPassword123",
+                 usar_relatorio_materializado: bool = False,
+                 tamanho_pool: int = 10,
+                 max_concorrencia: int = 200,
+                 pool: Any = None):
+        """
+        Prepara o pool assíncrono de conexões (aberto em abrir()).
+        
+        Args:
+            host: Endereço do servidor PostgreSQL
+            port: Porta de conexão
+            database: Nome do banco de dados
+            username: Nome do usuário
+            password: Senha do usuário
+            usar_relatorio_materializado: Se True, relatórios e agregações
+                leem mv_relatorio_perdas em vez de vw_relatorio_perdas
+            tamanho_pool: Número máximo de conexões abertas
+            max_concorrencia: Número máximo de operações em andamento;
+                as demais aguardam no semáforo
+            pool: Pool já construído (ex.: substituto em memória para
+                testes); deve oferecer open(), close() e connection()
+        """
+        self.host = host
+        self.port = port
+        self.database = database
+        self.username = username
+        self.password = password
+        
+        # Fonte dos relatórios: view comum ou materializada
+        self.visao_relatorio = "mv_relatorio_perdas" if usar_relatorio_materializado else "vw_relatorio_perdas"
+        
+        if pool is None:
+            pool = AsyncConnectionPool(
+                conninfo=(
+                    f"host={host} port={port} dbname={database} "
+                    f"user={username} password={password}"
+                ),
+                min_size=1,
+                max_size=tamanho_pool,
+                kwargs={'autocommit': True, 'row_factory': dict_row},
+                configure=_configurar_conexao,
+                open=False
+            )
+        self.pool = pool
+        self._semaforo = asyncio.Semaphore(max_concorrencia)
+        
+        # Configurar logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    async def abrir(self) -> None:
+        """Abre o pool de conexões."""
+        await self.pool.open()
+        self.logger.info("Pool PostgreSQL assíncrono aberto")
+    
+    async def fechar(self) -> None:
+        """Fecha o pool de conexões."""
+        await self.pool.close()
+        self.logger.info("Pool PostgreSQL assíncrono fechado")
+    
+    async def __aenter__(self) -> "PostgreSQLDatabaseAsync":
+        await self.abrir()
+        return self
+    
+    async def __aexit__(self, *exc) -> None:
+        await self.fechar()
+    
+    @asynccontextmanager
+    async def get_connection(self):
+        """
+        Context manager assíncrono que empresta uma conexão do pool.
+        
+        Yields:
+            psycopg.AsyncConnection: Conexão ativa com o banco
+        """
+        async with self._semaforo:
+            async with self.pool.connection() as connection:
+                yield connection
+    
+    async def test_connection(self) -> bool:
+        """
+        Testa a conexão com o banco.
+        
+        Returns:
+            bool: True se conexão for bem-sucedida
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("SELECT 1 as test")
+                result = await cursor.fetchone()
+                return result['test'] == 1
+        except Exception as e:
+            self.logger.error(f"Falha no teste de conexão: {e}")
+            return False
+    
+    async def inserir_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """
+        Insere dados de produção de cana no banco.
+        
+        Args:
+            dados_producao: Dicionário com dados da produção
+        
+        Returns:
+            int: ID do registro inserido
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(self.SQL_INSERIR_PRODUCAO, self._dados_producao(dados_producao))
+                registro_id = (await cursor.fetchone())['id']
+                
+                self.logger.debug(f"Produção inserida com ID: {registro_id}")
+                return registro_id
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir produção: {e}")
+            raise
+    
+    async def inserir_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere várias produções em uma única transação, em pipeline.
+        
+        Os INSERTs são enviados sem esperar cada resposta, o que elimina
+        uma ida e volta ao servidor por registro.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+        
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    async with conn.pipeline():
+                        cursores = [
+                            await conn.execute(self.SQL_INSERIR_PRODUCAO, self._dados_producao(dados))
+                            for dados in lista_producoes
+                        ]
+                    ids = [(await cursor.fetchone())['id'] for cursor in cursores]
+                
+                self.logger.info(f"{len(ids)} produções inseridas em lote")
+                return ids
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir produções em lote: {e}")
+            raise
+    
+    async def inserir_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """
+        Insere cálculo de perda no banco.
+        
+        Args:
+            dados_perda: Dicionário com dados da perda calculada
+        
+        Returns:
+            int: ID do registro de perda inserido
+        """
+        sql = """
+        INSERT INTO perdas_colheita
+        (producao_id, perda_estimada_toneladas, percentual_perda,
+         fatores_perda, metodo_calculo, observacoes)
+        VALUES
+        (%(producao_id)s, %(perda_estimada_toneladas)s, %(percentual_perda)s,
+         %(fatores_perda)s, %(metodo_calculo)s, %(observacoes)s)
+        RETURNING id
+        """
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql, self._dados_perda(dados_perda))
+                registro_id = (await cursor.fetchone())['id']
+                
+                self.logger.debug(f"Perda inserida com ID: {registro_id}")
+                return registro_id
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir perda: {e}")
+            raise
+    
+    async def upsert_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """
+        Insere a produção ou atualiza a existente com a mesma chave natural
+        (localizacao, data_colheita, tipo_colheita).
+        
+        Args:
+            dados_producao: Dicionário com dados da produção
+        
+        Returns:
+            int: ID da produção inserida ou atualizada
+        """
+        return (await self.upsert_producoes_em_lote([dados_producao]))[0]
+    
+    async def upsert_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere ou atualiza várias produções em uma única transação, em pipeline.
+        
+        Usa INSERT ... ON CONFLICT sobre a chave natural; linhas que já
+        existem com os mesmos valores não são regravadas, de modo que
+        reprocessar um lote não cresce a tabela nem gera escrita.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+        
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        linhas = [self._dados_producao(dados) for dados in lista_producoes]
+        # ON CONFLICT não atualiza a mesma linha duas vezes: vale a última ocorrência
+        unicas = {_chave_producao(linha): linha for linha in linhas}
+        
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    async with conn.pipeline():
+                        cursores = [
+                            (chave, await conn.execute(self.SQL_UPSERT_PRODUCAO, linha))
+                            for chave, linha in unicas.items()
+                        ]
+                    ids = {}
+                    for chave, cursor in cursores:
+                        gravada = await cursor.fetchone()
+                        if gravada is not None:
+                            ids[chave] = gravada['id']
+                    
+                    faltantes = [chave for chave in unicas if chave not in ids]
+                    if faltantes:
+                        localizacoes, datas, tipos = (list(coluna) for coluna in zip(*faltantes))
+                        cursor = await conn.execute(self.SQL_IDS_PRODUCOES, {
+                            'localizacoes': localizacoes, 'datas': datas, 'tipos': tipos
+                        })
+                        ids.update((_chave_producao(linha), linha['id']) for linha in await cursor.fetchall())
+                
+                self.logger.info(f"{len(unicas) - len(faltantes)} produções inseridas/atualizadas, "
+                                 f"{len(faltantes)} sem alteração")
+                return [ids[_chave_producao(linha)] for linha in linhas]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar produções em lote (upsert): {e}")
+            raise
+    
+    async def upsert_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """
+        Insere o cálculo de perda ou atualiza o existente da mesma produção
+        e método de cálculo.
+        
+        Args:
+            dados_perda: Dicionário com dados da perda calculada
+        
+        Returns:
+            int: ID do registro de perda inserido ou atualizado
+        """
+        return (await self.upsert_perdas_em_lote([dados_perda]))[0]
+    
+    async def upsert_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere ou atualiza vários cálculos de perda em uma única transação,
+        em pipeline, pela chave (producao_id, metodo_calculo).
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+        
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        linhas = [self._dados_perda(dados) for dados in lista_perdas]
+        unicas = {_chave_perda(linha): linha for linha in linhas}
+        
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    async with conn.pipeline():
+                        cursores = [
+                            (chave, await conn.execute(self.SQL_UPSERT_PERDA, linha))
+                            for chave, linha in unicas.items()
+                        ]
+                    ids = {}
+                    for chave, cursor in cursores:
+                        gravada = await cursor.fetchone()
+                        if gravada is not None:
+                            ids[chave] = gravada['id']
+                    
+                    faltantes = [chave for chave in unicas if chave not in ids]
+                    if faltantes:
+                        cursor = await conn.execute(self.SQL_IDS_PERDAS, {
+                            'producao_ids': sorted({producao_id for producao_id, _ in faltantes})
+                        })
+                        ids.update((_chave_perda(linha), linha['id']) for linha in await cursor.fetchall()
+                                   if _chave_perda(linha) not in ids)
+                
+                self.logger.info(f"{len(unicas) - len(faltantes)} perdas inseridas/atualizadas, "
+                                 f"{len(faltantes)} sem alteração")
+                return [ids[_chave_perda(linha)] for linha in linhas]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar perdas em lote (upsert): {e}")
+            raise
+    
+    async def buscar_producao_por_id(self, producao_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Busca dados de produção por ID.
+        
+        Args:
+            producao_id: ID da produção
+        
+        Returns:
+            Dict com dados da produção ou None se não encontrada
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(self.SQL_BUSCAR_PRODUCAO, {'producao_id': producao_id})
+                return await cursor.fetchone()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar produção {producao_id}: {e}")
+            raise
+    
+    async def buscar_producoes_por_id(self, producao_ids: Iterable[int]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Busca várias produções por ID em pipeline, usando uma só conexão.
+        
+        Args:
+            producao_ids: IDs das produções
+        
+        Returns:
+            Lista com o dicionário de cada produção (None se não
+            encontrada), na ordem dos IDs informados
+        """
+        try:
+            async with self.get_connection() as conn:
+                async with conn.pipeline():
+                    cursores = [
+                        await conn.execute(self.SQL_BUSCAR_PRODUCAO, {'producao_id': producao_id})
+                        for producao_id in producao_ids
+                    ]
+                return [await cursor.fetchone() for cursor in cursores]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar produções: {e}")
+            raise
+    
+    async def buscar_parametros_perdas(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca parâmetros para cálculo de perdas por tipo de colheita.
+        
+        Args:
+            tipo_colheita: 'manual' ou 'mecanizada'
+        
+        Returns:
+            Dict com parâmetros ou None se não encontrados
+        """
+        sql = """
+        SELECT tipo_colheita, fator_base_perda, fator_umidade,
+               fator_idade, fator_clima, descricao
+        FROM parametros_perdas
+        WHERE tipo_colheita = %(tipo_colheita)s AND ativo = true
+        """
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql, {'tipo_colheita': tipo_colheita})
+                return await cursor.fetchone()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar parâmetros para {tipo_colheita}: {e}")
+            raise
+    
+    async def listar_producoes(self, limite: int = 50,
+                               apos: Optional[Tuple[date, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Lista produções cadastradas usando paginação por chave (keyset).
+        
+        Args:
+            limite: Número máximo de registros a retornar
+            apos: Cursor (data_colheita, id) do último registro da página
+                anterior; None para a primeira página
+        
+        Returns:
+            Lista de dicionários com dados das produções
+        """
+        sql = """
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, produtividade_toneladas_ha
+        FROM producao_cana
+        """
+        
+        params = {'limite': limite}
+        
+        if apos:
+            sql += " WHERE (data_colheita, id) < (%(apos_data)s, %(apos_id)s)"
+            params['apos_data'], params['apos_id'] = apos
+        
+        sql += " ORDER BY data_colheita DESC, id DESC LIMIT %(limite)s"
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql, params)
+                return await cursor.fetchall()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao listar produções: {e}")
+            raise
+    
+    async def iterar_producoes(self,
+                               tamanho_lote: int = 1000,
+                               data_inicio: date = None,
+                               data_fim: date = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Percorre toda a tabela de produções com cursor no servidor.
+        
+        Args:
+            tamanho_lote: Quantidade de linhas trazidas por ida ao servidor
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Yields:
+            Dicionário com dados completos de cada produção
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, variedade_cana, idade_cana_meses,
+               umidade_solo, temperatura_media, precipitacao_mm, produtividade_toneladas_ha,
+               data_criacao, data_atualizacao
+        FROM producao_cana
+        WHERE 1=1 {filtro}
+        ORDER BY data_colheita DESC, id DESC
+        """
+        
+        try:
+            async with self.get_connection() as conn:
+                # Cursores nomeados só existem dentro de uma transação
+                async with conn.transaction():
+                    async with conn.cursor(name='cursor_producoes') as cursor:
+                        cursor.itersize = tamanho_lote
+                        await cursor.execute(sql, params)
+                        async for row in cursor:
+                            yield row
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao percorrer produções: {e}")
+            raise
+    
+    async def gerar_relatorio_perdas(self, data_inicio: date = None, data_fim: date = None) -> pd.DataFrame:
+        """
+        Gera relatório consolidado de perdas.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            DataFrame do pandas com dados do relatório
+        """
+        lotes = [lote async for lote in self.gerar_relatorio_perdas_em_lotes(data_inicio, data_fim)]
+        return pd.concat(lotes, ignore_index=True) if len(lotes) > 1 else lotes[0]
+    
+    async def gerar_relatorio_perdas_em_lotes(self,
+                                              data_inicio: date = None,
+                                              data_fim: date = None,
+                                              tamanho_lote: int = 10000) -> AsyncIterator[pd.DataFrame]:
+        """
+        Gera o relatório consolidado de perdas em blocos de DataFrame.
+        
+        Quando não há dados, é produzido um único DataFrame vazio com as
+        colunas do relatório.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            tamanho_lote: Número de linhas por DataFrame
+        
+        Yields:
+            DataFrame do pandas com até `tamanho_lote` linhas do relatório
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT {self.COLUNAS_RELATORIO} FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        ORDER BY data_colheita DESC
+        """
+        colunas = [coluna.strip() for coluna in self.COLUNAS_RELATORIO.split(',')]
+        
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    # Tuplas simples: evita criar um dicionário por linha
+                    async with conn.cursor(name='cursor_relatorio_perdas', row_factory=tuple_row) as cursor:
+                        cursor.itersize = tamanho_lote
+                        await cursor.execute(sql, params)
+                        
+                        algum_lote = False
+                        while True:
+                            rows = await cursor.fetchmany(tamanho_lote)
+                            if not rows:
+                                break
+                            algum_lote = True
+                            yield montar_dataframe(rows, colunas, TIPOS_RELATORIO)
+                        
+                        if not algum_lote:
+                            yield montar_dataframe([], colunas, TIPOS_RELATORIO)
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao gerar relatório: {e}")
+            raise
+    
+    async def resumir_perdas(self, data_inicio: date = None, data_fim: date = None) -> Dict[str, Any]:
+        """
+        Calcula os totais do relatório de perdas diretamente no banco.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            Dict com total_registros, total_colhido, total_perdas e
+            perda_media (None quando não há cálculos de perda)
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT COUNT(*) AS total_registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0)::float8 AS total_colhido,
+               COALESCE(SUM(perda_estimada_toneladas), 0)::float8 AS total_perdas,
+               AVG(percentual_perda)::float8 AS perda_media
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        """
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql, params)
+                return await cursor.fetchone()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao resumir perdas: {e}")
+            raise
+    
+    async def resumir_perdas_por(self,
+                                 agrupamento: str,
+                                 data_inicio: date = None,
+                                 data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega o relatório de perdas no banco por tipo, localização ou mês.
+        
+        Args:
+            agrupamento: 'tipo_colheita', 'localizacao' ou 'mes'
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            Lista de dicionários (um por grupo) com registros,
+            qtd_colhida_toneladas, perda_estimada_toneladas e percentual_perda
+        """
+        if agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self.AGRUPAMENTOS_RELATORIO[agrupamento]
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT {expressao} AS {agrupamento},
+               COUNT(*) AS registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0)::float8 AS qtd_colhida_toneladas,
+               COALESCE(SUM(perda_estimada_toneladas), 0)::float8 AS perda_estimada_toneladas,
+               ROUND(AVG(percentual_perda), 2)::float8 AS percentual_perda
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        GROUP BY {expressao}
+        ORDER BY {expressao}
+        """
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql, params)
+                return await cursor.fetchall()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao agrupar perdas por {agrupamento}: {e}")
+            raise
+    
+    async def atualizar_relatorio_materializado(self, concorrente: bool = True) -> None:
+        """
+        Atualiza mv_relatorio_perdas e registra o instante do refresh.
+        
+        Args:
+            concorrente: Se True, usa REFRESH ... CONCURRENTLY, que não
+                bloqueia leituras da view durante a atualização
+        """
+        sql_refresh = f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concorrente else ''}mv_relatorio_perdas"
+        
+        try:
+            async with self.get_connection() as conn:
+                # O instante registrado é o do início: alterações feitas
+                # durante o refresh continuam marcando a view como desatualizada
+                cursor = await conn.execute("SELECT clock_timestamp() AS inicio")
+                inicio = (await cursor.fetchone())['inicio']
+                
+                await conn.execute(sql_refresh)
+                await conn.execute("""
+                UPDATE controle_relatorio_materializado
+                   SET atualizado_em = %(inicio)s
+                 WHERE nome = 'mv_relatorio_perdas'
+                """, {'inicio': inicio})
+                
+                self.logger.info("Relatório materializado atualizado")
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao atualizar relatório materializado: {e}")
+            raise
+    
+    async def status_relatorio_materializado(self) -> Dict[str, Any]:
+        """
+        Informa se mv_relatorio_perdas está desatualizada.
+        
+        Returns:
+            Dict com desatualizado (bool), atualizado_em (último refresh)
+            e alterado_em (última alteração nas tabelas de origem)
+        """
+        sql = """
+        SELECT alterado_em > atualizado_em AS desatualizado,
+               atualizado_em, alterado_em
+        FROM controle_relatorio_materializado
+        WHERE nome = 'mv_relatorio_perdas'
+        """
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql)
+                return await cursor.fetchone()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao consultar status do relatório materializado: {e}")
+            raise
+    
+    async def executar_sql_customizado(self, sql: str, params: Dict = None) -> List[Dict[str, Any]]:
+        """
+        Executa SQL customizado (apenas SELECT).
+        
+        Args:
+            sql: Comando SQL SELECT
+            params: Parâmetros para o SQL
+        
+        Returns:
+            Lista de dicionários com resultados
+        """
+        if not sql.strip().upper().startswith('SELECT'):
+            raise ValueError("Apenas comandos SELECT são permitidos")
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(sql, params or {})
+                return await cursor.fetchall()
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao executar SQL customizado: {e}")
+            raise
+    
+    def _dados_producao(self, dados_producao: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de produção."""
+        return {
+            'localizacao': dados_producao['localizacao'],
+            'area_plantada_ha': dados_producao['area_plantada_ha'],
+            'qtd_colhida_toneladas': dados_producao['qtd_colhida_toneladas'],
+            'tipo_colheita': dados_producao['tipo_colheita'],
+            'data_colheita': dados_producao.get('data_colheita', datetime.now().date()),
+            'variedade_cana': dados_producao.get('variedade_cana'),
+            'idade_cana_meses': dados_producao.get('idade_cana_meses'),
+            'umidade_solo': dados_producao.get('umidade_solo'),
+            'temperatura_media': dados_producao.get('temperatura_media'),
+            'precipitacao_mm': dados_producao.get('precipitacao_mm')
+        }
+    
+    def _dados_perda(self, dados_perda: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de perda (fatores_perda em JSON)."""
+        # Converter fatores_perda para JSON se for dict
+        fatores_json = dados_perda.get('fatores_perda', {})
+        if isinstance(fatores_json, dict):
+            fatores_json = json.dumps(fatores_json)
+        
+        return {
+            'producao_id': dados_perda['producao_id'],
+            'perda_estimada_toneladas': dados_perda['perda_estimada_toneladas'],
+            'percentual_perda': dados_perda['percentual_perda'],
+            'fatores_perda': fatores_json,
+            'metodo_calculo': dados_perda.get('metodo_calculo', 'sistema_automatico'),
+            'observacoes': dados_perda.get('observacoes')
+        }
+    
+    def _filtro_data_colheita(self, data_inicio: date = None, data_fim: date = None) -> Tuple[str, Dict[str, Any]]:
+        """Monta o trecho WHERE e os parâmetros do filtro por período."""
+        filtro = ""
+        params = {}
+        
+        if data_inicio:
+            filtro += " AND data_colheita >= %(data_inicio)s"
+            params['data_inicio'] = data_inicio
+        
+        if data_fim:
+            filtro += " AND data_colheita <= %(data_fim)s"
+            params['data_fim'] = data_fim
+        
+        return filtro, params
+
+
+def _chave_producao(linha: Dict[str, Any]) -> Tuple[str, date, str]:
+    """Chave natural (localizacao, data_colheita, tipo_colheita) de uma produção."""
+    data_colheita = linha['data_colheita']
+    if isinstance(data_colheita, datetime):
+        data_colheita = data_colheita.date()
+    elif isinstance(data_colheita, str):
+        data_colheita = date.fromisoformat(data_colheita)
+    return linha['localizacao'], data_colheita, linha['tipo_colheita']
+
+
+def _chave_perda(linha: Dict[str, Any]) -> Tuple[int, str]:
+    """Chave natural (producao_id, metodo_calculo) de um cálculo de perda."""
+    return int(linha['producao_id']), linha['metodo_calculo']
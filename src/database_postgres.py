@@ -5,24 +5,116 @@ Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
 
 import psycopg2
 import psycopg2.extras
+import psycopg2.sql
 import logging
 import json
 import os
+import select
+import threading
 from datetime import datetime, date
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from contextlib import contextmanager
 import pandas as pd
 
+from src.colunar import TIPOS_PRODUCAO, TIPOS_RELATORIO, montar_dataframe
+from src.instrumentation import ConexaoInstrumentada, MonitorConsultas, monitor_consultas
+from src.repository import RepositorioProducao
 
-class PostgreSQLDatabase:
+
+# NUMERIC/DECIMAL lidos como float (registrado em cada conexão): evita criar
+# um Decimal por valor e deixa os números no mesmo tipo que o Oracle devolve
+DECIMAL_COMO_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    'DECIMAL_COMO_FLOAT',
+    lambda valor, cursor: float(valor) if valor is not None else None
+)
+
+
+class PostgreSQLDatabase(RepositorioProducao):
     """Classe para gerenciar conexões e operações com banco PostgreSQL."""
     
+    # Colunas do relatório de perdas (iguais na view comum e na materializada)
+    COLUNAS_RELATORIO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, produtividade_toneladas_ha, perda_estimada_toneladas, "
+        "percentual_perda, metodo_calculo, calculado_em, producao_potencial_toneladas"
+    )
+    
+    # Colunas de produção usadas nas leituras em lote (buscar_producoes_por_ids)
+    COLUNAS_PRODUCAO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, variedade_cana, idade_cana_meses, umidade_solo, "
+        "temperatura_media, precipitacao_mm, produtividade_toneladas_ha"
+    )
+    
+    # Índices compostos e de cobertura ajustados às consultas (garantir_indices):
+    # listar_producoes e iterar_producoes ordenam por (data_colheita, id) e o
+    # relatório filtra por data e junta as perdas por producao_id; com INCLUDE
+    # as colunas lidas saem do próprio índice (Index Only Scan)
+    INDICES_COBERTURA = {
+        'idx_producao_data_id': """
+        CREATE INDEX IF NOT EXISTS idx_producao_data_id
+            ON producao_cana (data_colheita DESC, id DESC)
+            INCLUDE (localizacao, area_plantada_ha, qtd_colhida_toneladas,
+                     tipo_colheita, produtividade_toneladas_ha)
+        """,
+        'idx_perdas_producao_cobertura': """
+        CREATE INDEX IF NOT EXISTS idx_perdas_producao_cobertura
+            ON perdas_colheita (producao_id)
+            INCLUDE (id, perda_estimada_toneladas, percentual_perda,
+                     metodo_calculo, calculado_em)
+        """
+    }
+    
+    # Fatores de fatores_perda (JSONB): o GIN (jsonb_path_ops) atende "quais
+    # cálculos aplicaram o fator" (@?) e os de expressão, filtros por faixa.
+    # fator_base fica sem índice: só há um valor por tipo de colheita.
+    EXPRESSAO_FATOR = "(fatores_perda->>'{fator}')::numeric"
+    INDICES_FATORES = {
+        'idx_perdas_fatores_gin': """
+        CREATE INDEX IF NOT EXISTS idx_perdas_fatores_gin
+            ON perdas_colheita USING GIN (fatores_perda jsonb_path_ops)
+        """,
+        **{
+            f'idx_perdas_{fator}': f"""
+        CREATE INDEX IF NOT EXISTS idx_perdas_{fator}
+            ON perdas_colheita (((fatores_perda->>'{fator}')::numeric))
+        """
+            for fator in ('fator_umidade', 'fator_idade', 'fator_clima')
+        }
+    }
+    
+    # Índices de uma coluna que passaram a ser prefixo dos de cobertura
+    INDICES_SUBSTITUIDOS = ('idx_producao_data', 'idx_perdas_producao')
+    
+    # Partições mensais de producao_cana: producao_cana_pAAAA_MM
+    PREFIXO_PARTICAO = "producao_cana_p"
+    # Recebe as datas sem partição mensal (anteriores a 2024, muito à frente
+    # ou de meses arquivados)
+    PARTICAO_PADRAO = "producao_cana_default"
+    
+    # Expressões SQL aceitas em resumir_perdas_por (lista fechada contra injeção)
+    AGRUPAMENTOS_RELATORIO = {
+        'tipo_colheita': "tipo_colheita",
+        'localizacao': "localizacao",
+        'mes': "CAST(date_trunc('month', data_colheita) AS DATE)"
+    }
+    
+    # Canal de NOTIFY das alterações em parametros_perdas
+    CANAL_PARAMETROS = "parametros_perdas_alterados"
+    
+    # Segundos entre verificações do pedido de parada na thread de escuta
+    INTERVALO_ESCUTA = 5.0
+    
     def __init__(self, 
                  host: str = "localhost",
                  port: int = 5432,
                  database: str = "cana_db",
                  username: str = "cana_user",
-                 password: str = "CanaPassword123"):
+                 password: str = "CanaPassword123",
+                 usar_relatorio_materializado: bool = False,
+                 monitor: Optional[MonitorConsultas] = None,
+                 connect_timeout: int = 5):
         """
         Inicializa a conexão com o banco PostgreSQL.
         
@@ -32,12 +124,30 @@ class PostgreSQLDatabase:
             database: Nome do banco de dados
             username: Nome do usuário
             password: Senha do usuário
+            usar_relatorio_materializado: Se True, relatórios e agregações
+                leem mv_relatorio_perdas em vez de vw_relatorio_perdas
+            monitor: Destino das métricas de consultas (padrão: o
+                monitor compartilhado monitor_consultas)
+            connect_timeout: Segundos de espera ao conectar (sem ele, um
+                servidor inacessível segura a chamada pelo timeout do TCP)
         """
         self.host = host
         self.port = port
         self.database = database
         self.username = username
         self.password = password
+        self.connect_timeout = connect_timeout
+        
+        # Fonte dos relatórios: view comum ou materializada
+        self.visao_relatorio = "mv_relatorio_perdas" if usar_relatorio_materializado else "vw_relatorio_perdas"
+        
+        # Métricas de consultas (tempo, linhas, binds) e contadores de conexão
+        self.monitor = monitor if monitor is not None else monitor_consultas
+        
+        # Escuta de alterações em parametros_perdas (assinar_alteracoes_parametros)
+        self._assinantes_parametros: List[Callable[[Optional[str]], None]] = []
+        self._escuta_parametros: Optional[threading.Thread] = None
+        self._parar_escuta = threading.Event()
         
         # Configurar logging
         logging.basicConfig(level=logging.INFO)
@@ -49,22 +159,27 @@ class PostgreSQLDatabase:
         Context manager para conexões com o banco.
         
         Yields:
-            psycopg2.Connection: Conexão ativa com o banco
+            ConexaoInstrumentada: Conexão ativa com o banco (psycopg2),
+            com os comandos medidos pelo monitor de consultas
         """
         connection = None
         try:
-            connection = psycopg2.connect(
+            conexao = psycopg2.connect(
                 host=self.host,
                 port=self.port,
                 database=self.database,
                 user=self.username,
                 password=self.password,
+                connect_timeout=self.connect_timeout,
                 cursor_factory=psycopg2.extras.RealDictCursor
             )
+            psycopg2.extensions.register_type(DECIMAL_COMO_FLOAT, conexao)
+            connection = ConexaoInstrumentada(conexao, self.monitor)
             connection.autocommit = True
-            self.logger.info("Conexão PostgreSQL estabelecida com sucesso")
+            self.monitor.contar('conexoes_abertas')
             yield connection
         except psycopg2.Error as e:
+            self.monitor.contar('erros_banco')
             self.logger.error(f"Erro de banco PostgreSQL: {e}")
             raise
         except Exception as e:
@@ -73,7 +188,7 @@ class PostgreSQLDatabase:
         finally:
             if connection:
                 connection.close()
-                self.logger.info("Conexão PostgreSQL fechada")
+                self.monitor.contar('conexoes_fechadas')
     
     def test_connection(self) -> bool:
         """
@@ -117,22 +232,7 @@ class PostgreSQLDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Preparar dados
-                dados_sql = {
-                    'localizacao': dados_producao['localizacao'],
-                    'area_plantada_ha': dados_producao['area_plantada_ha'],
-                    'qtd_colhida_toneladas': dados_producao['qtd_colhida_toneladas'],
-                    'tipo_colheita': dados_producao['tipo_colheita'],
-                    'data_colheita': dados_producao.get('data_colheita', datetime.now().date()),
-                    'variedade_cana': dados_producao.get('variedade_cana'),
-                    'idade_cana_meses': dados_producao.get('idade_cana_meses'),
-                    'umidade_solo': dados_producao.get('umidade_solo'),
-                    'temperatura_media': dados_producao.get('temperatura_media'),
-                    'precipitacao_mm': dados_producao.get('precipitacao_mm')
-                }
-                
-                cursor.execute(sql, dados_sql)
+                cursor.execute(sql, self._dados_producao(dados_producao))
                 registro_id = cursor.fetchone()['id']
                 
                 self.logger.info(f"Produção inserida com ID: {registro_id}")
@@ -142,6 +242,53 @@ class PostgreSQLDatabase:
             self.logger.error(f"Erro ao inserir produção: {e}")
             raise
     
+    def inserir_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]],
+                                  tamanho_pagina: int = 1000) -> List[int]:
+        """
+        Insere várias produções em uma única transação.
+        
+        Os registros são enviados em INSERTs de múltiplas linhas
+        (execute_values), uma ida ao servidor por página.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+            tamanho_pagina: Linhas por comando INSERT
+            
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        sql = """
+        INSERT INTO producao_cana 
+        (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, 
+         data_colheita, variedade_cana, idade_cana_meses, umidade_solo, 
+         temperatura_media, precipitacao_mm)
+        VALUES %s
+        RETURNING id
+        """
+        modelo = """
+        (%(localizacao)s, %(area_plantada_ha)s, %(qtd_colhida_toneladas)s, %(tipo_colheita)s,
+         %(data_colheita)s, %(variedade_cana)s, %(idade_cana_meses)s, %(umidade_solo)s,
+         %(temperatura_media)s, %(precipitacao_mm)s)
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                conn.autocommit = False
+                cursor = conn.cursor()
+                linhas = psycopg2.extras.execute_values(
+                    cursor, sql, [self._dados_producao(dados) for dados in lista_producoes],
+                    template=modelo, page_size=tamanho_pagina, fetch=True
+                )
+                conn.commit()
+                
+                ids = [linha['id'] for linha in linhas]
+                self.logger.info(f"{len(ids)} produções inseridas em lote")
+                return ids
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir produções em lote: {e}")
+            raise
+    
     def inserir_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
         """
         Insere cálculo de perda no banco.
@@ -165,22 +312,7 @@ class PostgreSQLDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Converter fatores_perda para JSON se for dict
-                fatores_json = dados_perda.get('fatores_perda', {})
-                if isinstance(fatores_json, dict):
-                    fatores_json = json.dumps(fatores_json)
-                
-                dados_sql = {
-                    'producao_id': dados_perda['producao_id'],
-                    'perda_estimada_toneladas': dados_perda['perda_estimada_toneladas'],
-                    'percentual_perda': dados_perda['percentual_perda'],
-                    'fatores_perda': fatores_json,
-                    'metodo_calculo': dados_perda.get('metodo_calculo', 'sistema_automatico'),
-                    'observacoes': dados_perda.get('observacoes')
-                }
-                
-                cursor.execute(sql, dados_sql)
+                cursor.execute(sql, self._dados_perda(dados_perda))
                 registro_id = cursor.fetchone()['id']
                 
                 self.logger.info(f"Perda inserida com ID: {registro_id}")
@@ -190,6 +322,259 @@ class PostgreSQLDatabase:
             self.logger.error(f"Erro ao inserir perda: {e}")
             raise
     
+    def inserir_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]],
+                               tamanho_pagina: int = 1000) -> List[int]:
+        """
+        Insere vários cálculos de perda em uma única transação.
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+            tamanho_pagina: Linhas por comando INSERT
+            
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        sql = """
+        INSERT INTO perdas_colheita 
+        (producao_id, perda_estimada_toneladas, percentual_perda, 
+         fatores_perda, metodo_calculo, observacoes)
+        VALUES %s
+        RETURNING id
+        """
+        modelo = """
+        (%(producao_id)s, %(perda_estimada_toneladas)s, %(percentual_perda)s,
+         %(fatores_perda)s, %(metodo_calculo)s, %(observacoes)s)
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                conn.autocommit = False
+                cursor = conn.cursor()
+                linhas = psycopg2.extras.execute_values(
+                    cursor, sql, [self._dados_perda(dados) for dados in lista_perdas],
+                    template=modelo, page_size=tamanho_pagina, fetch=True
+                )
+                conn.commit()
+                
+                ids = [linha['id'] for linha in linhas]
+                self.logger.info(f"{len(ids)} perdas inseridas em lote")
+                return ids
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir perdas em lote: {e}")
+            raise
+    
+    def upsert_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """
+        Insere a produção ou atualiza a existente com a mesma chave natural
+        (localizacao, data_colheita, tipo_colheita).
+        
+        Args:
+            dados_producao: Dicionário com dados da produção
+            
+        Returns:
+            int: ID da produção inserida ou atualizada
+        """
+        return self.upsert_producoes_em_lote([dados_producao])[0]
+    
+    def upsert_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]],
+                                 tamanho_pagina: int = 1000) -> List[int]:
+        """
+        Insere ou atualiza várias produções em uma única transação.
+        
+        Usa INSERT ... ON CONFLICT sobre a chave natural; linhas que já
+        existem com os mesmos valores não são regravadas, de modo que
+        reprocessar um lote não cresce a tabela nem gera escrita.
+        
+        Com 'registrado_em' nos dicionários (reenvio do spool), esse instante
+        é o gravado em data_atualizacao e a linha não é alterada se já foi
+        atualizada depois dele.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+            tamanho_pagina: Linhas por comando INSERT
+            
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        sql = """
+        INSERT INTO producao_cana 
+        (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, 
+         data_colheita, variedade_cana, idade_cana_meses, umidade_solo, 
+         temperatura_media, precipitacao_mm, data_atualizacao)
+        VALUES %s
+        ON CONFLICT (localizacao, data_colheita, tipo_colheita) DO UPDATE SET
+            area_plantada_ha = EXCLUDED.area_plantada_ha,
+            qtd_colhida_toneladas = EXCLUDED.qtd_colhida_toneladas,
+            variedade_cana = EXCLUDED.variedade_cana,
+            idade_cana_meses = EXCLUDED.idade_cana_meses,
+            umidade_solo = EXCLUDED.umidade_solo,
+            temperatura_media = EXCLUDED.temperatura_media,
+            precipitacao_mm = EXCLUDED.precipitacao_mm,
+            data_atualizacao = EXCLUDED.data_atualizacao
+        WHERE (producao_cana.area_plantada_ha, producao_cana.qtd_colhida_toneladas,
+               producao_cana.variedade_cana, producao_cana.idade_cana_meses,
+               producao_cana.umidade_solo, producao_cana.temperatura_media,
+               producao_cana.precipitacao_mm)
+              IS DISTINCT FROM
+              (EXCLUDED.area_plantada_ha, EXCLUDED.qtd_colhida_toneladas,
+               EXCLUDED.variedade_cana, EXCLUDED.idade_cana_meses,
+               EXCLUDED.umidade_solo, EXCLUDED.temperatura_media,
+               EXCLUDED.precipitacao_mm)
+          {so_mais_recentes}
+        RETURNING id, localizacao, data_colheita, tipo_colheita
+        """
+        modelo = """
+        (%(localizacao)s, %(area_plantada_ha)s, %(qtd_colhida_toneladas)s, %(tipo_colheita)s,
+         %(data_colheita)s, %(variedade_cana)s, %(idade_cana_meses)s, %(umidade_solo)s,
+         %(temperatura_media)s, %(precipitacao_mm)s,
+         COALESCE(%(registrado_em)s::timestamptz, CURRENT_TIMESTAMP))
+        """
+        # Linhas sem alteração não entram no RETURNING; seus IDs são lidos aqui
+        sql_existentes = """
+        SELECT p.id, p.localizacao, p.data_colheita, p.tipo_colheita
+        FROM producao_cana p
+        JOIN unnest(%(localizacoes)s::varchar[], %(datas)s::date[], %(tipos)s::varchar[])
+             AS c (localizacao, data_colheita, tipo_colheita)
+          ON p.localizacao = c.localizacao
+         AND p.data_colheita = c.data_colheita
+         AND p.tipo_colheita = c.tipo_colheita
+        """
+        
+        linhas = [{**self._dados_producao(dados), 'registrado_em': dados.get('registrado_em')}
+                  for dados in lista_producoes]
+        # ON CONFLICT não atualiza a mesma linha duas vezes no comando: vale a última ocorrência
+        unicas = {_chave_producao(linha): linha for linha in linhas}
+        # Reenvio: não sobrescreve uma linha atualizada depois do registro
+        sql = sql.format(so_mais_recentes=(
+            "AND producao_cana.data_atualizacao <= EXCLUDED.data_atualizacao"
+            if any(linha['registrado_em'] is not None for linha in linhas) else ""
+        ))
+        
+        try:
+            with self.get_connection() as conn:
+                conn.autocommit = False
+                cursor = conn.cursor()
+                gravadas = psycopg2.extras.execute_values(
+                    cursor, sql, list(unicas.values()),
+                    template=modelo, page_size=tamanho_pagina, fetch=True
+                )
+                ids = {_chave_producao(linha): linha['id'] for linha in gravadas}
+                
+                faltantes = [chave for chave in unicas if chave not in ids]
+                if faltantes:
+                    localizacoes, datas, tipos = (list(coluna) for coluna in zip(*faltantes))
+                    cursor.execute(sql_existentes, {
+                        'localizacoes': localizacoes, 'datas': datas, 'tipos': tipos
+                    })
+                    ids.update((_chave_producao(linha), linha['id']) for linha in cursor.fetchall())
+                
+                conn.commit()
+                
+                self.logger.info(f"{len(gravadas)} produções inseridas/atualizadas, "
+                                 f"{len(faltantes)} sem alteração")
+                return [ids[_chave_producao(linha)] for linha in linhas]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar produções em lote (upsert): {e}")
+            raise
+    
+    def upsert_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """
+        Insere o cálculo de perda ou atualiza o existente da mesma produção
+        e método de cálculo.
+        
+        Args:
+            dados_perda: Dicionário com dados da perda calculada
+            
+        Returns:
+            int: ID do registro de perda inserido ou atualizado
+        """
+        return self.upsert_perdas_em_lote([dados_perda])[0]
+    
+    def upsert_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]],
+                              tamanho_pagina: int = 1000) -> List[int]:
+        """
+        Insere ou atualiza vários cálculos de perda em uma única transação,
+        pela chave (producao_id, metodo_calculo).
+        
+        Com 'registrado_em' nos dicionários (reenvio do spool), esse instante
+        é o gravado em calculado_em e o cálculo não é alterado se já foi
+        recalculado depois dele.
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+            tamanho_pagina: Linhas por comando INSERT
+            
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        sql = """
+        INSERT INTO perdas_colheita 
+        (producao_id, perda_estimada_toneladas, percentual_perda, 
+         fatores_perda, metodo_calculo, observacoes, calculado_em)
+        VALUES %s
+        ON CONFLICT (producao_id, metodo_calculo) DO UPDATE SET
+            perda_estimada_toneladas = EXCLUDED.perda_estimada_toneladas,
+            percentual_perda = EXCLUDED.percentual_perda,
+            fatores_perda = EXCLUDED.fatores_perda,
+            observacoes = EXCLUDED.observacoes,
+            calculado_em = EXCLUDED.calculado_em
+        WHERE (perdas_colheita.perda_estimada_toneladas, perdas_colheita.percentual_perda,
+               perdas_colheita.fatores_perda, perdas_colheita.observacoes)
+              IS DISTINCT FROM
+              (EXCLUDED.perda_estimada_toneladas, EXCLUDED.percentual_perda,
+               EXCLUDED.fatores_perda, EXCLUDED.observacoes)
+          {so_mais_recentes}
+        RETURNING id, producao_id, metodo_calculo
+        """
+        modelo = """
+        (%(producao_id)s, %(perda_estimada_toneladas)s, %(percentual_perda)s,
+         %(fatores_perda)s, %(metodo_calculo)s, %(observacoes)s,
+         COALESCE(%(registrado_em)s::timestamptz, CURRENT_TIMESTAMP))
+        """
+        sql_existentes = """
+        SELECT id, producao_id, metodo_calculo
+        FROM perdas_colheita
+        WHERE producao_id = ANY(%(producao_ids)s)
+        """
+        
+        linhas = [{**self._dados_perda(dados), 'registrado_em': dados.get('registrado_em')}
+                  for dados in lista_perdas]
+        unicas = {_chave_perda(linha): linha for linha in linhas}
+        sql = sql.format(so_mais_recentes=(
+            "AND perdas_colheita.calculado_em <= EXCLUDED.calculado_em"
+            if any(linha['registrado_em'] is not None for linha in linhas) else ""
+        ))
+        
+        try:
+            with self.get_connection() as conn:
+                conn.autocommit = False
+                cursor = conn.cursor()
+                gravadas = psycopg2.extras.execute_values(
+                    cursor, sql, list(unicas.values()),
+                    template=modelo, page_size=tamanho_pagina, fetch=True
+                )
+                ids = {_chave_perda(linha): linha['id'] for linha in gravadas}
+                
+                faltantes = [chave for chave in unicas if chave not in ids]
+                if faltantes:
+                    cursor.execute(sql_existentes, {
+                        'producao_ids': sorted({producao_id for producao_id, _ in faltantes})
+                    })
+                    ids.update((_chave_perda(linha), linha['id']) for linha in cursor.fetchall()
+                               if _chave_perda(linha) not in ids)
+                
+                conn.commit()
+                
+                self.logger.info(f"{len(gravadas)} perdas inseridas/atualizadas, "
+                                 f"{len(faltantes)} sem alteração")
+                return [ids[_chave_perda(linha)] for linha in linhas]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar perdas em lote (upsert): {e}")
+            raise
+    
     def buscar_producao_por_id(self, producao_id: int) -> Optional[Dict[str, Any]]:
         """
         Busca dados de produção por ID.
@@ -223,6 +608,49 @@ class PostgreSQLDatabase:
             self.logger.error(f"Erro ao buscar produção {producao_id}: {e}")
             raise
     
+    def buscar_producoes_por_ids(self, producao_ids: Iterable[int],
+                                 tamanho_lote: int = 10000) -> pd.DataFrame:
+        """
+        Busca várias produções pelos IDs, em poucas idas ao banco.
+        
+        Os IDs (sem repetição) são enviados em blocos de `tamanho_lote`,
+        cada bloco como um único parâmetro array (= ANY); o resultado vem em
+        formato colunar, pronto para cálculo em lote.
+        
+        Args:
+            producao_ids: IDs das produções (até dezenas de milhares)
+            tamanho_lote: Quantidade de IDs por consulta
+            
+        Returns:
+            DataFrame com uma linha por produção encontrada (ordenado por
+            id) e as colunas de COLUNAS_PRODUCAO; IDs inexistentes são omitidos
+        """
+        sql = f"""
+        SELECT {self.COLUNAS_PRODUCAO}
+        FROM producao_cana 
+        WHERE id = ANY(%(ids)s)
+        """
+        
+        ids = sorted({int(producao_id) for producao_id in producao_ids})
+        colunas = [coluna.strip() for coluna in self.COLUNAS_PRODUCAO.split(',')]
+        blocos = []
+        
+        try:
+            with self.get_connection() as conn:
+                # Tuplas simples: evita criar um dicionário por linha
+                cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+                
+                for inicio in range(0, len(ids), tamanho_lote):
+                    cursor.execute(sql, {'ids': ids[inicio:inicio + tamanho_lote]})
+                    blocos.extend(cursor.fetchall())
+                
+            producoes = montar_dataframe(blocos, colunas, TIPOS_PRODUCAO)
+            return producoes.sort_values('id', ignore_index=True)
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar produções por IDs: {e}")
+            raise
+    
     def buscar_parametros_perdas(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
         """
         Busca parâmetros para cálculo de perdas por tipo de colheita.
@@ -254,12 +682,15 @@ class PostgreSQLDatabase:
             self.logger.error(f"Erro ao buscar parâmetros para {tipo_colheita}: {e}")
             raise
     
-    def listar_producoes(self, limite: int = 50) -> List[Dict[str, Any]]:
+    def listar_producoes(self, limite: int = 50,
+                         apos: Optional[Tuple[date, int]] = None) -> List[Dict[str, Any]]:
         """
-        Lista produções cadastradas.
+        Lista produções cadastradas usando paginação por chave (keyset).
         
         Args:
             limite: Número máximo de registros a retornar
+            apos: Cursor (data_colheita, id) do último registro da página
+                anterior; None para a primeira página
             
         Returns:
             Lista de dicionários com dados das produções
@@ -268,14 +699,20 @@ class PostgreSQLDatabase:
         SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
                tipo_colheita, data_colheita, produtividade_toneladas_ha
         FROM producao_cana 
-        ORDER BY data_colheita DESC
-        LIMIT %(limite)s
         """
         
+        params = {'limite': limite}
+        
+        if apos:
+            sql += " WHERE (data_colheita, id) < (%(apos_data)s, %(apos_id)s)"
+            params['apos_data'], params['apos_id'] = apos
+        
+        sql += " ORDER BY data_colheita DESC, id DESC LIMIT %(limite)s"
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, {'limite': limite})
+                cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
                 return [dict(row) for row in rows]
@@ -284,19 +721,88 @@ class PostgreSQLDatabase:
             self.logger.error(f"Erro ao listar produções: {e}")
             raise
     
-    def gerar_relatorio_perdas(self, data_inicio: date = None, data_fim: date = None) -> pd.DataFrame:
+    def iterar_producoes(self, 
+                         tamanho_lote: int = 1000,
+                         data_inicio: date = None,
+                         data_fim: date = None) -> Iterator[Dict[str, Any]]:
         """
-        Gera relatório consolidado de perdas.
+        Percorre toda a tabela de produções com cursor no servidor.
+        
+        Os registros são buscados em lotes por um cursor nomeado, de modo
+        que o uso de memória não depende do tamanho da tabela.
         
         Args:
+            tamanho_lote: Quantidade de linhas trazidas por ida ao servidor
             data_inicio: Data inicial para filtro (opcional)
             data_fim: Data final para filtro (opcional)
             
-        Returns:
-            DataFrame do pandas com dados do relatório
+        Yields:
+            Dicionário com dados completos de cada produção
         """
         sql = """
-        SELECT * FROM vw_relatorio_perdas
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, variedade_cana, idade_cana_meses,
+               umidade_solo, temperatura_media, precipitacao_mm, produtividade_toneladas_ha,
+               data_criacao, data_atualizacao
+        FROM producao_cana 
+        WHERE 1=1
+        """
+        
+        params = {}
+        
+        if data_inicio:
+            sql += " AND data_colheita >= %(data_inicio)s"
+            params['data_inicio'] = data_inicio
+            
+        if data_fim:
+            sql += " AND data_colheita <= %(data_fim)s"
+            params['data_fim'] = data_fim
+            
+        sql += " ORDER BY data_colheita DESC, id DESC"
+        
+        try:
+            with self.get_connection() as conn:
+                # Cursores nomeados só existem dentro de uma transação
+                conn.autocommit = False
+                try:
+                    with conn.cursor(name='cursor_producoes') as cursor:
+                        cursor.itersize = tamanho_lote
+                        cursor.execute(sql, params)
+                        
+                        while True:
+                            rows = cursor.fetchmany(tamanho_lote)
+                            if not rows:
+                                break
+                            for row in rows:
+                                yield dict(row)
+                finally:
+                    conn.rollback()
+                    
+        except Exception as e:
+            self.logger.error(f"Erro ao percorrer produções: {e}")
+            raise
+    
+    def gerar_relatorio_perdas_em_lotes(self, 
+                                        data_inicio: date = None, 
+                                        data_fim: date = None,
+                                        tamanho_lote: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Gera o relatório consolidado de perdas em blocos de DataFrame.
+        
+        As linhas são lidas por um cursor nomeado (no servidor), portanto
+        apenas um bloco fica em memória de cada vez. Quando não há dados,
+        é produzido um único DataFrame vazio com as colunas do relatório.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            tamanho_lote: Número de linhas por DataFrame
+            
+        Yields:
+            DataFrame do pandas com até `tamanho_lote` linhas do relatório
+        """
+        sql = f"""
+        SELECT {self.COLUNAS_RELATORIO} FROM {self.visao_relatorio}
         WHERE 1=1
         """
         
@@ -313,13 +819,675 @@ class PostgreSQLDatabase:
         sql += " ORDER BY data_colheita DESC"
         
         try:
-            conn_str = f"postgresql://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
-            return pd.read_sql(sql, conn_str, params=params)
-                
+            with self.get_connection() as conn:
+                # Cursores nomeados só existem dentro de uma transação
+                conn.autocommit = False
+                try:
+                    # Tuplas simples: evita criar um dicionário por linha
+                    with conn.cursor(name='cursor_relatorio_perdas',
+                                     cursor_factory=psycopg2.extensions.cursor) as cursor:
+                        cursor.itersize = tamanho_lote
+                        cursor.execute(sql, params)
+                        
+                        algum_lote = False
+                        while True:
+                            rows = cursor.fetchmany(tamanho_lote)
+                            colunas = [desc[0] for desc in cursor.description]
+                            if not rows:
+                                break
+                            algum_lote = True
+                            yield montar_dataframe(rows, colunas, TIPOS_RELATORIO)
+                        
+                        if not algum_lote:
+                            yield montar_dataframe([], colunas, TIPOS_RELATORIO)
+                finally:
+                    conn.rollback()
+                    
         except Exception as e:
             self.logger.error(f"Erro ao gerar relatório: {e}")
             raise
     
+    def resumir_perdas(self, data_inicio: date = None, data_fim: date = None) -> Dict[str, Any]:
+        """
+        Calcula os totais do relatório de perdas diretamente no banco.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Dict com total_registros, total_colhido, total_perdas e
+            perda_media (None quando não há cálculos de perda)
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT COUNT(*) AS total_registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0)::float8 AS total_colhido,
+               COALESCE(SUM(perda_estimada_toneladas), 0)::float8 AS total_perdas,
+               AVG(percentual_perda)::float8 AS perda_media
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                return dict(cursor.fetchone())
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao resumir perdas: {e}")
+            raise
+    
+    def resumir_perdas_por(self, 
+                           agrupamento: str,
+                           data_inicio: date = None, 
+                           data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega o relatório de perdas no banco por tipo, localização ou mês.
+        
+        Args:
+            agrupamento: 'tipo_colheita', 'localizacao' ou 'mes'
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Lista de dicionários (um por grupo) com registros,
+            qtd_colhida_toneladas, perda_estimada_toneladas e percentual_perda
+        """
+        if agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self.AGRUPAMENTOS_RELATORIO[agrupamento]
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT {expressao} AS {agrupamento},
+               COUNT(*) AS registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0)::float8 AS qtd_colhida_toneladas,
+               COALESCE(SUM(perda_estimada_toneladas), 0)::float8 AS perda_estimada_toneladas,
+               ROUND(AVG(percentual_perda), 2)::float8 AS percentual_perda
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        GROUP BY {expressao}
+        ORDER BY {expressao}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                return [dict(row) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao agrupar perdas por {agrupamento}: {e}")
+            raise
+    
+    def buscar_perdas_por_fator(self, fator: str, minimo: float = None, maximo: float = None,
+                                limite: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Busca as perdas que aplicaram um fator, opcionalmente numa faixa de valores.
+        
+        O filtro roda no banco sobre o JSONB (índices GIN e de expressão),
+        sem trazer fatores_perda para o Python.
+        
+        Args:
+            fator: Um de FATORES_PERDA (ex.: 'fator_umidade')
+            minimo: Valor mínimo do fator, inclusive (opcional)
+            maximo: Valor máximo do fator, inclusive (opcional)
+            limite: Número máximo de perdas retornadas
+            
+        Returns:
+            Lista de dicionários com id, producao_id, valor_fator,
+            perda_estimada_toneladas, percentual_perda, metodo_calculo e
+            calculado_em, do maior valor do fator para o menor
+        """
+        expressao = self._expressao_fator(fator)
+        
+        sql = f"""
+        SELECT id, producao_id, ({expressao})::float8 AS valor_fator,
+               perda_estimada_toneladas::float8 AS perda_estimada_toneladas,
+               percentual_perda::float8 AS percentual_perda,
+               metodo_calculo, calculado_em
+        FROM perdas_colheita
+        WHERE fatores_perda @? %(caminho)s::jsonpath
+        """
+        
+        params = {'caminho': f"$.{fator}", 'limite': limite}
+        
+        if minimo is not None:
+            sql += f" AND {expressao} >= %(minimo)s"
+            params['minimo'] = minimo
+            
+        if maximo is not None:
+            sql += f" AND {expressao} <= %(maximo)s"
+            params['maximo'] = maximo
+        
+        sql += f" ORDER BY {expressao} DESC, id LIMIT %(limite)s"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                return [dict(row) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar perdas por {fator}: {e}")
+            raise
+    
+    def agregar_fator(self, fator: str, agrupamento: Optional[str] = None,
+                      data_inicio: date = None, data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega um fator no banco, no total ou por tipo, localização ou mês.
+        
+        Args:
+            fator: Um de FATORES_PERDA (ex.: 'fator_umidade')
+            agrupamento: 'tipo_colheita', 'localizacao', 'mes' ou None (total)
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Lista de dicionários (um por grupo) com registros, minimo, media
+            e maximo do fator e percentual_perda médio
+        """
+        if agrupamento is not None and agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self._expressao_fator(fator)
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        grupo = self.AGRUPAMENTOS_RELATORIO.get(agrupamento)
+        
+        sql = f"""
+        SELECT {f'{grupo} AS {agrupamento},' if grupo else ''}
+               COUNT(*) AS registros,
+               MIN(valor_fator)::float8 AS minimo,
+               AVG(valor_fator)::float8 AS media,
+               MAX(valor_fator)::float8 AS maximo,
+               ROUND(AVG(percentual_perda), 2)::float8 AS percentual_perda
+        FROM (
+            SELECT p.tipo_colheita, p.localizacao, p.data_colheita,
+                   l.percentual_perda, {expressao} AS valor_fator
+            FROM perdas_colheita l
+            JOIN producao_cana p ON p.id = l.producao_id
+            WHERE {expressao} IS NOT NULL
+        ) f
+        WHERE 1=1 {filtro}
+        {f'GROUP BY {grupo} ORDER BY {grupo}' if grupo else ''}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                return [dict(row) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao agregar {fator}: {e}")
+            raise
+    
+    def recalcular_perdas_no_banco(self, data_inicio: date = None, data_fim: date = None) -> int:
+        """
+        Recalcula as perdas 'avancado' das produções do período dentro do banco.
+        
+        Chama a função recalcular_perdas (docker/init-postgres.sql), que aplica
+        a fórmula de CalculadoraPerdas.calcular_perda_avancada com os
+        parâmetros ativos em um único comando, sem trazer as produções para
+        o Python.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            
+        Returns:
+            Quantidade de perdas inseridas ou alteradas
+        """
+        sql = "SELECT recalcular_perdas(%(data_inicio)s, %(data_fim)s) AS linhas"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, {'data_inicio': data_inicio, 'data_fim': data_fim})
+                linhas = cursor.fetchone()['linhas']
+                
+                self.logger.info(f"{linhas} perdas recalculadas no banco")
+                return linhas
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao recalcular perdas no banco: {e}")
+            raise
+    
+    def garantir_indices(self) -> List[str]:
+        """
+        Cria os índices de INDICES_COBERTURA e INDICES_FATORES que faltam e
+        remove os substituídos.
+        
+        Bancos criados por docker/init-postgres.sql já os têm; aqui eles são
+        levados a bancos existentes. Em producao_cana o índice é criado na
+        tabela particionada e replicado em cada partição.
+        
+        Returns:
+            Lista com os nomes dos índices criados
+        """
+        sql_existentes = """
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema()
+          AND tablename IN ('producao_cana', 'perdas_colheita')
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql_existentes)
+                existentes = {row['indexname'] for row in cursor.fetchall()}
+                
+                indices = {**self.INDICES_COBERTURA, **self.INDICES_FATORES}
+                criados = [nome for nome in indices if nome not in existentes]
+                for nome in criados:
+                    cursor.execute(indices[nome])
+                
+                for nome in self.INDICES_SUBSTITUIDOS:
+                    if nome in existentes:
+                        cursor.execute(f"DROP INDEX IF EXISTS {nome}")
+                
+                if criados:
+                    # Estatísticas e mapa de visibilidade para o Index Only Scan
+                    cursor.execute("VACUUM ANALYZE producao_cana")
+                    cursor.execute("VACUUM ANALYZE perdas_colheita")
+                    self.logger.info(f"Índices criados: {', '.join(criados)}")
+                return criados
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao garantir índices: {e}")
+            raise
+    
+    def atualizar_relatorio_materializado(self, concorrente: bool = True) -> None:
+        """
+        Atualiza mv_relatorio_perdas e registra o instante do refresh.
+        
+        Args:
+            concorrente: Se True, usa REFRESH ... CONCURRENTLY, que não
+                bloqueia leituras da view durante a atualização
+        """
+        sql_refresh = f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concorrente else ''}mv_relatorio_perdas"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                # O instante registrado é o do início: alterações feitas
+                # durante o refresh continuam marcando a view como desatualizada
+                cursor.execute("SELECT clock_timestamp() AS inicio")
+                inicio = cursor.fetchone()['inicio']
+                
+                cursor.execute(sql_refresh)
+                cursor.execute("""
+                UPDATE controle_relatorio_materializado
+                   SET atualizado_em = %(inicio)s
+                 WHERE nome = 'mv_relatorio_perdas'
+                """, {'inicio': inicio})
+                
+                self.logger.info("Relatório materializado atualizado")
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao atualizar relatório materializado: {e}")
+            raise
+    
+    def status_relatorio_materializado(self) -> Dict[str, Any]:
+        """
+        Informa se mv_relatorio_perdas está desatualizada.
+        
+        Returns:
+            Dict com desatualizado (bool), atualizado_em (último refresh)
+            e alterado_em (última alteração nas tabelas de origem)
+        """
+        sql = """
+        SELECT alterado_em > atualizado_em AS desatualizado,
+               atualizado_em, alterado_em
+        FROM controle_relatorio_materializado
+        WHERE nome = 'mv_relatorio_perdas'
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return dict(cursor.fetchone())
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao consultar status do relatório materializado: {e}")
+            raise
+    
+    def criar_particoes_futuras(self, meses_a_frente: int = 3) -> List[str]:
+        """
+        Cria as partições mensais de producao_cana que ainda não existem.
+        
+        Cobre do mês atual até `meses_a_frente` meses adiante; deve ser
+        executado periodicamente (ex.: main.py --manter-particoes no cron).
+        Produções do mês que já tenham caído na partição padrão
+        (producao_cana_default) são movidas para a partição nova, com as
+        suas perdas, na mesma transação.
+        
+        Args:
+            meses_a_frente: Quantidade de meses futuros a garantir
+            
+        Returns:
+            Lista com os nomes das partições criadas
+        """
+        criadas = []
+        mes_atual = date.today().replace(day=1)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT to_regclass(%(nome)s) IS NOT NULL AS existe",
+                               {'nome': self.PARTICAO_PADRAO})
+                tem_padrao = cursor.fetchone()['existe']
+                
+                conn.autocommit = False
+                
+                for deslocamento in range(meses_a_frente + 1):
+                    inicio = _somar_meses(mes_atual, deslocamento)
+                    nome = f"{self.PREFIXO_PARTICAO}{inicio:%Y_%m}"
+                    periodo = {'inicio': inicio, 'fim': _somar_meses(inicio, 1)}
+                    
+                    cursor.execute("SELECT to_regclass(%(nome)s) IS NOT NULL AS existe", {'nome': nome})
+                    if cursor.fetchone()['existe']:
+                        conn.rollback()
+                        continue
+                    
+                    try:
+                        movidas = self._retirar_da_particao_padrao(cursor, periodo) if tem_padrao else 0
+                        cursor.execute(
+                            psycopg2.sql.SQL(
+                                "CREATE TABLE {} PARTITION OF producao_cana "
+                                "FOR VALUES FROM (%(inicio)s) TO (%(fim)s)"
+                            ).format(psycopg2.sql.Identifier(nome)),
+                            periodo
+                        )
+                        if movidas:
+                            self._devolver_retiradas(cursor)
+                            self.logger.info(f"{movidas} produção(ões) movida(s) da partição padrão para {nome}")
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    criadas.append(nome)
+                
+            if criadas:
+                self.logger.info(f"Partições criadas: {', '.join(criadas)}")
+            return criadas
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao criar partições: {e}")
+            raise
+    
+    def _retirar_da_particao_padrao(self, cursor, periodo: Dict[str, date]) -> int:
+        """
+        Retira da partição padrão as produções do período, guardando-as (e
+        as suas perdas, apagadas em cascata) em tabelas temporárias.
+        
+        A partição do mês só pode ser criada quando a padrão não tem linhas
+        do intervalo; _devolver_retiradas reinsere tudo depois, com os
+        mesmos ids. Deve rodar dentro da transação que cria a partição.
+        
+        Returns:
+            Quantidade de produções retiradas
+        """
+        cursor.execute(psycopg2.sql.SQL(
+            "SELECT EXISTS (SELECT 1 FROM {} "
+            "WHERE data_colheita >= %(inicio)s AND data_colheita < %(fim)s) AS existe"
+        ).format(psycopg2.sql.Identifier(self.PARTICAO_PADRAO)), periodo)
+        if not cursor.fetchone()['existe']:
+            return 0
+        
+        colunas = self._colunas_gravaveis_producao(cursor)
+        
+        cursor.execute("""
+        CREATE TEMP TABLE perdas_retiradas ON COMMIT DROP AS
+        SELECT * FROM perdas_colheita
+        WHERE data_colheita >= %(inicio)s AND data_colheita < %(fim)s
+        """, periodo)
+        cursor.execute(psycopg2.sql.SQL(
+            "CREATE TEMP TABLE producoes_retiradas ON COMMIT DROP AS "
+            "SELECT {colunas} FROM {padrao} "
+            "WHERE data_colheita >= %(inicio)s AND data_colheita < %(fim)s"
+        ).format(colunas=colunas, padrao=psycopg2.sql.Identifier(self.PARTICAO_PADRAO)), periodo)
+        cursor.execute(psycopg2.sql.SQL(
+            "DELETE FROM {} WHERE data_colheita >= %(inicio)s AND data_colheita < %(fim)s"
+        ).format(psycopg2.sql.Identifier(self.PARTICAO_PADRAO)), periodo)
+        return cursor.rowcount
+    
+    def _colunas_gravaveis_producao(self, cursor) -> psycopg2.sql.Composed:
+        """Lista SQL das colunas de producao_cana, sem as geradas (produtividade)."""
+        cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'producao_cana'
+          AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+        """)
+        return psycopg2.sql.SQL(', ').join(
+            psycopg2.sql.Identifier(row['column_name']) for row in cursor.fetchall()
+        )
+    
+    def _devolver_retiradas(self, cursor) -> None:
+        """Reinsere (já na partição nova) as produções e perdas de _retirar_da_particao_padrao."""
+        colunas = self._colunas_gravaveis_producao(cursor)
+        cursor.execute(psycopg2.sql.SQL(
+            "INSERT INTO producao_cana ({colunas}) SELECT {colunas} FROM producoes_retiradas"
+        ).format(colunas=colunas))
+        cursor.execute("INSERT INTO perdas_colheita SELECT * FROM perdas_retiradas")
+    
+    def arquivar_particoes(self, anteriores_a: date) -> List[str]:
+        """
+        Arquiva as partições de meses anteriores ao mês de `anteriores_a`.
+        
+        Para cada partição, as perdas do período são copiadas para
+        arquivo.perdas_colheita e removidas; em seguida a partição é
+        desanexada de producao_cana e movida para o schema arquivo.
+        Cada partição é arquivada em uma transação própria. Produções
+        gravadas depois com datas desses meses vão para a partição padrão.
+        
+        Args:
+            anteriores_a: Data de corte (meses anteriores ao dela são arquivados)
+            
+        Returns:
+            Lista com os nomes das partições arquivadas
+        """
+        limite = anteriores_a.replace(day=1)
+        arquivadas = []
+        
+        sql_particoes = """
+        SELECT c.relname AS nome
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class pai ON pai.oid = i.inhparent
+        WHERE pai.relname = 'producao_cana'
+        ORDER BY c.relname
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql_particoes)
+                nomes = [row['nome'] for row in cursor.fetchall()]
+                
+                conn.autocommit = False
+                
+                for nome in nomes:
+                    inicio = self._inicio_particao(nome)
+                    if inicio is None or _somar_meses(inicio, 1) > limite:
+                        continue
+                    
+                    periodo = {'inicio': inicio, 'fim': _somar_meses(inicio, 1)}
+                    identificador = psycopg2.sql.Identifier(nome)
+                    
+                    try:
+                        cursor.execute("""
+                        INSERT INTO arquivo.perdas_colheita
+                        SELECT * FROM perdas_colheita
+                        WHERE data_colheita >= %(inicio)s AND data_colheita < %(fim)s
+                        """, periodo)
+                        cursor.execute("""
+                        DELETE FROM perdas_colheita
+                        WHERE data_colheita >= %(inicio)s AND data_colheita < %(fim)s
+                        """, periodo)
+                        cursor.execute(psycopg2.sql.SQL(
+                            "ALTER TABLE producao_cana DETACH PARTITION {}"
+                        ).format(identificador))
+                        cursor.execute(psycopg2.sql.SQL(
+                            "ALTER TABLE {} SET SCHEMA arquivo"
+                        ).format(identificador))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    
+                    arquivadas.append(nome)
+                
+            if arquivadas:
+                self.logger.info(f"Partições arquivadas: {', '.join(arquivadas)}")
+            return arquivadas
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao arquivar partições: {e}")
+            raise
+    
+    def assinar_alteracoes_parametros(self, callback: Callable[[Optional[str]], None]) -> None:
+        """
+        Chama `callback(tipo_colheita)` a cada alteração em parametros_perdas.
+        
+        Uma thread em segundo plano mantém uma conexão dedicada em LISTEN no
+        canal CANAL_PARAMETROS, notificado pelo gatilho
+        trg_parametros_notificar (docker/init-postgres.sql). `callback(None)`
+        significa "recarregue todos": é chamado ao começar a escutar e a cada
+        queda ou reconexão, pois notificações enviadas sem escuta se perdem.
+        
+        Args:
+            callback: Função chamada na thread de escuta com o tipo de
+                colheita alterado (ou None)
+        """
+        self._assinantes_parametros.append(callback)
+        
+        if self._escuta_parametros is None or not self._escuta_parametros.is_alive():
+            self._parar_escuta.clear()
+            self._escuta_parametros = threading.Thread(
+                target=self._escutar_parametros, name="escuta-parametros", daemon=True
+            )
+            self._escuta_parametros.start()
+    
+    def cancelar_assinaturas_parametros(self) -> None:
+        """Encerra a escuta de alterações de parâmetros e remove os callbacks."""
+        self._parar_escuta.set()
+        if self._escuta_parametros is not None:
+            self._escuta_parametros.join(timeout=self.INTERVALO_ESCUTA + 1)
+            self._escuta_parametros = None
+        self._assinantes_parametros.clear()
+    
+    def _inicio_particao(self, nome: str) -> Optional[date]:
+        """Extrai o primeiro dia do mês do nome producao_cana_pAAAA_MM."""
+        if not nome.startswith(self.PREFIXO_PARTICAO):
+            return None
+        try:
+            ano, mes = nome[len(self.PREFIXO_PARTICAO):].split('_')
+            return date(int(ano), int(mes), 1)
+        except ValueError:
+            return None
+    
+    def _escutar_parametros(self) -> None:
+        """Laço da thread de escuta: LISTEN, espera por select() e reconexão com backoff."""
+        espera = 1.0
+        while not self._parar_escuta.is_set():
+            conn = None
+            try:
+                # Conexão própria e fora do monitor: fica aberta enquanto escuta
+                conn = psycopg2.connect(
+                    host=self.host,
+                    port=self.port,
+                    database=self.database,
+                    user=self.username,
+                    password=self.password,
+                    connect_timeout=self.connect_timeout
+                )
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.CANAL_PARAMETROS}")
+                self.logger.info(f"Escutando alterações em {self.CANAL_PARAMETROS}")
+                espera = 1.0
+                self._avisar_assinantes(None)
+                
+                while not self._parar_escuta.is_set():
+                    if select.select([conn], [], [], self.INTERVALO_ESCUTA) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        aviso = conn.notifies.pop(0)
+                        self._avisar_assinantes(aviso.payload or None)
+                
+            except Exception as e:
+                # Avisa só a primeira falha de uma sequência; as demais vão para debug
+                registrar = self.logger.warning if espera == 1.0 else self.logger.debug
+                registrar(f"Escuta de parâmetros interrompida, nova tentativa em {espera:.0f}s: {e}")
+                self._avisar_assinantes(None)
+                self._parar_escuta.wait(espera)
+                espera = min(espera * 2, 60.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+    
+    def _avisar_assinantes(self, tipo_colheita: Optional[str]) -> None:
+        """Repassa o aviso aos callbacks; erro em um deles não derruba a escuta."""
+        for callback in list(self._assinantes_parametros):
+            try:
+                callback(tipo_colheita)
+            except Exception as e:
+                self.logger.error(f"Erro no callback de alteração de parâmetros: {e}")
+    
+    def _dados_producao(self, dados_producao: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de produção."""
+        return {
+            'localizacao': dados_producao['localizacao'],
+            'area_plantada_ha': dados_producao['area_plantada_ha'],
+            'qtd_colhida_toneladas': dados_producao['qtd_colhida_toneladas'],
+            'tipo_colheita': dados_producao['tipo_colheita'],
+            'data_colheita': dados_producao.get('data_colheita', datetime.now().date()),
+            'variedade_cana': dados_producao.get('variedade_cana'),
+            'idade_cana_meses': dados_producao.get('idade_cana_meses'),
+            'umidade_solo': dados_producao.get('umidade_solo'),
+            'temperatura_media': dados_producao.get('temperatura_media'),
+            'precipitacao_mm': dados_producao.get('precipitacao_mm')
+        }
+    
+    def _dados_perda(self, dados_perda: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de perda (fatores_perda em JSON)."""
+        # Converter fatores_perda para JSON se for dict
+        fatores_json = dados_perda.get('fatores_perda', {})
+        if isinstance(fatores_json, dict):
+            fatores_json = json.dumps(fatores_json)
+        
+        return {
+            'producao_id': dados_perda['producao_id'],
+            'perda_estimada_toneladas': dados_perda['perda_estimada_toneladas'],
+            'percentual_perda': dados_perda['percentual_perda'],
+            'fatores_perda': fatores_json,
+            'metodo_calculo': dados_perda.get('metodo_calculo', 'sistema_automatico'),
+            'observacoes': dados_perda.get('observacoes')
+        }
+    
+    def _filtro_data_colheita(self, data_inicio: date = None, data_fim: date = None) -> Tuple[str, Dict[str, Any]]:
+        """Monta o trecho WHERE e os parâmetros do filtro por período."""
+        filtro = ""
+        params = {}
+        
+        if data_inicio:
+            filtro += " AND data_colheita >= %(data_inicio)s"
+            params['data_inicio'] = data_inicio
+            
+        if data_fim:
+            filtro += " AND data_colheita <= %(data_fim)s"
+            params['data_fim'] = data_fim
+        
+        return filtro, params
+    
     def executar_sql_customizado(self, sql: str, params: Dict = None) -> List[Tuple]:
         """
         Executa SQL customizado (apenas SELECT).
@@ -342,4 +1510,25 @@ class PostgreSQLDatabase:
                 
         except Exception as e:
             self.logger.error(f"Erro ao executar SQL customizado: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+def _somar_meses(data: date, meses: int) -> date:
+    """Retorna o primeiro dia do mês `meses` meses após o de `data`."""
+    total = data.year * 12 + data.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _chave_producao(linha: Dict[str, Any]) -> Tuple[str, date, str]:
+    """Chave natural (localizacao, data_colheita, tipo_colheita) de uma produção."""
+    data_colheita = linha['data_colheita']
+    if isinstance(data_colheita, datetime):
+        data_colheita = data_colheita.date()
+    elif isinstance(data_colheita, str):
+        data_colheita = date.fromisoformat(data_colheita)
+    return linha['localizacao'], data_colheita, linha['tipo_colheita']
+
+
+def _chave_perda(linha: Dict[str, Any]) -> Tuple[int, str]:
+    """Chave natural (producao_id, metodo_calculo) de um cálculo de perda."""
+    return int(linha['producao_id']), linha['metodo_calculo']
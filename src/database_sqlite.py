@@ -0,0 +1,1165 @@
+"""
+Módulo para o banco embutido SQLite.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Mesmo esquema dos bancos Oracle e PostgreSQL, em um arquivo local: permite
+executar recálculos em lote e benchmarks sem servidor e sem rede.
+"""
+
+import sqlite3
+import logging
+import json
+import os
+from datetime import datetime, date, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
+from contextlib import contextmanager
+import pandas as pd
+
+from src.colunar import TIPOS_PRODUCAO, TIPOS_RELATORIO, montar_dataframe
+from src.instrumentation import ConexaoInstrumentada, MonitorConsultas, monitor_consultas
+from src.repository import RepositorioProducao
+
+
+# Datas gravadas como texto ISO e convertidas de volta pelo tipo declarado
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(sep=' '))
+sqlite3.register_converter("DATE", lambda valor: date.fromisoformat(valor.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda valor: datetime.fromisoformat(valor.decode()))
+
+
+ESQUEMA_SQLITE = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS producao_cana (
+    id INTEGER PRIMARY KEY,
+    localizacao VARCHAR(100) NOT NULL,
+    area_plantada_ha DECIMAL(10,2) NOT NULL CHECK (area_plantada_ha > 0),
+    qtd_colhida_toneladas DECIMAL(12,2) NOT NULL CHECK (qtd_colhida_toneladas >= 0),
+    tipo_colheita VARCHAR(20) NOT NULL CHECK (tipo_colheita IN ('manual', 'mecanizada')),
+    data_colheita DATE NOT NULL,
+    variedade_cana VARCHAR(50),
+    idade_cana_meses INTEGER CHECK (idade_cana_meses > 0),
+    umidade_solo DECIMAL(5,2) CHECK (umidade_solo BETWEEN 0 AND 100),
+    temperatura_media DECIMAL(4,1),
+    precipitacao_mm DECIMAL(6,2) CHECK (precipitacao_mm >= 0),
+    produtividade_toneladas_ha DECIMAL(6,2) GENERATED ALWAYS AS (qtd_colhida_toneladas * 1.0 / area_plantada_ha) STORED,
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS perdas_colheita (
+    id INTEGER PRIMARY KEY,
+    producao_id INTEGER NOT NULL REFERENCES producao_cana(id) ON DELETE CASCADE,
+    perda_estimada_toneladas DECIMAL(10,2) NOT NULL CHECK (perda_estimada_toneladas >= 0),
+    percentual_perda DECIMAL(5,2) NOT NULL CHECK (percentual_perda BETWEEN 0 AND 100),
+    fatores_perda TEXT CHECK (fatores_perda IS NULL OR json_valid(fatores_perda)),
+    metodo_calculo VARCHAR(50) NOT NULL,
+    observacoes TEXT,
+    calculado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS parametros_perdas (
+    id INTEGER PRIMARY KEY,
+    tipo_colheita VARCHAR(20) NOT NULL CHECK (tipo_colheita IN ('manual', 'mecanizada')),
+    fator_base_perda DECIMAL(4,3) NOT NULL CHECK (fator_base_perda BETWEEN 0 AND 1),
+    fator_umidade DECIMAL(4,3) DEFAULT 0,
+    fator_idade DECIMAL(4,3) DEFAULT 0,
+    fator_clima DECIMAL(4,3) DEFAULT 0,
+    descricao VARCHAR(200),
+    ativo INTEGER DEFAULT 1 CHECK (ativo IN (0, 1)),
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (tipo_colheita, ativo)
+);
+
+INSERT OR IGNORE INTO parametros_perdas (tipo_colheita, fator_base_perda, fator_umidade, fator_idade, fator_clima, descricao) VALUES
+('manual', 0.05, 0.02, 0.01, 0.015, 'Parâmetros para colheita manual - perda base 5%'),
+('mecanizada', 0.08, 0.025, 0.015, 0.02, 'Parâmetros para colheita mecanizada - perda base 8%');
+
+CREATE INDEX IF NOT EXISTS idx_producao_tipo ON producao_cana(tipo_colheita);
+CREATE INDEX IF NOT EXISTS idx_producao_local ON producao_cana(localizacao);
+
+-- Índices compostos e de cobertura (ver SQLiteDatabase.INDICES_COBERTURA)
+CREATE INDEX IF NOT EXISTS idx_producao_data_id
+    ON producao_cana(data_colheita DESC, id DESC, localizacao, tipo_colheita,
+                     area_plantada_ha, qtd_colhida_toneladas);
+CREATE INDEX IF NOT EXISTS idx_perdas_producao_cobertura
+    ON perdas_colheita(producao_id, perda_estimada_toneladas, percentual_perda,
+                       metodo_calculo, calculado_em);
+DROP INDEX IF EXISTS idx_producao_data;
+DROP INDEX IF EXISTS idx_perdas_producao;
+
+-- Fatores de fatores_perda (ver SQLiteDatabase.EXPRESSAO_FATOR)
+CREATE INDEX IF NOT EXISTS idx_perdas_fator_umidade
+    ON perdas_colheita(json_extract(fatores_perda, '$.fator_umidade'));
+CREATE INDEX IF NOT EXISTS idx_perdas_fator_idade
+    ON perdas_colheita(json_extract(fatores_perda, '$.fator_idade'));
+CREATE INDEX IF NOT EXISTS idx_perdas_fator_clima
+    ON perdas_colheita(json_extract(fatores_perda, '$.fator_clima'));
+
+-- Chaves naturais usadas pelos upserts
+CREATE UNIQUE INDEX IF NOT EXISTS uk_producao_natural
+    ON producao_cana(localizacao, data_colheita, tipo_colheita);
+CREATE UNIQUE INDEX IF NOT EXISTS uk_perdas_producao_metodo
+    ON perdas_colheita(producao_id, metodo_calculo);
+
+CREATE VIEW IF NOT EXISTS vw_relatorio_perdas AS
+SELECT
+    p.id,
+    p.localizacao,
+    p.area_plantada_ha,
+    p.qtd_colhida_toneladas,
+    p.tipo_colheita,
+    p.data_colheita,
+    p.produtividade_toneladas_ha,
+    l.perda_estimada_toneladas,
+    l.percentual_perda,
+    l.metodo_calculo,
+    l.calculado_em,
+    (p.qtd_colhida_toneladas + l.perda_estimada_toneladas) AS producao_potencial_toneladas
+FROM producao_cana p
+LEFT JOIN perdas_colheita l ON p.id = l.producao_id;
+"""
+
+
+class SQLiteDatabase(RepositorioProducao):
+    """Classe para gerenciar o banco embutido SQLite."""
+    
+    # Colunas do relatório de perdas (iguais às dos outros bancos)
+    COLUNAS_RELATORIO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, produtividade_toneladas_ha, perda_estimada_toneladas, "
+        "percentual_perda, metodo_calculo, calculado_em, producao_potencial_toneladas"
+    )
+    
+    # Colunas de produção usadas nas leituras em lote (buscar_producoes_por_ids)
+    COLUNAS_PRODUCAO = (
+        "id, localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita, "
+        "data_colheita, variedade_cana, idade_cana_meses, umidade_solo, "
+        "temperatura_media, precipitacao_mm, produtividade_toneladas_ha"
+    )
+    
+    # Expressões SQL aceitas em resumir_perdas_por (lista fechada contra injeção)
+    AGRUPAMENTOS_RELATORIO = {
+        'tipo_colheita': "tipo_colheita",
+        'localizacao': "localizacao",
+        'mes': "date(data_colheita, 'start of month')"
+    }
+    
+    # Índices compostos e de cobertura ajustados às consultas: listar_producoes
+    # e iterar_producoes ordenam por (data_colheita, id) e o relatório filtra
+    # por data e junta as perdas por producao_id; as colunas lidas estão no
+    # índice (COVERING INDEX). O SQLite não lê colunas geradas do índice, então
+    # consultas com produtividade_toneladas_ha ainda buscam a linha pelo rowid.
+    INDICES_COBERTURA = ('idx_producao_data_id', 'idx_perdas_producao_cobertura')
+    
+    # Fatores de fatores_perda: índices de expressão sobre json_extract (no
+    # esquema) atendem filtros por faixa de cada fator; fator_base fica sem
+    # índice, pois só há um valor por tipo de colheita
+    EXPRESSAO_FATOR = "json_extract(fatores_perda, '$.{fator}')"
+    INDICES_FATORES = ('idx_perdas_fator_umidade', 'idx_perdas_fator_idade', 'idx_perdas_fator_clima')
+    
+    # Comandos reaproveitados pelas versões unitária e em lote
+    SQL_INSERIR_PRODUCAO = """
+    INSERT INTO producao_cana
+    (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita,
+     data_colheita, variedade_cana, idade_cana_meses, umidade_solo,
+     temperatura_media, precipitacao_mm)
+    VALUES
+    (:localizacao, :area_plantada_ha, :qtd_colhida_toneladas, :tipo_colheita,
+     :data_colheita, :variedade_cana, :idade_cana_meses, :umidade_solo,
+     :temperatura_media, :precipitacao_mm)
+    """
+    
+    SQL_INSERIR_PERDA = """
+    INSERT INTO perdas_colheita
+    (producao_id, perda_estimada_toneladas, percentual_perda,
+     fatores_perda, metodo_calculo, observacoes)
+    VALUES
+    (:producao_id, :perda_estimada_toneladas, :percentual_perda,
+     :fatores_perda, :metodo_calculo, :observacoes)
+    """
+    
+    # Upserts pela chave natural; o WHERE evita regravar linhas idênticas
+    # (nesse caso o RETURNING não devolve nada e o ID é lido por SQL_ID_*).
+    # Com :registrado_em (reenvio do spool), esse instante é o gravado e a
+    # linha não é alterada se já foi atualizada depois dele
+    SQL_UPSERT_PRODUCAO = """
+    INSERT INTO producao_cana
+    (localizacao, area_plantada_ha, qtd_colhida_toneladas, tipo_colheita,
+     data_colheita, variedade_cana, idade_cana_meses, umidade_solo,
+     temperatura_media, precipitacao_mm, data_atualizacao)
+    VALUES
+    (:localizacao, :area_plantada_ha, :qtd_colhida_toneladas, :tipo_colheita,
+     :data_colheita, :variedade_cana, :idade_cana_meses, :umidade_solo,
+     :temperatura_media, :precipitacao_mm, COALESCE(:registrado_em, CURRENT_TIMESTAMP))
+    ON CONFLICT (localizacao, data_colheita, tipo_colheita) DO UPDATE SET
+        area_plantada_ha = excluded.area_plantada_ha,
+        qtd_colhida_toneladas = excluded.qtd_colhida_toneladas,
+        variedade_cana = excluded.variedade_cana,
+        idade_cana_meses = excluded.idade_cana_meses,
+        umidade_solo = excluded.umidade_solo,
+        temperatura_media = excluded.temperatura_media,
+        precipitacao_mm = excluded.precipitacao_mm,
+        data_atualizacao = excluded.data_atualizacao
+    WHERE (area_plantada_ha, qtd_colhida_toneladas, variedade_cana, idade_cana_meses,
+           umidade_solo, temperatura_media, precipitacao_mm)
+          IS NOT
+          (excluded.area_plantada_ha, excluded.qtd_colhida_toneladas, excluded.variedade_cana,
+           excluded.idade_cana_meses, excluded.umidade_solo, excluded.temperatura_media,
+           excluded.precipitacao_mm)
+      AND (:registrado_em IS NULL OR data_atualizacao <= excluded.data_atualizacao)
+    RETURNING id
+    """
+    
+    SQL_ID_PRODUCAO = """
+    SELECT id FROM producao_cana
+    WHERE localizacao = :localizacao AND data_colheita = :data_colheita
+      AND tipo_colheita = :tipo_colheita
+    """
+    
+    SQL_UPSERT_PERDA = """
+    INSERT INTO perdas_colheita
+    (producao_id, perda_estimada_toneladas, percentual_perda,
+     fatores_perda, metodo_calculo, observacoes, calculado_em)
+    VALUES
+    (:producao_id, :perda_estimada_toneladas, :percentual_perda,
+     :fatores_perda, :metodo_calculo, :observacoes, COALESCE(:registrado_em, CURRENT_TIMESTAMP))
+    ON CONFLICT (producao_id, metodo_calculo) DO UPDATE SET
+        perda_estimada_toneladas = excluded.perda_estimada_toneladas,
+        percentual_perda = excluded.percentual_perda,
+        fatores_perda = excluded.fatores_perda,
+        observacoes = excluded.observacoes,
+        calculado_em = excluded.calculado_em
+    WHERE (perda_estimada_toneladas, percentual_perda, fatores_perda, observacoes)
+          IS NOT
+          (excluded.perda_estimada_toneladas, excluded.percentual_perda,
+           excluded.fatores_perda, excluded.observacoes)
+      AND (:registrado_em IS NULL OR calculado_em <= excluded.calculado_em)
+    RETURNING id
+    """
+    
+    SQL_ID_PERDA = """
+    SELECT id FROM perdas_colheita
+    WHERE producao_id = :producao_id AND metodo_calculo = :metodo_calculo
+    """
+    
+    # Mesma fórmula de CalculadoraPerdas.calcular_perda_avancada em um único
+    # INSERT ... SELECT (equivalente à função recalcular_perdas dos outros bancos)
+    SQL_RECALCULAR_PERDAS = """
+    WITH fatores AS (
+        SELECT p.id AS producao_id,
+               p.tipo_colheita,
+               p.qtd_colhida_toneladas,
+               p.umidade_solo,
+               p.idade_cana_meses,
+               pp.fator_base_perda AS fator_base,
+               CASE WHEN p.umidade_solo IS NULL THEN NULL
+                    WHEN p.umidade_solo BETWEEN 60 AND 70 THEN 0.0
+                    WHEN p.umidade_solo < 60 THEN pp.fator_umidade * (60 - p.umidade_solo) / 30.0
+                    ELSE pp.fator_umidade * (p.umidade_solo - 70) / 30.0
+               END AS fator_umidade,
+               CASE WHEN p.idade_cana_meses IS NULL THEN NULL
+                    WHEN p.idade_cana_meses BETWEEN 12 AND 18 THEN 0.0
+                    WHEN p.idade_cana_meses < 12 THEN pp.fator_idade * (12 - p.idade_cana_meses) / 6.0
+                    ELSE pp.fator_idade * (p.idade_cana_meses - 18) / 12.0
+               END AS fator_idade,
+               CASE WHEN p.temperatura_media IS NULL OR p.precipitacao_mm IS NULL THEN NULL
+                    ELSE (CASE WHEN p.temperatura_media < 25 THEN pp.fator_clima * (25 - p.temperatura_media) / 10.0
+                               WHEN p.temperatura_media > 30 THEN pp.fator_clima * (p.temperatura_media - 30) / 10.0
+                               ELSE 0.0
+                          END
+                        + CASE WHEN p.precipitacao_mm < 80 THEN pp.fator_clima * (80 - p.precipitacao_mm) / 80.0
+                               WHEN p.precipitacao_mm > 125 THEN pp.fator_clima * (p.precipitacao_mm - 125) / 125.0
+                               ELSE 0.0
+                          END) / 2
+               END AS fator_clima
+        FROM producao_cana p
+        JOIN parametros_perdas pp ON pp.tipo_colheita = p.tipo_colheita AND pp.ativo = 1
+        WHERE (:data_inicio IS NULL OR p.data_colheita >= :data_inicio)
+          AND (:data_fim IS NULL OR p.data_colheita <= :data_fim)
+    ),
+    calculadas AS (
+        SELECT f.*,
+               MIN(f.fator_base + IFNULL(f.fator_umidade, 0) + IFNULL(f.fator_idade, 0)
+                   + IFNULL(f.fator_clima, 0), 0.25) AS fator_total,
+               -- Umidade como o Python a exibe (58.0, 72.5)
+               CASE WHEN f.umidade_solo = CAST(f.umidade_solo AS INTEGER)
+                    THEN CAST(f.umidade_solo AS INTEGER) || '.0'
+                    ELSE CAST(f.umidade_solo AS REAL) || ''
+               END AS umidade_texto
+        FROM fatores f
+    )
+    INSERT INTO perdas_colheita
+    (producao_id, perda_estimada_toneladas, percentual_perda,
+     fatores_perda, metodo_calculo, observacoes)
+    SELECT producao_id,
+           ROUND(qtd_colhida_toneladas * fator_total, 2),
+           ROUND(fator_total * 100, 2),
+           -- json_patch descarta as chaves nulas (fatores não aplicados)
+           json_patch('{}', json_object(
+               'fator_base', fator_base,
+               'fator_umidade', fator_umidade,
+               'fator_idade', fator_idade,
+               'fator_clima', fator_clima
+           )),
+           'avancado',
+           'Cálculo avançado para colheita ' || tipo_colheita
+           || CASE WHEN fator_umidade <> 0 AND umidade_solo < 60
+                       THEN '; Solo seco (' || umidade_texto || '%) aumentou perdas'
+                   WHEN fator_umidade <> 0 AND umidade_solo > 70
+                       THEN '; Solo muito úmido (' || umidade_texto || '%) aumentou perdas'
+                   ELSE ''
+              END
+           || CASE WHEN fator_idade <> 0 AND idade_cana_meses < 12
+                       THEN '; Cana jovem (' || idade_cana_meses || ' meses) gerou mais perdas'
+                   WHEN fator_idade <> 0 AND idade_cana_meses > 18
+                       THEN '; Cana madura (' || idade_cana_meses || ' meses) gerou mais perdas'
+                   ELSE ''
+              END
+           || CASE WHEN fator_clima <> 0 THEN '; Condições climáticas adversas identificadas' ELSE '' END
+    FROM calculadas
+    WHERE true
+    ON CONFLICT (producao_id, metodo_calculo) DO UPDATE SET
+        perda_estimada_toneladas = excluded.perda_estimada_toneladas,
+        percentual_perda = excluded.percentual_perda,
+        fatores_perda = excluded.fatores_perda,
+        observacoes = excluded.observacoes,
+        calculado_em = CURRENT_TIMESTAMP
+    WHERE (perda_estimada_toneladas, percentual_perda, fatores_perda, observacoes)
+          IS NOT
+          (excluded.perda_estimada_toneladas, excluded.percentual_perda,
+           excluded.fatores_perda, excluded.observacoes)
+    """
+    
+    def __init__(self, caminho: str = "data/cana.db",
+                 monitor: Optional[MonitorConsultas] = None):
+        """
+        Abre (ou cria) o banco SQLite e garante o esquema.
+        
+        Args:
+            caminho: Arquivo do banco (criado se não existir)
+            monitor: Destino das métricas de consultas (padrão: o
+                monitor compartilhado monitor_consultas)
+        """
+        self.caminho = caminho
+        self.visao_relatorio = "vw_relatorio_perdas"
+        
+        # Métricas de consultas (tempo, linhas, binds) e contadores de conexão
+        self.monitor = monitor if monitor is not None else monitor_consultas
+        
+        # Configurar logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+        
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        
+        with self.get_connection() as conn:
+            conn.executescript(ESQUEMA_SQLITE)
+    
+    @contextmanager
+    def get_connection(self):
+        """
+        Context manager para conexões com o banco.
+        
+        A conexão fica em modo autocommit; operações em lote abrem a
+        própria transação com BEGIN/COMMIT.
+        
+        Yields:
+            ConexaoInstrumentada: Conexão ativa com o banco (sqlite3),
+            com os comandos medidos pelo monitor de consultas
+        """
+        connection = None
+        try:
+            conexao_sqlite = sqlite3.connect(
+                self.caminho,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None
+            )
+            conexao_sqlite.row_factory = sqlite3.Row
+            conexao_sqlite.execute("PRAGMA foreign_keys = ON")
+            # Em WAL, NORMAL só sincroniza no checkpoint: seguro e bem mais rápido
+            conexao_sqlite.execute("PRAGMA synchronous = NORMAL")
+            connection = ConexaoInstrumentada(conexao_sqlite, self.monitor)
+            self.monitor.contar('conexoes_abertas')
+            yield connection
+        except sqlite3.Error as e:
+            self.monitor.contar('erros_banco')
+            self.logger.error(f"Erro de banco SQLite: {e}")
+            raise
+        finally:
+            if connection:
+                connection.close()
+                self.monitor.contar('conexoes_fechadas')
+    
+    def test_connection(self) -> bool:
+        """
+        Testa a conexão com o banco.
+        
+        Returns:
+            bool: True se conexão for bem-sucedida
+        """
+        try:
+            with self.get_connection() as conn:
+                return conn.execute("SELECT 1 AS test").fetchone()['test'] == 1
+        except Exception as e:
+            self.logger.error(f"Falha no teste de conexão: {e}")
+            return False
+    
+    def inserir_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """
+        Insere dados de produção de cana no banco.
+        
+        Args:
+            dados_producao: Dicionário com dados da produção
+        
+        Returns:
+            int: ID do registro inserido
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.execute(self.SQL_INSERIR_PRODUCAO, self._dados_producao(dados_producao))
+                
+                registro_id = cursor.lastrowid
+                self.logger.info(f"Produção inserida com ID: {registro_id}")
+                return registro_id
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir produção: {e}")
+            raise
+    
+    def inserir_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere várias produções em uma única transação.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+        
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        try:
+            with self.get_connection() as conn:
+                ids = self._inserir_em_transacao(
+                    conn, self.SQL_INSERIR_PRODUCAO,
+                    (self._dados_producao(dados) for dados in lista_producoes)
+                )
+                
+                self.logger.info(f"{len(ids)} produções inseridas em lote")
+                return ids
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir produções em lote: {e}")
+            raise
+    
+    def inserir_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """
+        Insere cálculo de perda no banco.
+        
+        Args:
+            dados_perda: Dicionário com dados da perda calculada
+        
+        Returns:
+            int: ID do registro de perda inserido
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.execute(self.SQL_INSERIR_PERDA, self._dados_perda(dados_perda))
+                
+                registro_id = cursor.lastrowid
+                self.logger.info(f"Perda inserida com ID: {registro_id}")
+                return registro_id
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir perda: {e}")
+            raise
+    
+    def inserir_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere vários cálculos de perda em uma única transação.
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+        
+        Returns:
+            Lista de IDs inseridos, na ordem da entrada
+        """
+        try:
+            with self.get_connection() as conn:
+                ids = self._inserir_em_transacao(
+                    conn, self.SQL_INSERIR_PERDA,
+                    (self._dados_perda(dados) for dados in lista_perdas)
+                )
+                
+                self.logger.info(f"{len(ids)} perdas inseridas em lote")
+                return ids
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir perdas em lote: {e}")
+            raise
+    
+    def upsert_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """
+        Insere a produção ou atualiza a existente com a mesma chave natural
+        (localizacao, data_colheita, tipo_colheita).
+        
+        Args:
+            dados_producao: Dicionário com dados da produção
+        
+        Returns:
+            int: ID da produção inserida ou atualizada
+        """
+        return self.upsert_producoes_em_lote([dados_producao])[0]
+    
+    def upsert_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere ou atualiza várias produções em uma única transação.
+        
+        Linhas que já existem com os mesmos valores não são regravadas, de
+        modo que reprocessar um lote não cresce a tabela nem gera escrita.
+        
+        Args:
+            lista_producoes: Dicionários com dados das produções
+        
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        try:
+            with self.get_connection() as conn:
+                ids = self._upsert_em_transacao(
+                    conn, self.SQL_UPSERT_PRODUCAO, self.SQL_ID_PRODUCAO,
+                    ({**self._dados_producao(dados), 'registrado_em': _instante_utc(dados.get('registrado_em'))}
+                     for dados in lista_producoes)
+                )
+                
+                self.logger.info(f"{len(ids)} produções gravadas em lote (upsert)")
+                return ids
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar produções em lote (upsert): {e}")
+            raise
+    
+    def upsert_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """
+        Insere o cálculo de perda ou atualiza o existente da mesma produção
+        e método de cálculo.
+        
+        Args:
+            dados_perda: Dicionário com dados da perda calculada
+        
+        Returns:
+            int: ID do registro de perda inserido ou atualizado
+        """
+        return self.upsert_perdas_em_lote([dados_perda])[0]
+    
+    def upsert_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insere ou atualiza vários cálculos de perda em uma única transação,
+        pela chave (producao_id, metodo_calculo).
+        
+        Args:
+            lista_perdas: Dicionários com dados das perdas calculadas
+        
+        Returns:
+            Lista de IDs, na ordem da entrada (chaves repetidas recebem o mesmo ID)
+        """
+        try:
+            with self.get_connection() as conn:
+                ids = self._upsert_em_transacao(
+                    conn, self.SQL_UPSERT_PERDA, self.SQL_ID_PERDA,
+                    ({**self._dados_perda(dados), 'registrado_em': _instante_utc(dados.get('registrado_em'))}
+                     for dados in lista_perdas)
+                )
+                
+                self.logger.info(f"{len(ids)} perdas gravadas em lote (upsert)")
+                return ids
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar perdas em lote (upsert): {e}")
+            raise
+    
+    def buscar_producao_por_id(self, producao_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Busca dados de produção por ID.
+        
+        Args:
+            producao_id: ID da produção
+        
+        Returns:
+            Dict com dados da produção ou None se não encontrada
+        """
+        sql = """
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, variedade_cana, idade_cana_meses,
+               umidade_solo, temperatura_media, precipitacao_mm, produtividade_toneladas_ha,
+               data_criacao, data_atualizacao
+        FROM producao_cana
+        WHERE id = :producao_id
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute(sql, {'producao_id': producao_id}).fetchone()
+                return dict(row) if row else None
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar produção {producao_id}: {e}")
+            raise
+    
+    def buscar_producoes_por_ids(self, producao_ids: Iterable[int],
+                                 tamanho_lote: int = 10000) -> pd.DataFrame:
+        """
+        Busca várias produções pelos IDs, em poucas idas ao banco.
+        
+        Os IDs (sem repetição) são enviados em blocos de `tamanho_lote`,
+        cada bloco como um único parâmetro array JSON (json_each); o resultado vem em
+        formato colunar, pronto para cálculo em lote.
+        
+        Args:
+            producao_ids: IDs das produções (até dezenas de milhares)
+            tamanho_lote: Quantidade de IDs por consulta
+            
+        Returns:
+            DataFrame com uma linha por produção encontrada (ordenado por
+            id) e as colunas de COLUNAS_PRODUCAO; IDs inexistentes são omitidos
+        """
+        sql = f"""
+        SELECT {self.COLUNAS_PRODUCAO}
+        FROM producao_cana
+        WHERE id IN (SELECT value FROM json_each(:ids))
+        """
+        
+        ids = sorted({int(producao_id) for producao_id in producao_ids})
+        colunas = [coluna.strip() for coluna in self.COLUNAS_PRODUCAO.split(',')]
+        blocos = []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                # Tuplas simples: evita criar um objeto Row por linha
+                cursor.row_factory = None
+                
+                for inicio in range(0, len(ids), tamanho_lote):
+                    cursor.execute(sql, {'ids': json.dumps(ids[inicio:inicio + tamanho_lote])})
+                    blocos.extend(cursor.fetchall())
+                
+            producoes = montar_dataframe(blocos, colunas, TIPOS_PRODUCAO)
+            return producoes.sort_values('id', ignore_index=True)
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar produções por IDs: {e}")
+            raise
+    
+    def buscar_parametros_perdas(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca parâmetros para cálculo de perdas por tipo de colheita.
+        
+        Args:
+            tipo_colheita: 'manual' ou 'mecanizada'
+        
+        Returns:
+            Dict com parâmetros ou None se não encontrados
+        """
+        sql = """
+        SELECT tipo_colheita, fator_base_perda, fator_umidade,
+               fator_idade, fator_clima, descricao
+        FROM parametros_perdas
+        WHERE tipo_colheita = :tipo_colheita AND ativo = 1
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute(sql, {'tipo_colheita': tipo_colheita}).fetchone()
+                return dict(row) if row else None
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar parâmetros para {tipo_colheita}: {e}")
+            raise
+    
+    def listar_producoes(self, limite: int = 50,
+                         apos: Optional[Tuple[date, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Lista produções cadastradas usando paginação por chave (keyset).
+        
+        Args:
+            limite: Número máximo de registros a retornar
+            apos: Cursor (data_colheita, id) do último registro da página
+                anterior; None para a primeira página
+        
+        Returns:
+            Lista de dicionários com dados das produções
+        """
+        sql = """
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, produtividade_toneladas_ha
+        FROM producao_cana
+        """
+        
+        params = {'limite': limite}
+        
+        if apos:
+            sql += " WHERE (data_colheita, id) < (:apos_data, :apos_id)"
+            params['apos_data'], params['apos_id'] = apos
+        
+        sql += " ORDER BY data_colheita DESC, id DESC LIMIT :limite"
+        
+        try:
+            with self.get_connection() as conn:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao listar produções: {e}")
+            raise
+    
+    def iterar_producoes(self,
+                         tamanho_lote: int = 1000,
+                         data_inicio: date = None,
+                         data_fim: date = None) -> Iterator[Dict[str, Any]]:
+        """
+        Percorre toda a tabela de produções em lotes.
+        
+        Args:
+            tamanho_lote: Quantidade de linhas lidas por vez
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Yields:
+            Dicionário com dados completos de cada produção
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT id, localizacao, area_plantada_ha, qtd_colhida_toneladas,
+               tipo_colheita, data_colheita, variedade_cana, idade_cana_meses,
+               umidade_solo, temperatura_media, precipitacao_mm, produtividade_toneladas_ha,
+               data_criacao, data_atualizacao
+        FROM producao_cana
+        WHERE 1=1 {filtro}
+        ORDER BY data_colheita DESC, id DESC
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.execute(sql, params)
+                
+                while True:
+                    rows = cursor.fetchmany(tamanho_lote)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao percorrer produções: {e}")
+            raise
+    
+    def gerar_relatorio_perdas_em_lotes(self,
+                                        data_inicio: date = None,
+                                        data_fim: date = None,
+                                        tamanho_lote: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Gera o relatório consolidado de perdas em blocos de DataFrame.
+        
+        Quando não há dados, é produzido um único DataFrame vazio com as
+        colunas do relatório.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+            tamanho_lote: Número de linhas por DataFrame
+        
+        Yields:
+            DataFrame do pandas com até `tamanho_lote` linhas do relatório
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT {self.COLUNAS_RELATORIO} FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        ORDER BY data_colheita DESC
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                # Tuplas simples: evita criar um objeto Row por linha
+                cursor.row_factory = None
+                cursor.execute(sql, params)
+                
+                colunas = [desc[0] for desc in cursor.description]
+                
+                algum_lote = False
+                while True:
+                    rows = cursor.fetchmany(tamanho_lote)
+                    if not rows:
+                        break
+                    algum_lote = True
+                    yield montar_dataframe(rows, colunas, TIPOS_RELATORIO)
+                
+                if not algum_lote:
+                    yield montar_dataframe([], colunas, TIPOS_RELATORIO)
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao gerar relatório: {e}")
+            raise
+    
+    def resumir_perdas(self, data_inicio: date = None, data_fim: date = None) -> Dict[str, Any]:
+        """
+        Calcula os totais do relatório de perdas diretamente no banco.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            Dict com total_registros, total_colhido, total_perdas e
+            perda_media (None quando não há cálculos de perda)
+        """
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT COUNT(*) AS total_registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0.0) AS total_colhido,
+               COALESCE(SUM(perda_estimada_toneladas), 0.0) AS total_perdas,
+               AVG(percentual_perda) AS perda_media
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                return dict(conn.execute(sql, params).fetchone())
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao resumir perdas: {e}")
+            raise
+    
+    def resumir_perdas_por(self,
+                           agrupamento: str,
+                           data_inicio: date = None,
+                           data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega o relatório de perdas no banco por tipo, localização ou mês.
+        
+        Args:
+            agrupamento: 'tipo_colheita', 'localizacao' ou 'mes'
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            Lista de dicionários (um por grupo) com registros,
+            qtd_colhida_toneladas, perda_estimada_toneladas e percentual_perda
+        """
+        if agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self.AGRUPAMENTOS_RELATORIO[agrupamento]
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        
+        sql = f"""
+        SELECT {expressao} AS {agrupamento},
+               COUNT(*) AS registros,
+               COALESCE(SUM(qtd_colhida_toneladas), 0.0) AS qtd_colhida_toneladas,
+               COALESCE(SUM(perda_estimada_toneladas), 0.0) AS perda_estimada_toneladas,
+               ROUND(AVG(percentual_perda), 2) AS percentual_perda
+        FROM {self.visao_relatorio}
+        WHERE 1=1 {filtro}
+        GROUP BY {expressao}
+        ORDER BY {expressao}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao agrupar perdas por {agrupamento}: {e}")
+            raise
+    
+    def buscar_perdas_por_fator(self, fator: str, minimo: float = None, maximo: float = None,
+                                limite: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Busca as perdas que aplicaram um fator, opcionalmente numa faixa de valores.
+        
+        O filtro roda no banco com json_extract (índices de expressão), sem
+        trazer fatores_perda para o Python.
+        
+        Args:
+            fator: Um de FATORES_PERDA (ex.: 'fator_umidade')
+            minimo: Valor mínimo do fator, inclusive (opcional)
+            maximo: Valor máximo do fator, inclusive (opcional)
+            limite: Número máximo de perdas retornadas
+        
+        Returns:
+            Lista de dicionários com id, producao_id, valor_fator,
+            perda_estimada_toneladas, percentual_perda, metodo_calculo e
+            calculado_em, do maior valor do fator para o menor
+        """
+        expressao = self._expressao_fator(fator)
+        
+        sql = f"""
+        SELECT id, producao_id, {expressao} AS valor_fator,
+               perda_estimada_toneladas, percentual_perda,
+               metodo_calculo, calculado_em
+        FROM perdas_colheita
+        WHERE {expressao} IS NOT NULL
+        """
+        
+        params = {'limite': limite}
+        
+        if minimo is not None:
+            sql += f" AND {expressao} >= :minimo"
+            params['minimo'] = minimo
+        
+        if maximo is not None:
+            sql += f" AND {expressao} <= :maximo"
+            params['maximo'] = maximo
+        
+        sql += f" ORDER BY {expressao} DESC, id LIMIT :limite"
+        
+        try:
+            with self.get_connection() as conn:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar perdas por {fator}: {e}")
+            raise
+    
+    def agregar_fator(self, fator: str, agrupamento: Optional[str] = None,
+                      data_inicio: date = None, data_fim: date = None) -> List[Dict[str, Any]]:
+        """
+        Agrega um fator no banco, no total ou por tipo, localização ou mês.
+        
+        Args:
+            fator: Um de FATORES_PERDA (ex.: 'fator_umidade')
+            agrupamento: 'tipo_colheita', 'localizacao', 'mes' ou None (total)
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            Lista de dicionários (um por grupo) com registros, minimo, media
+            e maximo do fator e percentual_perda médio
+        """
+        if agrupamento is not None and agrupamento not in self.AGRUPAMENTOS_RELATORIO:
+            raise ValueError(f"Agrupamento deve ser um de: {', '.join(self.AGRUPAMENTOS_RELATORIO)}")
+        
+        expressao = self._expressao_fator(fator)
+        filtro, params = self._filtro_data_colheita(data_inicio, data_fim)
+        grupo = self.AGRUPAMENTOS_RELATORIO.get(agrupamento)
+        
+        sql = f"""
+        SELECT {f'{grupo} AS {agrupamento},' if grupo else ''}
+               COUNT(*) AS registros,
+               MIN(valor_fator) AS minimo,
+               AVG(valor_fator) AS media,
+               MAX(valor_fator) AS maximo,
+               ROUND(AVG(percentual_perda), 2) AS percentual_perda
+        FROM (
+            SELECT p.tipo_colheita, p.localizacao, p.data_colheita,
+                   l.percentual_perda, {expressao} AS valor_fator
+            FROM perdas_colheita l
+            JOIN producao_cana p ON p.id = l.producao_id
+            WHERE {expressao} IS NOT NULL
+        ) f
+        WHERE 1=1 {filtro}
+        {f'GROUP BY {grupo} ORDER BY {grupo}' if grupo else ''}
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao agregar {fator}: {e}")
+            raise
+    
+    def recalcular_perdas_no_banco(self, data_inicio: date = None, data_fim: date = None) -> int:
+        """
+        Recalcula as perdas 'avancado' das produções do período dentro do banco.
+        
+        Aplica a fórmula de CalculadoraPerdas.calcular_perda_avancada com os
+        parâmetros ativos em um único comando (SQL_RECALCULAR_PERDAS), sem
+        trazer as produções para o Python.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            Quantidade de perdas inseridas ou alteradas
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute(self.SQL_RECALCULAR_PERDAS,
+                             {'data_inicio': data_inicio, 'data_fim': data_fim})
+                # rowcount não é preenchido para comandos iniciados por WITH
+                linhas = conn.execute("SELECT changes()").fetchone()[0]
+                
+                self.logger.info(f"{linhas} perdas recalculadas no banco")
+                return linhas
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao recalcular perdas no banco: {e}")
+            raise
+    
+    def garantir_indices(self) -> List[str]:
+        """
+        Garante os índices de INDICES_COBERTURA e INDICES_FATORES e atualiza as estatísticas.
+        
+        O esquema (ESQUEMA_SQLITE) já os cria ao abrir o banco; aqui só é
+        preciso rodar ANALYZE para o planejador conhecer a seletividade.
+        
+        Returns:
+            Lista com os nomes dos índices criados
+        """
+        sql_existentes = "SELECT name FROM sqlite_master WHERE type = 'index'"
+        
+        try:
+            with self.get_connection() as conn:
+                existentes = {row[0] for row in conn.execute(sql_existentes).fetchall()}
+                conn.executescript(ESQUEMA_SQLITE)
+                conn.execute("ANALYZE")
+                criados = [nome for nome in self.INDICES_COBERTURA + self.INDICES_FATORES
+                           if nome not in existentes]
+            
+            if criados:
+                self.logger.info(f"Índices criados: {', '.join(criados)}")
+            return criados
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao garantir índices: {e}")
+            raise
+    
+    def executar_sql_customizado(self, sql: str, params: Dict = None) -> List[Tuple]:
+        """
+        Executa SQL customizado (apenas SELECT).
+        
+        Args:
+            sql: Comando SQL SELECT
+            params: Parâmetros para o SQL
+        
+        Returns:
+            Lista de tuplas com resultados
+        """
+        if not sql.strip().upper().startswith('SELECT'):
+            raise ValueError("Apenas comandos SELECT são permitidos")
+        
+        try:
+            with self.get_connection() as conn:
+                return [tuple(row) for row in conn.execute(sql, params or {}).fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao executar SQL customizado: {e}")
+            raise
+    
+    def atualizar_relatorio_materializado(self, *args, **kwargs) -> None:
+        """Sem relatório materializado no SQLite: os relatórios leem a view; nada a fazer."""
+    
+    def status_relatorio_materializado(self) -> Dict[str, Any]:
+        """
+        Situação do relatório materializado, que não existe no SQLite.
+        
+        Returns:
+            Dict com disponivel=False, desatualizado=False (a view é sempre
+            atual), atualizado_em=None e situacao
+        """
+        return {
+            'disponivel': False,
+            'desatualizado': False,
+            'atualizado_em': None,
+            'situacao': 'inexistente (relatórios leem vw_relatorio_perdas)'
+        }
+    
+    def criar_particoes_futuras(self, meses_a_frente: int = 3) -> List[str]:
+        """SQLite não particiona producao_cana: nenhuma partição a criar."""
+        return []
+    
+    def arquivar_particoes(self, anteriores_a: date) -> List[str]:
+        """SQLite não particiona producao_cana: nenhuma partição a arquivar."""
+        return []
+    
+    def _inserir_em_transacao(self, conn: ConexaoInstrumentada, sql: str,
+                              linhas: Iterable[Dict[str, Any]]) -> List[int]:
+        """Executa o INSERT para cada linha em uma transação e devolve os IDs."""
+        # Sem rede, um execute por linha dentro da transação custa pouco;
+        # executemany não devolve lastrowid de cada linha
+        ids = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for linha in linhas:
+                ids.append(conn.execute(sql, linha).lastrowid)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+    
+    def _upsert_em_transacao(self, conn: ConexaoInstrumentada, sql_upsert: str,
+                             sql_id: str, linhas: Iterable[Dict[str, Any]]) -> List[int]:
+        """Executa o upsert para cada linha em uma transação e devolve os IDs."""
+        ids = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for linha in linhas:
+                gravada = conn.execute(sql_upsert, linha).fetchone()
+                if gravada is None:
+                    gravada = conn.execute(sql_id, linha).fetchone()
+                ids.append(gravada[0])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+    
+    def _dados_producao(self, dados_producao: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de produção."""
+        return {
+            'localizacao': dados_producao['localizacao'],
+            'area_plantada_ha': dados_producao['area_plantada_ha'],
+            'qtd_colhida_toneladas': dados_producao['qtd_colhida_toneladas'],
+            'tipo_colheita': dados_producao['tipo_colheita'],
+            'data_colheita': dados_producao.get('data_colheita', datetime.now().date()),
+            'variedade_cana': dados_producao.get('variedade_cana'),
+            'idade_cana_meses': dados_producao.get('idade_cana_meses'),
+            'umidade_solo': dados_producao.get('umidade_solo'),
+            'temperatura_media': dados_producao.get('temperatura_media'),
+            'precipitacao_mm': dados_producao.get('precipitacao_mm')
+        }
+    
+    def _dados_perda(self, dados_perda: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta os parâmetros do INSERT de perda (fatores_perda em JSON)."""
+        # Converter fatores_perda para JSON se for dict
+        fatores_json = dados_perda.get('fatores_perda', {})
+        if isinstance(fatores_json, dict):
+            fatores_json = json.dumps(fatores_json)
+        
+        return {
+            'producao_id': dados_perda['producao_id'],
+            'perda_estimada_toneladas': dados_perda['perda_estimada_toneladas'],
+            'percentual_perda': dados_perda['percentual_perda'],
+            'fatores_perda': fatores_json,
+            'metodo_calculo': dados_perda.get('metodo_calculo', 'sistema_automatico'),
+            'observacoes': dados_perda.get('observacoes')
+        }
+    
+    def _filtro_data_colheita(self, data_inicio: date = None, data_fim: date = None) -> Tuple[str, Dict[str, Any]]:
+        """Monta o trecho WHERE e os parâmetros do filtro por período."""
+        filtro = ""
+        params = {}
+        
+        if data_inicio:
+            filtro += " AND data_colheita >= :data_inicio"
+            params['data_inicio'] = data_inicio
+        
+        if data_fim:
+            filtro += " AND data_colheita <= :data_fim"
+            params['data_fim'] = data_fim
+        
+        return filtro, params
+
+
+def _instante_utc(instante: Optional[datetime]) -> Optional[str]:
+    """Instante em UTC no formato de CURRENT_TIMESTAMP do SQLite ('AAAA-MM-DD HH:MM:SS')."""
+    if instante is None:
+        return None
+    return instante.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
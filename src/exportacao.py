@@ -0,0 +1,443 @@
+"""
+Exportação e importação colunar de histórico, relatórios e resultados em lote.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Com o pyarrow instalado, os DataFrames são gravados em Parquet (zstd) ou
+Feather (Arrow IPC, lido com memory map); sem ele, em um .npz comprimido
+com um array NumPy por coluna e por grupo de linhas. Em todos os formatos
+cada lote gravado vira um grupo de linhas, que pode ser relido sozinho
+(iterar_grupos) e só com as colunas pedidas.
+"""
+
+import json
+import logging
+import os
+import zipfile
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.colunar import TIPOS_PRODUCAO, TIPOS_RELATORIO
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    # Sem pyarrow: Parquet e Feather indisponíveis, exportação em .npz
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Extensão do arquivo -> formato
+FORMATOS = {
+    '.parquet': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.npz': 'npz'
+}
+
+# Membro do .npz com a descrição das colunas e dos grupos
+META_NPZ = '__meta__'
+
+# Tipos Arrow das colunas conhecidas, para quando chegam inteiramente nulas
+# no primeiro lote (ex.: produções ainda sem cálculo no relatório) e o tipo
+# inferido seria null; as demais colunas nulas são gravadas como texto
+TIPOS_ARROW = {
+    **{coluna: {'Int64': 'int64'}.get(tipo, tipo) for coluna, tipo in {**TIPOS_PRODUCAO, **TIPOS_RELATORIO}.items()},
+    'data_colheita': 'date32',
+    'calculado_em': 'timestamp[us]',
+    'data_criacao': 'timestamp[us]',
+    'data_atualizacao': 'timestamp[us]'
+}
+
+# Colunas dos resultados em lote (EscritorResultadosColunar)
+COLUNAS_RESULTADOS = [
+    'localizacao', 'area_plantada_ha', 'qtd_colhida_toneladas', 'tipo_colheita',
+    'data_colheita', 'perda_estimada_toneladas', 'percentual_perda',
+    'metodo_calculo', 'fatores_perda', 'observacoes'
+]
+
+
+def formato_do_arquivo(caminho: str) -> Optional[str]:
+    """Formato colunar pela extensão ('parquet', 'feather', 'npz') ou None."""
+    return FORMATOS.get(os.path.splitext(caminho)[1].lower())
+
+
+def extensao_padrao() -> str:
+    """Extensão usada quando o usuário não escolhe: .parquet com pyarrow, senão .npz."""
+    return '.parquet' if pa is not None else '.npz'
+
+
+class EscritorColunar:
+    """
+    Gravação de DataFrames em lotes, um grupo de linhas por lote.
+    
+    Parquet e Feather sem pyarrow instalado são gravados como .npz (mesmo
+    nome, outra extensão; ver `caminho`). Usar com `with`.
+    """
+    
+    def __init__(self, caminho: str, compressao: str = 'zstd',
+                 referencia_tipos: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            caminho: Arquivo de destino (.parquet, .feather/.arrow ou .npz)
+            compressao: Codec do Parquet (o Feather usa lz4; o .npz, deflate)
+            referencia_tipos: Tabela completa a gravar, quando conhecida: as
+                colunas nulas no primeiro lote têm o tipo inferido dos
+                primeiros valores não nulos dela
+        
+        Raises:
+            ValueError: Se a extensão não for de um formato colunar
+        """
+        formato = formato_do_arquivo(caminho)
+        if formato is None:
+            raise ValueError(f"Extensão não suportada: {caminho} (use {', '.join(FORMATOS)})")
+        if formato != 'npz' and pa is None:
+            caminho = os.path.splitext(caminho)[0] + '.npz'
+            logger.warning(f"pyarrow não instalado: exportando em {caminho}")
+            formato = 'npz'
+        
+        self.caminho = caminho
+        self.formato = formato
+        self.compressao = compressao
+        self.linhas_escritas = 0
+        self.grupos: List[Dict[str, Any]] = []
+        self._escritor = None
+        self._esquema = None
+        self._referencia_tipos = referencia_tipos
+        
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        if formato == 'npz':
+            self._escritor = zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+            self._colunas: Optional[List[str]] = None
+    
+    def escrever(self, lote: pd.DataFrame) -> None:
+        """
+        Grava o lote como um grupo de linhas.
+        
+        Raises:
+            ValueError: Se as colunas forem diferentes das do primeiro lote (.npz)
+        """
+        if self.formato == 'npz':
+            self._escrever_npz(lote)
+        else:
+            if self._esquema is None:
+                self._esquema = _esquema_arrow(lote, self._referencia_tipos)
+                self._referencia_tipos = None
+            tabela = pa.Table.from_pandas(lote, schema=self._esquema, preserve_index=False)
+            if self._escritor is None:
+                if self.formato == 'parquet':
+                    self._escritor = pq.ParquetWriter(self.caminho, self._esquema, compression=self.compressao)
+                else:
+                    opcoes = pa.ipc.IpcWriteOptions(compression='lz4')
+                    self._escritor = pa.ipc.new_file(self.caminho, self._esquema, options=opcoes)
+            if self.formato == 'parquet':
+                self._escritor.write_table(tabela, row_group_size=max(len(lote), 1))
+            else:
+                self._escritor.write_table(tabela, max_chunksize=max(len(lote), 1))
+        self.linhas_escritas += len(lote)
+    
+    def fechar(self) -> None:
+        """Finaliza o arquivo (no .npz, grava a descrição das colunas e grupos)."""
+        if self._escritor is None:
+            return
+        if self.formato == 'npz':
+            meta = {'colunas': self._colunas or [], 'grupos': self.grupos}
+            self._gravar_array(META_NPZ, np.array(json.dumps(meta, ensure_ascii=False)))
+        self._escritor.close()
+        self._escritor = None
+    
+    def _escrever_npz(self, lote: pd.DataFrame) -> None:
+        """Um membro .npy por coluna do lote (mais a máscara de nulos, quando há)."""
+        colunas = [str(coluna) for coluna in lote.columns]
+        if self._colunas is None:
+            self._colunas = colunas
+        elif colunas != self._colunas:
+            raise ValueError(f"Colunas do lote diferentes das do arquivo: {colunas}")
+        
+        indice = len(self.grupos)
+        tipos = []
+        for posicao, coluna in enumerate(lote.columns):
+            tipo, valores, nulos = _codificar_coluna(lote[coluna])
+            nome = f"g{indice:06d}_c{posicao:04d}"
+            self._gravar_array(nome, valores)
+            if nulos is not None:
+                self._gravar_array(nome + "_nulos", nulos)
+            tipos.append(tipo)
+        self.grupos.append({'linhas': len(lote), 'tipos': tipos})
+    
+    def _gravar_array(self, nome: str, valores: np.ndarray) -> None:
+        """Grava o array como membro <nome>.npy do zip, como np.savez_compressed faz."""
+        with self._escritor.open(nome + '.npy', 'w', force_zip64=True) as membro:
+            np.lib.format.write_array(membro, np.asanyarray(valores), allow_pickle=False)
+    
+    def __enter__(self) -> 'EscritorColunar':
+        return self
+    
+    def __exit__(self, *_) -> None:
+        self.fechar()
+
+
+class EscritorResultadosColunar:
+    """
+    Resultados de cálculo em lote gravados em formato colunar.
+    
+    Mesma interface de EscritorJSONL (escrever_resultado, linhas_escritas,
+    caminho): as linhas são acumuladas e gravadas a cada `tamanho_grupo`,
+    um grupo de linhas por vez.
+    """
+    
+    def __init__(self, caminho: str, tamanho_grupo: int = 100000):
+        """
+        Args:
+            caminho: Arquivo de destino (.parquet, .feather/.arrow ou .npz)
+            tamanho_grupo: Resultados por grupo de linhas
+        """
+        self._escritor = EscritorColunar(caminho)
+        self.caminho = self._escritor.caminho
+        self.tamanho_grupo = tamanho_grupo
+        self._linhas: List[Dict[str, Any]] = []
+    
+    @property
+    def linhas_escritas(self) -> int:
+        """Resultados já gravados no arquivo."""
+        return self._escritor.linhas_escritas
+    
+    def escrever_resultado(self, resultado: Any, dados_producao: Any) -> None:
+        """Acrescenta um resultado (ResultadoPerda) com os dados da produção (DadosProducao)."""
+        self._linhas.append({
+            'localizacao': dados_producao.localizacao,
+            'area_plantada_ha': float(dados_producao.area_plantada_ha),
+            'qtd_colhida_toneladas': float(dados_producao.qtd_colhida_toneladas),
+            'tipo_colheita': dados_producao.tipo_colheita,
+            'data_colheita': dados_producao.data_colheita,
+            'perda_estimada_toneladas': resultado.perda_estimada_toneladas,
+            'percentual_perda': resultado.percentual_perda,
+            'metodo_calculo': resultado.metodo_calculo,
+            # Fatores em JSON: o conjunto de chaves muda com o método
+            'fatores_perda': json.dumps(resultado.fatores_aplicados, ensure_ascii=False),
+            'observacoes': resultado.observacoes
+        })
+        if len(self._linhas) >= self.tamanho_grupo:
+            self._descarregar()
+    
+    def fechar(self) -> None:
+        """Grava o grupo restante e finaliza o arquivo."""
+        if self._linhas or not self._escritor.linhas_escritas:
+            self._descarregar()
+        self._escritor.fechar()
+    
+    def _descarregar(self) -> None:
+        """Grava as linhas acumuladas como um grupo."""
+        self._escritor.escrever(pd.DataFrame(self._linhas, columns=COLUNAS_RESULTADOS))
+        self._linhas = []
+    
+    def __enter__(self) -> 'EscritorResultadosColunar':
+        return self
+    
+    def __exit__(self, *_) -> None:
+        self.fechar()
+
+
+def _esquema_arrow(lote: pd.DataFrame, referencia: Optional[pd.DataFrame] = None) -> 'pa.Schema':
+    """
+    Esquema do arquivo, inferido do primeiro lote, sem campos do tipo null.
+    
+    Uma coluna inteiramente nula no primeiro lote tem o tipo inferido dos
+    primeiros valores não nulos da referência (ex.: coordenadas que só
+    aparecem em lotes seguintes); sem eles, o de TIPOS_ARROW ou texto.
+    """
+    esquema = pa.Schema.from_pandas(lote, preserve_index=False)
+    for posicao, campo in enumerate(esquema):
+        if not pa.types.is_null(campo.type):
+            continue
+        tipo = None
+        if referencia is not None and campo.name in referencia:
+            presentes = referencia[campo.name].dropna().head(1000)
+            if len(presentes):
+                tipo = pa.array(presentes.tolist(), from_pandas=True).type
+        if tipo is None or pa.types.is_null(tipo):
+            tipo = pa.type_for_alias(TIPOS_ARROW.get(campo.name, 'string'))
+        esquema = esquema.set(posicao, campo.with_type(tipo))
+    return esquema
+
+
+def exportar_dataframe(df: pd.DataFrame, caminho: str, tamanho_grupo: int = 100000) -> str:
+    """
+    Grava o DataFrame em formato colunar, em grupos de `tamanho_grupo` linhas.
+    
+    Args:
+        df: Tabela a exportar (ex.: tabela de memória do histórico)
+        caminho: Arquivo de destino (.parquet, .feather/.arrow ou .npz)
+        tamanho_grupo: Linhas por grupo (unidade de leitura em iterar_grupos)
+    
+    Returns:
+        Caminho gravado (extensão .npz se o pyarrow não estiver instalado)
+    """
+    with EscritorColunar(caminho, referencia_tipos=df) as escritor:
+        for inicio in range(0, max(len(df), 1), tamanho_grupo):
+            escritor.escrever(df.iloc[inicio:inicio + tamanho_grupo])
+    return escritor.caminho
+
+
+def exportar_lotes(lotes: Iterable[pd.DataFrame], caminho: str) -> Tuple[str, int]:
+    """
+    Grava em formato colunar os DataFrames de um gerador, um grupo por lote.
+    
+    Feito para gerar_relatorio_perdas_em_lotes: um lote por vez em memória.
+    
+    Args:
+        lotes: DataFrames com as mesmas colunas
+        caminho: Arquivo de destino (.parquet, .feather/.arrow ou .npz)
+    
+    Returns:
+        Tupla (caminho gravado, linhas gravadas)
+    """
+    with EscritorColunar(caminho) as escritor:
+        for lote in lotes:
+            escritor.escrever(lote)
+    return escritor.caminho, escritor.linhas_escritas
+
+
+def ler_colunar(caminho: str, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lê um arquivo colunar inteiro.
+    
+    Args:
+        caminho: Arquivo .parquet, .feather/.arrow ou .npz
+        colunas: Colunas a ler (projeção); None lê todas
+    
+    Returns:
+        DataFrame com as colunas pedidas
+    """
+    formato = _formato_leitura(caminho)
+    if formato == 'parquet':
+        return pq.read_table(caminho, columns=colunas).to_pandas()
+    if formato == 'feather':
+        return feather.read_table(caminho, columns=colunas, memory_map=True).to_pandas()
+    
+    grupos = list(iterar_grupos(caminho, colunas))
+    if len(grupos) == 1:
+        return grupos[0]
+    if not grupos:
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            meta = json.loads(str(arquivo[META_NPZ]))
+        return pd.DataFrame(columns=colunas or meta['colunas'])
+    return pd.concat(grupos, ignore_index=True)
+
+
+def iterar_grupos(caminho: str, colunas: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Lê o arquivo um grupo de linhas por vez.
+    
+    Args:
+        caminho: Arquivo .parquet, .feather/.arrow ou .npz
+        colunas: Colunas a ler (projeção); None lê todas
+    
+    Yields:
+        Um DataFrame por grupo de linhas
+    """
+    formato = _formato_leitura(caminho)
+    if formato == 'parquet':
+        arquivo = pq.ParquetFile(caminho)
+        for indice in range(arquivo.num_row_groups):
+            yield arquivo.read_row_group(indice, columns=colunas).to_pandas()
+        return
+    if formato == 'feather':
+        with pa.memory_map(caminho, 'r') as origem:
+            leitor = pa.ipc.open_file(origem)
+            for indice in range(leitor.num_record_batches):
+                tabela = pa.Table.from_batches([leitor.get_batch(indice)])
+                yield (tabela.select(colunas) if colunas else tabela).to_pandas()
+        return
+    
+    # .npz: só os membros das colunas pedidas são descomprimidos
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        meta = json.loads(str(arquivo[META_NPZ]))
+        nomes = meta['colunas']
+        selecionadas = colunas or nomes
+        faltando = [coluna for coluna in selecionadas if coluna not in nomes]
+        if faltando:
+            raise KeyError(f"Colunas inexistentes em {caminho}: {faltando}")
+        
+        for indice, grupo in enumerate(meta['grupos']):
+            dados = {}
+            for coluna in selecionadas:
+                posicao = nomes.index(coluna)
+                nome = f"g{indice:06d}_c{posicao:04d}"
+                nulos = arquivo[nome + "_nulos"] if nome + "_nulos" in arquivo.files else None
+                dados[coluna] = _decodificar_coluna(grupo['tipos'][posicao], arquivo[nome], nulos)
+            yield pd.DataFrame(dados, columns=selecionadas)
+
+
+def _formato_leitura(caminho: str) -> str:
+    """Formato do arquivo a ler; Parquet/Feather exigem o pyarrow."""
+    formato = formato_do_arquivo(caminho)
+    if formato is None:
+        raise ValueError(f"Extensão não suportada: {caminho} (use {', '.join(FORMATOS)})")
+    if formato != 'npz' and pa is None:
+        raise ImportError(f"Leitura de {formato} requer o pyarrow (pip install pyarrow)")
+    return formato
+
+
+def _codificar_coluna(serie: pd.Series) -> Tuple[str, np.ndarray, Optional[np.ndarray]]:
+    """
+    Converte a coluna em um array NumPy sem objetos Python (o .npz é lido
+    sem pickle).
+    
+    Returns:
+        Tupla (tipo, valores, máscara de nulos ou None); o tipo diz como
+        decodificar: 'numero', 'nulavel:<dtype>', 'data', 'data_hora',
+        'texto' ou 'json'
+    """
+    if isinstance(serie.dtype, np.dtype) and serie.dtype != object:
+        return 'numero', serie.to_numpy(), None
+    if pd.api.types.is_numeric_dtype(serie.dtype) or pd.api.types.is_bool_dtype(serie.dtype):
+        # Dtypes com nulos do pandas (Int64, boolean...): float com NaN + dtype original
+        return f'nulavel:{serie.dtype}', serie.to_numpy(dtype='float64', na_value=np.nan), None
+    
+    # Objeto ou outro dtype de extensão (ex.: string): valor a valor
+    valores = serie.astype(object).tolist()
+    presentes = [valor for valor in valores if valor is not None and valor == valor]
+    nulos = np.array([valor is None or valor != valor for valor in valores], dtype=bool)
+    mascara = nulos if nulos.any() else None
+    
+    if presentes and all(isinstance(valor, datetime) for valor in presentes):
+        return 'data_hora', np.array([None if nulo else valor for valor, nulo in zip(valores, nulos)],
+                                     dtype='datetime64[us]'), None
+    if presentes and all(isinstance(valor, date) and not isinstance(valor, datetime) for valor in presentes):
+        return 'data', np.array([None if nulo else valor for valor, nulo in zip(valores, nulos)],
+                                dtype='datetime64[D]'), None
+    if all(isinstance(valor, str) for valor in presentes):
+        return 'texto', np.array(['' if nulo else valor for valor, nulo in zip(valores, nulos)],
+                                 dtype=str), mascara
+    # Dicionários (fatores), tuplas (coordenadas) e afins
+    return 'json', np.array([json.dumps(None if nulo else valor, ensure_ascii=False, default=str)
+                             for valor, nulo in zip(valores, nulos)], dtype=str), None
+
+
+def _decodificar_coluna(tipo: str, valores: np.ndarray, nulos: Optional[np.ndarray]) -> Any:
+    """Inverso de _codificar_coluna."""
+    if tipo == 'numero':
+        return valores
+    if tipo.startswith('nulavel:'):
+        return pd.array(valores).astype(tipo.split(':', 1)[1])
+    if tipo == 'data_hora':
+        return pd.to_datetime(valores)
+    if tipo == 'data':
+        # datetime64[D] -> datetime.date (NaT -> None), como vem do banco
+        return valores.astype(object)
+    
+    coluna = np.empty(len(valores), dtype=object)
+    if tipo == 'json':
+        coluna[:] = [json.loads(valor) for valor in valores]
+    else:
+        coluna[:] = valores.tolist()
+        if nulos is not None:
+            coluna[nulos] = None
+    return coluna
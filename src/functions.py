@@ -3,13 +3,21 @@ Módulo com funções para cálculo de perdas na colheita de cana-de-açúcar.
 Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
 """
 
+import gzip
 import json
 import logging
 from datetime import datetime, date
-from typing import Dict, List, Optional, Any, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass
 import os
-import pandas as pd
+
+from src.manifesto import ManifestoDados
+from src.segmentos import ArquivoRelatorios
+
+# pandas é importado no primeiro uso: cálculos avulsos (CLI --calcular-json)
+# não pagam o custo de importação
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 @dataclass
@@ -76,7 +84,8 @@ class GerenciadorDados:
         self.versao_sistema: Tuple[int, int, int] = (1, 0, 0)
         
         # TABELA DE MEMÓRIA: DataFrame para análises estatísticas
-        self.tabela_memoria: pd.DataFrame = pd.DataFrame()
+        # (montado em criar_tabela_memoria_analise)
+        self.tabela_memoria: Optional['pd.DataFrame'] = None
         
         # LISTA de TUPLAS: Coordenadas de fazendas cadastradas
         self.fazendas_cadastradas: List[Tuple[str, float, float]] = [
@@ -141,13 +150,15 @@ class GerenciadorDados:
         
         return estatisticas
     
-    def criar_tabela_memoria_analise(self) -> pd.DataFrame:
+    def criar_tabela_memoria_analise(self) -> 'pd.DataFrame':
         """
         TABELA DE MEMÓRIA: Cria DataFrame (tabela de memória) com dados do histórico.
         
         Returns:
             DataFrame com dados estruturados
         """
+        import pandas as pd
+        
         if not self.historico_calculos:  # Verificando LISTA
             return pd.DataFrame()
         
@@ -241,13 +252,20 @@ class GerenciadorDados:
 class CalculadoraPerdas:
     """Classe principal para cálculo de perdas na colheita."""
     
-    def __init__(self):
+    def __init__(self, repositorio: Any = None):
+        """
+        Args:
+            repositorio: Repositório de onde ler os parâmetros de perdas
+                (de preferência um RepositorioComCache); sem repositório,
+                ou se a leitura falhar, valem os parâmetros padrão
+        """
         self.logger = logging.getLogger(__name__)
+        self.repositorio = repositorio
         
         # Integração com GerenciadorDados para usar todos os tipos obrigatórios
         self.gerenciador = GerenciadorDados()
         
-        # Parâmetros padrão para cálculo de perdas
+        # Parâmetros padrão para cálculo de perdas (usados sem banco)
         self.parametros_padrao = {
             'manual': ParametrosPerdas(
                 tipo_colheita='manual',
@@ -267,6 +285,37 @@ class CalculadoraPerdas:
             )
         }
     
+    def obter_parametros(self, tipo_colheita: str) -> ParametrosPerdas:
+        """
+        Parâmetros de perdas do tipo de colheita.
+        
+        Lidos do repositório (tabela parametros_perdas) quando houver um;
+        caso contrário, ou se a leitura falhar, usa os parâmetros padrão.
+        
+        Args:
+            tipo_colheita: 'manual' ou 'mecanizada'
+            
+        Returns:
+            ParametrosPerdas do tipo de colheita
+        """
+        if self.repositorio is not None:
+            try:
+                dados = self.repositorio.buscar_parametros_perdas(tipo_colheita)
+                if dados:
+                    # Bancos devolvem DECIMAL/NUMBER como Decimal
+                    return ParametrosPerdas(
+                        tipo_colheita=dados['tipo_colheita'],
+                        fator_base_perda=float(dados['fator_base_perda']),
+                        fator_umidade=float(dados.get('fator_umidade') or 0),
+                        fator_idade=float(dados.get('fator_idade') or 0),
+                        fator_clima=float(dados.get('fator_clima') or 0),
+                        descricao=dados.get('descricao') or ""
+                    )
+            except Exception as e:
+                self.logger.warning(f"Parâmetros do banco indisponíveis, usando padrão: {e}")
+        
+        return self.parametros_padrao[tipo_colheita]
+    
     def calcular_perda_basica(self, 
                              qtd_colhida: float, 
                              tipo_colheita: str,
@@ -285,8 +334,8 @@ class CalculadoraPerdas:
         if tipo_colheita not in ['manual', 'mecanizada']:
             raise ValueError("Tipo de colheita deve ser 'manual' ou 'mecanizada'")
         
-        # Usar parâmetros fornecidos ou padrão
-        params = parametros or self.parametros_padrao[tipo_colheita]
+        # Usar parâmetros fornecidos, do banco ou padrão
+        params = parametros or self.obter_parametros(tipo_colheita)
         
         # Cálculo básico
         perda_toneladas = qtd_colhida * params.fator_base_perda
@@ -307,13 +356,16 @@ class CalculadoraPerdas:
     
     def calcular_perda_avancada(self, 
                                dados_producao: DadosProducao,
-                               parametros: Optional[ParametrosPerdas] = None) -> ResultadoPerda:
+                               parametros: Optional[ParametrosPerdas] = None,
+                               registrar_historico: bool = True) -> ResultadoPerda:
         """
         Calcula perda considerando fatores ambientais e de produção.
         
         Args:
             dados_producao: Dados completos da produção
             parametros: Parâmetros customizados (opcional)
+            registrar_historico: Se False, o cálculo não entra no histórico em
+                memória (cálculos em lote, que não podem crescer com o volume)
             
         Returns:
             ResultadoPerda com cálculo avançado
@@ -321,8 +373,8 @@ class CalculadoraPerdas:
         if dados_producao.tipo_colheita not in ['manual', 'mecanizada']:
             raise ValueError("Tipo de colheita deve ser 'manual' ou 'mecanizada'")
         
-        # Usar parâmetros fornecidos ou padrão
-        params = parametros or self.parametros_padrao[dados_producao.tipo_colheita]
+        # Usar parâmetros fornecidos, do banco ou padrão
+        params = parametros or self.obter_parametros(dados_producao.tipo_colheita)
         
         # Fator base
         fator_total = params.fator_base_perda
@@ -372,10 +424,70 @@ class CalculadoraPerdas:
         )
         
         # USANDO TODOS OS TIPOS: Salvando no histórico
-        self.gerenciador.adicionar_calculo_historico(dados_producao, resultado)
+        if registrar_historico:
+            self.gerenciador.adicionar_calculo_historico(dados_producao, resultado)
         
         return resultado
     
+    def calcular_perdas_em_lote(self, producoes: 'pd.DataFrame') -> List[Dict[str, Any]]:
+        """
+        Calcula a perda avançada de cada produção de um resultado colunar.
+        
+        Args:
+            producoes: DataFrame como o de buscar_producoes_por_ids
+            
+        Returns:
+            Lista de dicionários no formato de inserir_perdas_em_lote
+        """
+        import pandas as pd
+        
+        # Percorre as colunas em paralelo (sem criar uma Series por linha)
+        colunas = [
+            'id', 'localizacao', 'area_plantada_ha', 'qtd_colhida_toneladas',
+            'tipo_colheita', 'data_colheita', 'variedade_cana', 'idade_cana_meses',
+            'umidade_solo', 'temperatura_media', 'precipitacao_mm'
+        ]
+        valores = [
+            [None if pd.isna(valor) else valor for valor in producoes[coluna]]
+            for coluna in colunas
+        ]
+        
+        # Parâmetros lidos uma vez por tipo de colheita, não uma vez por linha
+        parametros = {
+            tipo: self.obter_parametros(tipo)
+            for tipo in set(valores[colunas.index('tipo_colheita')])
+            if tipo in self.parametros_padrao
+        }
+        
+        perdas = []
+        for (producao_id, localizacao, area, qtd, tipo, data_colheita, variedade,
+             idade, umidade, temperatura, precipitacao) in zip(*valores):
+            dados = DadosProducao(
+                localizacao=localizacao,
+                area_plantada_ha=float(area),
+                qtd_colhida_toneladas=float(qtd),
+                tipo_colheita=tipo,
+                data_colheita=data_colheita,
+                variedade_cana=variedade,
+                idade_cana_meses=int(idade) if idade is not None else None,
+                umidade_solo=float(umidade) if umidade is not None else None,
+                temperatura_media=float(temperatura) if temperatura is not None else None,
+                precipitacao_mm=float(precipitacao) if precipitacao is not None else None
+            )
+            resultado = self.calcular_perda_avancada(
+                dados, parametros=parametros.get(tipo), registrar_historico=False
+            )
+            perdas.append({
+                'producao_id': int(producao_id),
+                'perda_estimada_toneladas': resultado.perda_estimada_toneladas,
+                'percentual_perda': resultado.percentual_perda,
+                'fatores_perda': resultado.fatores_aplicados,
+                'metodo_calculo': resultado.metodo_calculo,
+                'observacoes': resultado.observacoes
+            })
+        
+        return perdas
+    
     def calcular_com_coordenadas(self, dados_producao: DadosProducao, 
                                 coordenadas: Tuple[float, float, float]) -> ResultadoPerda:
         """
@@ -606,12 +718,23 @@ class CalculadoraPerdas:
 class ManipuladorJSON:
     """Classe para manipulação de arquivos JSON."""
     
-    def __init__(self, diretorio_dados: str = "data"):
+    def __init__(self, diretorio_dados: str = "data", arquivo_relatorios: Optional[ArquivoRelatorios] = None):
+        """
+        Args:
+            diretorio_dados: Diretório dos arquivos JSON
+            arquivo_relatorios: Modo arquivo: relatórios de perda sem nome de
+                arquivo explícito vão para os segmentos rotativos em vez de
+                um .json cada
+        """
         self.diretorio_dados = diretorio_dados
+        self.arquivo_relatorios = arquivo_relatorios
         self.logger = logging.getLogger(__name__)
         
         # Criar diretório se não existir
         os.makedirs(diretorio_dados, exist_ok=True)
+        
+        # Índice dos arquivos (tipo, localização, data...), sem abrir cada um
+        self.manifesto = ManifestoDados(diretorio_dados)
     
     def salvar_dados_producao(self, dados: DadosProducao, arquivo: str = None) -> str:
         """
@@ -625,29 +748,16 @@ class ManipuladorJSON:
             Caminho do arquivo salvo
         """
         if not arquivo:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            arquivo = f"producao_{timestamp}.json"
+            arquivo = self._nome_livre("producao")
         
         caminho_arquivo = os.path.join(self.diretorio_dados, arquivo)
         
         # Converter para dicionário
-        dados_dict = {
-            'localizacao': dados.localizacao,
-            'area_plantada_ha': dados.area_plantada_ha,
-            'qtd_colhida_toneladas': dados.qtd_colhida_toneladas,
-            'tipo_colheita': dados.tipo_colheita,
-            'data_colheita': dados.data_colheita.isoformat(),
-            'variedade_cana': dados.variedade_cana,
-            'idade_cana_meses': dados.idade_cana_meses,
-            'umidade_solo': dados.umidade_solo,
-            'temperatura_media': dados.temperatura_media,
-            'precipitacao_mm': dados.precipitacao_mm,
-            'timestamp_exportacao': datetime.now().isoformat()
-        }
+        dados_dict = _producao_para_dict(dados)
+        dados_dict['timestamp_exportacao'] = datetime.now().isoformat()
         
         try:
-            with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-                json.dump(dados_dict, f, indent=2, ensure_ascii=False)
+            self._gravar_json(caminho_arquivo, dados_dict)
             
             self.logger.info(f"Dados de produção salvos em: {caminho_arquivo}")
             return caminho_arquivo
@@ -674,21 +784,7 @@ class ManipuladorJSON:
             with open(arquivo, 'r', encoding='utf-8') as f:
                 dados_dict = json.load(f)
             
-            # Converter data de string para date
-            data_colheita = datetime.fromisoformat(dados_dict['data_colheita']).date()
-            
-            dados = DadosProducao(
-                localizacao=dados_dict['localizacao'],
-                area_plantada_ha=dados_dict['area_plantada_ha'],
-                qtd_colhida_toneladas=dados_dict['qtd_colhida_toneladas'],
-                tipo_colheita=dados_dict['tipo_colheita'],
-                data_colheita=data_colheita,
-                variedade_cana=dados_dict.get('variedade_cana'),
-                idade_cana_meses=dados_dict.get('idade_cana_meses'),
-                umidade_solo=dados_dict.get('umidade_solo'),
-                temperatura_media=dados_dict.get('temperatura_media'),
-                precipitacao_mm=dados_dict.get('precipitacao_mm')
-            )
+            dados = _producao_de_dict(dados_dict)
             
             self.logger.info(f"Dados de produção carregados de: {arquivo}")
             return dados
@@ -701,47 +797,33 @@ class ManipuladorJSON:
         """
         Salva resultado de cálculo de perda em arquivo JSON.
         
+        No modo arquivo (arquivo_relatorios definido) e sem nome explícito,
+        o relatório é acrescentado ao segmento ativo em vez de gerar um
+        arquivo novo.
+        
         Args:
             resultado: Resultado do cálculo
             dados_producao: Dados originais da produção
             arquivo: Nome do arquivo (opcional)
             
         Returns:
-            Caminho do arquivo salvo
+            Caminho do arquivo salvo ou, no modo arquivo, o ID do relatório
+            (ver ler_relatorio)
         """
-        if not arquivo:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            arquivo = f"relatorio_perdas_{timestamp}.json"
-        
-        caminho_arquivo = os.path.join(self.diretorio_dados, arquivo)
-        
         # Compilar dados completos
-        relatorio = {
-            'dados_producao': {
-                'localizacao': dados_producao.localizacao,
-                'area_plantada_ha': dados_producao.area_plantada_ha,
-                'qtd_colhida_toneladas': dados_producao.qtd_colhida_toneladas,
-                'tipo_colheita': dados_producao.tipo_colheita,
-                'data_colheita': dados_producao.data_colheita.isoformat()
-            },
-            'calculo_perdas': {
-                'perda_estimada_toneladas': resultado.perda_estimada_toneladas,
-                'percentual_perda': resultado.percentual_perda,
-                'fatores_aplicados': resultado.fatores_aplicados,
-                'metodo_calculo': resultado.metodo_calculo,
-                'observacoes': resultado.observacoes
-            },
-            'resumo': {
-                'producao_potencial_toneladas': dados_producao.qtd_colhida_toneladas + resultado.perda_estimada_toneladas,
-                'eficiencia_colheita': round((dados_producao.qtd_colhida_toneladas / (dados_producao.qtd_colhida_toneladas + resultado.perda_estimada_toneladas)) * 100, 2),
-                'produtividade_ha': round(dados_producao.qtd_colhida_toneladas / dados_producao.area_plantada_ha, 2)
-            },
-            'timestamp_calculo': datetime.now().isoformat()
-        }
+        relatorio = _montar_relatorio_perda(resultado, dados_producao)
         
         try:
-            with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-                json.dump(relatorio, f, indent=2, ensure_ascii=False)
+            if self.arquivo_relatorios is not None and not arquivo:
+                id_relatorio = self.arquivo_relatorios.acrescentar(relatorio)
+                self.logger.info(f"Relatório de perdas arquivado: {id_relatorio}")
+                return id_relatorio
+            
+            if not arquivo:
+                arquivo = self._nome_livre("relatorio_perdas")
+            caminho_arquivo = os.path.join(self.diretorio_dados, arquivo)
+            
+            self._gravar_json(caminho_arquivo, relatorio)
             
             self.logger.info(f"Relatório de perdas salvo em: {caminho_arquivo}")
             return caminho_arquivo
@@ -750,21 +832,347 @@ class ManipuladorJSON:
             self.logger.error(f"Erro ao salvar relatório de perdas: {e}")
             raise
     
+    def ler_relatorio(self, id_relatorio: str) -> Dict[str, Any]:
+        """
+        Lê um relatório do modo arquivo pelo ID devolvido em salvar_resultado_perda.
+        
+        Args:
+            id_relatorio: ID do relatório
+            
+        Returns:
+            Relatório (dados_producao, calculo_perdas, timestamp_relatorio)
+            
+        Raises:
+            ValueError: Se o modo arquivo não estiver ativo
+            KeyError: Se o ID não existir
+        """
+        if self.arquivo_relatorios is None:
+            raise ValueError("Modo arquivo de relatórios não está ativo")
+        return self.arquivo_relatorios.ler(id_relatorio)
+    
+    def abrir_jsonl(self, arquivo: str, tamanho_buffer: int = 1000) -> 'EscritorJSONL':
+        """
+        Abre um arquivo JSON Lines para gravação em lote (.jsonl ou .jsonl.gz).
+        
+        Args:
+            arquivo: Nome (gravado no diretório de dados) ou caminho do arquivo
+            tamanho_buffer: Linhas acumuladas entre duas escritas no arquivo
+            
+        Returns:
+            EscritorJSONL (usar com `with`)
+        """
+        return EscritorJSONL(self._caminho(arquivo), tamanho_buffer)
+    
+    def ler_jsonl(self, arquivo: str) -> 'LeitorJSONL':
+        """
+        Leitor em fluxo de um arquivo JSON Lines (.jsonl ou .jsonl.gz).
+        
+        Args:
+            arquivo: Nome (no diretório de dados) ou caminho do arquivo
+            
+        Returns:
+            LeitorJSONL: iterar sobre ele devolve dicionários; producoes()
+            devolve DadosProducao
+        """
+        return LeitorJSONL(self._caminho(arquivo))
+    
+    def filtrar_arquivos(self,
+                         tipo: Optional[str] = None,
+                         localizacao: Optional[str] = None,
+                         data_inicio: Optional[date] = None,
+                         data_fim: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Arquivos do diretório de dados que atendem aos filtros, pelo manifesto.
+        
+        Args:
+            tipo: 'producao' ou 'relatorio_perda'
+            localizacao: Trecho da localização (sem diferenciar maiúsculas)
+            data_inicio: Data de colheita mínima
+            data_fim: Data de colheita máxima
+            
+        Returns:
+            Entradas do manifesto (nome, tipo, localizacao, data_colheita,
+            tamanho, mtime_ns, sha256), ordenadas pelo nome
+        """
+        try:
+            return self.manifesto.filtrar(tipo, localizacao, data_inicio, data_fim)
+        except Exception as e:
+            self.logger.error(f"Erro ao filtrar arquivos: {e}")
+            return []
+    
+    def excluir_arquivo(self, arquivo: str) -> None:
+        """
+        Exclui um arquivo do diretório de dados e sua entrada no manifesto.
+        
+        Args:
+            arquivo: Nome do arquivo
+        """
+        os.remove(os.path.join(self.diretorio_dados, arquivo))
+        self.manifesto.remover(arquivo)
+        self.logger.info(f"Arquivo excluído: {arquivo}")
+    
+    def _gravar_json(self, caminho_arquivo: str, dados: Dict[str, Any]) -> None:
+        """
+        Grava o JSON formatado e atualiza o manifesto (arquivos do próprio diretório).
+        
+        A gravação é atômica (arquivo temporário oculto + os.replace): uma
+        queda no meio não deixa um JSON truncado no lugar do anterior.
+        """
+        conteudo = json.dumps(dados, indent=2, ensure_ascii=False).encode('utf-8')
+        diretorio, nome = os.path.split(caminho_arquivo)
+        temporario = os.path.join(diretorio, f".{nome}.{os.getpid()}.tmp")
+        try:
+            with open(temporario, 'wb') as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho_arquivo)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        
+        if os.path.dirname(os.path.abspath(caminho_arquivo)) == os.path.abspath(self.diretorio_dados):
+            try:
+                self.manifesto.registrar(os.path.basename(caminho_arquivo), conteudo)
+            except Exception as e:
+                # O arquivo foi gravado; a próxima listagem reconcilia o manifesto
+                self.logger.warning(f"Manifesto não atualizado para {caminho_arquivo}: {e}")
+    
+    def _nome_livre(self, prefixo: str) -> str:
+        """
+        Nome <prefixo>_<data>_<hora com microssegundos>.json ainda não usado.
+        
+        Com resolução de segundos, dois salvamentos no mesmo segundo
+        sobrescreviam um ao outro.
+        """
+        base = f"{prefixo}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        arquivo = f"{base}.json"
+        sufixo = 1
+        while os.path.exists(os.path.join(self.diretorio_dados, arquivo)):
+            arquivo = f"{base}_{sufixo}.json"
+            sufixo += 1
+        return arquivo
+    
+    def _caminho(self, arquivo: str) -> str:
+        """Nome solto vai para o diretório de dados; caminhos ficam como estão."""
+        return arquivo if os.path.dirname(arquivo) else os.path.join(self.diretorio_dados, arquivo)
+    
     def listar_arquivos_dados(self) -> List[str]:
         """
-        Lista arquivos JSON no diretório de dados.
+        Lista arquivos JSON no diretório de dados (pelo manifesto).
         
         Returns:
             Lista de nomes de arquivos JSON
         """
         try:
-            arquivos = [f for f in os.listdir(self.diretorio_dados) if f.endswith('.json')]
-            return sorted(arquivos)
+            return [entrada['nome'] for entrada in self.manifesto.entradas()]
         except Exception as e:
             self.logger.error(f"Erro ao listar arquivos: {e}")
             return []
 
 
+class EscritorJSONL:
+    """
+    Gravação em lote no formato JSON Lines: um registro JSON compacto por linha.
+    
+    As linhas são acumuladas e escritas no arquivo a cada `tamanho_buffer`
+    registros; arquivos terminados em .gz são comprimidos com gzip. Usar
+    com `with` (o buffer restante é gravado ao fechar).
+    """
+    
+    def __init__(self, caminho: str, tamanho_buffer: int = 1000):
+        """
+        Args:
+            caminho: Arquivo de destino (.jsonl ou .jsonl.gz)
+            tamanho_buffer: Linhas acumuladas entre duas escritas no arquivo
+        """
+        self.caminho = caminho
+        self.tamanho_buffer = tamanho_buffer
+        self.linhas_escritas = 0
+        self._buffer: List[str] = []
+        
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._arquivo = _abrir_texto(caminho, 'w')
+    
+    def escrever(self, registro: Dict[str, Any]) -> None:
+        """Acrescenta um registro (dicionário serializável; datas viram ISO 8601)."""
+        self._buffer.append(json.dumps(registro, ensure_ascii=False, default=_data_iso) + "\n")
+        if len(self._buffer) >= self.tamanho_buffer:
+            self._descarregar()
+    
+    def escrever_producao(self, dados: DadosProducao) -> None:
+        """Acrescenta dados de produção (mesmo formato de salvar_dados_producao)."""
+        self.escrever(_producao_para_dict(dados))
+    
+    def escrever_resultado(self, resultado: ResultadoPerda, dados_producao: DadosProducao) -> None:
+        """Acrescenta um relatório de perda (mesmo formato de salvar_resultado_perda)."""
+        self.escrever(_montar_relatorio_perda(resultado, dados_producao))
+    
+    def fechar(self) -> None:
+        """Grava o buffer restante e fecha o arquivo."""
+        if self._arquivo is not None:
+            self._descarregar()
+            self._arquivo.close()
+            self._arquivo = None
+    
+    def _descarregar(self) -> None:
+        """Escreve as linhas acumuladas de uma vez."""
+        if self._buffer:
+            self._arquivo.write(''.join(self._buffer))
+            self.linhas_escritas += len(self._buffer)
+            self._buffer.clear()
+    
+    def __enter__(self) -> 'EscritorJSONL':
+        return self
+    
+    def __exit__(self, *_) -> None:
+        self.fechar()
+
+
+class LeitorJSONL:
+    """
+    Leitura em fluxo de arquivos JSON Lines (.jsonl ou .jsonl.gz).
+    
+    Uma linha por vez é mantida em memória. Linhas em branco são puladas;
+    linhas inválidas (JSON malformado ou, em producoes(), dados que não
+    passam em validar_dados_producao) são contadas em `linhas_invalidas` e
+    ignoradas, com aviso no log para as primeiras `max_avisos`.
+    """
+    
+    def __init__(self, caminho: str, max_avisos: int = 10):
+        """
+        Args:
+            caminho: Arquivo de origem (.jsonl ou .jsonl.gz)
+            max_avisos: Linhas inválidas registradas individualmente no log
+        """
+        self.caminho = caminho
+        self.max_avisos = max_avisos
+        self.linhas_lidas = 0
+        self.linhas_invalidas = 0
+        self.logger = logging.getLogger(__name__)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Registros do arquivo como dicionários."""
+        for _, registro in self._registros():
+            yield registro
+    
+    def producoes(self) -> Iterator[DadosProducao]:
+        """Registros do arquivo como DadosProducao (os inválidos são ignorados)."""
+        for numero, registro in self._registros():
+            try:
+                erros = validar_dados_producao(registro)
+                if not erros:
+                    dados = _producao_de_dict(registro)
+            except (KeyError, TypeError, ValueError) as e:
+                erros = [f"campo ausente ou com tipo errado ({e!r})"]
+            if erros:
+                self._invalida(numero, "; ".join(erros))
+                continue
+            yield dados
+    
+    def _registros(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Pares (número da linha, registro) das linhas válidas."""
+        with _abrir_texto(self.caminho, 'r') as arquivo:
+            for numero, linha in enumerate(arquivo, 1):
+                if not linha.strip():
+                    continue
+                self.linhas_lidas += 1
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError as e:
+                    self._invalida(numero, f"JSON inválido ({e.msg})")
+                    continue
+                if not isinstance(registro, dict):
+                    self._invalida(numero, "registro não é um objeto JSON")
+                    continue
+                yield numero, registro
+        
+        if self.linhas_invalidas > self.max_avisos:
+            self.logger.warning(f"{self.linhas_invalidas} linhas inválidas ignoradas em {self.caminho}")
+    
+    def _invalida(self, numero: int, motivo: str) -> None:
+        """Conta a linha inválida e avisa no log enquanto houver avisos disponíveis."""
+        self.linhas_invalidas += 1
+        if self.linhas_invalidas <= self.max_avisos:
+            self.logger.warning(f"Linha {numero} ignorada em {self.caminho}: {motivo}")
+
+
+def _abrir_texto(caminho: str, modo: str):
+    """Abre o arquivo em modo texto UTF-8, com gzip quando termina em .gz."""
+    if caminho.endswith('.gz'):
+        return gzip.open(caminho, modo + 't', encoding='utf-8')
+    return open(caminho, modo, encoding='utf-8', buffering=1024 * 1024)
+
+
+def _data_iso(valor: Any) -> str:
+    """Datas em ISO 8601 nos arquivos JSON Lines."""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+def _producao_para_dict(dados: DadosProducao) -> Dict[str, Any]:
+    """Formato JSON dos dados de produção (arquivos .json e .jsonl)."""
+    return {
+        'localizacao': dados.localizacao,
+        'area_plantada_ha': dados.area_plantada_ha,
+        'qtd_colhida_toneladas': dados.qtd_colhida_toneladas,
+        'tipo_colheita': dados.tipo_colheita,
+        'data_colheita': dados.data_colheita.isoformat(),
+        'variedade_cana': dados.variedade_cana,
+        'idade_cana_meses': dados.idade_cana_meses,
+        'umidade_solo': dados.umidade_solo,
+        'temperatura_media': dados.temperatura_media,
+        'precipitacao_mm': dados.precipitacao_mm
+    }
+
+
+def _producao_de_dict(dados_dict: Dict[str, Any]) -> DadosProducao:
+    """DadosProducao a partir do formato JSON (data de string para date)."""
+    return DadosProducao(
+        localizacao=dados_dict['localizacao'],
+        area_plantada_ha=dados_dict['area_plantada_ha'],
+        qtd_colhida_toneladas=dados_dict['qtd_colhida_toneladas'],
+        tipo_colheita=dados_dict['tipo_colheita'],
+        data_colheita=datetime.fromisoformat(dados_dict['data_colheita']).date(),
+        variedade_cana=dados_dict.get('variedade_cana'),
+        idade_cana_meses=dados_dict.get('idade_cana_meses'),
+        umidade_solo=dados_dict.get('umidade_solo'),
+        temperatura_media=dados_dict.get('temperatura_media'),
+        precipitacao_mm=dados_dict.get('precipitacao_mm')
+    )
+
+
+def _montar_relatorio_perda(resultado: ResultadoPerda, dados_producao: DadosProducao) -> Dict[str, Any]:
+    """Formato JSON do relatório de perda (arquivos .json e .jsonl)."""
+    producao_potencial = dados_producao.qtd_colhida_toneladas + resultado.perda_estimada_toneladas
+    return {
+        'dados_producao': {
+            'localizacao': dados_producao.localizacao,
+            'area_plantada_ha': dados_producao.area_plantada_ha,
+            'qtd_colhida_toneladas': dados_producao.qtd_colhida_toneladas,
+            'tipo_colheita': dados_producao.tipo_colheita,
+            'data_colheita': dados_producao.data_colheita.isoformat()
+        },
+        'calculo_perdas': {
+            'perda_estimada_toneladas': resultado.perda_estimada_toneladas,
+            'percentual_perda': resultado.percentual_perda,
+            'fatores_aplicados': resultado.fatores_aplicados,
+            'metodo_calculo': resultado.metodo_calculo,
+            'observacoes': resultado.observacoes
+        },
+        'resumo': {
+            'producao_potencial_toneladas': producao_potencial,
+            # Sem produção nem perda (talhão não colhido) não há eficiência
+            'eficiencia_colheita': (round((dados_producao.qtd_colhida_toneladas / producao_potencial) * 100, 2)
+                                    if producao_potencial else None),
+            'produtividade_ha': round(dados_producao.qtd_colhida_toneladas / dados_producao.area_plantada_ha, 2)
+        },
+        'timestamp_calculo': datetime.now().isoformat()
+    }
+
+
 def validar_dados_producao(dados: Dict[str, Any]) -> List[str]:
     """
     Valida dados de produção de cana.
@@ -0,0 +1,242 @@
+"""
+Estado de saúde do banco com cache e disjuntor (circuit breaker).
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Testar a conexão abre uma conexão completa e, com o banco fora do ar,
+espera o timeout de conexão a cada tentativa. MonitorSaude guarda o
+último sucesso por alguns segundos e, após falhas seguidas, abre o
+disjuntor: as verificações passam a falhar na hora enquanto uma thread
+sonda o banco em segundo plano, com espera exponencial, até ele voltar.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class MonitorSaude:
+    """Disponibilidade do banco com sucesso em cache e disjuntor."""
+    
+    # Estados do disjuntor
+    FECHADO = 'fechado'          # banco respondendo; verificações liberadas
+    ABERTO = 'aberto'            # falhas seguidas; verificações falham na hora
+    MEIO_ABERTO = 'meio_aberto'  # sondagem em andamento após a espera
+    
+    def __init__(self,
+                 testar: Callable[[], bool],
+                 validade_sucesso: float = 15.0,
+                 limite_falhas: int = 3,
+                 espera_inicial: float = 1.0,
+                 espera_maxima: float = 60.0,
+                 sondar_em_segundo_plano: bool = True):
+        """
+        Args:
+            testar: Função que testa a conexão (ex.: repositorio.test_connection);
+                retornar False ou lançar exceção contam como falha
+            validade_sucesso: Segundos em que um sucesso dispensa novo teste
+            limite_falhas: Falhas seguidas que abrem o disjuntor
+            espera_inicial: Espera (s) antes da primeira sondagem com o disjuntor aberto
+            espera_maxima: Limite (s) da espera, que dobra a cada sondagem sem sucesso
+            sondar_em_segundo_plano: Se False, a sondagem é feita na própria
+                chamada de disponivel() quando a espera termina
+        """
+        self.testar = testar
+        self.validade_sucesso = validade_sucesso
+        self.limite_falhas = limite_falhas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.sondar_em_segundo_plano = sondar_em_segundo_plano
+        
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._sonda: Optional[threading.Thread] = None
+        
+        self.situacao = self.FECHADO
+        self.falhas_consecutivas = 0
+        self.ultimo_sucesso: Optional[float] = None
+        self.ultima_falha: Optional[float] = None
+        self.ultimo_erro: Optional[str] = None
+        self.espera_atual = espera_inicial
+        self.proxima_sondagem: Optional[float] = None
+        self.testes_realizados = 0
+        self.verificacoes_em_cache = 0
+        self.rejeicoes_rapidas = 0
+    
+    def disponivel(self, forcar: bool = False) -> bool:
+        """
+        Informa se o banco está disponível, testando só quando necessário.
+        
+        Args:
+            forcar: Testa a conexão mesmo com sucesso recente ou disjuntor aberto
+        
+        Returns:
+            True se o banco respondeu (agora ou dentro da validade do cache)
+        """
+        if not forcar:
+            with self._lock:
+                agora = time.monotonic()
+                
+                if (self.situacao == self.FECHADO and self.ultimo_sucesso is not None
+                        and agora - self.ultimo_sucesso < self.validade_sucesso):
+                    self.verificacoes_em_cache += 1
+                    return True
+                
+                if self.situacao != self.FECHADO:
+                    espera_terminou = agora >= self.proxima_sondagem
+                    if (self.sondar_em_segundo_plano or self.situacao == self.MEIO_ABERTO
+                            or not espera_terminou):
+                        self.rejeicoes_rapidas += 1
+                        return False
+                    # Sem thread: esta chamada faz a sondagem
+                    self.situacao = self.MEIO_ABERTO
+        
+        return self._executar_teste()
+    
+    def registrar_sucesso(self) -> None:
+        """Registra que o banco respondeu (fecha o disjuntor)."""
+        with self._lock:
+            if self.situacao != self.FECHADO:
+                self.logger.info("Banco de dados disponível novamente; disjuntor fechado")
+            self.situacao = self.FECHADO
+            self.falhas_consecutivas = 0
+            self.ultimo_sucesso = time.monotonic()
+            self.ultimo_erro = None
+            self.espera_atual = self.espera_inicial
+            self.proxima_sondagem = None
+    
+    def registrar_falha(self, erro: Any = None) -> None:
+        """Registra uma falha de acesso ao banco (pode abrir o disjuntor)."""
+        abrir_sonda = False
+        with self._lock:
+            agora = time.monotonic()
+            self.falhas_consecutivas += 1
+            self.ultima_falha = agora
+            self.ultimo_sucesso = None
+            self.ultimo_erro = str(erro) if erro is not None else "teste de conexão falhou"
+            
+            if self.situacao == self.FECHADO:
+                if self.falhas_consecutivas >= self.limite_falhas:
+                    self.logger.warning(
+                        f"Banco indisponível após {self.falhas_consecutivas} falhas; disjuntor aberto"
+                    )
+                    self.situacao = self.ABERTO
+                    self.espera_atual = self.espera_inicial
+                    self.proxima_sondagem = agora + self.espera_atual
+                    abrir_sonda = self.sondar_em_segundo_plano
+            else:
+                # Sondagem sem sucesso: dobra a espera
+                self.situacao = self.ABERTO
+                self.espera_atual = min(self.espera_atual * 2, self.espera_maxima)
+                self.proxima_sondagem = agora + self.espera_atual
+        
+        if abrir_sonda:
+            self._iniciar_sonda()
+    
+    def estado(self) -> Dict[str, Any]:
+        """Situação do disjuntor, falhas, idade do último sucesso e contadores."""
+        with self._lock:
+            agora = time.monotonic()
+            return {
+                'situacao': self.situacao,
+                'falhas_consecutivas': self.falhas_consecutivas,
+                'segundos_desde_sucesso': (agora - self.ultimo_sucesso
+                                           if self.ultimo_sucesso is not None else None),
+                'proxima_sondagem_em': (max(self.proxima_sondagem - agora, 0.0)
+                                        if self.proxima_sondagem is not None else None),
+                'ultimo_erro': self.ultimo_erro,
+                'testes_realizados': self.testes_realizados,
+                'verificacoes_em_cache': self.verificacoes_em_cache,
+                'rejeicoes_rapidas': self.rejeicoes_rapidas
+            }
+    
+    def descrever(self) -> str:
+        """Resumo de uma linha para exibição no menu."""
+        estado = self.estado()
+        if estado['situacao'] == self.FECHADO:
+            if estado['falhas_consecutivas']:
+                return f"🟠 instável ({estado['falhas_consecutivas']} falha(s) seguida(s))"
+            if estado['segundos_desde_sucesso'] is None:
+                return "⚪ não verificado"
+            return f"🟢 disponível (verificado há {estado['segundos_desde_sucesso']:.0f}s)"
+        if estado['situacao'] == self.MEIO_ABERTO:
+            return "🟡 testando reconexão"
+        return (f"🔴 indisponível ({estado['falhas_consecutivas']} falhas; "
+                f"nova tentativa em {estado['proxima_sondagem_em']:.0f}s)")
+    
+    def parar(self) -> None:
+        """Encerra a sondagem em segundo plano."""
+        self._parar.set()
+        if self._sonda is not None:
+            self._sonda.join(timeout=1.0)
+            self._sonda = None
+    
+    def _executar_teste(self) -> bool:
+        """Testa a conexão e registra o resultado."""
+        with self._lock:
+            self.testes_realizados += 1
+        
+        try:
+            ok = bool(self.testar())
+            erro = None
+        except Exception as e:
+            ok = False
+            erro = e
+        
+        if ok:
+            self.registrar_sucesso()
+        else:
+            self.registrar_falha(erro)
+        return ok
+    
+    def _iniciar_sonda(self) -> None:
+        """Inicia a thread de sondagem, se ainda não estiver rodando."""
+        with self._lock:
+            if self._sonda is not None and self._sonda.is_alive():
+                return
+            self._parar.clear()
+            self._sonda = threading.Thread(target=self._sondar, name="sonda-banco", daemon=True)
+            self._sonda.start()
+    
+    def _sondar(self) -> None:
+        """Laço da sondagem: espera, testa e repete até o disjuntor fechar."""
+        while not self._parar.is_set():
+            with self._lock:
+                if self.situacao == self.FECHADO:
+                    return
+                espera = max(self.proxima_sondagem - time.monotonic(), 0.0)
+            
+            if self._parar.wait(espera):
+                return
+            
+            with self._lock:
+                if self.situacao == self.FECHADO:
+                    return
+                self.situacao = self.MEIO_ABERTO
+            
+            self._executar_teste()
+
+
+# Exceções dos drivers (DB-API: psycopg2, psycopg, oracledb, sqlite3) e dos
+# pools que indicam banco fora do ar, rede ou timeout, e não dados rejeitados
+NOMES_ERROS_CONEXAO = ('OperationalError', 'InterfaceError', 'PoolError', 'PoolTimeout')
+
+
+def erro_de_conexao(erro: BaseException) -> bool:
+    """
+    Indica se o erro é de conexão (vale tentar de novo mais tarde) ou de dados.
+    
+    Erros de dados (IntegrityError, DataError, ProgrammingError...) se
+    repetiriam a cada nova tentativa e não devem ir para o spool.
+    
+    Args:
+        erro: Exceção lançada pelo repositório
+    
+    Returns:
+        True para falhas de conexão, rede ou timeout
+    """
+    if isinstance(erro, OSError):
+        # ConnectionError, TimeoutError e erros de socket
+        return True
+    return any(classe.__name__ in NOMES_ERROS_CONEXAO for classe in type(erro).__mro__)
@@ -0,0 +1,187 @@
+"""
+Ingestão em massa de arquivos JSON de produção.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+carregar_dados_producao abre um arquivo por vez, com uma linha de log e
+um DadosProducao por arquivo. Aqui o diretório é varrido uma vez
+(os.scandir), os arquivos são lidos e validados por um pool de
+trabalhadores em lotes de caminhos, e as produções válidas são
+acumuladas em colunas (uma lista por campo), prontas para o cálculo em
+lote, para um DataFrame ou para upsert_producoes_em_lote. Arquivos
+ilegíveis ou inválidos vão para a quarentena com o motivo, sem
+interromper a ingestão.
+
+Threads (padrão) sobrepõem a leitura dos arquivos; com usar_processos=True
+a decodificação e a validação também rodam em paralelo, em processos.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from src.functions import DadosProducao, validar_dados_producao
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Campos de produção, na ordem das colunas do lote
+COLUNAS_PRODUCAO = [
+    'localizacao', 'area_plantada_ha', 'qtd_colhida_toneladas', 'tipo_colheita',
+    'data_colheita', 'variedade_cana', 'idade_cana_meses', 'umidade_solo',
+    'temperatura_media', 'precipitacao_mm'
+]
+
+# Caminhos entregues a cada tarefa do pool (menos idas e voltas por arquivo)
+ARQUIVOS_POR_TAREFA = 256
+
+
+@dataclass
+class ResultadoIngestao:
+    """Lote colunar das produções válidas e quarentena dos arquivos rejeitados."""
+    colunas: Dict[str, List[Any]]
+    # Arquivo de origem de cada linha do lote
+    arquivos: List[str]
+    # LISTA: {'arquivo': caminho, 'motivo': texto} de cada arquivo rejeitado
+    quarentena: List[Dict[str, str]] = field(default_factory=list)
+    segundos: float = 0.0
+    
+    @property
+    def total_validos(self) -> int:
+        return len(self.arquivos)
+    
+    @property
+    def total_arquivos(self) -> int:
+        return len(self.arquivos) + len(self.quarentena)
+    
+    @property
+    def arquivos_por_segundo(self) -> float:
+        return self.total_arquivos / self.segundos if self.segundos > 0 else 0.0
+    
+    def registros(self) -> Iterator[Dict[str, Any]]:
+        """Produções como dicionários, no formato de upsert_producoes_em_lote."""
+        for valores in zip(*(self.colunas[coluna] for coluna in COLUNAS_PRODUCAO)):
+            yield dict(zip(COLUNAS_PRODUCAO, valores))
+    
+    def producoes(self) -> Iterator[DadosProducao]:
+        """Produções como DadosProducao, para o cálculo em lote."""
+        for valores in zip(*(self.colunas[coluna] for coluna in COLUNAS_PRODUCAO)):
+            yield DadosProducao(*valores)
+    
+    def dataframe(self) -> 'pd.DataFrame':
+        """Lote como DataFrame, com as colunas numéricas em arrays NumPy tipados."""
+        from src.colunar import TIPOS_PRODUCAO, montar_dataframe
+        
+        linhas = list(zip(*(self.colunas[coluna] for coluna in COLUNAS_PRODUCAO)))
+        return montar_dataframe(linhas, COLUNAS_PRODUCAO, TIPOS_PRODUCAO)
+
+
+def listar_arquivos_json(diretorio: str, recursivo: bool = False) -> List[str]:
+    """
+    Arquivos .json de um diretório (sem os ocultos, como o manifesto), em ordem de nome.
+    
+    Args:
+        diretorio: Diretório a varrer
+        recursivo: Se True, inclui os subdiretórios
+    """
+    caminhos = []
+    pendentes = [diretorio]
+    while pendentes:
+        with os.scandir(pendentes.pop()) as itens:
+            for item in itens:
+                if item.name.startswith('.'):
+                    continue
+                if item.is_dir():
+                    if recursivo:
+                        pendentes.append(item.path)
+                elif item.name.endswith('.json') and item.is_file():
+                    caminhos.append(item.path)
+    return sorted(caminhos)
+
+
+def ingerir_diretorio(diretorio: str,
+                      trabalhadores: Optional[int] = None,
+                      usar_processos: bool = False,
+                      recursivo: bool = False) -> ResultadoIngestao:
+    """
+    Lê e valida em paralelo todos os arquivos JSON de produção de um diretório.
+    
+    Args:
+        diretorio: Diretório com um JSON de produção por arquivo
+        trabalhadores: Tamanho do pool (padrão do concurrent.futures)
+        usar_processos: Se True, pool de processos em vez de threads
+        recursivo: Se True, inclui os subdiretórios
+    
+    Returns:
+        ResultadoIngestao com o lote colunar, a quarentena e a duração
+    """
+    logger = logging.getLogger(__name__)
+    inicio = time.perf_counter()
+    
+    try:
+        caminhos = listar_arquivos_json(diretorio, recursivo)
+        tarefas = [caminhos[i:i + ARQUIVOS_POR_TAREFA]
+                   for i in range(0, len(caminhos), ARQUIVOS_POR_TAREFA)]
+        
+        resultado = ResultadoIngestao(colunas={coluna: [] for coluna in COLUNAS_PRODUCAO}, arquivos=[])
+        colunas = [resultado.colunas[coluna] for coluna in COLUNAS_PRODUCAO]
+        
+        pool: Executor = (ProcessPoolExecutor(trabalhadores) if usar_processos
+                          else ThreadPoolExecutor(trabalhadores))
+        with pool:
+            # map preserva a ordem: o lote sai na ordem dos nomes de arquivo
+            for lote in pool.map(_ler_arquivos, tarefas):
+                for caminho, valores, motivo in lote:
+                    if motivo is not None:
+                        resultado.quarentena.append({'arquivo': caminho, 'motivo': motivo})
+                        continue
+                    for coluna, valor in zip(colunas, valores):
+                        coluna.append(valor)
+                    resultado.arquivos.append(caminho)
+        
+        resultado.segundos = time.perf_counter() - inicio
+        logger.info(f"Ingestão de {diretorio}: {resultado.total_validos} válido(s), "
+                    f"{len(resultado.quarentena)} em quarentena, "
+                    f"{resultado.arquivos_por_segundo:.0f} arquivos/s")
+        return resultado
+    
+    except Exception as e:
+        logger.error(f"Erro na ingestão de {diretorio}: {e}")
+        raise
+
+
+def _ler_arquivos(caminhos: List[str]) -> List[Tuple[str, Optional[tuple], Optional[str]]]:
+    """Tarefa do pool: (caminho, valores das colunas ou None, motivo da rejeição ou None)."""
+    return [_ler_arquivo(caminho) for caminho in caminhos]
+
+
+def _ler_arquivo(caminho: str) -> Tuple[str, Optional[tuple], Optional[str]]:
+    """Lê e valida um arquivo de produção, sem log por arquivo."""
+    try:
+        with open(caminho, 'rb') as arquivo:
+            dados = json.loads(arquivo.read())
+    except OSError as e:
+        return caminho, None, f"arquivo ilegível ({e.strerror or e})"
+    except ValueError as e:
+        return caminho, None, f"JSON inválido ({e})"
+    
+    if not isinstance(dados, dict):
+        return caminho, None, "conteúdo não é um objeto JSON"
+    if isinstance(dados.get('calculo_perdas'), dict):
+        return caminho, None, "relatório de perda, não dados de produção"
+    
+    try:
+        erros = validar_dados_producao(dados)
+        if not erros:
+            valores = tuple(dados.get(coluna) for coluna in COLUNAS_PRODUCAO)
+            # Data ISO: só a parte da data (também aceita 'AAAA-MM-DDTHH:MM:SS')
+            data_colheita = date.fromisoformat(dados['data_colheita'][:10])
+            return caminho, valores[:4] + (data_colheita,) + valores[5:], None
+    except (KeyError, TypeError, ValueError) as e:
+        erros = [f"campo ausente ou com tipo errado ({e!r})"]
+    return caminho, None, "; ".join(erros)
@@ -0,0 +1,387 @@
+"""
+Instrumentação das consultas aos bancos de dados.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+As conexões entregues por get_connection() são envolvidas por
+ConexaoInstrumentada: cada comando executado registra tempo de parede,
+linhas retornadas e tamanho dos parâmetros no MonitorConsultas, que mantém
+histogramas por nome de consulta, um log de consultas lentas e contadores
+(ex.: conexões abertas/fechadas).
+"""
+
+import json
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+
+# Limites superiores (ms) das faixas dos histogramas; a última é aberta
+FAIXAS_HISTOGRAMA_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_PADRAO_TABELA = re.compile(
+    r"^\s*(?:(insert)\s+into|(update)|(delete)\s+from|(merge)\s+into|(select)\b.*?\bfrom|(refresh)\s+materialized\s+view(?:\s+concurrently)?)"
+    r"\s+([\w.\"]+)",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def nome_consulta(sql: Any) -> str:
+    """
+    Deriva um nome estável para o comando: operação e tabela principal.
+    
+    Ex.: 'SELECT ... FROM vw_relatorio_perdas WHERE ...' -> 'select:vw_relatorio_perdas'.
+    Comandos não reconhecidos usam apenas a primeira palavra.
+    
+    Args:
+        sql: Texto do comando (str ou bytes)
+    
+    Returns:
+        Nome da consulta em minúsculas
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+    sql = str(sql)
+    
+    encontrado = _PADRAO_TABELA.match(sql)
+    if encontrado:
+        operacao = next(grupo for grupo in encontrado.groups()[:-1] if grupo)
+        return f"{operacao.lower()}:{encontrado.group(7).strip(chr(34)).lower()}"
+    
+    palavras = sql.split(None, 1)
+    return palavras[0].lower() if palavras else "vazio"
+
+
+def tamanho_binds(params: Any) -> int:
+    """Tamanho aproximado, em bytes, dos valores enviados como parâmetros."""
+    if params is None:
+        return 0
+    if isinstance(params, dict):
+        params = params.values()
+    elif isinstance(params, (str, bytes)):
+        return len(params)
+    
+    total = 0
+    for valor in params:
+        if isinstance(valor, (str, bytes)):
+            total += len(valor)
+        elif isinstance(valor, (int, float, Decimal, date)):
+            # Números e datas: tamanho fixo aproximado, sem converter para texto
+            total += 8
+        elif isinstance(valor, (dict, list, tuple)):
+            total += tamanho_binds(valor)
+    return total
+
+
+class MonitorConsultas:
+    """Agrega métricas das consultas executadas (seguro entre threads)."""
+    
+    def __init__(self, limite_lento_ms: float = 500.0, max_consultas_lentas: int = 200):
+        """
+        Args:
+            limite_lento_ms: Duração a partir da qual a consulta vai para o
+                log de consultas lentas
+            max_consultas_lentas: Quantidade de consultas lentas mantidas
+                (as mais antigas são descartadas)
+        """
+        self.limite_lento_ms = limite_lento_ms
+        self._lock = threading.Lock()
+        self._consultas: Dict[str, Dict[str, Any]] = {}
+        self._contadores: Dict[str, int] = {}
+        self._lentas = deque(maxlen=max_consultas_lentas)
+    
+    def contar(self, evento: str, quantidade: int = 1) -> None:
+        """Incrementa um contador (ex.: 'conexoes_abertas')."""
+        with self._lock:
+            self._contadores[evento] = self._contadores.get(evento, 0) + quantidade
+    
+    def registrar(self, sql: Any, duracao_s: float, linhas: int = 0, bytes_binds: int = 0) -> None:
+        """
+        Registra a execução de um comando.
+        
+        Args:
+            sql: Texto do comando
+            duracao_s: Tempo de parede (execução + leitura das linhas)
+            linhas: Linhas retornadas (ou afetadas, em comandos DML)
+            bytes_binds: Tamanho dos parâmetros enviados
+        """
+        nome = nome_consulta(sql)
+        duracao_ms = duracao_s * 1000
+        
+        with self._lock:
+            estatisticas = self._consultas.get(nome)
+            if estatisticas is None:
+                estatisticas = self._consultas[nome] = {
+                    'execucoes': 0,
+                    'tempo_total_ms': 0.0,
+                    'tempo_min_ms': duracao_ms,
+                    'tempo_max_ms': duracao_ms,
+                    'linhas': 0,
+                    'bytes_binds': 0,
+                    'histograma': [0] * (len(FAIXAS_HISTOGRAMA_MS) + 1)
+                }
+            
+            estatisticas['execucoes'] += 1
+            estatisticas['tempo_total_ms'] += duracao_ms
+            estatisticas['tempo_min_ms'] = min(estatisticas['tempo_min_ms'], duracao_ms)
+            estatisticas['tempo_max_ms'] = max(estatisticas['tempo_max_ms'], duracao_ms)
+            estatisticas['linhas'] += linhas
+            estatisticas['bytes_binds'] += bytes_binds
+            estatisticas['histograma'][self._faixa(duracao_ms)] += 1
+            
+            if duracao_ms >= self.limite_lento_ms:
+                self._lentas.append({
+                    'nome': nome,
+                    'sql': " ".join(str(sql if not isinstance(sql, bytes) else sql.decode('utf-8', 'replace')).split())[:1000],
+                    'duracao_ms': round(duracao_ms, 3),
+                    'linhas': linhas,
+                    'bytes_binds': bytes_binds,
+                    'em': datetime.now().isoformat(timespec='seconds')
+                })
+    
+    def consultas_lentas(self) -> List[Dict[str, Any]]:
+        """Cópia do log de consultas lentas (mais antigas primeiro)."""
+        with self._lock:
+            return list(self._lentas)
+    
+    def resumo(self) -> Dict[str, Any]:
+        """
+        Fotografia das métricas coletadas.
+        
+        Returns:
+            Dict com limite_lento_ms, contadores, consultas (estatísticas e
+            histograma por nome, com as faixas em ms) e consultas_lentas
+        """
+        with self._lock:
+            consultas = {}
+            for nome, estatisticas in self._consultas.items():
+                dados = dict(estatisticas)
+                dados['tempo_medio_ms'] = dados['tempo_total_ms'] / dados['execucoes']
+                dados['histograma'] = {
+                    self._rotulo_faixa(i): total
+                    for i, total in enumerate(estatisticas['histograma']) if total
+                }
+                consultas[nome] = dados
+            
+            return {
+                'limite_lento_ms': self.limite_lento_ms,
+                'contadores': dict(self._contadores),
+                'consultas': consultas,
+                'consultas_lentas': list(self._lentas)
+            }
+    
+    def exportar_json(self, caminho: Optional[str] = None) -> str:
+        """
+        Exporta o resumo em JSON.
+        
+        Args:
+            caminho: Arquivo de destino (opcional)
+        
+        Returns:
+            Texto JSON do resumo
+        """
+        texto = json.dumps(self.resumo(), ensure_ascii=False, indent=2)
+        if caminho:
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto)
+        return texto
+    
+    def limpar(self) -> None:
+        """Descarta todas as métricas coletadas."""
+        with self._lock:
+            self._consultas.clear()
+            self._contadores.clear()
+            self._lentas.clear()
+    
+    def _faixa(self, duracao_ms: float) -> int:
+        for i, limite in enumerate(FAIXAS_HISTOGRAMA_MS):
+            if duracao_ms <= limite:
+                return i
+        return len(FAIXAS_HISTOGRAMA_MS)
+    
+    def _rotulo_faixa(self, indice: int) -> str:
+        if indice < len(FAIXAS_HISTOGRAMA_MS):
+            return f"<={FAIXAS_HISTOGRAMA_MS[indice]}ms"
+        return f">{FAIXAS_HISTOGRAMA_MS[-1]}ms"
+
+
+# Monitor compartilhado pelos bancos quando nenhum outro é informado
+monitor_consultas = MonitorConsultas()
+
+
+class CursorInstrumentado:
+    """
+    Envolve um cursor DB-API medindo cada comando executado.
+    
+    O registro de um comando é concluído no próximo execute, ao fechar o
+    cursor, quando o cursor é descartado ou ao fechar a conexão; até lá,
+    o tempo gasto nas leituras (fetch*) e as linhas lidas são somados a ele.
+    """
+    
+    def __init__(self, cursor: Any, monitor: MonitorConsultas):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_monitor', monitor)
+        object.__setattr__(self, '_pendente', None)
+    
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self._cursor, nome)
+    
+    def __setattr__(self, nome: str, valor: Any) -> None:
+        # itersize, arraysize, prefetchrows, row_factory... vão para o cursor real
+        setattr(self._cursor, nome, valor)
+    
+    def __iter__(self):
+        # Itera o cursor real: cursores nomeados continuam buscando em lotes (itersize)
+        iterador = iter(self._cursor)
+        while True:
+            inicio = time.perf_counter()
+            try:
+                row = next(iterador)
+            except StopIteration:
+                self._acumular(time.perf_counter() - inicio, 0)
+                return
+            self._acumular(time.perf_counter() - inicio, 1)
+            yield row
+    
+    def __enter__(self) -> "CursorInstrumentado":
+        self._cursor.__enter__()
+        return self
+    
+    def __exit__(self, *exc) -> Any:
+        self._concluir()
+        return self._cursor.__exit__(*exc)
+    
+    def execute(self, sql: Any, params: Any = None, **kwargs) -> "CursorInstrumentado":
+        self._concluir()
+        argumentos = () if params is None else (params,)
+        inicio = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *argumentos, **kwargs)
+        finally:
+            self._iniciar(sql, time.perf_counter() - inicio, tamanho_binds(params if params is not None else kwargs))
+        return self
+    
+    def executemany(self, sql: Any, seq_params: Any, **kwargs) -> "CursorInstrumentado":
+        self._concluir()
+        seq_params = list(seq_params)
+        inicio = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_params, **kwargs)
+        finally:
+            self._iniciar(sql, time.perf_counter() - inicio, sum(tamanho_binds(p) for p in seq_params))
+        return self
+    
+    def callproc(self, nome: str, params: Any = None, *args, **kwargs) -> Any:
+        self._concluir()
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.callproc(nome, params or [], *args, **kwargs)
+        finally:
+            self._iniciar(f"call {nome}", time.perf_counter() - inicio, tamanho_binds(params))
+    
+    def fetchone(self) -> Any:
+        inicio = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._acumular(time.perf_counter() - inicio, 0 if row is None else 1)
+        return row
+    
+    def fetchmany(self, *args, **kwargs) -> List[Any]:
+        inicio = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._acumular(time.perf_counter() - inicio, len(rows))
+        return rows
+    
+    def fetchall(self) -> List[Any]:
+        inicio = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._acumular(time.perf_counter() - inicio, len(rows))
+        return rows
+    
+    def close(self) -> None:
+        self._concluir()
+        self._cursor.close()
+    
+    def __del__(self) -> None:
+        # Cursor descartado sem close (ex.: conn.execute(...) por linha em um laço)
+        if self.__dict__.get('_pendente') is not None:
+            self._concluir()
+    
+    def _iniciar(self, sql: Any, duracao_s: float, bytes_binds: int) -> None:
+        if hasattr(sql, 'as_string'):
+            # psycopg2.sql.Composed: converte para texto para nomear a consulta
+            try:
+                sql = sql.as_string(self._cursor)
+            except Exception:
+                sql = str(sql)
+        # Em DML, rowcount traz as linhas afetadas; em SELECT, contamos nos fetch*
+        rowcount = getattr(self._cursor, 'rowcount', -1)
+        linhas = rowcount if isinstance(rowcount, int) and rowcount > 0 and not _eh_consulta(sql) else 0
+        object.__setattr__(self, '_pendente', [sql, duracao_s, linhas, bytes_binds])
+    
+    def _acumular(self, duracao_s: float, linhas: int) -> None:
+        if self._pendente is not None:
+            self._pendente[1] += duracao_s
+            self._pendente[2] += linhas
+    
+    def _concluir(self) -> None:
+        if self._pendente is not None:
+            sql, duracao_s, linhas, bytes_binds = self._pendente
+            object.__setattr__(self, '_pendente', None)
+            self._monitor.registrar(sql, duracao_s, linhas, bytes_binds)
+
+
+def _eh_consulta(sql: Any) -> bool:
+    if isinstance(sql, bytes):
+        sql = sql[:20].decode('utf-8', errors='replace')
+    return str(sql).lstrip().lower().startswith(('select', 'with'))
+
+
+class ConexaoInstrumentada:
+    """Envolve uma conexão DB-API entregando cursores instrumentados."""
+    
+    def __init__(self, conexao: Any, monitor: MonitorConsultas):
+        object.__setattr__(self, '_conexao', conexao)
+        object.__setattr__(self, '_monitor', monitor)
+        # Referências fracas: cursores descartados concluem o registro e saem daqui
+        object.__setattr__(self, '_cursores', weakref.WeakSet())
+    
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self._conexao, nome)
+    
+    def __setattr__(self, nome: str, valor: Any) -> None:
+        # autocommit, row_factory... vão para a conexão real
+        setattr(self._conexao, nome, valor)
+    
+    def cursor(self, *args, **kwargs) -> CursorInstrumentado:
+        cursor = CursorInstrumentado(self._conexao.cursor(*args, **kwargs), self._monitor)
+        self._cursores.add(cursor)
+        return cursor
+    
+    def execute(self, sql: Any, params: Any = None) -> CursorInstrumentado:
+        """Atalho das conexões sqlite3: cria um cursor e executa."""
+        return self.cursor().execute(sql, params)
+    
+    def executescript(self, script: str) -> CursorInstrumentado:
+        """Atalho das conexões sqlite3 para scripts com vários comandos."""
+        cursor = self.cursor()
+        cursor._concluir()
+        inicio = time.perf_counter()
+        try:
+            cursor._cursor.executescript(script)
+        finally:
+            cursor._iniciar("executescript", time.perf_counter() - inicio, 0)
+        return cursor
+    
+    def close(self) -> None:
+        self.concluir_registros()
+        self._conexao.close()
+    
+    def concluir_registros(self) -> None:
+        """Conclui o registro dos comandos ainda pendentes nos cursores."""
+        for cursor in list(self._cursores):
+            cursor._concluir()
+        self._cursores.clear()
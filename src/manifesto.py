@@ -0,0 +1,340 @@
+"""
+Manifesto (índice) dos arquivos JSON do diretório de dados.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Para saber o que é cada arquivo (produção ou relatório de perda, de qual
+localização e data) era preciso abrir todos. ManifestoDados guarda em
+data/.manifest.json o tipo, a localização, a data da colheita, o tamanho,
+o mtime e o hash SHA-256 de cada arquivo. O manifesto é atualizado a cada
+gravação feita pelo sistema e reconciliado na listagem: um os.scandir
+compara tamanho e mtime, e só os arquivos novos ou alterados por fora
+são abertos. Enquanto o mtime do diretório não mudar (nenhum arquivo
+criado, removido ou renomeado), nem a varredura é refeita.
+
+Cada gravação acrescenta uma linha ao diário (data/.manifest.journal) em
+vez de regravar o manifesto inteiro; o manifesto é refeito (compactação)
+quando o diário passa do tamanho do próprio manifesto, e o diário é
+zerado. Na leitura, o manifesto e as linhas do diário são aplicados em
+ordem; outros processos são acompanhados lendo só o trecho novo do diário.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+
+class ManifestoDados:
+    """Índice incremental dos arquivos .json de um diretório."""
+    
+    NOME_ARQUIVO = ".manifest.json"
+    # Alterações desde a última compactação, uma linha JSON por alteração
+    NOME_DIARIO = ".manifest.journal"
+    VERSAO = 1
+    
+    # Tipos de arquivo reconhecidos pelo conteúdo
+    PRODUCAO = "producao"
+    RELATORIO_PERDA = "relatorio_perda"
+    DESCONHECIDO = "desconhecido"
+    INVALIDO = "invalido"
+    
+    def __init__(self, diretorio: str, compactar_a_cada: int = 1000):
+        """
+        Args:
+            diretorio: Diretório de dados indexado (o manifesto fica nele)
+            compactar_a_cada: Mínimo de linhas do diário antes de refazer o
+                manifesto (acima disso, compacta quando o diário tiver tantas
+                linhas quanto o manifesto tem entradas)
+        """
+        self.diretorio = diretorio
+        self.caminho = os.path.join(diretorio, self.NOME_ARQUIVO)
+        self.caminho_diario = os.path.join(diretorio, self.NOME_DIARIO)
+        self.compactar_a_cada = compactar_a_cada
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        # Carregado no primeiro uso; recarregado se outro processo regravar o manifesto
+        self._entradas: Optional[Dict[str, Dict[str, Any]]] = None
+        self._mtime_manifesto: Optional[int] = None
+        # mtime do diretório na última reconciliação deste processo
+        self._mtime_diretorio: Optional[int] = None
+        self._ordenadas: Optional[List[Dict[str, Any]]] = None
+        # Bytes e linhas do diário já aplicados às entradas em memória
+        self._posicao_diario = 0
+        self._linhas_diario = 0
+    
+    def registrar(self, nome: str, conteudo: bytes) -> Dict[str, Any]:
+        """
+        Atualiza a entrada de um arquivo recém-gravado no diretório.
+        
+        Args:
+            nome: Nome do arquivo (sem diretório)
+            conteudo: Bytes gravados (evita reler o arquivo para o hash)
+        
+        Returns:
+            Entrada registrada
+        """
+        with self._lock:
+            entradas = self._carregar()
+            entrada = self._descrever(nome, os.stat(os.path.join(self.diretorio, nome)), conteudo)
+            entradas[nome] = entrada
+            self._registrar_alteracao({'arquivo': entrada})
+            return entrada
+    
+    def remover(self, nome: str) -> None:
+        """Retira do manifesto um arquivo excluído."""
+        with self._lock:
+            if self._carregar().pop(nome, None) is not None:
+                self._registrar_alteracao({'removido': nome})
+    
+    def reconciliar(self, forcar: bool = False) -> int:
+        """
+        Sincroniza o manifesto com o diretório.
+        
+        Arquivos com tamanho e mtime iguais aos registrados não são abertos;
+        novos ou alterados por fora são lidos, e os que sumiram são removidos.
+        
+        Args:
+            forcar: Varre o diretório mesmo sem mudança no seu mtime (pega
+                arquivos editados no lugar por outros programas)
+        
+        Returns:
+            Número de entradas criadas, atualizadas ou removidas
+        """
+        with self._lock:
+            entradas = self._carregar()
+            mtime_diretorio = os.stat(self.diretorio).st_mtime_ns
+            if not forcar and mtime_diretorio == self._mtime_diretorio:
+                return 0
+            
+            vistos = set()
+            alteracoes = 0
+            
+            with os.scandir(self.diretorio) as itens:
+                for item in itens:
+                    if not self._indexavel(item.name) or not item.is_file():
+                        continue
+                    vistos.add(item.name)
+                    estado = item.stat()
+                    entrada = entradas.get(item.name)
+                    if (entrada is not None and entrada['tamanho'] == estado.st_size
+                            and entrada['mtime_ns'] == estado.st_mtime_ns):
+                        continue
+                    try:
+                        with open(item.path, 'rb') as arquivo:
+                            conteudo = arquivo.read()
+                    except OSError as e:
+                        self.logger.warning(f"Arquivo {item.name} não indexado: {e}")
+                        continue
+                    entradas[item.name] = self._descrever(item.name, estado, conteudo)
+                    alteracoes += 1
+            
+            for nome in set(entradas) - vistos:
+                del entradas[nome]
+                alteracoes += 1
+            
+            if alteracoes:
+                self._salvar()
+                self.logger.info(f"Manifesto de {self.diretorio} reconciliado: {alteracoes} alteração(ões)")
+                # O os.replace do manifesto muda o mtime do diretório; o resto já foi visto
+                mtime_diretorio = os.stat(self.diretorio).st_mtime_ns
+            self._mtime_diretorio = mtime_diretorio
+            return alteracoes
+    
+    def entradas(self, reconciliar: bool = True) -> List[Dict[str, Any]]:
+        """
+        Entradas do manifesto, ordenadas pelo nome do arquivo.
+        
+        A lista é compartilhada entre chamadas até a próxima alteração:
+        não modificar as entradas.
+        
+        Args:
+            reconciliar: Se True, sincroniza com o diretório antes
+        """
+        with self._lock:
+            if reconciliar:
+                self.reconciliar()
+            entradas = self._carregar()
+            if self._ordenadas is None:
+                self._ordenadas = [entradas[nome] for nome in sorted(entradas)]
+            return self._ordenadas
+    
+    def filtrar(self,
+                tipo: Optional[str] = None,
+                localizacao: Optional[str] = None,
+                data_inicio: Optional[date] = None,
+                data_fim: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Entradas que atendem aos filtros, sem abrir os arquivos.
+        
+        Args:
+            tipo: 'producao' ou 'relatorio_perda'
+            localizacao: Trecho da localização (sem diferenciar maiúsculas)
+            data_inicio: Data de colheita mínima
+            data_fim: Data de colheita máxima
+        
+        Returns:
+            Lista de entradas (com 'nome'), ordenadas pelo nome
+        """
+        trecho = localizacao.lower() if localizacao else None
+        inicio = data_inicio.isoformat() if data_inicio else None
+        fim = data_fim.isoformat() if data_fim else None
+        
+        selecionadas = []
+        for entrada in self.entradas():
+            if tipo and entrada['tipo'] != tipo:
+                continue
+            if trecho and trecho not in (entrada['localizacao'] or '').lower():
+                continue
+            # Datas ISO 8601 comparadas como texto
+            data_colheita = entrada['data_colheita']
+            if (inicio or fim) and not data_colheita:
+                continue
+            if inicio and data_colheita < inicio:
+                continue
+            if fim and data_colheita > fim:
+                continue
+            selecionadas.append(entrada)
+        return selecionadas
+    
+    def _indexavel(self, nome: str) -> bool:
+        """Arquivos .json do diretório, exceto o próprio manifesto e ocultos."""
+        return nome.endswith('.json') and not nome.startswith('.')
+    
+    def _descrever(self, nome: str, estado: os.stat_result, conteudo: bytes) -> Dict[str, Any]:
+        """Entrada do manifesto a partir do conteúdo do arquivo."""
+        entrada = {
+            'nome': nome,
+            'tipo': self.INVALIDO,
+            'localizacao': None,
+            'data_colheita': None,
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'sha256': hashlib.sha256(conteudo).hexdigest()
+        }
+        try:
+            dados = json.loads(conteudo)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            self.logger.warning(f"Arquivo {nome} não é um JSON válido")
+            return entrada
+        
+        if not isinstance(dados, dict):
+            entrada['tipo'] = self.DESCONHECIDO
+        elif isinstance(dados.get('calculo_perdas'), dict):
+            producao = dados.get('dados_producao') or {}
+            entrada.update(tipo=self.RELATORIO_PERDA,
+                           localizacao=producao.get('localizacao'),
+                           data_colheita=producao.get('data_colheita'))
+        elif 'localizacao' in dados and 'tipo_colheita' in dados:
+            entrada.update(tipo=self.PRODUCAO,
+                           localizacao=dados.get('localizacao'),
+                           data_colheita=dados.get('data_colheita'))
+        else:
+            entrada['tipo'] = self.DESCONHECIDO
+        return entrada
+    
+    def _registrar_alteracao(self, alteracao: Dict[str, Any]) -> None:
+        """Acrescenta a alteração ao diário (uma escrita) ou, se ele já está grande, compacta."""
+        self._ordenadas = None
+        if self._linhas_diario >= max(self.compactar_a_cada, len(self._entradas)):
+            self._salvar()
+        else:
+            linha = (json.dumps(alteracao, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+            with open(self.caminho_diario, 'ab') as diario:
+                diario.write(linha)
+                fim = diario.tell()
+            # Se outro processo escreveu no diário desde a última leitura, a
+            # posição não avança: as linhas dele (e esta) são lidas na próxima
+            if fim - len(linha) == self._posicao_diario:
+                self._posicao_diario = fim
+                self._linhas_diario += 1
+        
+        # A gravação que originou a alteração mudou o mtime do diretório; sem
+        # isto, a próxima listagem varreria o diretório por causa dela
+        if self._mtime_diretorio is not None:
+            self._mtime_diretorio = os.stat(self.diretorio).st_mtime_ns
+    
+    def _carregar(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Entradas em memória: manifesto lido no primeiro uso ou se foi refeito
+        (por outro processo), mais as linhas novas do diário.
+        """
+        try:
+            mtime = os.stat(self.caminho).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        
+        if self._entradas is None or mtime != self._mtime_manifesto:
+            self._entradas = {}
+            self._ordenadas = None
+            self._mtime_diretorio = None
+            self._posicao_diario = 0
+            self._linhas_diario = 0
+            if mtime is not None:
+                try:
+                    with open(self.caminho, 'r', encoding='utf-8') as arquivo:
+                        manifesto = json.load(arquivo)
+                    if manifesto.get('versao') == self.VERSAO:
+                        self._entradas = {entrada['nome']: entrada for entrada in manifesto.get('arquivos', [])}
+                except (OSError, ValueError, AttributeError) as e:
+                    # Manifesto corrompido: é refeito na próxima reconciliação
+                    self.logger.warning(f"Manifesto {self.caminho} ignorado: {e}")
+            self._mtime_manifesto = mtime
+        
+        self._aplicar_diario()
+        return self._entradas
+    
+    def _aplicar_diario(self) -> None:
+        """Aplica às entradas as linhas do diário ainda não lidas por este processo."""
+        try:
+            tamanho = os.stat(self.caminho_diario).st_size
+        except FileNotFoundError:
+            tamanho = 0
+        if tamanho < self._posicao_diario:
+            # Diário zerado por uma compactação que ainda não vimos: relê do início
+            # (reaplicar linhas é inofensivo; a reconciliação corrige o resto)
+            self._posicao_diario = 0
+            self._linhas_diario = 0
+        if tamanho == self._posicao_diario:
+            return
+        
+        with open(self.caminho_diario, 'rb') as diario:
+            diario.seek(self._posicao_diario)
+            trecho = diario.read()
+        
+        for linha in trecho.splitlines(keepends=True):
+            if not linha.endswith(b"\n"):
+                # Linha ainda sendo escrita por outro processo
+                break
+            self._posicao_diario += len(linha)
+            self._linhas_diario += 1
+            try:
+                alteracao = json.loads(linha)
+                if 'arquivo' in alteracao:
+                    self._entradas[alteracao['arquivo']['nome']] = alteracao['arquivo']
+                else:
+                    self._entradas.pop(alteracao['removido'], None)
+            except (ValueError, KeyError, TypeError) as e:
+                self.logger.warning(f"Linha do diário {self.caminho_diario} ignorada: {e}")
+        self._ordenadas = None
+    
+    def _salvar(self) -> None:
+        """
+        Compacta: grava o manifesto inteiro de forma atômica (arquivo
+        temporário + os.replace), numa única escrita, e zera o diário.
+        """
+        conteudo = json.dumps({'versao': self.VERSAO, 'arquivos': list(self._entradas.values())},
+                              ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, self.caminho)
+        # Depois do manifesto: uma queda entre os dois só faz o diário ser reaplicado
+        with open(self.caminho_diario, 'wb'):
+            pass
+        self._mtime_manifesto = os.stat(self.caminho).st_mtime_ns
+        self._posicao_diario = 0
+        self._linhas_diario = 0
+        self._ordenadas = None
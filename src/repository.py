@@ -0,0 +1,174 @@
+"""
+Interface comum dos repositórios de dados.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
+
+# Só para as anotações: importar a interface (ex.: pelo main.py) não carrega o pandas
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class RepositorioProducao(ABC):
+    """
+    Operações de produção, perdas e relatórios comuns a todos os bancos.
+    
+    Implementada por OracleDatabase, PostgreSQLDatabase e SQLiteDatabase;
+    o restante do sistema deve depender apenas desta interface.
+    """
+    
+    # Fatores gravados em perdas_colheita.fatores_perda (lista fechada contra injeção)
+    FATORES_PERDA = ('fator_base', 'fator_umidade', 'fator_idade', 'fator_clima')
+    
+    # Expressão SQL que extrai um fator de fatores_perda (definida em cada banco,
+    # idêntica à dos índices de INDICES_FATORES para que eles sejam usados)
+    EXPRESSAO_FATOR = ""
+    
+    @abstractmethod
+    def test_connection(self) -> bool:
+        """Retorna True se o banco estiver acessível."""
+    
+    @abstractmethod
+    def inserir_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """Insere uma produção e retorna o ID gerado."""
+    
+    @abstractmethod
+    def inserir_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insere várias produções em uma transação; IDs na ordem da entrada."""
+    
+    @abstractmethod
+    def inserir_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """Insere um cálculo de perda e retorna o ID gerado."""
+    
+    @abstractmethod
+    def inserir_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insere vários cálculos de perda em uma transação; IDs na ordem da entrada."""
+    
+    @abstractmethod
+    def upsert_producao_cana(self, dados_producao: Dict[str, Any]) -> int:
+        """Insere ou atualiza a produção pela chave (localizacao, data_colheita, tipo_colheita)."""
+    
+    @abstractmethod
+    def upsert_producoes_em_lote(self, lista_producoes: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insere ou atualiza várias produções pela chave natural; IDs na ordem da entrada."""
+    
+    @abstractmethod
+    def upsert_perda_colheita(self, dados_perda: Dict[str, Any]) -> int:
+        """Insere ou atualiza o cálculo de perda pela chave (producao_id, metodo_calculo)."""
+    
+    @abstractmethod
+    def upsert_perdas_em_lote(self, lista_perdas: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insere ou atualiza vários cálculos de perda pela chave natural; IDs na ordem da entrada."""
+    
+    @abstractmethod
+    def buscar_producao_por_id(self, producao_id: int) -> Optional[Dict[str, Any]]:
+        """Retorna a produção com o ID informado ou None."""
+    
+    @abstractmethod
+    def buscar_producoes_por_ids(self, producao_ids: Iterable[int],
+                                 tamanho_lote: int = 10000) -> 'pd.DataFrame':
+        """Busca várias produções pelos IDs; resultado colunar ordenado por id."""
+    
+    @abstractmethod
+    def buscar_parametros_perdas(self, tipo_colheita: str) -> Optional[Dict[str, Any]]:
+        """Retorna os parâmetros ativos do tipo de colheita ou None."""
+    
+    @abstractmethod
+    def listar_producoes(self, limite: int = 50,
+                         apos: Optional[Tuple[date, int]] = None) -> List[Dict[str, Any]]:
+        """Lista produções por (data_colheita, id) decrescente, paginando por chave."""
+    
+    @abstractmethod
+    def iterar_producoes(self,
+                         tamanho_lote: int = 1000,
+                         data_inicio: date = None,
+                         data_fim: date = None) -> Iterator[Dict[str, Any]]:
+        """Percorre as produções em lotes, sem carregar a tabela em memória."""
+    
+    @abstractmethod
+    def gerar_relatorio_perdas_em_lotes(self,
+                                        data_inicio: date = None,
+                                        data_fim: date = None,
+                                        tamanho_lote: int = 10000) -> Iterator['pd.DataFrame']:
+        """Produz o relatório de perdas em blocos de DataFrame."""
+    
+    @abstractmethod
+    def resumir_perdas(self, data_inicio: date = None, data_fim: date = None) -> Dict[str, Any]:
+        """Totais do relatório de perdas calculados no banco."""
+    
+    @abstractmethod
+    def resumir_perdas_por(self,
+                           agrupamento: str,
+                           data_inicio: date = None,
+                           data_fim: date = None) -> List[Dict[str, Any]]:
+        """Totais do relatório de perdas agrupados no banco."""
+    
+    @abstractmethod
+    def buscar_perdas_por_fator(self, fator: str, minimo: float = None, maximo: float = None,
+                                limite: int = 1000) -> List[Dict[str, Any]]:
+        """Perdas com o fator entre minimo e maximo, filtradas no banco."""
+    
+    @abstractmethod
+    def agregar_fator(self, fator: str, agrupamento: Optional[str] = None,
+                      data_inicio: date = None, data_fim: date = None) -> List[Dict[str, Any]]:
+        """Mínimo, média e máximo de um fator (por grupo), calculados no banco."""
+    
+    @abstractmethod
+    def recalcular_perdas_no_banco(self, data_inicio: date = None, data_fim: date = None) -> int:
+        """Recalcula as perdas 'avancado' do período no próprio banco; retorna as linhas gravadas."""
+    
+    @abstractmethod
+    def garantir_indices(self) -> List[str]:
+        """Cria os índices compostos e de cobertura que faltam; retorna os criados."""
+    
+    @abstractmethod
+    def executar_sql_customizado(self, sql: str, params: Dict = None) -> List[Tuple]:
+        """Executa um SELECT arbitrário."""
+    
+    def gerar_relatorio_perdas(self, data_inicio: date = None, data_fim: date = None) -> 'pd.DataFrame':
+        """
+        Gera relatório consolidado de perdas.
+        
+        Args:
+            data_inicio: Data inicial para filtro (opcional)
+            data_fim: Data final para filtro (opcional)
+        
+        Returns:
+            DataFrame do pandas com dados do relatório
+        """
+        import pandas as pd
+        
+        lotes = list(self.gerar_relatorio_perdas_em_lotes(data_inicio, data_fim))
+        return pd.concat(lotes, ignore_index=True) if len(lotes) > 1 else lotes[0]
+    
+    def _expressao_fator(self, fator: str) -> str:
+        """Expressão SQL do fator, validada contra FATORES_PERDA."""
+        if fator not in self.FATORES_PERDA:
+            raise ValueError(f"Fator deve ser um de: {', '.join(self.FATORES_PERDA)}")
+        return self.EXPRESSAO_FATOR.format(fator=fator)
+    
+    def atualizar_relatorio_materializado(self, *args, **kwargs) -> None:
+        """Atualiza o relatório materializado (nem todo banco oferece)."""
+        raise NotImplementedError(f"{type(self).__name__} não possui relatório materializado")
+    
+    def status_relatorio_materializado(self) -> Dict[str, Any]:
+        """Situação do relatório materializado (nem todo banco oferece)."""
+        raise NotImplementedError(f"{type(self).__name__} não possui relatório materializado")
+    
+    def criar_particoes_futuras(self, meses_a_frente: int = 3) -> List[str]:
+        """Cria partições mensais futuras (nem todo banco oferece)."""
+        raise NotImplementedError(f"{type(self).__name__} não usa tabelas particionadas")
+    
+    def arquivar_particoes(self, anteriores_a: date) -> List[str]:
+        """Arquiva partições antigas (nem todo banco oferece)."""
+        raise NotImplementedError(f"{type(self).__name__} não usa tabelas particionadas")
+    
+    def assinar_alteracoes_parametros(self, callback: Callable[[Optional[str]], None]) -> None:
+        """Avisa `callback(tipo_colheita)` sobre alterações de parâmetros (nem todo banco oferece)."""
+        raise NotImplementedError(f"{type(self).__name__} não avisa alterações de parâmetros")
+    
+    def cancelar_assinaturas_parametros(self) -> None:
+        """Encerra os avisos de alteração de parâmetros, se houver."""
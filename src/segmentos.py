@@ -0,0 +1,319 @@
+"""
+Arquivo de relatórios de perda em segmentos rotativos.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+No modo arquivo, cada relatório é acrescentado como uma linha JSON ao
+segmento ativo (relatorios-<início>.jsonl.tmp) em vez de virar um arquivo
+próprio. O segmento é selado ao passar do tamanho ou da idade máximos:
+fsync, índice de offsets gravado ao lado (.idx, arquivo temporário +
+rename) e rename de .jsonl.tmp para .jsonl. O ID de cada relatório
+(<início do segmento>-<sequência>) leva ao segmento e, pelo índice, ao
+offset da linha: a leitura por ID é um seek.
+
+Várias sessões podem usar o mesmo diretório: o segmento ativo fica
+travado (flock) pela sessão dona enquanto está aberto. Um segmento ativo
+sem trava, deixado por uma queda, é selado na abertura seguinte,
+descartando a última linha se ela estiver incompleta; os travados são de
+outra sessão em execução e ficam como estão.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class ArquivoRelatorios:
+    """Segmentos JSON Lines com rotação por tamanho e idade e índice de offsets."""
+    
+    PREFIXO = "relatorios-"
+    EXTENSAO = ".jsonl"
+    EXTENSAO_ATIVO = ".jsonl.tmp"
+    EXTENSAO_INDICE = ".idx"
+    
+    def __init__(self,
+                 diretorio: str = "data/relatorios",
+                 tamanho_max_segmento: int = 16 * 1024 * 1024,
+                 idade_max_segundos: float = 3600.0,
+                 sincronizar_cada_gravacao: bool = False):
+        """
+        Args:
+            diretorio: Pasta dos segmentos
+            tamanho_max_segmento: Bytes a partir dos quais o segmento é selado
+            idade_max_segundos: Idade a partir da qual o segmento é selado
+            sincronizar_cada_gravacao: Se True, fsync a cada relatório (por
+                padrão, flush a cada relatório e fsync ao selar/fechar)
+        """
+        self.diretorio = diretorio
+        self.tamanho_max_segmento = tamanho_max_segmento
+        self.idade_max_segundos = idade_max_segundos
+        self.sincronizar_cada_gravacao = sincronizar_cada_gravacao
+        
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._arquivo = None
+        self._segmento: Optional[str] = None
+        self._aberto_em = 0.0
+        self._offsets: List[int] = []
+        # Índices de segmentos selados já lidos (segmento -> offsets)
+        self._indices: Dict[str, List[int]] = {}
+        
+        os.makedirs(diretorio, exist_ok=True)
+        self._recuperar_ativos()
+    
+    def acrescentar(self, registro: Dict[str, Any]) -> str:
+        """
+        Acrescenta um relatório ao segmento ativo.
+        
+        Args:
+            registro: Relatório serializável em JSON
+        
+        Returns:
+            ID do relatório (<segmento>-<sequência>)
+        """
+        linha = (json.dumps(registro, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+        
+        with self._lock:
+            if self._arquivo is not None and (
+                    self._arquivo.tell() >= self.tamanho_max_segmento
+                    or time.monotonic() - self._aberto_em >= self.idade_max_segundos):
+                self._selar()
+            if self._arquivo is None:
+                self._abrir_segmento()
+            
+            self._offsets.append(self._arquivo.tell())
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+            if self.sincronizar_cada_gravacao:
+                os.fsync(self._arquivo.fileno())
+            return f"{self._segmento}-{len(self._offsets)}"
+    
+    def ler(self, id_relatorio: str) -> Dict[str, Any]:
+        """
+        Lê um relatório pelo ID (seek direto ao offset indexado).
+        
+        Raises:
+            KeyError: Se o ID não existir no arquivo
+        """
+        segmento, sequencia = self._separar_id(id_relatorio)
+        with self._lock:
+            if segmento == self._segmento:
+                offsets = self._offsets
+                caminho = self._caminho(segmento, self.EXTENSAO_ATIVO)
+            else:
+                offsets = self._indice(segmento)
+                caminho = self._caminho(segmento, self.EXTENSAO)
+            if not 1 <= sequencia <= len(offsets):
+                raise KeyError(id_relatorio)
+            
+            with open(caminho, 'rb') as arquivo:
+                arquivo.seek(offsets[sequencia - 1])
+                return json.loads(arquivo.readline())
+    
+    def iterar(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Pares (ID, relatório) de todos os segmentos, em ordem de gravação."""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.flush()
+            segmentos = self.segmentos()
+            ativo = self._segmento
+        
+        for segmento in segmentos:
+            with self._abrir_para_leitura(segmento, segmento == ativo) as arquivo:
+                for sequencia, linha in enumerate(arquivo, 1):
+                    if not linha.endswith(b"\n"):
+                        # Linha ainda sendo escrita no segmento ativo
+                        break
+                    yield f"{segmento}-{sequencia}", json.loads(linha)
+    
+    def segmentos(self) -> List[str]:
+        """Segmentos (selados e o ativo) em ordem de criação."""
+        nomes = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.startswith(self.PREFIXO):
+                continue
+            for extensao in (self.EXTENSAO, self.EXTENSAO_ATIVO):
+                if nome.endswith(extensao):
+                    nomes.append(nome[len(self.PREFIXO):-len(extensao)])
+        return sorted(nomes)
+    
+    def estatisticas(self) -> Dict[str, Any]:
+        """Segmentos, bytes em disco e relatórios no segmento ativo."""
+        with self._lock:
+            return {
+                'segmentos': len(self.segmentos()),
+                'bytes': sum(os.path.getsize(os.path.join(self.diretorio, nome))
+                             for nome in os.listdir(self.diretorio)),
+                'segmento_ativo': self._segmento,
+                'relatorios_no_ativo': len(self._offsets)
+            }
+    
+    def fechar(self) -> None:
+        """Sela o segmento ativo (chamar ao sair)."""
+        with self._lock:
+            self._selar()
+    
+    def _abrir_segmento(self) -> None:
+        """Abre um segmento novo, nomeado pelo instante (microssegundos) de criação."""
+        segmento = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        while os.path.exists(self._caminho(segmento, self.EXTENSAO_ATIVO)) or \
+                os.path.exists(self._caminho(segmento, self.EXTENSAO)):
+            time.sleep(0.000001)
+            segmento = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        
+        self._segmento = segmento
+        self._arquivo = open(self._caminho(segmento, self.EXTENSAO_ATIVO), 'xb')
+        _travar(self._arquivo)
+        self._aberto_em = time.monotonic()
+        self._offsets = []
+    
+    def _selar(self) -> None:
+        """fsync, índice ao lado e rename do segmento ativo para o nome final."""
+        if self._arquivo is None:
+            return
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        if fcntl is None:
+            # Sem fcntl o arquivo aberto não pode ser renomeado
+            self._arquivo.close()
+        
+        self._gravar_indice(self._segmento, self._offsets)
+        # Com fcntl, renomeado ainda travado: nenhuma outra sessão o toma por abandonado
+        os.replace(self._caminho(self._segmento, self.EXTENSAO_ATIVO),
+                   self._caminho(self._segmento, self.EXTENSAO))
+        self._arquivo.close()
+        self._arquivo = None
+        self._sincronizar_diretorio()
+        
+        self._indices[self._segmento] = self._offsets
+        self.logger.info(f"Segmento {self._segmento} selado com {len(self._offsets)} relatório(s)")
+        self._segmento = None
+        self._offsets = []
+    
+    def _recuperar_ativos(self) -> None:
+        """Sela segmentos ativos de execuções anteriores (queda ou saída sem fechar)."""
+        for nome in sorted(os.listdir(self.diretorio)):
+            if not (nome.startswith(self.PREFIXO) and nome.endswith(self.EXTENSAO_ATIVO)):
+                continue
+            segmento = nome[len(self.PREFIXO):-len(self.EXTENSAO_ATIVO)]
+            caminho = os.path.join(self.diretorio, nome)
+            
+            try:
+                arquivo = open(caminho, 'r+b')
+            except (FileNotFoundError, PermissionError):
+                # Selado pela dona nesse meio-tempo, ou em uso (sem fcntl)
+                continue
+            with arquivo:
+                if not _travar(arquivo):
+                    self.logger.debug(f"Segmento {segmento} em uso por outra sessão")
+                    continue
+                
+                offsets = []
+                valido = 0
+                for linha in arquivo:
+                    try:
+                        if not linha.endswith(b"\n"):
+                            raise ValueError("linha incompleta")
+                        json.loads(linha)
+                    except ValueError:
+                        self.logger.warning(f"Segmento {segmento}: linha final incompleta descartada")
+                        break
+                    offsets.append(valido)
+                    valido += len(linha)
+                
+                arquivo.truncate(valido)
+                os.fsync(arquivo.fileno())
+                self._gravar_indice(segmento, offsets)
+                if fcntl is None:
+                    arquivo.close()
+                try:
+                    os.replace(caminho, self._caminho(segmento, self.EXTENSAO))
+                except PermissionError:
+                    # Sem fcntl: aberto por outra sessão, não pode ser renomeado
+                    continue
+            self._sincronizar_diretorio()
+            self.logger.info(f"Segmento {segmento} recuperado e selado com {len(offsets)} relatório(s)")
+    
+    def _indice(self, segmento: str) -> List[int]:
+        """Offsets de um segmento selado (lidos do .idx uma vez)."""
+        if segmento not in self._indices:
+            try:
+                with open(self._caminho(segmento, self.EXTENSAO_INDICE), 'r', encoding='utf-8') as arquivo:
+                    self._indices[segmento] = json.load(arquivo)['offsets']
+            except FileNotFoundError:
+                raise KeyError(segmento) from None
+        return self._indices[segmento]
+    
+    def _gravar_indice(self, segmento: str, offsets: List[int]) -> None:
+        """Grava o índice do segmento de forma atômica (temporário + rename)."""
+        caminho = self._caminho(segmento, self.EXTENSAO_INDICE)
+        temporario = caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({'offsets': offsets}, arquivo, separators=(',', ':'))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+    
+    def _sincronizar_diretorio(self) -> None:
+        """fsync do diretório, para que os renames sobrevivam a uma queda (POSIX)."""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        descritor = os.open(self.diretorio, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descritor)
+        finally:
+            os.close(descritor)
+    
+    def _abrir_para_leitura(self, segmento: str, ativo: bool) -> BinaryIO:
+        """Abre um segmento para leitura: o ativo desta sessão, um selado ou o ativo de outra sessão."""
+        if ativo:
+            return open(self._caminho(segmento, self.EXTENSAO_ATIVO), 'rb')
+        # O ativo de outra sessão pode ser selado entre a listagem e a abertura
+        for extensao in (self.EXTENSAO, self.EXTENSAO_ATIVO, self.EXTENSAO):
+            try:
+                return open(self._caminho(segmento, extensao), 'rb')
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(self._caminho(segmento, self.EXTENSAO))
+    
+    def _caminho(self, segmento: str, extensao: str) -> str:
+        """Caminho de um arquivo do segmento."""
+        return os.path.join(self.diretorio, f"{self.PREFIXO}{segmento}{extensao}")
+    
+    def _separar_id(self, id_relatorio: str) -> Tuple[str, int]:
+        """(segmento, sequência) de um ID; KeyError se malformado."""
+        segmento, _, sequencia = id_relatorio.rpartition('-')
+        if not segmento or not sequencia.isdigit():
+            raise KeyError(id_relatorio)
+        return segmento, int(sequencia)
+    
+    def __enter__(self) -> 'ArquivoRelatorios':
+        return self
+    
+    def __exit__(self, *_) -> None:
+        self.fechar()
+
+
+def _travar(arquivo: BinaryIO) -> bool:
+    """
+    flock exclusivo sem espera; a trava some quando o arquivo é fechado
+    ou o processo termina.
+    
+    Returns:
+        False se outra sessão tem a trava; True se travou (ou sem fcntl)
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
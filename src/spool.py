@@ -0,0 +1,461 @@
+"""
+Spool local e durável de cálculos não gravados no banco.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Com o banco fora do ar (links instáveis nos escritórios de campo), o par
+produção + perda vai para arquivos de segmento JSONL só de acréscimo em
+data/spool. O fsync é feito em grupo (a cada N registros ou T segundos).
+Quando o banco volta, os segmentos são reenviados em lote com os upserts
+pela chave natural; cada registro leva uma chave de idempotência, então
+reenviar um segmento parcialmente gravado não duplica linhas. O instante do
+registro (registrado_em) vai junto e é o gravado no banco: um registro
+antigo não sobrescreve uma gravação feita depois dele.
+
+Vários processos podem usar o mesmo diretório. O segmento em gravação tem
+o nome temporário spool-<instante>.jsonl.tmp, travado (flock) pelo
+processo dono, e só é renomeado para .jsonl ao ser selado; o reenvio lê
+apenas segmentos selados, sob uma trava de reenvio (reenvio.lock), e sela
+antes os segmentos temporários sem dono (processo que caiu). Sem fcntl
+(Windows), um segmento aberto não pode ser renomeado, o que tem o mesmo
+efeito para os segmentos em uso.
+
+Uma falha de conexão interrompe o reenvio (o segmento fica para a próxima
+vez). Se o banco recusar os dados de um lote, os registros desse lote são
+reenviados um a um e os recusados vão para rejeitados.jsonl (dead letter),
+com o erro, em vez de travar o spool.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.health import erro_de_conexao
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class SpoolOffline:
+    """Segmentos JSONL só de acréscimo, com fsync em grupo e reenvio em lote."""
+    
+    PREFIXO_SEGMENTO = "spool-"
+    EXTENSAO_SEGMENTO = ".jsonl"
+    # Segmento em gravação, renomeado para EXTENSAO_SEGMENTO ao ser selado
+    EXTENSAO_ATIVO = ".jsonl.tmp"
+    # Trava dos reenvios (um processo por vez)
+    ARQUIVO_TRAVA_REENVIO = "reenvio.lock"
+    # Registros recusados pelo banco (fora dos segmentos: não são reenviados)
+    ARQUIVO_REJEITADOS = "rejeitados.jsonl"
+    
+    def __init__(self,
+                 diretorio: str = "data/spool",
+                 tamanho_max_segmento: int = 4 * 1024 * 1024,
+                 fsync_a_cada: int = 20,
+                 intervalo_fsync: float = 1.0,
+                 tamanho_lote: int = 500):
+        """
+        Args:
+            diretorio: Pasta dos segmentos
+            tamanho_max_segmento: Bytes a partir dos quais um novo segmento é aberto
+            fsync_a_cada: Registros gravados entre dois fsync
+            intervalo_fsync: Segundos máximos sem fsync com registros pendentes
+            tamanho_lote: Registros por upsert em lote no reenvio
+        """
+        self.diretorio = diretorio
+        self.tamanho_max_segmento = tamanho_max_segmento
+        self.fsync_a_cada = fsync_a_cada
+        self.intervalo_fsync = intervalo_fsync
+        self.tamanho_lote = tamanho_lote
+        self.caminho_rejeitados = os.path.join(diretorio, self.ARQUIVO_REJEITADOS)
+        
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._lock_reenvio = threading.Lock()
+        self._arquivo = None
+        self._caminho_atual: Optional[str] = None
+        self._nao_sincronizados = 0
+        self._ultimo_fsync = time.monotonic()
+        self._parar = threading.Event()
+        self._reenvio: Optional[threading.Thread] = None
+        
+        os.makedirs(diretorio, exist_ok=True)
+        self._selar_abandonados()
+        
+        # Profundidade inicial: registros deixados por execuções anteriores
+        # (e ainda em gravação por outros processos)
+        self.registros_pendentes = sum(
+            sum(1 for _ in self._ler_segmento(caminho))
+            for caminho in self._segmentos() + self._segmentos_ativos()
+        )
+        self.registros_reenviados = 0
+        self.registros_rejeitados = 0
+        self.ultimo_reenvio: Optional[Dict[str, Any]] = None
+    
+    def gravar(self, dados_producao: Dict[str, Any], dados_perda: Dict[str, Any]) -> str:
+        """
+        Acrescenta o par produção + perda ao segmento atual.
+        
+        Args:
+            dados_producao: Dicionário no formato de upsert_producao_cana
+            dados_perda: Dicionário no formato de upsert_perda_colheita (producao_id é ignorado)
+        
+        Returns:
+            Chave de idempotência do registro
+        """
+        chave = uuid.uuid4().hex
+        registro = {
+            'chave': chave,
+            'registrado_em': datetime.now(timezone.utc).isoformat(),
+            'producao': dados_producao,
+            'perda': {nome: valor for nome, valor in dados_perda.items() if nome != 'producao_id'}
+        }
+        linha = json.dumps(registro, ensure_ascii=False, default=_serializar) + "\n"
+        
+        with self._lock:
+            if self._arquivo is None or self._arquivo.tell() >= self.tamanho_max_segmento:
+                self._abrir_segmento()
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+            self._nao_sincronizados += 1
+            self.registros_pendentes += 1
+            
+            if (self._nao_sincronizados >= self.fsync_a_cada
+                    or time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync):
+                self._sincronizar()
+        
+        return chave
+    
+    def rejeitar(self, dados_producao: Dict[str, Any], dados_perda: Dict[str, Any],
+                 erro: BaseException) -> None:
+        """
+        Guarda em rejeitados.jsonl um cálculo que o banco recusou (erro de dados).
+        
+        Args:
+            dados_producao: Dicionário no formato de upsert_producao_cana
+            dados_perda: Dicionário no formato de upsert_perda_colheita
+            erro: Erro devolvido pelo banco
+        """
+        self._rejeitar([{
+            'chave': uuid.uuid4().hex,
+            'registrado_em': datetime.now(timezone.utc).isoformat(),
+            'producao': dados_producao,
+            'perda': {nome: valor for nome, valor in dados_perda.items() if nome != 'producao_id'}
+        }], [erro])
+    
+    def sincronizar(self) -> None:
+        """Força o fsync dos registros ainda não sincronizados."""
+        with self._lock:
+            self._sincronizar()
+    
+    def reenviar(self, repositorio: Any) -> Dict[str, Any]:
+        """
+        Reenvia todos os segmentos ao banco, em lote, e remove os concluídos.
+        
+        Um segmento só é apagado depois de reenviado por inteiro; se o
+        banco cair no meio, ele é reenviado de novo na próxima vez (os
+        upserts e a chave de idempotência evitam duplicidade). Registros
+        recusados pelo banco vão para rejeitados.jsonl e não param o reenvio.
+        
+        Args:
+            repositorio: Repositório com upsert_producoes_em_lote e upsert_perdas_em_lote
+        
+        Returns:
+            Dict com registros reenviados, rejeitados, segmentos concluídos,
+            segundos e registros_por_segundo
+        
+        Raises:
+            Exception: Falha de conexão com o banco (o reenvio para ali)
+        """
+        with self._lock_reenvio:
+            with open(os.path.join(self.diretorio, self.ARQUIVO_TRAVA_REENVIO), 'a') as trava:
+                if not _travar(trava):
+                    self.logger.info("Spool em reenvio por outro processo; reenvio adiado")
+                    return {'registros': 0, 'rejeitados': 0, 'segmentos': 0,
+                            'segundos': 0.0, 'registros_por_segundo': None}
+                return self._reenviar(repositorio)
+    
+    def _reenviar(self, repositorio: Any) -> Dict[str, Any]:
+        """Reenvio propriamente dito (um por vez, sob _lock_reenvio e a trava de reenvio)."""
+        with self._lock:
+            # O segmento em uso é selado para entrar no reenvio
+            self._fechar_segmento()
+        self._selar_abandonados()
+        segmentos = self._segmentos()
+        
+        inicio = time.perf_counter()
+        reenviados = 0
+        rejeitados = 0
+        concluidos = 0
+        
+        for caminho in segmentos:
+            # Chave de idempotência: repetições no segmento são gravadas uma vez
+            try:
+                lidos = list(self._ler_segmento(caminho))
+            except FileNotFoundError:
+                # Reenviado por um processo sem a trava (ex.: sem fcntl)
+                continue
+            registros = list({registro['chave']: registro for registro in lidos}.values())
+            
+            recusados, erros = [], []
+            for inicio_lote in range(0, len(registros), self.tamanho_lote):
+                lote = registros[inicio_lote:inicio_lote + self.tamanho_lote]
+                try:
+                    self._enviar_lote(repositorio, lote)
+                    reenviados += len(lote)
+                    continue
+                except Exception as e:
+                    if erro_de_conexao(e):
+                        raise
+                    self.logger.warning(f"Lote do spool recusado pelo banco; reenviando um a um: {e}")
+                
+                # Dados recusados: só os registros com problema ficam de fora
+                for registro in lote:
+                    try:
+                        self._enviar_lote(repositorio, [registro])
+                        reenviados += 1
+                    except Exception as e:
+                        if erro_de_conexao(e):
+                            raise
+                        recusados.append(registro)
+                        erros.append(e)
+            
+            # Rejeitados gravados (com fsync) antes de apagar o segmento
+            if recusados:
+                self._rejeitar(recusados, erros)
+                rejeitados += len(recusados)
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            concluidos += 1
+            with self._lock:
+                self.registros_pendentes = max(self.registros_pendentes - len(lidos), 0)
+                self.registros_reenviados += len(registros) - len(recusados)
+        
+        segundos = time.perf_counter() - inicio
+        resultado = {
+            'registros': reenviados,
+            'rejeitados': rejeitados,
+            'segmentos': concluidos,
+            'segundos': segundos,
+            'registros_por_segundo': reenviados / segundos if segundos > 0 else None
+        }
+        if reenviados or rejeitados:
+            self.ultimo_reenvio = resultado
+            self.logger.info(f"Spool reenviado: {reenviados} registros em {segundos:.2f}s")
+        if rejeitados:
+            self.logger.error(f"{rejeitados} registro(s) do spool recusados pelo banco; "
+                              f"guardados em {self.caminho_rejeitados}")
+        return resultado
+    
+    def _enviar_lote(self, repositorio: Any, lote: List[Dict[str, Any]]) -> None:
+        """Upsert das produções e das perdas de um lote, com o instante de cada registro."""
+        instantes = [_instante_registro(registro) for registro in lote]
+        producao_ids = repositorio.upsert_producoes_em_lote([
+            {**_restaurar_producao(registro['producao']), 'registrado_em': instante}
+            for registro, instante in zip(lote, instantes)
+        ])
+        repositorio.upsert_perdas_em_lote([
+            {**registro['perda'], 'producao_id': producao_id, 'registrado_em': instante}
+            for registro, producao_id, instante in zip(lote, producao_ids, instantes)
+        ])
+    
+    def _rejeitar(self, registros: List[Dict[str, Any]], erros: List[BaseException]) -> None:
+        """Acrescenta registros recusados, com o erro, ao arquivo de rejeitados (com fsync)."""
+        rejeitado_em = datetime.now().isoformat()
+        linhas = "".join(
+            json.dumps({**registro, 'erro': str(erro), 'rejeitado_em': rejeitado_em},
+                       ensure_ascii=False, default=_serializar) + "\n"
+            for registro, erro in zip(registros, erros)
+        )
+        with self._lock:
+            with open(self.caminho_rejeitados, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linhas)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            self.registros_rejeitados += len(registros)
+    
+    
+    def iniciar_reenvio(self, repositorio: Any, disponivel: Callable[[], bool],
+                        intervalo_segundos: float = 30.0) -> None:
+        """
+        Reenvia o spool em segundo plano sempre que o banco estiver disponível.
+        
+        Args:
+            repositorio: Repositório de destino
+            disponivel: Verificação barata de disponibilidade (ex.: MonitorSaude.disponivel)
+            intervalo_segundos: Espera entre verificações
+        """
+        if self._reenvio is not None and self._reenvio.is_alive():
+            return
+        
+        def reenviar_periodicamente():
+            while not self._parar.wait(intervalo_segundos):
+                if not self.registros_pendentes or not disponivel():
+                    continue
+                try:
+                    self.reenviar(repositorio)
+                except Exception as e:
+                    self.logger.warning(f"Reenvio do spool interrompido: {e}")
+        
+        self._parar.clear()
+        self._reenvio = threading.Thread(target=reenviar_periodicamente, name="reenvio-spool", daemon=True)
+        self._reenvio.start()
+    
+    def estatisticas(self) -> Dict[str, Any]:
+        """Profundidade (registros e segmentos), bytes em disco e último reenvio."""
+        with self._lock:
+            segmentos = self._segmentos() + self._segmentos_ativos()
+            return {
+                'registros_pendentes': self.registros_pendentes,
+                'segmentos': len(segmentos),
+                'bytes': sum(os.path.getsize(caminho) for caminho in segmentos),
+                'registros_reenviados': self.registros_reenviados,
+                'registros_rejeitados': self.registros_rejeitados,
+                'ultimo_reenvio': self.ultimo_reenvio
+            }
+    
+    def fechar(self) -> None:
+        """Para o reenvio em segundo plano e sela o segmento atual."""
+        self._parar.set()
+        if self._reenvio is not None:
+            self._reenvio.join(timeout=5.0)
+            self._reenvio = None
+        with self._lock:
+            self._fechar_segmento()
+    
+    def _abrir_segmento(self) -> None:
+        """Sela o segmento atual (se houver) e abre um novo, travado por este processo."""
+        self._fechar_segmento()
+        nome = f"{self.PREFIXO_SEGMENTO}{time.time_ns()}{self.EXTENSAO_ATIVO}"
+        self._caminho_atual = os.path.join(self.diretorio, nome)
+        self._arquivo = open(self._caminho_atual, 'x', encoding='utf-8')
+        _travar(self._arquivo)
+    
+    def _fechar_segmento(self) -> None:
+        """Sincroniza, fecha e sela o segmento atual (rename de .jsonl.tmp para .jsonl)."""
+        if self._arquivo is None:
+            return
+        self._sincronizar()
+        if fcntl is not None:
+            # Selado ainda travado: nenhum outro processo o toma por abandonado
+            self._selar(self._caminho_atual)
+            self._arquivo.close()
+        else:
+            # Sem fcntl o arquivo aberto não pode ser renomeado
+            self._arquivo.close()
+            self._selar(self._caminho_atual)
+        self._arquivo = None
+        self._caminho_atual = None
+    
+    def _selar(self, caminho: str) -> None:
+        """Renomeia um segmento temporário para o nome definitivo (visível ao reenvio)."""
+        try:
+            os.replace(caminho, caminho[:-len(self.EXTENSAO_ATIVO)] + self.EXTENSAO_SEGMENTO)
+        except FileNotFoundError:
+            # Já selado pelo dono ou por outro processo
+            pass
+    
+    def _selar_abandonados(self) -> None:
+        """Sela os segmentos temporários de processos que terminaram sem selá-los."""
+        for caminho in self._segmentos_ativos():
+            if caminho == self._caminho_atual:
+                continue
+            try:
+                arquivo = open(caminho, 'rb')
+            except FileNotFoundError:
+                continue
+            try:
+                if not _travar(arquivo):
+                    # Ainda em gravação por outro processo
+                    continue
+                if fcntl is None:
+                    arquivo.close()
+                self._selar(caminho)
+                self.logger.info(f"Segmento abandonado selado: {os.path.basename(caminho)}")
+            except PermissionError:
+                # Sem fcntl: aberto por outro processo, não pode ser renomeado
+                continue
+            finally:
+                arquivo.close()
+    
+    def _sincronizar(self) -> None:
+        """fsync do segmento atual (chamar com o lock)."""
+        if self._arquivo is not None and self._nao_sincronizados:
+            os.fsync(self._arquivo.fileno())
+        self._nao_sincronizados = 0
+        self._ultimo_fsync = time.monotonic()
+    
+    def _segmentos(self) -> List[str]:
+        """Segmentos selados em ordem de criação (o nome leva o instante em ns)."""
+        return self._listar(self.EXTENSAO_SEGMENTO)
+    
+    def _segmentos_ativos(self) -> List[str]:
+        """Segmentos temporários (em gravação ou abandonados) em ordem de criação."""
+        return self._listar(self.EXTENSAO_ATIVO)
+    
+    def _listar(self, extensao: str) -> List[str]:
+        """Caminhos dos arquivos de segmento com a extensão, em ordem de nome."""
+        nomes = sorted(
+            nome for nome in os.listdir(self.diretorio)
+            if nome.startswith(self.PREFIXO_SEGMENTO) and nome.endswith(extensao)
+        )
+        return [os.path.join(self.diretorio, nome) for nome in nomes]
+    
+    def _ler_segmento(self, caminho: str) -> Iterator[Dict[str, Any]]:
+        """Registros do segmento; uma última linha incompleta (queda no meio da escrita) é ignorada."""
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            for numero, linha in enumerate(arquivo, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    self.logger.warning(f"Linha {numero} inválida ignorada em {caminho}")
+
+
+def _travar(arquivo: Any) -> bool:
+    """
+    Trava exclusiva (flock) sem espera no arquivo aberto, liberada ao fechá-lo
+    ou quando o processo termina.
+    
+    Returns:
+        False se outro processo tem a trava; True se travou (ou sem fcntl)
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _serializar(valor: Any) -> str:
+    """Datas em ISO 8601 no JSON do spool."""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável no spool: {type(valor).__name__}")
+
+
+def _restaurar_producao(dados_producao: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte data_colheita de volta para date antes do reenvio."""
+    dados = dict(dados_producao)
+    if isinstance(dados.get('data_colheita'), str):
+        dados['data_colheita'] = date.fromisoformat(dados['data_colheita'][:10])
+    return dados
+
+
+def _instante_registro(registro: Dict[str, Any]) -> Optional[datetime]:
+    """Instante do registro com fuso (registros antigos, sem fuso, estão na hora local)."""
+    if not registro.get('registrado_em'):
+        return None
+    instante = datetime.fromisoformat(registro['registrado_em'])
+    return instante if instante.tzinfo is not None else instante.astimezone()
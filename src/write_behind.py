@@ -0,0 +1,272 @@
+"""
+Gravação assíncrona (write-behind) dos cálculos no banco.
+Sistema de Cálculo de Perdas na Colheita de Cana-de-Açúcar.
+
+Salvar um cálculo exigia duas idas ao banco (produção e perda) antes de
+devolver o controle ao usuário. FilaEscritaAssincrona recebe o par
+produção + perda, devolve na hora e uma thread grava em lote (por
+tamanho ou por tempo) com os upserts em lote do repositório. A fila é
+limitada: quando cheia, quem enfileira espera (backpressure).
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.health import erro_de_conexao
+
+# Confirmação de durabilidade: (producao_id, perda_id, erro); erro None = gravado
+CallbackConfirmacao = Callable[[Optional[int], Optional[int], Optional[Exception]], None]
+
+
+@dataclass
+class _ItemEscrita:
+    """Par produção + perda aguardando gravação."""
+    dados_producao: Dict[str, Any]
+    dados_perda: Dict[str, Any]
+    ao_confirmar: Optional[CallbackConfirmacao]
+
+
+class FilaEscritaAssincrona:
+    """Fila limitada com thread que grava produções e perdas em lote."""
+    
+    def __init__(self,
+                 repositorio: Any,
+                 tamanho_lote: int = 500,
+                 intervalo_segundos: float = 2.0,
+                 max_pendentes: int = 10000,
+                 tentativas: int = 3,
+                 ao_confirmar: Optional[CallbackConfirmacao] = None):
+        """
+        Args:
+            repositorio: Repositório com upsert_producoes_em_lote e
+                upsert_perdas_em_lote (RepositorioProducao ou RepositorioComCache)
+            tamanho_lote: Itens que disparam a gravação imediata do lote
+            intervalo_segundos: Tempo máximo que um item espera na fila
+            max_pendentes: Limite de itens na fila; acima dele enfileirar() espera
+            tentativas: Tentativas de gravação de cada lote antes de desistir
+                (só falhas de conexão; dados recusados não são repetidos)
+            ao_confirmar: Callback padrão de confirmação (chamado na thread
+                de gravação) para itens enfileirados sem callback próprio
+        """
+        self.repositorio = repositorio
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_segundos = intervalo_segundos
+        self.tentativas = tentativas
+        self.ao_confirmar = ao_confirmar
+        
+        self.logger = logging.getLogger(__name__)
+        self._fila: "queue.Queue[_ItemEscrita]" = queue.Queue(maxsize=max_pendentes)
+        self._pedido_descarga = threading.Event()
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._ocioso = threading.Condition(self._lock)
+        self._em_gravacao = 0
+        
+        self.itens_gravados = 0
+        self.itens_com_falha = 0
+        self.lotes_gravados = 0
+        
+        self._trabalhador = threading.Thread(target=self._executar, name="write-behind", daemon=True)
+        self._trabalhador.start()
+    
+    def enfileirar(self,
+                   dados_producao: Dict[str, Any],
+                   dados_perda: Dict[str, Any],
+                   ao_confirmar: Optional[CallbackConfirmacao] = None,
+                   timeout: Optional[float] = None) -> None:
+        """
+        Coloca o par produção + perda na fila de gravação.
+        
+        O producao_id de dados_perda é preenchido na gravação.
+        
+        Args:
+            dados_producao: Dicionário no formato de upsert_producao_cana
+            dados_perda: Dicionário no formato de upsert_perda_colheita (sem producao_id)
+            ao_confirmar: Callback de confirmação deste item (padrão: o da fila)
+            timeout: Espera máxima (s) com a fila cheia; None espera indefinidamente
+        
+        Raises:
+            RuntimeError: Se a fila já foi fechada
+            queue.Full: Se a fila continuar cheia após `timeout`
+        """
+        if self._parar.is_set():
+            raise RuntimeError("Fila de escrita fechada")
+        
+        with self._lock:
+            self._em_gravacao += 1
+        try:
+            self._fila.put(_ItemEscrita(dados_producao, dados_perda, ao_confirmar), timeout=timeout)
+        except queue.Full:
+            self._concluir(1)
+            raise
+    
+    def descarregar(self, timeout: Optional[float] = None) -> bool:
+        """
+        Grava agora o que estiver na fila e espera a confirmação.
+        
+        Returns:
+            True se tudo o que foi enfileirado até aqui foi processado
+        """
+        self._pedido_descarga.set()
+        with self._ocioso:
+            return self._ocioso.wait_for(lambda: self._em_gravacao == 0, timeout=timeout)
+    
+    def fechar(self, timeout: Optional[float] = None) -> bool:
+        """
+        Grava os itens pendentes e encerra a thread (chamar ao sair).
+        
+        Returns:
+            True se a fila foi esvaziada dentro do prazo
+        """
+        concluido = self.descarregar(timeout)
+        self._parar.set()
+        self._pedido_descarga.set()
+        self._trabalhador.join(timeout=timeout)
+        if not concluido:
+            self.logger.warning(f"Fila de escrita fechada com {self.pendentes()} itens não gravados")
+        return concluido
+    
+    def pendentes(self) -> int:
+        """Itens enfileirados ainda não confirmados."""
+        with self._lock:
+            return self._em_gravacao
+    
+    def estatisticas(self) -> Dict[str, int]:
+        """Pendentes, itens gravados, itens com falha e lotes gravados."""
+        with self._lock:
+            return {
+                'pendentes': self._em_gravacao,
+                'itens_gravados': self.itens_gravados,
+                'itens_com_falha': self.itens_com_falha,
+                'lotes_gravados': self.lotes_gravados
+            }
+    
+    def _executar(self) -> None:
+        """Laço da thread: junta itens até o tamanho do lote ou o fim do intervalo."""
+        while True:
+            lote = self._coletar_lote()
+            if lote:
+                self._gravar(lote)
+            elif self._parar.is_set() and self._fila.empty():
+                return
+    
+    def _coletar_lote(self) -> List[_ItemEscrita]:
+        """Retira da fila até tamanho_lote itens, esperando no máximo o intervalo."""
+        lote = []
+        limite = time.monotonic() + self.intervalo_segundos
+        while len(lote) < self.tamanho_lote:
+            descarregando = self._pedido_descarga.is_set()
+            try:
+                if descarregando:
+                    lote.append(self._fila.get_nowait())
+                else:
+                    espera = limite - time.monotonic()
+                    if espera <= 0:
+                        break
+                    # Espera curta: um pedido de descarga é atendido logo
+                    lote.append(self._fila.get(timeout=min(espera, 0.1)))
+            except queue.Empty:
+                if descarregando:
+                    break
+        
+        if self._fila.empty():
+            self._pedido_descarga.clear()
+        return lote
+    
+    def _gravar(self, lote: List[_ItemEscrita]) -> None:
+        """
+        Grava o lote (produções, depois perdas) e confirma cada item.
+        
+        Falha de conexão: novas tentativas do lote, com espera crescente.
+        Lote recusado pelo banco (erro de dados): sem novas tentativas, o
+        lote é regravado um a um, e só os itens com problema falham.
+        """
+        erro = None
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                producao_ids, perda_ids = self._gravar_itens(lote)
+                break
+            except Exception as e:
+                erro = e
+                if not erro_de_conexao(e):
+                    self.logger.warning(f"Lote de {len(lote)} cálculos recusado pelo banco; "
+                                        f"gravando um a um: {e}")
+                    self._gravar_um_a_um(lote)
+                    return
+                self.logger.warning(f"Falha ao gravar lote de {len(lote)} cálculos "
+                                    f"(tentativa {tentativa}/{self.tentativas}): {e}")
+                if tentativa < self.tentativas:
+                    self._parar.wait(min(2 ** (tentativa - 1), 10))
+        else:
+            self.logger.error(f"Lote de {len(lote)} cálculos não gravado: {erro}")
+            self._falhar(lote, erro)
+            return
+        
+        with self._lock:
+            self.lotes_gravados += 1
+        self._gravados(lote, producao_ids, perda_ids)
+    
+    def _gravar_um_a_um(self, lote: List[_ItemEscrita]) -> None:
+        """Grava cada item do lote recusado; uma falha de conexão encerra o restante."""
+        for posicao, item in enumerate(lote):
+            try:
+                producao_ids, perda_ids = self._gravar_itens([item])
+            except Exception as e:
+                if erro_de_conexao(e):
+                    self.logger.error(f"{len(lote) - posicao} cálculo(s) não gravados: {e}")
+                    self._falhar(lote[posicao:], e)
+                    return
+                self.logger.error(f"Cálculo recusado pelo banco: {e}")
+                self._falhar([item], e)
+            else:
+                self._gravados([item], producao_ids, perda_ids)
+    
+    def _gravar_itens(self, itens: List[_ItemEscrita]) -> Tuple[List[int], List[int]]:
+        """Upsert em lote das produções e das perdas dos itens; devolve os IDs."""
+        producao_ids = self.repositorio.upsert_producoes_em_lote(
+            [item.dados_producao for item in itens]
+        )
+        perda_ids = self.repositorio.upsert_perdas_em_lote([
+            {**item.dados_perda, 'producao_id': producao_id}
+            for item, producao_id in zip(itens, producao_ids)
+        ])
+        return producao_ids, perda_ids
+    
+    def _gravados(self, itens: List[_ItemEscrita], producao_ids: List[int],
+                  perda_ids: List[int]) -> None:
+        """Contabiliza e confirma itens gravados."""
+        with self._lock:
+            self.itens_gravados += len(itens)
+        for item, producao_id, perda_id in zip(itens, producao_ids, perda_ids):
+            self._confirmar(item, producao_id, perda_id, None)
+        self._concluir(len(itens))
+    
+    def _falhar(self, itens: List[_ItemEscrita], erro: Exception) -> None:
+        """Contabiliza e confirma itens não gravados, com o erro."""
+        with self._lock:
+            self.itens_com_falha += len(itens)
+        for item in itens:
+            self._confirmar(item, None, None, erro)
+        self._concluir(len(itens))
+    
+    def _confirmar(self, item: _ItemEscrita, producao_id: Optional[int],
+                   perda_id: Optional[int], erro: Optional[Exception]) -> None:
+        """Chama o callback de confirmação do item; erro nele não para a thread."""
+        callback = item.ao_confirmar or self.ao_confirmar
+        if callback is None:
+            return
+        try:
+            callback(producao_id, perda_id, erro)
+        except Exception as e:
+            self.logger.error(f"Erro no callback de confirmação: {e}")
+    
+    def _concluir(self, quantidade: int) -> None:
+        """Desconta itens processados e acorda quem espera a fila esvaziar."""
+        with self._ocioso:
+            self._em_gravacao -= quantidade
+            if self._em_gravacao == 0:
+                self._ocioso.notify_all()